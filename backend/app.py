@@ -7,10 +7,14 @@ from decimal import Decimal
 from flask.json.provider import JSONProvider
 from config import config_by_name
 from utils.errors import register_error_handlers
+from utils.commands import register_commands
+from utils.metrics import register_dynamodb_metrics
+from utils.cognito import warm_cognito_client
 from routes.auth import auth_bp
 from routes.users import users_bp
+from models.records import UserRecord
 
-# Custom JSON Provider to handle Decimal values
+# Custom JSON Provider to handle Decimal values and user records
 class CustomJSONProvider(JSONProvider):
     def dumps(self, obj, **kwargs):
         return json.dumps(obj, **kwargs, default=self._default)
@@ -21,6 +25,8 @@ class CustomJSONProvider(JSONProvider):
     def _default(self, obj):
         if isinstance(obj, Decimal):
             return float(obj)
+        if isinstance(obj, UserRecord):
+            return obj.to_dict()
         raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
 
 def create_app(config_name='default'):
@@ -54,10 +60,19 @@ def create_app(config_name='default'):
     # Register error handlers
     register_error_handlers(app)
     
+    # Record DynamoDB usage per request
+    register_dynamodb_metrics(app)
+    
     # Register blueprints
     app.register_blueprint(auth_bp)
     app.register_blueprint(users_bp)
     
+    # Register CLI commands
+    register_commands(app)
+    
+    # Build the shared Cognito client now rather than on the first request
+    warm_cognito_client(app)
+    
     # Root endpoint
     @app.route('/')
     def index():
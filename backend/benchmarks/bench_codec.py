@@ -0,0 +1,78 @@
+"""
+Micro-benchmark: resource-style decoding vs the direct codec.
+
+Decodes a page of low-level user items the way each DynamoDB access mode
+does and serializes the result to JSON the way the API responds:
+
+- resource: TypeDeserializer, then CustomJSONProvider converting Decimal to float
+- client:   utils.dynamo_codec.decode_item, then plain json.dumps
+
+Usage (from the backend directory):
+    python benchmarks/bench_codec.py [--items 100] [--repeat 5] [--number 200]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from boto3.dynamodb.types import TypeDeserializer
+from app import CustomJSONProvider, create_app
+from utils.dynamo_codec import decode_item
+
+
+def make_items(count):
+    """Build low-level items shaped like user profiles."""
+    return [
+        {
+            'PK': {'S': f'USER#{index:08d}'},
+            'SK': {'S': 'PROFILE'},
+            'UserId': {'S': f'{index:08d}'},
+            'Email': {'S': f'user{index}@example.com'},
+            'Name': {'S': f'User {index}'},
+            'Role': {'S': 'parent' if index % 3 else 'child'},
+            'CreatedAt': {'N': str(1700000000 + index)},
+            'Score': {'N': f'{index}.5'},
+            'Tags': {'L': [{'S': 'a'}, {'S': 'b'}]},
+            'Settings': {'M': {'Notifications': {'BOOL': True}, 'Limit': {'N': '10'}}},
+            'EntityType': {'S': 'USER'},
+            'GSI1PK': {'S': f'EMAIL#user{index}@example.com'},
+            'GSI1SK': {'S': f'USER#{index:08d}'}
+        }
+        for index in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=100, help='Items per page')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing runs; the best is reported')
+    parser.add_argument('--number', type=int, default=200, help='Pages decoded per run')
+    args = parser.parse_args()
+
+    items = make_items(args.items)
+    deserializer = TypeDeserializer()
+    provider = CustomJSONProvider(create_app('testing'))
+
+    def resource_path():
+        page = [{name: deserializer.deserialize(value) for name, value in item.items()} for item in items]
+        return provider.dumps(page)
+
+    def client_path():
+        return json.dumps([decode_item(item) for item in items])
+
+    assert json.loads(resource_path()) == json.loads(client_path())
+
+    results = {}
+    for name, func in (('resource', resource_path), ('client', client_path)):
+        best = min(timeit.repeat(func, repeat=args.repeat, number=args.number))
+        results[name] = best / (args.number * args.items) * 1e6
+        print(f"{name:>8}: {results[name]:.2f} us/item")
+
+    print(f" speedup: {results['resource'] / results['client']:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark utils/database.py offline against the in-memory DynamoDB engine.
+
+Seeds parents with children, then times the user lookups with an optional
+per-request latency injected, and reports latency percentiles and the number
+of DynamoDB requests each operation makes.
+
+Usage (from the backend directory):
+    python benchmarks/bench_database.py [--parents 1000] [--children 3]
+        [--latency-ms 2] [--throttle-rate 0] [--access-mode resource|client]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from utils.database import (
+    BulkWriter,
+    get_children_by_parent_id,
+    get_memory_engine,
+    get_user_by_email,
+    get_user_by_id,
+    reset_memory_engine
+)
+
+
+def seed(parents, children_per_parent):
+    """Write parents, children and relationships with BulkWriter."""
+    users = []
+    now = int(time.time())
+
+    with BulkWriter() as writer:
+        for parent_index in range(parents):
+            parent_id = f'parent-{parent_index}'
+            email = f'parent{parent_index}@example.com'
+            writer.put({
+                'PK': f'USER#{parent_id}', 'SK': 'PROFILE', 'EntityType': 'USER',
+                'GSI1PK': f'EMAIL#{email}', 'GSI1SK': 'USER', 'UserId': parent_id,
+                'Email': email, 'Name': f'Parent {parent_index}', 'Role': 'parent',
+                'PasswordHash': 'hash', 'CreatedAt': now, 'UpdatedAt': now
+            })
+            users.append((parent_id, email))
+
+            for child_index in range(children_per_parent):
+                child_id = f'{parent_id}-child-{child_index}'
+                writer.put({
+                    'PK': f'USER#{child_id}', 'SK': 'PROFILE', 'EntityType': 'USER',
+                    'UserId': child_id, 'Email': f'{child_id}@example.com', 'Name': 'Child',
+                    'Role': 'child', 'ParentId': parent_id, 'CreatedAt': now, 'UpdatedAt': now
+                })
+                writer.put({
+                    'PK': f'USER#{parent_id}', 'SK': f'CHILD#{child_id}', 'EntityType': 'RELATIONSHIP',
+                    'GSI1PK': f'PARENT#{parent_id}', 'GSI1SK': f'CHILD#{child_id}',
+                    'ChildId': child_id, 'ParentId': parent_id, 'CreatedAt': now
+                })
+
+    return users, writer.stats
+
+
+def run(name, operation, samples, engine):
+    """Time an operation over the samples and count its DynamoDB requests."""
+    requests_before = sum(engine.requests.values())
+    timings = []
+
+    for sample in samples:
+        started_at = time.perf_counter()
+        operation(sample)
+        timings.append((time.perf_counter() - started_at) * 1000)
+
+    requests = sum(engine.requests.values()) - requests_before
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{name:>26}: p50 {statistics.median(timings):7.3f} ms  p95 {p95:7.3f} ms  "
+          f"{requests / len(samples):.1f} requests/op")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--parents', type=int, default=1000)
+    parser.add_argument('--children', type=int, default=3)
+    parser.add_argument('--samples', type=int, default=500)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--throttle-rate', type=float, default=0)
+    parser.add_argument('--access-mode', choices=('resource', 'client'), default='resource')
+    parser.add_argument('--cache', action='store_true', help='Enable the profile cache')
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    app.config.update(
+        DYNAMODB_ENGINE='memory',
+        DYNAMODB_ACCESS_MODE=args.access_mode,
+        MEMORY_DYNAMODB_LATENCY_MS=args.latency_ms,
+        MEMORY_DYNAMODB_THROTTLE_RATE=args.throttle_rate,
+        PROFILE_CACHE_ENABLED=args.cache
+    )
+
+    with app.app_context():
+        reset_memory_engine()
+        engine = get_memory_engine()
+
+        started_at = time.perf_counter()
+        users, write_stats = seed(args.parents, args.children)
+        print(f"seeded {write_stats['written']} items in {time.perf_counter() - started_at:.2f}s "
+              f"({write_stats['retries']} retries)")
+
+        rng = random.Random(7)
+        samples = [rng.choice(users) for _ in range(args.samples)]
+
+        run('get_user_by_id', lambda user: get_user_by_id(user[0]), samples, engine)
+        run('get_user_by_email', lambda user: get_user_by_email(user[1]), samples, engine)
+        run('get_children_by_parent_id', lambda user: get_children_by_parent_id(user[0]), samples, engine)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Micro-benchmark: RS256 verification paths for Cognito access tokens.
+
+Signs a token with a freshly generated 2048-bit key and compares verifying
+it the old way (scan the JWKS for the kid and jwk.construct on every call)
+with verifying against public keys built once per JWKS fetch, through
+python-jose and through cryptography directly. No network access needed.
+
+Usage (from the backend directory):
+    python benchmarks/bench_jwt_verify.py [--number 2000] [--keys 2]
+"""
+import argparse
+import timeit
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from jose import jwk, jwt
+from jose.utils import base64url_decode
+
+
+def make_jwks(count):
+    """Generate signing keys and the matching public JWKS."""
+    private_keys, jwks = [], {'keys': []}
+    for index in range(count):
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        pem = private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+        public_jwk = jwk.construct(pem, 'RS256').public_key().to_dict()
+        jwks['keys'].append(dict(public_jwk, kid=f'key-{index}', use='sig'))
+        private_keys.append((pem, private_key))
+    return private_keys, jwks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--number', type=int, default=2000, help='Verifications to time')
+    parser.add_argument('--keys', type=int, default=2, help='Keys in the JWKS')
+    args = parser.parse_args()
+
+    private_keys, jwks = make_jwks(args.keys)
+    kid = jwks['keys'][-1]['kid']
+    pem, private_key = private_keys[-1]
+    token = jwt.encode({'sub': 'user', 'token_use': 'access'}, pem, algorithm='RS256', headers={'kid': kid})
+
+    message, encoded_signature = token.rsplit('.', 1)
+    message = message.encode('utf-8')
+    signature = base64url_decode(encoded_signature.encode('utf-8'))
+
+    def per_call_construct():
+        header = jwt.get_unverified_header(token)
+        key = next(key for key in jwks['keys'] if key['kid'] == header['kid'])
+        return jwk.construct(key).verify(message, signature)
+
+    jose_keys = {key['kid']: jwk.construct(key) for key in jwks['keys']}
+
+    def prebuilt_jose():
+        return jose_keys[jwt.get_unverified_header(token)['kid']].verify(message, signature)
+
+    cryptography_keys = {kid: private_key.public_key()}
+
+    def prebuilt_cryptography():
+        try:
+            cryptography_keys[jwt.get_unverified_header(token)['kid']].verify(
+                signature, message, padding.PKCS1v15(), hashes.SHA256()
+            )
+            return True
+        except InvalidSignature:
+            return False
+
+    for name, verify in (('jwk.construct per call', per_call_construct),
+                         ('prebuilt python-jose', prebuilt_jose),
+                         ('prebuilt cryptography', prebuilt_cryptography)):
+        assert verify()
+        best = min(timeit.repeat(verify, repeat=5, number=args.number))
+        print(f"{name:>24}: {best / args.number * 1e6:8.1f} us/verify")
+
+
+if __name__ == '__main__':
+    main()
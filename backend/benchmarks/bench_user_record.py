@@ -0,0 +1,88 @@
+"""
+Micro-benchmark: memory and build time of UserRecord vs per-call dicts.
+
+Builds N profiles from DynamoDB items both the old way (a new snake_case dict
+per lookup, copied again by the cache and the model) and as UserRecord
+instances, and reports retained memory per cached profile and the cost of
+serving one cached lookup.
+
+Usage (from the backend directory):
+    python benchmarks/bench_user_record.py [--profiles 10000]
+"""
+import argparse
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from models.records import UserRecord
+
+
+def make_items(count):
+    """Build items shaped like user PROFILE reads."""
+    return [
+        {
+            'UserId': f'{index:08d}',
+            'Email': f'user{index}@example.com',
+            'Name': f'User {index}',
+            'Role': 'parent',
+            'CreatedAt': 1700000000 + index
+        }
+        for index in range(count)
+    ]
+
+
+def dict_from_item(item):
+    return {
+        'user_id': item['UserId'],
+        'email': item['Email'],
+        'name': item['Name'],
+        'role': item['Role'],
+        'created_at': item['CreatedAt']
+    }
+
+
+def retained_bytes(build, items):
+    """Measure memory held by the built profiles, excluding the source items."""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    profiles = [build(item) for item in items]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    del profiles
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--profiles', type=int, default=10000, help='Profiles to build')
+    parser.add_argument('--number', type=int, default=200000, help='Cached lookups to time')
+    args = parser.parse_args()
+
+    items = make_items(args.profiles)
+
+    dict_bytes = retained_bytes(dict_from_item, items) / args.profiles
+    record_bytes = retained_bytes(UserRecord.from_item, items) / args.profiles
+    print(f"memory per cached profile: dict {dict_bytes:.0f} B, UserRecord {record_bytes:.0f} B")
+
+    # A cached lookup used to copy the cached dict and then strip password_hash
+    cached_dict = dict_from_item(items[0])
+    cached_record = UserRecord.from_item(items[0])
+
+    dict_lookup = min(timeit.repeat(
+        lambda: {k: v for k, v in dict(cached_dict).items() if k != 'password_hash'},
+        repeat=5, number=args.number
+    ))
+    record_lookup = min(timeit.repeat(
+        lambda: cached_record.without_password(),
+        repeat=5, number=args.number
+    ))
+    print(f"cached lookup: dict {dict_lookup / args.number * 1e9:.0f} ns, "
+          f"UserRecord {record_lookup / args.number * 1e9:.0f} ns")
+
+
+if __name__ == '__main__':
+    main()
@@ -19,6 +19,58 @@ class DefaultConfig:
     DYNAMODB_TABLE = os.environ.get('DYNAMODB_TABLE', 'ActivityHub')
     DYNAMODB_ENDPOINT_URL = os.environ.get('DYNAMODB_ENDPOINT_URL', None)
     
+    # DynamoDB connection pooling (clients are shared per process)
+    DYNAMODB_MAX_POOL_CONNECTIONS = int(os.environ.get('DYNAMODB_MAX_POOL_CONNECTIONS', 50))
+    DYNAMODB_CONNECT_TIMEOUT = float(os.environ.get('DYNAMODB_CONNECT_TIMEOUT', 2))
+    DYNAMODB_READ_TIMEOUT = float(os.environ.get('DYNAMODB_READ_TIMEOUT', 5))
+    DYNAMODB_TCP_KEEPALIVE = os.environ.get('DYNAMODB_TCP_KEEPALIVE', 'true').lower() == 'true'
+    DYNAMODB_MAX_ATTEMPTS = int(os.environ.get('DYNAMODB_MAX_ATTEMPTS', 3))
+    
+    # Read path: 'resource' (boto3 Table API) or 'client' (low-level client with a direct codec)
+    DYNAMODB_ACCESS_MODE = os.environ.get('DYNAMODB_ACCESS_MODE', 'resource')
+    
+    # Backend: 'aws', or 'memory' for the in-process engine used in load tests and benchmarks
+    DYNAMODB_ENGINE = os.environ.get('DYNAMODB_ENGINE', 'aws')
+    MEMORY_DYNAMODB_LATENCY_MS = float(os.environ.get('MEMORY_DYNAMODB_LATENCY_MS', 0))
+    MEMORY_DYNAMODB_THROTTLE_RATE = float(os.environ.get('MEMORY_DYNAMODB_THROTTLE_RATE', 0))
+    
+    # DynamoDB capacity and latency metrics
+    DYNAMODB_METRICS_ENABLED = os.environ.get('DYNAMODB_METRICS_ENABLED', 'true').lower() == 'true'
+    DYNAMODB_SLOW_CALL_MS = float(os.environ.get('DYNAMODB_SLOW_CALL_MS', 100))
+    DYNAMODB_SLOW_READ_RATIO = float(os.environ.get('DYNAMODB_SLOW_READ_RATIO', 10))
+    DYNAMODB_SLOW_READ_MIN_SCANNED = int(os.environ.get('DYNAMODB_SLOW_READ_MIN_SCANNED', 50))
+    
+    # Write shards per entity type in EntityShardIndex; run `flask backfill-entity-shards` after changing
+    ENTITY_SHARD_COUNT = int(os.environ.get('ENTITY_SHARD_COUNT', 8))
+    
+    # Background tasks (refreshing secondary copies of data after a write)
+    BACKGROUND_TASKS_ENABLED = os.environ.get('BACKGROUND_TASKS_ENABLED', 'true').lower() == 'true'
+    BACKGROUND_WORKERS = int(os.environ.get('BACKGROUND_WORKERS', 4))
+    
+    # In-process user profile cache
+    PROFILE_CACHE_ENABLED = os.environ.get('PROFILE_CACHE_ENABLED', 'true').lower() == 'true'
+    PROFILE_CACHE_SIZE = int(os.environ.get('PROFILE_CACHE_SIZE', 10000))
+    PROFILE_CACHE_TTL = int(os.environ.get('PROFILE_CACHE_TTL', 300))
+    PROFILE_CACHE_NEGATIVE_TTL = int(os.environ.get('PROFILE_CACHE_NEGATIVE_TTL', 30))
+    
+    # Children listing cache (pages per parent, dropped when a child changes)
+    CHILDREN_CACHE_ENABLED = os.environ.get('CHILDREN_CACHE_ENABLED', 'true').lower() == 'true'
+    CHILDREN_CACHE_SIZE = int(os.environ.get('CHILDREN_CACHE_SIZE', 10000))
+    CHILDREN_CACHE_TTL = int(os.environ.get('CHILDREN_CACHE_TTL', 60))
+    
+    # Cognito JWKS refresh (keys are refreshed in the background before JWKS_TTL runs out)
+    JWKS_TTL = int(os.environ.get('JWKS_TTL', 3600))
+    JWKS_REFRESH_AHEAD = int(os.environ.get('JWKS_REFRESH_AHEAD', 300))
+    JWKS_MAX_STALE = int(os.environ.get('JWKS_MAX_STALE', 86400))
+    JWKS_MIN_REFRESH_INTERVAL = int(os.environ.get('JWKS_MIN_REFRESH_INTERVAL', 30))
+    JWKS_CONNECT_TIMEOUT = float(os.environ.get('JWKS_CONNECT_TIMEOUT', 2))
+    JWKS_READ_TIMEOUT = float(os.environ.get('JWKS_READ_TIMEOUT', 5))
+    
+    # Verified Cognito token cache (entries never outlive the token's exp)
+    TOKEN_CACHE_ENABLED = os.environ.get('TOKEN_CACHE_ENABLED', 'true').lower() == 'true'
+    TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', 10000))
+    TOKEN_CACHE_TTL = int(os.environ.get('TOKEN_CACHE_TTL', 3600))
+    
     # S3 configuration
     S3_RAW_BUCKET = os.environ.get('S3_RAW_BUCKET', 'activityhub-media-raw')
     S3_PROCESSED_BUCKET = os.environ.get('S3_PROCESSED_BUCKET', 'activityhub-media-processed')
@@ -30,6 +82,24 @@ class DefaultConfig:
     COGNITO_USER_POOL_ID = os.environ.get('COGNITO_USER_POOL_ID', '')
     COGNITO_APP_CLIENT_ID = os.environ.get('COGNITO_APP_CLIENT_ID', '')
     COGNITO_REGION = os.environ.get('COGNITO_REGION', AWS_REGION)
+    COGNITO_ENDPOINT_URL = os.environ.get('COGNITO_ENDPOINT_URL', None)
+    
+    # Cognito client (shared per process and created when the app starts)
+    COGNITO_WARM_CLIENT = os.environ.get('COGNITO_WARM_CLIENT', 'true').lower() == 'true'
+    COGNITO_MAX_POOL_CONNECTIONS = int(os.environ.get('COGNITO_MAX_POOL_CONNECTIONS', 10))
+    COGNITO_CONNECT_TIMEOUT = float(os.environ.get('COGNITO_CONNECT_TIMEOUT', 2))
+    COGNITO_READ_TIMEOUT = float(os.environ.get('COGNITO_READ_TIMEOUT', 5))
+    COGNITO_TCP_KEEPALIVE = os.environ.get('COGNITO_TCP_KEEPALIVE', 'true').lower() == 'true'
+    COGNITO_MAX_ATTEMPTS = int(os.environ.get('COGNITO_MAX_ATTEMPTS', 3))
+    
+    # Cognito sub -> username cache (in front of the COGNITO#<sub> items in DynamoDB)
+    COGNITO_USERNAME_CACHE_ENABLED = os.environ.get('COGNITO_USERNAME_CACHE_ENABLED', 'true').lower() == 'true'
+    COGNITO_USERNAME_CACHE_SIZE = int(os.environ.get('COGNITO_USERNAME_CACHE_SIZE', 10000))
+    COGNITO_USERNAME_CACHE_TTL = int(os.environ.get('COGNITO_USERNAME_CACHE_TTL', 86400))
+    COGNITO_USERNAME_CACHE_NEGATIVE_TTL = int(os.environ.get('COGNITO_USERNAME_CACHE_NEGATIVE_TTL', 30))
+    
+    # ListUsers requests per second spent by the Cognito -> DynamoDB reconciliation
+    COGNITO_LIST_USERS_RPS = float(os.environ.get('COGNITO_LIST_USERS_RPS', 4))
     
     # Error messages
     ERROR_MESSAGES = {
@@ -67,6 +137,19 @@ class TestingConfig(DefaultConfig):
     # For testing, we'll often mock AWS services
     SERVER_NAME = "test.local"
     
+    # Tests manipulate the mock database directly, so don't cache reads
+    PROFILE_CACHE_ENABLED = False
+    CHILDREN_CACHE_ENABLED = False
+    
+    # Tests patch token verification per test, so don't cache verified tokens
+    TOKEN_CACHE_ENABLED = False
+    
+    # Tests mock Cognito per test, so don't cache usernames across them
+    COGNITO_USERNAME_CACHE_ENABLED = False
+    
+    # Run background tasks inline so tests can assert on their effects
+    BACKGROUND_TASKS_ENABLED = False
+    
     # Override secrets with test-specific values for predictability
     SECRET_KEY = 'test-secret-key'
     JWT_SECRET_KEY = 'test-jwt-secret'
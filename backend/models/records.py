@@ -0,0 +1,132 @@
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, Optional
+
+# Stored DynamoDB attribute -> public field, in UserRecord constructor order.
+# This is the one place the PascalCase item schema is mapped to the API shape.
+USER_ATTRIBUTE_MAP = {
+    'UserId': 'user_id',
+    'Email': 'email',
+    'Name': 'name',
+    'Role': 'role',
+    'CreatedAt': 'created_at',
+    'UpdatedAt': 'updated_at',
+    'AvatarKey': 'avatar_key',
+    'Points': 'points',
+    'ParentId': 'parent_id',
+    'PasswordHash': 'password_hash'
+}
+
+_USER_FIELDS = tuple(USER_ATTRIBUTE_MAP.values())
+
+
+class UserRecord(Mapping):
+    """
+    Immutable, compact user record built directly from a DynamoDB item.
+
+    Records use __slots__ instead of a per-instance dict, so cached profiles
+    take a fraction of the memory and can be shared between requests without
+    defensive copies. They behave like a read-only dict of the fields that are
+    set, so existing callers using user['email'] or user.get('role') keep
+    working.
+    """
+
+    __slots__ = _USER_FIELDS
+
+    def __init__(self, user_id: str, email: str, name: str, role: str, created_at: Any = None,
+                 updated_at: Any = None, avatar_key: Optional[str] = None, points: Any = None,
+                 parent_id: Optional[str] = None, password_hash: Optional[str] = None):
+        set_field = object.__setattr__
+        set_field(self, 'user_id', user_id)
+        set_field(self, 'email', email)
+        set_field(self, 'name', name)
+        set_field(self, 'role', role)
+        set_field(self, 'created_at', created_at)
+        set_field(self, 'updated_at', updated_at)
+        set_field(self, 'avatar_key', avatar_key)
+        set_field(self, 'points', points)
+        set_field(self, 'parent_id', parent_id)
+        set_field(self, 'password_hash', password_hash)
+
+    @classmethod
+    def from_item(cls, item: Dict[str, Any], include_password: bool = False) -> 'UserRecord':
+        """
+        Build a record from a user PROFILE item
+
+        Args:
+            item (dict): The DynamoDB item
+            include_password (bool, optional): Keep the password hash. Defaults to False.
+
+        Returns:
+            UserRecord: The user record
+        """
+        record = cls(*[item.get(attribute) for attribute in USER_ATTRIBUTE_MAP])
+        if not include_password and record.password_hash is not None:
+            object.__setattr__(record, 'password_hash', None)
+        return record
+
+    @classmethod
+    def from_fields(cls, fields: Dict[str, Any], include_password: bool = False) -> 'UserRecord':
+        """
+        Build a record from an item already decoded to public field names
+
+        Args:
+            fields (dict): Field values, e.g. from decode_item(item, USER_ATTRIBUTE_MAP)
+            include_password (bool, optional): Keep the password hash. Defaults to False.
+
+        Returns:
+            UserRecord: The user record
+        """
+        record = cls(*[fields.get(field) for field in _USER_FIELDS])
+        if not include_password and record.password_hash is not None:
+            object.__setattr__(record, 'password_hash', None)
+        return record
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name: str):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in _USER_FIELDS:
+            raise KeyError(key)
+        value = getattr(self, key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return (field for field in _USER_FIELDS if getattr(self, field) is not None)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"UserRecord(user_id={self.user_id!r}, email={self.email!r}, role={self.role!r})"
+
+    def __reduce__(self):
+        return (type(self), tuple(getattr(self, field) for field in _USER_FIELDS))
+
+    def without_password(self) -> 'UserRecord':
+        """
+        Get the record without its password hash
+
+        Returns:
+            UserRecord: This record if it has no hash, otherwise a copy without it
+        """
+        if self.password_hash is None:
+            return self
+        return type(self)(*[getattr(self, field) for field in _USER_FIELDS[:-1]])
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serialize to the public API shape; the password hash is never included
+
+        Returns:
+            dict: User data
+        """
+        return {
+            field: value
+            for field in _USER_FIELDS[:-1]
+            if (value := getattr(self, field)) is not None
+        }
@@ -54,15 +54,16 @@ class User:
             password (str): User's password
         
         Returns:
-            tuple: (user_data, token) if authentication is successful, (None, None) otherwise
+            tuple: (UserRecord, token) if authentication is successful, (None, None) otherwise
         """
         # Get the user by email
         user = get_user_by_email(email)
         
-        # Check if user exists and password is correct
-        if user and verify_password(user['password_hash'], password):
+        # Check if user exists and password is correct; users mirrored from
+        # Cognito have no password hash and can't sign in here
+        if user and user.password_hash and verify_password(user.password_hash, password):
             # Remove password_hash from user data
-            user_data = {k: v for k, v in user.items() if k != 'password_hash'}
+            user_data = user.without_password()
             
             # Generate JWT token
             token = generate_jwt_token(user['user_id'], user['role'])
@@ -99,7 +100,6 @@ class User:
         
         # Remove password_hash from user data if user exists
         if user:
-            user_data = {k: v for k, v in user.items() if k != 'password_hash'}
-            return user_data
+            return user.without_password()
         
         return None
@@ -1,8 +1,10 @@
 from flask import Blueprint, request, jsonify, current_app
-import boto3
-from botocore.exceptions import ClientError
+from botocore.exceptions import BotoCoreError, ClientError
 from werkzeug.exceptions import BadRequest, Unauthorized
 from utils.errors import error_response
+from utils.cognito import get_cognito_client, remember_cognito_username
+from utils.cognito_auth import user_from_claims, verify_cognito_token
+from utils.database import put_child_relationships
 import re
 
 # Create a blueprint for auth routes
@@ -57,8 +59,7 @@ def register():
         return error_response('BAD_REQUEST', "Parent ID is required for child users")
     
     # Initialize Cognito client
-    client = boto3.client('cognito-idp', 
-                         region_name=current_app.config['COGNITO_REGION'])
+    client = get_cognito_client()
     
     try:
         # Register the user in Cognito
@@ -84,6 +85,9 @@ def register():
         
         user_id = response['UserSub']
         
+        # Record the username so profile lookups by ID don't need ListUsers
+        remember_cognito_username(user_id, data['email'])
+        
         # If the user is a child, add the parent ID as a custom attribute
         if role == 'child' and parent_id:
             client.admin_update_user_attributes(
@@ -96,6 +100,17 @@ def register():
                     }
                 ]
             )
+            
+            # List the child under the parent without a Cognito scan
+            try:
+                put_child_relationships(parent_id, [{
+                    'user_id': user_id,
+                    'email': data['email'],
+                    'name': data['name'],
+                    'role': role
+                }])
+            except (BotoCoreError, ClientError) as e:
+                current_app.logger.warning(f"Could not record {user_id} as a child of {parent_id}: {str(e)}")
         
         # Return success response
         user_data = {
@@ -122,6 +137,58 @@ def register():
             current_app.logger.error(f"Error registering user: {str(e)}")
             return error_response('SERVER_ERROR', "Error registering user")
 
+def _user_from_id_token(id_token):
+    """
+    Build the user payload from a freshly issued ID token
+    
+    Args:
+        id_token (str): ID token returned by Cognito
+    
+    Returns:
+        dict or None: User data, or None if the token can't be verified
+    """
+    claims = verify_cognito_token(id_token)
+    if not claims or claims.get('token_use') != 'id':
+        return None
+    
+    return user_from_claims(claims)
+
+def _user_from_access_token(client, access_token, email):
+    """
+    Build the user payload by asking Cognito for the user's attributes
+    
+    Args:
+        client: cognito-idp client
+        access_token (str): Access token returned by Cognito
+        email (str): Email the user signed in with
+    
+    Returns:
+        dict: User data
+    """
+    user_response = client.get_user(
+        AccessToken=access_token
+    )
+    
+    # Extract user data from attributes
+    user_data = {
+        'user_id': None,
+        'email': email,
+        'name': None,
+        'role': None
+    }
+    
+    for attr in user_response['UserAttributes']:
+        if attr['Name'] == 'sub':
+            user_data['user_id'] = attr['Value']
+        elif attr['Name'] == 'name':
+            user_data['name'] = attr['Value']
+        elif attr['Name'] == 'custom:role':
+            user_data['role'] = attr['Value']
+        elif attr['Name'] == 'custom:parentId' and user_data['role'] == 'child':
+            user_data['parent_id'] = attr['Value']
+    
+    return user_data
+
 @auth_bp.route('/login', methods=['POST'])
 def login():
     """
@@ -146,8 +213,7 @@ def login():
             return error_response('BAD_REQUEST', f"Missing required field: {field}")
     
     # Initialize Cognito client
-    client = boto3.client('cognito-idp', 
-                         region_name=current_app.config['COGNITO_REGION'])
+    client = get_cognito_client()
     
     try:
         # Authenticate the user
@@ -163,28 +229,12 @@ def login():
         # Get tokens from the response
         tokens = response['AuthenticationResult']
         
-        # Get the user's attributes
-        user_response = client.get_user(
-            AccessToken=tokens['AccessToken']
-        )
-        
-        # Extract user data from attributes
-        user_data = {
-            'user_id': None,
-            'email': data['email'],
-            'name': None,
-            'role': None
-        }
-        
-        for attr in user_response['UserAttributes']:
-            if attr['Name'] == 'sub':
-                user_data['user_id'] = attr['Value']
-            elif attr['Name'] == 'name':
-                user_data['name'] = attr['Value']
-            elif attr['Name'] == 'custom:role':
-                user_data['role'] = attr['Value']
-            elif attr['Name'] == 'custom:parentId' and user_data['role'] == 'child':
-                user_data['parent_id'] = attr['Value']
+        # The ID token already carries the user's attributes; verifying it
+        # here also puts it in the token cache for the client's next request
+        user_data = _user_from_id_token(tokens['IdToken'])
+        if user_data is None:
+            # The token couldn't be verified locally (e.g. JWKS unavailable)
+            user_data = _user_from_access_token(client, tokens['AccessToken'], data['email'])
         
         # Return success response with tokens
         return jsonify({
@@ -223,8 +273,7 @@ def refresh_token():
         return error_response('BAD_REQUEST', "Refresh token is required")
     
     # Initialize Cognito client
-    client = boto3.client('cognito-idp', 
-                         region_name=current_app.config['COGNITO_REGION'])
+    client = get_cognito_client()
     
     try:
         # Refresh the token
@@ -242,6 +291,7 @@ def refresh_token():
         # Return success response with tokens
         return jsonify({
             'message': 'Token refreshed successfully',
+            'user': _user_from_id_token(tokens['IdToken']),
             'tokens': {
                 'id_token': tokens['IdToken'],
                 'access_token': tokens['AccessToken'],
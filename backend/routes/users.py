@@ -1,12 +1,97 @@
 from flask import Blueprint, request, jsonify, current_app, g
 from utils.errors import error_response
-from utils.cognito_auth import cognito_token_required, cognito_admin_required, cognito_parent_required
-import boto3
+from utils.cognito import (
+    PROFILE_FIELD_ATTRIBUTES,
+    cognito_attributes,
+    forget_cognito_username,
+    get_cognito_client,
+    import_cognito_children,
+    refresh_profile_copies,
+    resolve_cognito_username
+)
+from utils.cognito_auth import cognito_token_required, cognito_admin_required, cognito_parent_required, user_from_claims
+from utils.database import (
+    children_imported,
+    get_cached_user,
+    get_children_page,
+    get_user_by_id,
+    list_users,
+    UnprocessedKeysError
+)
+from botocore.exceptions import BotoCoreError, ClientError
 import time
 
 # Create a blueprint for user routes
 users_bp = Blueprint('users', __name__, url_prefix='/api/users')
 
+@users_bp.route('', methods=['GET'])
+@cognito_admin_required
+def list_all_users():
+    """
+    List all users, ordered by ID, one page at a time (admin only)
+    
+    Query parameters:
+        limit (int, optional): Users per page, 1-100. Defaults to 50.
+        cursor (str, optional): next_cursor from the previous page
+    
+    Returns:
+        JSON: Users and the cursor of the next page (null on the last page)
+    """
+    limit = request.args.get('limit', 50, type=int)
+    if not 1 <= limit <= 100:
+        return error_response('BAD_REQUEST', "limit must be between 1 and 100")
+    
+    try:
+        users, next_cursor = list_users(limit=limit, cursor=request.args.get('cursor'))
+    except ValueError:
+        return error_response('BAD_REQUEST', "Invalid cursor")
+    except (BotoCoreError, ClientError) as e:
+        current_app.logger.error(f"Error listing users: {str(e)}")
+        return error_response('SERVER_ERROR', "Error listing users")
+    
+    return jsonify({
+        'users': users,
+        'next_cursor': next_cursor
+    })
+
+@users_bp.route('/me', methods=['GET'])
+@cognito_token_required
+def get_me():
+    """
+    Get the caller's own profile from their verified token, without calling Cognito
+    
+    ID tokens carry the profile attributes, so the answer is built from the
+    claims. Anything the token doesn't carry (access tokens only identify the
+    user) is filled from a profile already in the profile cache. The role is
+    always the one the API authorizes the caller with.
+    
+    Query parameters:
+        profile (bool, optional): Read the stored profile (e.g. avatar and
+            points) if it isn't cached. Defaults to false.
+    
+    Returns:
+        JSON: User profile data
+    """
+    user_data = user_from_claims(g.claims)
+    # cognito:groups takes precedence over custom:role when authorizing
+    user_data['role'] = g.user_role
+    
+    profile = get_cached_user(g.user_id)
+    if profile is None and request.args.get('profile', 'false').lower() == 'true':
+        try:
+            profile = get_user_by_id(g.user_id)
+        except (BotoCoreError, ClientError) as e:
+            current_app.logger.warning(f"Error reading profile of {g.user_id}: {str(e)}")
+    
+    if profile:
+        for field, value in profile.to_dict().items():
+            if user_data.get(field) is None and value is not None:
+                user_data[field] = value
+    
+    return jsonify({
+        'user': user_data
+    })
+
 @users_bp.route('/<user_id>', methods=['GET'])
 @cognito_token_required
 def get_user(user_id):
@@ -30,22 +115,18 @@ def get_user(user_id):
             return error_response('FORBIDDEN', "You do not have permission to access this user's profile")
     
     # Initialize Cognito client
-    client = boto3.client('cognito-idp', 
-                         region_name=current_app.config['COGNITO_REGION'])
+    client = get_cognito_client()
     
     try:
-        # We need to find the user by their ID (sub)
-        # Since Cognito doesn't have a direct "get user by ID" API, we'll list users and filter
-        response = client.list_users(
-            UserPoolId=current_app.config['COGNITO_USER_POOL_ID'],
-            Filter=f'sub = "{user_id}"'
-        )
-        
-        if not response['Users'] or len(response['Users']) == 0:
+        # Cognito has no "get user by sub" API, so resolve the username first
+        username = resolve_cognito_username(user_id, client)
+        if not username:
             return error_response('NOT_FOUND', "User not found")
         
-        # Get the first (and should be only) user
-        cognito_user = response['Users'][0]
+        response = client.admin_get_user(
+            UserPoolId=current_app.config['COGNITO_USER_POOL_ID'],
+            Username=username
+        )
         
         # Extract user data from attributes
         user_data = {
@@ -53,10 +134,10 @@ def get_user(user_id):
             'email': None,
             'name': None,
             'role': None,
-            'created_at': cognito_user['UserCreateDate'].timestamp()
+            'created_at': response['UserCreateDate'].timestamp()
         }
         
-        for attr in cognito_user['Attributes']:
+        for attr in response['UserAttributes']:
             if attr['Name'] == 'email':
                 user_data['email'] = attr['Value']
             elif attr['Name'] == 'name':
@@ -71,6 +152,13 @@ def get_user(user_id):
             'user': user_data
         })
         
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') == 'UserNotFoundException':
+            # The user was deleted since their username was recorded
+            forget_cognito_username(user_id)
+            return error_response('NOT_FOUND', "User not found")
+        current_app.logger.error(f"Error getting user profile: {str(e)}")
+        return error_response('SERVER_ERROR', "Error getting user profile")
     except Exception as e:
         current_app.logger.error(f"Error getting user profile: {str(e)}")
         return error_response('SERVER_ERROR', "Error getting user profile")
@@ -102,86 +190,73 @@ def update_user_profile(user_id):
     if not data:
         return error_response('BAD_REQUEST', "No data provided for update")
     
+    # Fields that can be updated; only admins can change roles
+    changes = {}
+    if 'name' in data:
+        changes['name'] = data['name']
+    if 'role' in data and g.user_role == 'admin':
+        changes['role'] = data['role']
+    
+    if not changes:
+        return error_response('BAD_REQUEST', "No valid updates provided")
+    
     # Initialize Cognito client
-    client = boto3.client('cognito-idp', 
-                         region_name=current_app.config['COGNITO_REGION'])
+    client = get_cognito_client()
     
     try:
-        # First find the user by their ID to get their username (email)
-        list_response = client.list_users(
-            UserPoolId=current_app.config['COGNITO_USER_POOL_ID'],
-            Filter=f'sub = "{user_id}"'
-        )
-        
-        if not list_response['Users'] or len(list_response['Users']) == 0:
-            return error_response('NOT_FOUND', "User not found")
-        
-        # Get the username (email)
-        username = None
-        for attr in list_response['Users'][0]['Attributes']:
-            if attr['Name'] == 'email':
-                username = attr['Value']
-                break
-        
+        # First find the user's username from their ID (sub)
+        username = resolve_cognito_username(user_id, client)
         if not username:
-            return error_response('SERVER_ERROR', "Could not determine user's email")
-        
-        # Prepare attributes to update
-        user_attributes = []
+            return error_response('NOT_FOUND', "User not found")
         
-        # Add fields that can be updated
-        if 'name' in data:
-            user_attributes.append({
-                'Name': 'name',
-                'Value': data['name']
-            })
+        # Update the user in Cognito
+        client.admin_update_user_attributes(
+            UserPoolId=current_app.config['COGNITO_USER_POOL_ID'],
+            Username=username,
+            UserAttributes=[
+                {'Name': PROFILE_FIELD_ATTRIBUTES[field], 'Value': value}
+                for field, value in changes.items()
+            ]
+        )
         
-        # Only admins can update roles
-        if 'role' in data and g.user_role == 'admin':
-            user_attributes.append({
-                'Name': 'custom:role',
-                'Value': data['role']
-            })
+        # Build the response from the user's known state plus the change.
+        # The mirrored profile (usually cached) describes the user; Cognito
+        # is only read back for users that have no local copy.
+        try:
+            profile = get_user_by_id(user_id)
+        except (BotoCoreError, ClientError) as e:
+            current_app.logger.warning(f"Error reading profile of {user_id}: {str(e)}")
+            profile = None
         
-        # Update the user in Cognito
-        if user_attributes:
-            client.admin_update_user_attributes(
-                UserPoolId=current_app.config['COGNITO_USER_POOL_ID'],
-                Username=username,
-                UserAttributes=user_attributes
-            )
-            
-            # Get the updated user
+        if profile is not None:
+            prior = profile.to_dict()
+        else:
             get_response = client.admin_get_user(
                 UserPoolId=current_app.config['COGNITO_USER_POOL_ID'],
                 Username=username
             )
-            
-            # Extract user data from attributes
-            user_data = {
-                'user_id': user_id,
-                'email': username,
-                'name': None,
-                'role': None,
-                'updated_at': int(time.time())
-            }
-            
-            for attr in get_response['UserAttributes']:
-                if attr['Name'] == 'name':
-                    user_data['name'] = attr['Value']
-                elif attr['Name'] == 'custom:role':
-                    user_data['role'] = attr['Value']
-                elif attr['Name'] == 'custom:parentId' and user_data.get('role') == 'child':
-                    user_data['parent_id'] = attr['Value']
-            
-            return jsonify({
-                'message': 'User profile updated successfully',
-                'user': user_data
-            })
-        else:
-            return error_response('BAD_REQUEST', "No valid updates provided")
+            prior = user_from_claims(cognito_attributes(get_response['UserAttributes']))
+        
+        user_data = {
+            **prior,
+            **changes,
+            'user_id': user_id,
+            'email': prior.get('email') or username,
+            'updated_at': int(time.time())
+        }
+        if user_data['role'] != 'child':
+            user_data.pop('parent_id', None)
+        
+        # Copies of the profile elsewhere are refreshed off the request path
+        refresh_profile_copies(user_id, prior.get('parent_id'), changes)
+        
+        return jsonify({
+            'message': 'User profile updated successfully',
+            'user': user_data
+        })
             
     except client.exceptions.UserNotFoundException:
+        forget_cognito_username(user_id)
         return error_response('NOT_FOUND', "User not found")
     except Exception as e:
         current_app.logger.error(f"Error updating user profile: {str(e)}")
@@ -191,51 +266,42 @@ def update_user_profile(user_id):
 @cognito_parent_required
 def get_children():
     """
-    Get all children for the authenticated parent from Cognito
+    Get the authenticated parent's children, ordered by ID, one page at a time
+    
+    Children are read from the relationship items in the parent's item
+    collection. Families that predate those items are imported from Cognito
+    on the parent's first request.
+    
+    Query parameters:
+        limit (int, optional): Children per page, 1-100. Defaults to 50.
+        cursor (str, optional): next_cursor from the previous page
     
     Returns:
-        JSON: List of children profiles
+        JSON: Children profiles and the cursor of the next page (null on the last page)
     """
     parent_id = g.user_id
     
-    # Initialize Cognito client
-    client = boto3.client('cognito-idp', 
-                         region_name=current_app.config['COGNITO_REGION'])
+    limit = request.args.get('limit', 50, type=int)
+    if not 1 <= limit <= 100:
+        return error_response('BAD_REQUEST', "limit must be between 1 and 100")
+    cursor = request.args.get('cursor')
     
     try:
-        # Find all users with custom:parentId matching this parent
-        response = client.list_users(
-            UserPoolId=current_app.config['COGNITO_USER_POOL_ID'],
-            Filter=f'custom:parentId = "{parent_id}"'
-        )
+        # Read the freshly imported family straight from the table
+        consistent_read = False
+        if not cursor and not children_imported(parent_id):
+            import_cognito_children(parent_id, get_cognito_client())
+            consistent_read = True
         
-        children = []
-        
-        for cognito_user in response['Users']:
-            # Extract user data from attributes
-            user_data = {
-                'user_id': None,
-                'email': None,
-                'name': None,
-                'role': 'child',  # We know these are children
-                'created_at': cognito_user['UserCreateDate'].timestamp()
-            }
-            
-            for attr in cognito_user['Attributes']:
-                if attr['Name'] == 'sub':
-                    user_data['user_id'] = attr['Value']
-                elif attr['Name'] == 'email':
-                    user_data['email'] = attr['Value']
-                elif attr['Name'] == 'name':
-                    user_data['name'] = attr['Value']
-            
-            if user_data['user_id'] and user_data['email']:
-                children.append(user_data)
-        
-        return jsonify({
-            'children': children
-        })
-        
-    except Exception as e:
+        children, next_cursor = get_children_page(parent_id, limit=limit, cursor=cursor,
+                                                  consistent_read=consistent_read)
+    except ValueError:
+        return error_response('BAD_REQUEST', "Invalid cursor")
+    except (BotoCoreError, ClientError, UnprocessedKeysError) as e:
         current_app.logger.error(f"Error getting children: {str(e)}")
-        return error_response('SERVER_ERROR', "Error getting children")
\ No newline at end of file
+        return error_response('SERVER_ERROR', "Error getting children")
+    
+    return jsonify({
+        'children': children,
+        'next_cursor': next_cursor
+    })
@@ -4,6 +4,8 @@ import tempfile
 import json
 from flask import Flask
 from werkzeug.security import generate_password_hash
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
 import time
 
 # Add the backend directory to the Python path
@@ -12,6 +14,8 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from app import create_app
 from utils.auth import generate_password_hash, generate_jwt_token
+from utils.cognito_auth import reset_jwks_cache
+from utils.database import get_memory_engine, reset_memory_engine
 
 
 @pytest.fixture
@@ -22,6 +26,9 @@ def app():
     # Create app context
     with app.app_context():
         yield app
+    
+    # JWKS and public keys are cached per process
+    reset_jwks_cache()
 
 
 @pytest.fixture
@@ -37,9 +44,17 @@ def mock_db(monkeypatch):
     # Dictionary to store our "database" items
     db_items = {}
     
+    def apply_projection(item, params):
+        # Return only the projected attributes, resolving #name aliases
+        if 'ProjectionExpression' not in params:
+            return item
+        names = params.get('ExpressionAttributeNames', {})
+        attributes = [names.get(name.strip(), name.strip()) for name in params['ProjectionExpression'].split(',')]
+        return {k: v for k, v in item.items() if k in attributes}
+    
     # Mock the DynamoDB resource
     class MockDynamoTable:
-        def put_item(self, Item):
+        def put_item(self, Item, **kwargs):
             # Create a copy of the item to avoid reference issues
             item_copy = {k: v for k, v in Item.items()}
             pk = item_copy['PK']
@@ -48,12 +63,12 @@ def mock_db(monkeypatch):
             db_items[key] = item_copy
             return {}
         
-        def get_item(self, Key):
+        def get_item(self, Key, **kwargs):
             pk = Key['PK']
             sk = Key['SK']
             key = f"{pk}#{sk}"
             if key in db_items:
-                return {"Item": db_items[key]}
+                return {"Item": apply_projection(db_items[key], kwargs)}
             return {}
         
         def query(self, **kwargs):
@@ -124,7 +139,7 @@ def mock_db(monkeypatch):
             else:
                 results = list(db_items.values())
                     
-            return {"Items": results}
+            return {"Items": [apply_projection(item, kwargs) for item in results]}
         
         def update_item(self, **kwargs):
             # Improved update_item that actually updates the item
@@ -186,7 +201,7 @@ def mock_db(monkeypatch):
             
             return {}
         
-        def delete_item(self, Key):
+        def delete_item(self, Key, **kwargs):
             pk = Key['PK']
             sk = Key['SK']
             key = f"{pk}#{sk}"
@@ -200,6 +215,68 @@ def mock_db(monkeypatch):
     class MockDynamoDB:
         def Table(self, table_name):
             return MockDynamoTable()
+        
+        def batch_get_item(self, RequestItems, **kwargs):
+            responses = {}
+            for table_name, request in RequestItems.items():
+                keys = [f"{key['PK']}#{key['SK']}" for key in request['Keys']]
+                responses[table_name] = [apply_projection(db_items[key], request) for key in keys if key in db_items]
+            return {"Responses": responses, "UnprocessedKeys": {}}
+        
+        def batch_write_item(self, RequestItems):
+            for table_name, requests in RequestItems.items():
+                for request in requests:
+                    if 'PutRequest' in request:
+                        item = dict(request['PutRequest']['Item'])
+                        db_items[f"{item['PK']}#{item['SK']}"] = item
+                    else:
+                        key = request['DeleteRequest']['Key']
+                        db_items.pop(f"{key['PK']}#{key['SK']}", None)
+            return {"UnprocessedItems": {}}
+    
+    # Mock the low-level DynamoDB client (used for transactions)
+    class MockDynamoClient:
+        def transact_write_items(self, TransactItems, **kwargs):
+            deserializer = TypeDeserializer()
+            
+            def deserialize(values):
+                return {k: deserializer.deserialize(v) for k, v in values.items()}
+            
+            # Evaluate conditions first so the transaction is all-or-nothing
+            reasons = []
+            for action in TransactItems:
+                (action_type, params), = action.items()
+                key_values = deserialize(params.get('Item') or params['Key'])
+                key = f"{key_values['PK']}#{key_values['SK']}"
+                condition = params.get('ConditionExpression', '')
+                if 'attribute_not_exists' in condition and key in db_items:
+                    reasons.append({'Code': 'ConditionalCheckFailed'})
+                elif 'attribute_exists' in condition and 'attribute_not_exists' not in condition and key not in db_items:
+                    reasons.append({'Code': 'ConditionalCheckFailed'})
+                else:
+                    reasons.append({'Code': 'None'})
+            
+            if any(reason['Code'] != 'None' for reason in reasons):
+                error = ClientError(
+                    {'Error': {'Code': 'TransactionCanceledException', 'Message': 'Transaction cancelled'}},
+                    'TransactWriteItems'
+                )
+                error.response['CancellationReasons'] = reasons
+                raise error
+            
+            for action in TransactItems:
+                (action_type, params), = action.items()
+                if action_type == 'Put':
+                    item = deserialize(params['Item'])
+                    db_items[f"{item['PK']}#{item['SK']}"] = item
+                elif action_type == 'Delete':
+                    key_values = deserialize(params['Key'])
+                    db_items.pop(f"{key_values['PK']}#{key_values['SK']}", None)
+            
+            return {}
+    
+    def mock_get_dynamodb_client():
+        return MockDynamoClient()
     
     # Replace the real get_dynamodb_resource with our mock
     def mock_get_dynamodb_resource():
@@ -210,12 +287,24 @@ def mock_db(monkeypatch):
         return MockDynamoDB().Table("ActivityHub-test")
     
     # Apply the monkeypatches
+    monkeypatch.setattr('utils.database.get_dynamodb_client', mock_get_dynamodb_client)
     monkeypatch.setattr('utils.database.get_dynamodb_resource', mock_get_dynamodb_resource)
     monkeypatch.setattr('utils.database.get_table', mock_get_table)
     
     return db_items
 
 
+@pytest.fixture
+def memory_db(app):
+    """Run the real data-access code against the in-memory DynamoDB engine."""
+    app.config['DYNAMODB_ENGINE'] = 'memory'
+    reset_memory_engine()
+    
+    yield get_memory_engine()
+    
+    reset_memory_engine()
+
+
 @pytest.fixture
 def auth_headers():
     """Create authentication headers for testing."""
@@ -4,7 +4,7 @@ from unittest.mock import patch, MagicMock
 from botocore.exceptions import ClientError
 
 class TestAuthRoutes:
-    def test_register_success(self, client):
+    def test_register_success(self, client, memory_db):
         """Test successful user registration with Cognito."""
         # Arrange
         registration_data = {
@@ -15,7 +15,7 @@ class TestAuthRoutes:
         }
         
         # Mock the Cognito client
-        with patch('boto3.client') as mock_boto_client:
+        with patch('routes.auth.get_cognito_client') as mock_boto_client:
             mock_client = MagicMock()
             mock_boto_client.return_value = mock_client
             
@@ -53,8 +53,14 @@ class TestAuthRoutes:
             assert attrs['email'] == 'newuser@example.com'
             assert attrs['name'] == 'New User'
             assert attrs['custom:role'] == 'parent'
+            
+            # The username is recorded so later lookups by ID skip ListUsers
+            stored = memory_db.Table('ActivityHub-test').get_item(
+                Key={'PK': 'COGNITO#test-user-id', 'SK': 'USERNAME'}
+            ).get('Item')
+            assert stored['Username'] == 'newuser@example.com'
     
-    def test_register_child_with_parent(self, client):
+    def test_register_child_with_parent(self, client, memory_db):
         """Test registering a child user with a parent ID."""
         # Arrange
         child_data = {
@@ -66,7 +72,7 @@ class TestAuthRoutes:
         }
         
         # Mock the Cognito client
-        with patch('boto3.client') as mock_boto_client:
+        with patch('routes.auth.get_cognito_client') as mock_boto_client:
             mock_client = MagicMock()
             mock_boto_client.return_value = mock_client
             
@@ -95,6 +101,13 @@ class TestAuthRoutes:
             _, kwargs = mock_client.admin_update_user_attributes.call_args
             attrs = {attr['Name']: attr['Value'] for attr in kwargs['UserAttributes']}
             assert attrs['custom:parentId'] == 'parent-user-id'
+            
+            # The child is listed under the parent in DynamoDB
+            relationship = memory_db.Table('ActivityHub-test').get_item(
+                Key={'PK': 'USER#parent-user-id', 'SK': 'CHILD#child-user-id'}
+            ).get('Item')
+            assert relationship['Name'] == 'Child User'
+            assert relationship['Email'] == 'child@example.com'
     
     def test_register_duplicate_email(self, client):
         """Test registration with an email that already exists."""
@@ -107,7 +120,7 @@ class TestAuthRoutes:
         }
         
         # Mock the Cognito client
-        with patch('boto3.client') as mock_boto_client:
+        with patch('routes.auth.get_cognito_client') as mock_boto_client:
             mock_client = MagicMock()
             mock_boto_client.return_value = mock_client
             
@@ -134,7 +147,7 @@ class TestAuthRoutes:
             assert data['message'] == "User with this email already exists"
     
     def test_login_success(self, client):
-        """Test successful login."""
+        """Test login falls back to get_user when the ID token can't be verified locally."""
         # Arrange
         login_data = {
             'email': 'test@example.com',
@@ -142,7 +155,7 @@ class TestAuthRoutes:
         }
         
         # Mock the Cognito client
-        with patch('boto3.client') as mock_boto_client:
+        with patch('routes.auth.get_cognito_client') as mock_boto_client:
             mock_client = MagicMock()
             mock_boto_client.return_value = mock_client
             
@@ -192,6 +205,55 @@ class TestAuthRoutes:
             assert kwargs['AuthParameters']['USERNAME'] == 'test@example.com'
             assert kwargs['AuthParameters']['PASSWORD'] == 'password123'
     
+    def test_login_reads_user_from_id_token(self, client):
+        """Test login builds the user from the verified ID token without calling get_user."""
+        # Arrange
+        login_data = {
+            'email': 'child@example.com',
+            'password': 'password123'
+        }
+        claims = {
+            'sub': 'child-user-id',
+            'token_use': 'id',
+            'email': 'child@example.com',
+            'name': 'Child User',
+            'custom:role': 'child',
+            'custom:parentId': 'parent-user-id'
+        }
+        
+        with patch('routes.auth.get_cognito_client') as mock_boto_client, \
+             patch('routes.auth.verify_cognito_token', return_value=claims) as mock_verify:
+            mock_client = MagicMock()
+            mock_boto_client.return_value = mock_client
+            mock_client.initiate_auth.return_value = {
+                'AuthenticationResult': {
+                    'IdToken': 'mock-id-token',
+                    'AccessToken': 'mock-access-token',
+                    'RefreshToken': 'mock-refresh-token',
+                    'ExpiresIn': 3600
+                }
+            }
+            
+            # Act
+            response = client.post(
+                '/api/login',
+                data=json.dumps(login_data),
+                content_type='application/json'
+            )
+            
+            # Assert
+            assert response.status_code == 200
+            data = json.loads(response.data)
+            assert data['user'] == {
+                'user_id': 'child-user-id',
+                'email': 'child@example.com',
+                'name': 'Child User',
+                'role': 'child',
+                'parent_id': 'parent-user-id'
+            }
+            mock_verify.assert_called_once_with('mock-id-token')
+            mock_client.get_user.assert_not_called()
+    
     def test_login_invalid_credentials(self, client):
         """Test login with invalid credentials."""
         # Arrange
@@ -201,7 +263,7 @@ class TestAuthRoutes:
         }
         
         # Mock the Cognito client
-        with patch('boto3.client') as mock_boto_client:
+        with patch('routes.auth.get_cognito_client') as mock_boto_client:
             mock_client = MagicMock()
             mock_boto_client.return_value = mock_client
             
@@ -234,8 +296,9 @@ class TestAuthRoutes:
             'refresh_token': 'valid-refresh-token'
         }
         
-        # Mock the Cognito client
-        with patch('boto3.client') as mock_boto_client:
+        # Mock the Cognito client and the verified ID token
+        with patch('routes.auth.get_cognito_client') as mock_boto_client, \
+             patch('routes.auth.verify_cognito_token', return_value={'sub': 'test-user-id', 'token_use': 'id'}):
             mock_client = MagicMock()
             mock_boto_client.return_value = mock_client
             
@@ -260,6 +323,7 @@ class TestAuthRoutes:
             data = json.loads(response.data)
             assert data['message'] == 'Token refreshed successfully'
             assert data['tokens']['id_token'] == 'new-id-token'
+            assert data['user']['user_id'] == 'test-user-id'
             assert data['tokens']['access_token'] == 'new-access-token'
             
             # Verify Cognito was called with correct parameters
@@ -276,7 +340,7 @@ class TestAuthRoutes:
         }
         
         # Mock the Cognito client
-        with patch('boto3.client') as mock_boto_client:
+        with patch('routes.auth.get_cognito_client') as mock_boto_client:
             mock_client = MagicMock()
             mock_boto_client.return_value = mock_client
             
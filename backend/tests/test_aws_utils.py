@@ -0,0 +1,151 @@
+import pytest
+from unittest.mock import patch
+from utils.aws import BotoRegistry, build_client_config
+from utils.database import (
+    get_dynamodb_client,
+    get_dynamodb_resource,
+    get_table,
+    get_dynamodb_pool_stats,
+    reset_dynamodb_registry
+)
+
+class TestBotoRegistry:
+    def test_client_is_created_once(self):
+        """Test the registry hands out the same client for the same key."""
+        # Arrange
+        registry = BotoRegistry()
+
+        # Act
+        client1 = registry.client('dynamodb', 'eu-west-2')
+        client2 = registry.client('dynamodb', 'eu-west-2')
+
+        # Assert
+        assert client1 is client2
+
+    def test_clients_are_keyed_by_region_and_endpoint(self):
+        """Test different regions and endpoints get different clients."""
+        # Arrange
+        registry = BotoRegistry()
+
+        # Act
+        london = registry.client('dynamodb', 'eu-west-2')
+        ireland = registry.client('dynamodb', 'eu-west-1')
+        local = registry.client('dynamodb', 'eu-west-2', endpoint_url='http://localhost:8000')
+
+        # Assert
+        assert london is not ireland
+        assert london is not local
+        assert local.meta.endpoint_url == 'http://localhost:8000'
+
+    def test_tables_share_one_resource(self):
+        """Test table lookups are cached per table and reuse the pooled resource."""
+        # Arrange
+        registry = BotoRegistry()
+
+        # Act
+        table1 = registry.table('ActivityHub-test', 'eu-west-2')
+        table2 = registry.table('ActivityHub-test', 'eu-west-2')
+        other = registry.table('ActivityHub-other', 'eu-west-2')
+        resource = registry.resource('dynamodb', 'eu-west-2')
+
+        # Assert
+        assert table1 is table2
+        assert table1 is not other
+        assert table1.meta.client is resource.meta.client
+
+    def test_config_is_applied_lazily(self):
+        """Test a config factory is only called when the client is created."""
+        # Arrange
+        registry = BotoRegistry()
+        calls = []
+
+        def config_factory():
+            calls.append(1)
+            return build_client_config(max_pool_connections=7)
+
+        # Act
+        client = registry.client('dynamodb', 'eu-west-2', config=config_factory)
+        registry.client('dynamodb', 'eu-west-2', config=config_factory)
+
+        # Assert
+        assert len(calls) == 1
+        assert client.meta.config.max_pool_connections == 7
+
+    def test_registry_resets_in_forked_child(self):
+        """Test clients are not reused after the process id changes."""
+        # Arrange
+        registry = BotoRegistry()
+        parent_client = registry.client('dynamodb', 'eu-west-2')
+
+        # Act - simulate running in a forked worker
+        with patch('utils.aws.os.getpid', return_value=registry._pid + 1):
+            child_client = registry.client('dynamodb', 'eu-west-2')
+
+        # Assert
+        assert child_client is not parent_client
+
+    def test_stats(self):
+        """Test registry statistics report entries and hand-out counts."""
+        # Arrange
+        registry = BotoRegistry()
+        registry.client('dynamodb', 'eu-west-2')
+        registry.client('dynamodb', 'eu-west-2')
+
+        # Act
+        stats = registry.stats()
+
+        # Assert
+        assert len(stats['entries']) == 1
+        entry = stats['entries'][0]
+        assert entry['kind'] == 'client'
+        assert entry['service'] == 'dynamodb'
+        assert entry['hits'] == 2
+        assert entry['pools'] == []  # No requests made yet
+
+
+class TestDynamoDBRegistry:
+    def test_get_table_is_pooled(self, app):
+        """Test the database helpers reuse pooled clients for the app config."""
+        with app.app_context():
+            # Arrange
+            reset_dynamodb_registry()
+
+            # Act
+            table1 = get_table()
+            table2 = get_table()
+
+            # Assert
+            assert table1 is table2
+            assert table1.name == app.config['DYNAMODB_TABLE']
+            assert get_dynamodb_resource() is get_dynamodb_resource()
+            assert get_dynamodb_client() is get_dynamodb_client()
+
+            client_config = get_dynamodb_client().meta.config
+            assert client_config.max_pool_connections == app.config['DYNAMODB_MAX_POOL_CONNECTIONS']
+            assert client_config.tcp_keepalive is True
+
+    def test_endpoint_url_is_honoured(self, app):
+        """Test DYNAMODB_ENDPOINT_URL is passed to the pooled client."""
+        with app.app_context():
+            # Arrange
+            app.config['DYNAMODB_ENDPOINT_URL'] = 'http://localhost:8000'
+
+            # Act
+            client = get_dynamodb_client()
+
+            # Assert
+            assert client.meta.endpoint_url == 'http://localhost:8000'
+
+    def test_pool_stats(self, app):
+        """Test pool statistics only include DynamoDB entries."""
+        with app.app_context():
+            # Arrange
+            reset_dynamodb_registry()
+            get_table()
+
+            # Act
+            stats = get_dynamodb_pool_stats()
+
+            # Assert
+            assert all(entry['service'] == 'dynamodb' for entry in stats['entries'])
+            assert any(entry['kind'] == 'table' for entry in stats['entries'])
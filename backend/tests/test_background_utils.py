@@ -0,0 +1,47 @@
+import threading
+import pytest
+from flask import current_app
+from utils.background import reset_background_executor, run_in_background
+
+@pytest.fixture
+def background_app(app):
+    """Run background tasks on the thread pool for a test."""
+    app.config['BACKGROUND_TASKS_ENABLED'] = True
+    reset_background_executor()
+    yield app
+    reset_background_executor()
+
+class TestBackgroundTasks:
+    def test_runs_inline_when_disabled(self, app):
+        """Test the testing config runs tasks on the calling thread."""
+        with app.app_context():
+            # Act
+            future = run_in_background(threading.current_thread)
+            
+            # Assert
+            assert future is None
+    
+    def test_runs_on_pool_with_app_context(self, background_app):
+        """Test tasks run on a worker thread inside an app context."""
+        with background_app.app_context():
+            # Act
+            future = run_in_background(lambda: (threading.current_thread().name, current_app.name))
+            thread_name, app_name = future.result(timeout=5)
+            
+            # Assert
+            assert thread_name.startswith('background')
+            assert app_name == background_app.name
+    
+    def test_errors_are_logged(self, background_app, caplog):
+        """Test a failing task is logged instead of raising."""
+        with background_app.app_context():
+            # Arrange
+            def fail():
+                raise RuntimeError("boom")
+            
+            # Act
+            result = run_in_background(fail).result(timeout=5)
+            
+            # Assert
+            assert result is None
+            assert 'Background task fail failed' in caplog.text
@@ -0,0 +1,165 @@
+import pytest
+import threading
+from unittest.mock import patch
+from utils.cache import TTLCache
+
+class TestTTLCache:
+    def test_get_and_set(self):
+        """Test storing and reading a value."""
+        # Arrange
+        cache = TTLCache(max_size=10)
+        
+        # Act
+        cache.set('key', 'value')
+        
+        # Assert
+        assert cache.get('key') == 'value'
+        assert cache.get('other', 'default') == 'default'
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+    
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted when full."""
+        # Arrange
+        cache = TTLCache(max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')  # 'b' is now least recently used
+        
+        # Act
+        cache.set('c', 3)
+        
+        # Assert
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.get('c') == 3
+        assert cache.stats()['evictions'] == 1
+    
+    def test_entries_expire(self):
+        """Test entries are dropped once their TTL has passed."""
+        # Arrange
+        cache = TTLCache(ttl=10)
+        with patch('utils.cache.time.monotonic', return_value=1000):
+            cache.set('short', 'value', ttl=5)
+            cache.set('long', 'value')
+        
+        # Act
+        with patch('utils.cache.time.monotonic', return_value=1007):
+            short = cache.get('short')
+            long = cache.get('long')
+        
+        # Assert
+        assert short is None
+        assert long == 'value'
+        assert cache.stats()['expirations'] == 1
+    
+    def test_negative_caching(self):
+        """Test misses loaded through get_or_load are cached."""
+        # Arrange
+        cache = TTLCache(negative_ttl=30)
+        calls = []
+        
+        def loader():
+            calls.append(1)
+            return None
+        
+        # Act
+        first = cache.get_or_load('missing', loader)
+        second = cache.get_or_load('missing', loader)
+        
+        # Assert
+        assert first is None and second is None
+        assert len(calls) == 1
+        assert cache.stats()['negative_hits'] == 1
+    
+    def test_invalidate(self):
+        """Test invalidated entries are reloaded."""
+        # Arrange
+        cache = TTLCache()
+        cache.set('key', 'old')
+        
+        # Act
+        cache.invalidate('key', 'not-cached')
+        value = cache.get_or_load('key', lambda: 'new')
+        
+        # Assert
+        assert value == 'new'
+        assert cache.stats()['invalidations'] == 1
+    
+    def test_loader_errors_are_not_cached(self):
+        """Test a failing loader caches nothing, not even a miss."""
+        # Arrange
+        cache = TTLCache(max_size=10, ttl=60)
+        
+        def fail():
+            raise RuntimeError('throttled')
+        
+        # Act
+        with pytest.raises(RuntimeError):
+            cache.get_or_load('a', fail)
+        value = cache.get_or_load('a', lambda: 1)
+        
+        # Assert
+        assert value == 1
+    
+    def test_invalidate_during_load_discards_result(self):
+        """Test a value loaded before an invalidation is returned but not cached."""
+        # Arrange
+        cache = TTLCache(max_size=10, ttl=60)
+        
+        def stale_loader():
+            # The backing store changes and is invalidated while we read it
+            cache.invalidate('a')
+            return 'stale'
+        
+        # Act
+        first = cache.get_or_load('a', stale_loader)
+        second = cache.get_or_load('a', lambda: 'fresh')
+        
+        # Assert
+        assert first == 'stale'
+        assert second == 'fresh'
+    
+    def test_load_into_merges_unless_invalidated(self):
+        """Test loaded pieces are merged into the entry, and dropped if it changed while loading."""
+        # Arrange
+        cache = TTLCache(max_size=10, ttl=60)
+        merge = lambda current, value: {**(current or {}), **value}
+        
+        def stale_loader():
+            cache.invalidate('a')
+            return {'page-3': 'stale'}
+        
+        # Act
+        cache.load_into('a', lambda: {'page-1': 1}, merge)
+        cache.load_into('a', lambda: {'page-2': 2}, merge)
+        merged = cache.get('a')
+        stale = cache.load_into('a', stale_loader, merge)
+        
+        # Assert
+        assert merged == {'page-1': 1, 'page-2': 2}
+        assert stale == {'page-3': 'stale'}
+        assert cache.get('a') is None
+    
+    def test_thread_safety(self):
+        """Test concurrent writers never exceed the size bound."""
+        # Arrange
+        cache = TTLCache(max_size=50)
+        
+        def worker(offset):
+            for i in range(500):
+                cache.set(offset * 1000 + i, i)
+                cache.get(offset * 1000 + i - 1)
+        
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        
+        # Act
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        # Assert
+        assert len(cache) == 50
+        assert cache.stats()['evictions'] == 8 * 500 - 50
@@ -1,4 +1,5 @@
 import pytest
+import threading
 import time
 import jwt
 from unittest.mock import patch, MagicMock
@@ -8,7 +9,10 @@ from utils.cognito_auth import (
     verify_cognito_token,
     cognito_token_required,
     cognito_admin_required,
-    cognito_parent_required
+    cognito_parent_required,
+    get_token_cache_stats,
+    JWKSProvider,
+    reset_token_cache
 )
 
 # Sample JWKS for testing
@@ -44,8 +48,9 @@ class TestCognitoAuth:
             app.config['COGNITO_REGION'] = 'us-west-2'
             app.config['COGNITO_USER_POOL_ID'] = 'us-west-2_test'
             
-            # Mock the requests.get call
-            with patch('utils.cognito_auth.requests.get') as mock_get:
+            # Mock the JWKS session's get call
+            with patch('utils.cognito_auth.requests.Session') as mock_session:
+                mock_get = mock_session.return_value.get
                 mock_response = MagicMock()
                 mock_response.json.return_value = MOCK_JWKS
                 mock_response.raise_for_status.return_value = None
@@ -72,9 +77,9 @@ class TestCognitoAuth:
             # Create a mock token
             mock_token = "header.payload.signature"
             
-            # Mock get_cognito_jwks
-            with patch('utils.cognito_auth.get_cognito_jwks') as mock_get_jwks:
-                mock_get_jwks.return_value = MOCK_JWKS
+            # Mock the JWKS fetch
+            with patch('utils.cognito_auth.requests.Session') as mock_session:
+                mock_session.return_value.get.return_value.json.return_value = MOCK_JWKS
                 
                 # Mock jwt.get_unverified_header
                 with patch('utils.cognito_auth.jwt.get_unverified_header') as mock_get_header:
@@ -110,9 +115,9 @@ class TestCognitoAuth:
             expired_payload = MOCK_JWT_PAYLOAD.copy()
             expired_payload['exp'] = int(time.time()) - 3600  # Expired 1 hour ago
             
-            # Mock get_cognito_jwks
-            with patch('utils.cognito_auth.get_cognito_jwks') as mock_get_jwks:
-                mock_get_jwks.return_value = MOCK_JWKS
+            # Mock the JWKS fetch
+            with patch('utils.cognito_auth.requests.Session') as mock_session:
+                mock_session.return_value.get.return_value.json.return_value = MOCK_JWKS
                 
                 # Mock jwt.get_unverified_header
                 with patch('utils.cognito_auth.jwt.get_unverified_header') as mock_get_header:
@@ -136,6 +141,69 @@ class TestCognitoAuth:
                                 result = verify_cognito_token('mock-token')
                                 assert result is None
     
+    def _verify_with_mocks(self, token, payload=MOCK_JWT_PAYLOAD):
+        """Run verify_cognito_token with key lookup, parsing and RSA mocked out."""
+        with patch('utils.cognito_auth.get_cognito_public_key') as mock_get_key, \
+             patch('utils.cognito_auth.jwt.get_unverified_header',
+                   return_value={"kid": "test-key-id", "alg": "RS256"}), \
+             patch('utils.cognito_auth.jwt.get_unverified_claims', return_value=payload), \
+             patch('utils.cognito_auth.base64url_decode', return_value=b'decoded-signature'):
+            mock_get_key.return_value.verify.return_value = True
+            return verify_cognito_token(token), mock_get_key
+    
+    @pytest.fixture
+    def token_cache_app(self, app):
+        """Enable the verified token cache for a test."""
+        app.config['TOKEN_CACHE_ENABLED'] = True
+        app.config['COGNITO_APP_CLIENT_ID'] = 'test-client-id'
+        reset_token_cache()
+        yield app
+        reset_token_cache()
+    
+    def test_verified_token_is_cached(self, token_cache_app):
+        """Test a repeated token skips signature verification."""
+        with token_cache_app.app_context():
+            # Arrange
+            first, _ = self._verify_with_mocks("header.payload.signature")
+            
+            # Act
+            second, mock_get_key = self._verify_with_mocks("header.payload.signature")
+            
+            # Assert
+            assert first == second == MOCK_JWT_PAYLOAD
+            mock_get_key.assert_not_called()
+            stats = get_token_cache_stats()
+            assert stats['hits'] == 1
+            assert stats['size'] == 1
+    
+    def test_cached_token_still_checks_claims(self, token_cache_app):
+        """Test cached tokens are rejected once the audience no longer matches."""
+        with token_cache_app.app_context():
+            # Arrange
+            self._verify_with_mocks("header.payload.signature")
+            token_cache_app.config['COGNITO_APP_CLIENT_ID'] = 'another-client-id'
+            
+            # Act
+            result, mock_get_key = self._verify_with_mocks("header.payload.signature")
+            
+            # Assert
+            assert result is None
+            mock_get_key.assert_not_called()
+            assert get_token_cache_stats()['size'] == 0
+    
+    def test_invalid_token_is_not_cached(self, token_cache_app):
+        """Test tokens that fail verification are never cached."""
+        with token_cache_app.app_context():
+            # Arrange
+            expired_payload = dict(MOCK_JWT_PAYLOAD, exp=int(time.time()) - 10)
+            
+            # Act
+            result, _ = self._verify_with_mocks("header.payload.signature", expired_payload)
+            
+            # Assert
+            assert result is None
+            assert get_token_cache_stats()['size'] == 0
+    
     def test_cognito_token_required_decorator(self, app):
         """Test cognito_token_required decorator."""
         with app.app_context():
@@ -243,4 +311,108 @@ class TestCognitoAuth:
                 response = client.get('/test-parent', headers={
                     'Authorization': 'Bearer mock-token'
                 })
-                assert response.status_code == 403
\ No newline at end of file
+                assert response.status_code == 403
+
+
+class TestJWKSProvider:
+    JWKS_URL = 'https://cognito-idp.us-west-2.amazonaws.com/us-west-2_test/.well-known/jwks.json'
+    
+    @pytest.fixture
+    def session(self):
+        """Patch the HTTP session so fetches return MOCK_JWKS."""
+        with patch('utils.cognito_auth.requests.Session') as mock_session_class, \
+             patch('utils.cognito_auth.jwk.construct', side_effect=lambda key: MagicMock(kid=key['kid'])):
+            mock_session = mock_session_class.return_value
+            mock_session.get.return_value.json.return_value = MOCK_JWKS
+            yield mock_session
+    
+    def test_keys_built_once_per_fetch(self, session):
+        """Test keys are looked up by kid without refetching or rebuilding."""
+        # Arrange
+        provider = JWKSProvider(self.JWKS_URL, timeout=(1, 2))
+        
+        # Act
+        first = provider.get_key('test-key-id')
+        second = provider.get_key('test-key-id')
+        
+        # Assert
+        assert first is second
+        assert first.kid == 'test-key-id'
+        session.get.assert_called_once_with(self.JWKS_URL, timeout=(1, 2))
+    
+    def test_unknown_kid_refreshes_once_per_interval(self, session):
+        """Test a rotated key is fetched immediately but unknown kids can't stampede Cognito."""
+        # Arrange
+        provider = JWKSProvider(self.JWKS_URL, min_refresh_interval=0)
+        provider.get_jwks()
+        rotated = {"keys": MOCK_JWKS["keys"] + [dict(MOCK_JWKS["keys"][0], kid="rotated-key-id")]}
+        session.get.return_value.json.return_value = rotated
+        
+        # Act
+        rotated_key = provider.get_key('rotated-key-id')
+        provider.min_refresh_interval = 60
+        missing = [provider.get_key('unknown-key-id') for _ in range(5)]
+        
+        # Assert
+        assert rotated_key.kid == 'rotated-key-id'
+        assert missing == [None] * 5
+        assert session.get.call_count == 2
+        assert provider.stats()['unknown_kid_refreshes'] == 1
+    
+    def test_stale_keys_served_while_revalidating(self, session):
+        """Test expiring keys are refreshed in the background, not in the request."""
+        # Arrange
+        provider = JWKSProvider(self.JWKS_URL, ttl=60, refresh_ahead=10)
+        stale_jwks = provider.get_jwks()
+        release = threading.Event()
+        fresh = {"keys": [dict(MOCK_JWKS["keys"][0], kid="fresh-key-id")]}
+        
+        def slow_fetch(*args, **kwargs):
+            release.wait(5)
+            return MagicMock(json=MagicMock(return_value=fresh))
+        
+        session.get.side_effect = slow_fetch
+        jwks, keys, fetched_at = provider._state
+        provider._state = (jwks, keys, fetched_at - 55)
+        
+        # Act
+        served = [provider.get_jwks() for _ in range(3)]
+        release.set()
+        for _ in range(50):
+            if provider.get_jwks() is fresh:
+                break
+            time.sleep(0.01)
+        
+        # Assert
+        assert all(jwks is stale_jwks for jwks in served)
+        assert provider.get_jwks() is fresh
+        assert session.get.call_count == 2
+        assert provider.stats()['background_refreshes'] == 1
+    
+    def test_concurrent_misses_share_one_fetch(self, session):
+        """Test threads that find no keys wait on a single fetch."""
+        # Arrange
+        provider = JWKSProvider(self.JWKS_URL)
+        release = threading.Event()
+        
+        def slow_fetch(*args, **kwargs):
+            release.wait(5)
+            return MagicMock(json=MagicMock(return_value=MOCK_JWKS))
+        
+        session.get.side_effect = slow_fetch
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(provider.get_key('test-key-id')))
+                   for _ in range(8)]
+        
+        # Act
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        
+        # Assert
+        assert len(results) == 8
+        assert all(key is results[0] and key is not None for key in results)
+        assert session.get.call_count == 1
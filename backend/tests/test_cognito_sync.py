@@ -0,0 +1,218 @@
+import pytest
+import json
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+from utils.cognito import refresh_profile_copies
+from utils.cognito_sync import handle_cognito_trigger, mirror_cognito_user, reconcile_cognito_profiles
+from utils.database import create_user, get_cognito_username, get_user_by_id, put_child_relationships
+
+def trigger_event(source, sub='sub-1', email='user@example.com', name='User', role='parent', parent_id=None):
+    """Build a Cognito trigger event."""
+    attributes = {'sub': sub, 'email': email, 'name': name, 'custom:role': role}
+    if parent_id:
+        attributes['custom:parentId'] = parent_id
+    return {
+        'version': '1',
+        'triggerSource': source,
+        'userName': email,
+        'request': {'userAttributes': attributes},
+        'response': {}
+    }
+
+def cognito_user(sub, email, name, role='parent'):
+    """Build a ListUsers entry."""
+    return {
+        'Username': email,
+        'UserCreateDate': datetime(2023, 1, 1),
+        'Attributes': [{'Name': 'sub', 'Value': sub}, {'Name': 'email', 'Value': email},
+                       {'Name': 'name', 'Value': name}, {'Name': 'custom:role', 'Value': role}]
+    }
+
+class TestCognitoTrigger:
+    def test_post_confirmation_creates_profile(self, app, memory_db):
+        """Test a confirmed child is mirrored under their sub with their family relationship."""
+        with app.app_context():
+            # Arrange
+            event = trigger_event('PostConfirmation_ConfirmSignUp', sub='kid-sub', email='Kid@example.com',
+                                  name='Kid', role='child', parent_id='parent-sub')
+
+            # Act
+            result = handle_cognito_trigger(event)
+
+            # Assert
+            assert result is event
+            user = get_user_by_id('kid-sub')
+            assert user['email'] == 'kid@example.com'
+            assert user['role'] == 'child'
+            assert user.password_hash is None
+            table = memory_db.Table(app.config['DYNAMODB_TABLE'])
+            relation = table.get_item(Key={'PK': 'USER#parent-sub', 'SK': 'CHILD#kid-sub'}).get('Item')
+            assert relation['Name'] == 'Kid'
+            assert get_cognito_username('kid-sub') == 'Kid@example.com'
+
+    def test_token_generation_updates_changed_fields(self, app, memory_db):
+        """Test token issue brings a stale profile in line and leaves a current one alone."""
+        with app.app_context():
+            # Arrange
+            handle_cognito_trigger(trigger_event('PostConfirmation_ConfirmSignUp'))
+
+            # Act
+            renamed = mirror_cognito_user({'user_id': 'sub-1', 'email': 'user@example.com', 'name': 'Renamed',
+                                           'role': 'parent', 'username': 'user@example.com'})
+            memory_db.requests.clear()
+            handle_cognito_trigger(trigger_event('TokenGeneration_Authentication', name='Renamed'))
+
+            # Assert
+            assert renamed == 'updated'
+            assert get_user_by_id('sub-1')['name'] == 'Renamed'
+            assert 'UpdateItem' not in memory_db.requests
+            assert 'TransactWriteItems' not in memory_db.requests
+
+    def test_email_of_another_user_is_a_conflict(self, app, memory_db):
+        """Test a Cognito user whose email is claimed by a DynamoDB-only user is not mirrored."""
+        with app.app_context():
+            # Arrange
+            create_user({'email': 'user@example.com', 'name': 'Legacy', 'password_hash': 'hash', 'role': 'parent'})
+            user_data = {'user_id': 'sub-1', 'email': 'user@example.com', 'name': 'User',
+                         'role': 'parent', 'username': 'user@example.com'}
+
+            # Act
+            result = mirror_cognito_user(user_data)
+
+            # Assert
+            assert result == 'conflict'
+            assert get_user_by_id('sub-1', consistent_read=True) is None
+
+    def test_missing_role_uses_authorization_default(self, app, memory_db):
+        """Test a user without custom:role is mirrored with the role authorization gives them."""
+        with app.app_context():
+            # Arrange
+            event = trigger_event('PostConfirmation_ConfirmSignUp')
+            del event['request']['userAttributes']['custom:role']
+
+            # Act
+            handle_cognito_trigger(event)
+
+            # Assert
+            assert get_user_by_id('sub-1', consistent_read=True)['role'] == 'user'
+
+    def test_errors_do_not_block_sign_in(self, app, memory_db):
+        """Test a failed mirror is logged and the event still returned."""
+        with app.app_context():
+            # Arrange
+            event = trigger_event('TokenGeneration_RefreshTokens')
+
+            # Act
+            with patch('utils.cognito_sync.mirror_cognito_user', side_effect=RuntimeError('DynamoDB down')):
+                result = handle_cognito_trigger(event)
+
+            # Assert
+            assert result is event
+
+    def test_other_triggers_are_passed_through(self, app, memory_db):
+        """Test triggers that don't mirror users make no DynamoDB calls."""
+        with app.app_context():
+            # Act
+            event = trigger_event('PreSignUp_SignUp')
+            result = handle_cognito_trigger(event)
+
+            # Assert
+            assert result is event
+            assert sum(memory_db.requests.values()) == 0
+
+    def test_profile_update_refreshes_mirror(self, app, memory_db):
+        """Test an API profile update is applied to the mirrored profile and relationship item."""
+        with app.app_context():
+            # Arrange
+            handle_cognito_trigger(trigger_event('PostConfirmation_ConfirmSignUp', sub='kid-sub', name='Kid',
+                                                 role='child', parent_id='parent-sub'))
+
+            # Act
+            refresh_profile_copies('kid-sub', 'parent-sub', {'name': 'Kiddo'})
+
+            # Assert
+            assert get_user_by_id('kid-sub')['name'] == 'Kiddo'
+            table = memory_db.Table(app.config['DYNAMODB_TABLE'])
+            relation = table.get_item(Key={'PK': 'USER#parent-sub', 'SK': 'CHILD#kid-sub'}).get('Item')
+            assert relation['Name'] == 'Kiddo'
+
+    def test_profile_update_of_unmirrored_child_is_not_an_error(self, app, memory_db):
+        """Test refreshing a child that was never mirrored updates the relationship without logging errors."""
+        with app.app_context():
+            # Arrange
+            put_child_relationships('parent-sub', [{'user_id': 'kid-sub', 'email': 'kid@example.com', 'name': 'Kid'}])
+
+            # Act
+            with patch.object(app.logger, 'error') as error:
+                refresh_profile_copies('kid-sub', 'parent-sub', {'name': 'Kiddo'})
+
+            # Assert
+            error.assert_not_called()
+            assert get_user_by_id('kid-sub', consistent_read=True) is None
+            table = memory_db.Table(app.config['DYNAMODB_TABLE'])
+            relation = table.get_item(Key={'PK': 'USER#parent-sub', 'SK': 'CHILD#kid-sub'}).get('Item')
+            assert relation['Name'] == 'Kiddo'
+
+class TestCognitoReconciliation:
+    @pytest.fixture
+    def pool(self):
+        client = MagicMock()
+        client.list_users.side_effect = lambda **kwargs: {'Users': []} if 'Filter' in kwargs else (
+            {'Users': [cognito_user('sub-1', 'one@example.com', 'One')], 'PaginationToken': 'page-2'}
+            if 'PaginationToken' not in kwargs else
+            {'Users': [cognito_user('sub-2', 'two@example.com', 'Two'),
+                       cognito_user('sub-3', 'three@example.com', 'Three')]}
+        )
+        return client
+
+    @pytest.fixture
+    def table_users(self, app, memory_db):
+        with app.app_context():
+            # sub-1 is current, sub-2 is stale, sub-3 is missing, gone-sub has left the pool
+            for user_id, email, name in [('sub-1', 'one@example.com', 'One'), ('sub-2', 'two@example.com', 'Old'),
+                                         ('gone-sub', 'gone@example.com', 'Gone')]:
+                create_user({'user_id': user_id, 'email': email, 'name': name, 'role': 'parent'})
+            create_user({'email': 'legacy@example.com', 'name': 'Legacy', 'password_hash': 'hash', 'role': 'parent'})
+
+    def test_report(self, app, memory_db, pool, table_users):
+        """Test differences are reported without changing the table."""
+        with app.app_context():
+            # Act
+            stats = reconcile_cognito_profiles(total_segments=2, client=pool)
+
+            # Assert
+            assert stats['cognito_users'] == 3
+            assert stats['samples']['missing'] == ['sub-3']
+            assert stats['samples']['stale'] == ['sub-2']
+            assert stats['samples']['orphaned'] == ['gone-sub']
+            assert stats['created'] == stats['updated'] == stats['deleted'] == 0
+            assert get_user_by_id('sub-3') is None
+
+    def test_fix(self, app, memory_db, pool, table_users):
+        """Test fixing creates missing, updates stale and deletes confirmed orphaned profiles."""
+        with app.app_context():
+            # Act
+            stats = reconcile_cognito_profiles(total_segments=2, client=pool, fix=True, delete_orphaned=True)
+
+            # Assert
+            assert (stats['created'], stats['updated'], stats['deleted']) == (1, 1, 1)
+            assert get_user_by_id('sub-3', consistent_read=True)['name'] == 'Three'
+            assert get_user_by_id('sub-3')['created_at'] == int(datetime(2023, 1, 1).timestamp())
+            assert get_user_by_id('sub-2', consistent_read=True)['name'] == 'Two'
+            assert get_user_by_id('gone-sub', consistent_read=True) is None
+            _, kwargs = pool.list_users.call_args
+            assert kwargs['Filter'] == 'sub = "gone-sub"'
+
+    def test_command(self, app, memory_db, pool, table_users):
+        """Test the reconcile-cognito CLI command reports its statistics."""
+        # Arrange
+        runner = app.test_cli_runner()
+
+        # Act
+        with patch('utils.cognito_sync.get_cognito_client', return_value=pool):
+            result = runner.invoke(args=['reconcile-cognito', '--segments', '2'])
+
+        # Assert
+        assert result.exit_code == 0, result.output
+        stats = json.loads(result.output)
+        assert (stats['missing'], stats['stale'], stats['orphaned']) == (1, 1, 1)
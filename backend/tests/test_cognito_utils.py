@@ -0,0 +1,210 @@
+import pytest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+from botocore.stub import Stubber
+from utils.aws import registry
+from utils.cognito import (
+    forget_cognito_username,
+    get_cognito_client,
+    get_username_cache,
+    get_username_cache_stats,
+    list_cognito_children,
+    remember_cognito_username,
+    reset_username_cache,
+    resolve_cognito_username,
+    warm_cognito_client
+)
+from utils.database import get_cognito_username
+from utils.metrics import get_cognito_metrics, record_cognito_call, reset_cognito_metrics
+
+@pytest.fixture(autouse=True)
+def clean_cognito():
+    registry.reset()
+    reset_cognito_metrics()
+    yield
+    registry.reset()
+    reset_cognito_metrics()
+
+class TestCognitoClient:
+    def test_client_is_shared(self, app):
+        """Test handlers get the same pooled client with the configured timeouts."""
+        with app.app_context():
+            # Act
+            client1 = get_cognito_client()
+            client2 = get_cognito_client()
+
+            # Assert
+            assert client1 is client2
+            assert client1.meta.region_name == app.config['COGNITO_REGION']
+            assert client1.meta.config.connect_timeout == app.config['COGNITO_CONNECT_TIMEOUT']
+            assert client1.meta.config.read_timeout == app.config['COGNITO_READ_TIMEOUT']
+            assert client1.meta.config.max_pool_connections == app.config['COGNITO_MAX_POOL_CONNECTIONS']
+
+    def test_warm_creates_client_once(self, app):
+        """Test warming builds the client so the first request reuses it."""
+        # Arrange
+        with patch('utils.cognito._instrument', side_effect=lambda client: client) as instrument:
+            # Act
+            warm_cognito_client(app)
+            with app.app_context():
+                get_cognito_client()
+
+        # Assert
+        assert instrument.call_count == 1
+        assert len(registry.stats()['entries']) == 1
+
+    def test_warm_can_be_disabled(self, app):
+        """Test COGNITO_WARM_CLIENT=False leaves client creation to the first request."""
+        # Arrange
+        app.config['COGNITO_WARM_CLIENT'] = False
+
+        # Act
+        warm_cognito_client(app)
+
+        # Assert
+        assert registry.stats()['entries'] == []
+
+    def test_calls_are_timed_per_operation(self, app):
+        """Test successful and failed calls are recorded against the endpoint."""
+        with app.test_request_context('/api/login'):
+            # Arrange
+            app.preprocess_request()
+            client = get_cognito_client()
+            stubber = Stubber(client)
+            stubber.add_response('initiate_auth', {'AuthenticationResult': {'IdToken': 'token'}})
+            stubber.add_client_error('initiate_auth', 'NotAuthorizedException')
+
+            # Act
+            with stubber:
+                client.initiate_auth(AuthFlow='USER_PASSWORD_AUTH', ClientId='client',
+                                     AuthParameters={'USERNAME': 'a', 'PASSWORD': 'b'})
+                with pytest.raises(client.exceptions.NotAuthorizedException):
+                    client.initiate_auth(AuthFlow='USER_PASSWORD_AUTH', ClientId='client',
+                                         AuthParameters={'USERNAME': 'a', 'PASSWORD': 'b'})
+
+        # Assert
+        metrics = get_cognito_metrics()
+        assert len(metrics) == 1
+        assert metrics[0]['operation'] == 'InitiateAuth'
+        assert metrics[0]['calls'] == 2
+        assert metrics[0]['errors'] == 1
+
+class TestCognitoMetrics:
+    def test_latency_histogram(self):
+        """Test calls outside a request are bucketed under 'background'."""
+        # Act
+        record_cognito_call('AdminGetUser', 3)
+        record_cognito_call('AdminGetUser', 30, error=True)
+
+        # Assert
+        metrics = get_cognito_metrics()
+        assert metrics[0]['endpoint'] == 'background'
+        assert metrics[0]['calls'] == 2
+        assert metrics[0]['errors'] == 1
+        assert metrics[0]['latency_ms_avg'] == 16.5
+        assert metrics[0]['latency_ms_max'] == 30
+        assert metrics[0]['latency_buckets']['5'] == 1
+        assert metrics[0]['latency_buckets']['50'] == 1
+
+    def test_reset(self):
+        """Test metrics can be cleared."""
+        # Arrange
+        record_cognito_call('ListUsers', 1)
+
+        # Act
+        reset_cognito_metrics()
+
+        # Assert
+        assert get_cognito_metrics() == []
+
+class TestCognitoUsernames:
+    @pytest.fixture(autouse=True)
+    def username_cache(self, app):
+        app.config['COGNITO_USERNAME_CACHE_ENABLED'] = True
+        reset_username_cache()
+        yield
+        reset_username_cache()
+
+    def test_miss_is_listed_once_and_recorded(self, app, memory_db):
+        """Test an unknown sub is found with ListUsers once and then served from the index."""
+        with app.app_context():
+            # Arrange
+            client = MagicMock()
+            client.list_users.return_value = {'Users': [{'Username': 'user@example.com', 'Attributes': []}]}
+
+            # Act
+            first = resolve_cognito_username('sub-1', client)
+            reset_username_cache()
+            second = resolve_cognito_username('sub-1', client)
+
+            # Assert
+            assert first == second == 'user@example.com'
+            client.list_users.assert_called_once()
+            _, kwargs = client.list_users.call_args
+            assert kwargs['Filter'] == 'sub = "sub-1"'
+            assert get_cognito_username('sub-1') == 'user@example.com'
+
+    def test_cache_hit_skips_dynamodb(self, app, memory_db):
+        """Test a remembered username is served from the local cache."""
+        with app.app_context():
+            # Arrange
+            remember_cognito_username('sub-1', 'user@example.com')
+            memory_db.requests.clear()
+
+            # Act
+            username = resolve_cognito_username('sub-1', MagicMock())
+
+            # Assert
+            assert username == 'user@example.com'
+            assert sum(memory_db.requests.values()) == 0
+            assert get_username_cache_stats()['hits'] == 1
+
+    def test_unknown_sub_is_negatively_cached(self, app, memory_db):
+        """Test subs Cognito doesn't know don't call ListUsers on every lookup."""
+        with app.app_context():
+            # Arrange
+            client = MagicMock()
+            client.list_users.return_value = {'Users': []}
+
+            # Act
+            first = resolve_cognito_username('missing', client)
+            second = resolve_cognito_username('missing', client)
+
+            # Assert
+            assert first is None and second is None
+            client.list_users.assert_called_once()
+
+    def test_forget(self, app, memory_db):
+        """Test forgetting a username removes it from the cache and DynamoDB."""
+        with app.app_context():
+            # Arrange
+            remember_cognito_username('sub-1', 'user@example.com')
+
+            # Act
+            forget_cognito_username('sub-1')
+
+            # Assert
+            assert get_cognito_username('sub-1') is None
+            assert get_username_cache().get('sub-1') is None
+
+    def test_list_children_follows_pages(self, app):
+        """Test every ListUsers page of a family is read."""
+        with app.app_context():
+            # Arrange
+            def cognito_user(sub):
+                return {'Username': f'{sub}@example.com', 'UserCreateDate': datetime(2023, 1, 1),
+                        'Attributes': [{'Name': 'sub', 'Value': sub}, {'Name': 'email', 'Value': f'{sub}@example.com'},
+                                       {'Name': 'name', 'Value': sub.title()}]}
+            client = MagicMock()
+            client.list_users.side_effect = [
+                {'Users': [cognito_user('kid-1')], 'PaginationToken': 'page-2'},
+                {'Users': [cognito_user('kid-2')]}
+            ]
+
+            # Act
+            children = list_cognito_children('parent-1', client)
+
+            # Assert
+            assert [child['user_id'] for child in children] == ['kid-1', 'kid-2']
+            assert children[1]['name'] == 'Kid-2'
+            assert client.list_users.call_args_list[1][1]['PaginationToken'] == 'page-2'
@@ -1,5 +1,7 @@
 import pytest
 import time
+from unittest.mock import patch, MagicMock
+from botocore.exceptions import ClientError
 from utils.database import (
     generate_id,
     create_item,
@@ -7,12 +9,30 @@ from utils.database import (
     update_item,
     delete_item,
     query_items,
+    iter_query,
+    query_page,
+    encode_cursor,
+    decode_cursor,
+    batch_get_items,
+    UnprocessedKeysError,
+    build_projection,
+    BulkWriter,
+    transact_write,
     create_user,
     get_user_by_email,
     get_user_by_id,
     update_user,
     delete_user,
-    get_children_by_parent_id
+    get_children_by_parent_id,
+    list_users,
+    query_sharded_page,
+    get_profile_cache_stats,
+    reset_profile_cache,
+    children_imported,
+    get_children_page,
+    get_children_cache_stats,
+    put_child_relationships,
+    reset_children_cache
 )
 
 class TestDatabaseUtils:
@@ -68,6 +88,64 @@ class TestDatabaseUtils:
             assert result['Name'] == 'Another Test Item'
             assert result['Description'] == 'Another test description'
     
+    def test_get_item_projection(self, mock_db, app):
+        """Test get_item only returns the projected attributes."""
+        with app.app_context():
+            # Arrange
+            mock_db['TEST#P#DETAILS'] = {'PK': 'TEST#P', 'SK': 'DETAILS', 'Name': 'Projected', 'Secret': 'x'}
+            
+            # Act
+            result = get_item('TEST#P', 'DETAILS', projection=['Name'], consistent_read=True)
+            
+            # Assert
+            assert result == {'Name': 'Projected'}
+    
+    def test_build_projection_aliases_names(self):
+        """Test projections alias every attribute and keep existing names."""
+        # Act
+        expression, names = build_projection(['Name', 'Role', 'Name'], {'#pk': 'PK'})
+        
+        # Assert
+        assert expression == '#proj0, #proj1'
+        assert names == {'#pk': 'PK', '#proj0': 'Name', '#proj1': 'Role'}
+    
+    def test_read_options_are_sent(self, app):
+        """Test projection and consistency options reach DynamoDB."""
+        with app.app_context():
+            # Arrange
+            table = MagicMock()
+            table.get_item.return_value = {}
+            table.query.return_value = {'Items': []}
+            
+            with patch('utils.database.get_table', return_value=table):
+                # Act
+                get_item('USER#1', 'PROFILE', projection=['Name'], consistent_read=True)
+                query_items(key_condition_expression='condition', projection=['ChildId'],
+                            expression_attribute_names={'#x': 'X'})
+            
+            # Assert
+            _, get_kwargs = table.get_item.call_args
+            assert get_kwargs['ConsistentRead'] is True
+            assert get_kwargs['ProjectionExpression'] == '#proj0'
+            assert get_kwargs['ExpressionAttributeNames'] == {'#proj0': 'Name'}
+            
+            _, query_kwargs = table.query.call_args
+            assert query_kwargs['ProjectionExpression'] == '#proj0'
+            assert query_kwargs['ExpressionAttributeNames'] == {'#x': 'X', '#proj0': 'ChildId'}
+            assert 'ConsistentRead' not in query_kwargs
+    
+    def test_get_user_by_id_requests_mapped_attributes(self, app, test_user):
+        """Test the user mapping only reads the attributes it maps."""
+        with app.app_context():
+            with patch('utils.database.get_item', wraps=get_item) as mock_get_item:
+                # Act
+                result = get_user_by_id(test_user['user_id'])
+            
+            # Assert
+            _, kwargs = mock_get_item.call_args
+            assert 'PasswordHash' not in kwargs['projection']
+            assert result['user_id'] == test_user['user_id']
+    
     def test_get_nonexistent_item(self, app):
         """Test getting an item that doesn't exist."""
         # We need app context for current_app.config
@@ -131,6 +209,303 @@ class TestDatabaseUtils:
             assert success is True
             assert 'TEST#999#DETAILS' not in mock_db
     
+    def _paged_table(self, pages):
+        """Build a mock table whose query returns the given pages in order."""
+        table = MagicMock()
+        
+        def query(**kwargs):
+            start = kwargs.get('ExclusiveStartKey')
+            index = 0 if start is None else start['page']
+            response = {'Items': pages[index]}
+            if index + 1 < len(pages):
+                response['LastEvaluatedKey'] = {'page': index + 1}
+            return response
+        
+        table.query.side_effect = query
+        return table
+    
+    def test_iter_query_follows_pages_lazily(self, app):
+        """Test iter_query follows LastEvaluatedKey only as items are consumed."""
+        with app.app_context():
+            # Arrange
+            pages = [[{'PK': 'P', 'SK': f'{p}-{i}'} for i in range(2)] for p in range(3)]
+            table = self._paged_table(pages)
+            
+            with patch('utils.database.get_table', return_value=table):
+                # Act
+                results = iter_query(key_condition_expression='condition', limit=3)
+                first = next(results)
+                
+                # Assert - only the first page has been read so far
+                assert first['SK'] == '0-0'
+                assert table.query.call_count == 1
+                
+                remaining = list(results)
+                assert [item['SK'] for item in remaining] == ['0-1', '1-0']
+                assert table.query.call_count == 2
+    
+    def test_iter_query_passes_options(self, app):
+        """Test sort order and page size are passed to DynamoDB."""
+        with app.app_context():
+            # Arrange
+            table = self._paged_table([[]])
+            
+            with patch('utils.database.get_table', return_value=table):
+                # Act
+                list(iter_query(key_condition_expression='condition',
+                                scan_index_forward=False, page_size=25))
+            
+            # Assert
+            _, kwargs = table.query.call_args
+            assert kwargs['ScanIndexForward'] is False
+            assert kwargs['Limit'] == 25
+    
+    def test_query_items_reads_all_pages(self, app):
+        """Test query_items no longer stops at the first page."""
+        with app.app_context():
+            # Arrange
+            pages = [[{'PK': 'P', 'SK': str(i)}] for i in range(4)]
+            table = self._paged_table(pages)
+            
+            with patch('utils.database.get_table', return_value=table):
+                # Act
+                results = query_items(key_condition_expression='condition')
+            
+            # Assert
+            assert [item['SK'] for item in results] == ['0', '1', '2', '3']
+    
+    def test_query_page_cursor_round_trip(self, app):
+        """Test query_page returns a cursor that resumes after the last item."""
+        with app.app_context():
+            # Arrange - items carry their page so the mock can resume from a key
+            items = [{'PK': 'P', 'SK': f'{i:02d}'} for i in range(5)]
+            table = MagicMock()
+            
+            def query(**kwargs):
+                start = kwargs.get('ExclusiveStartKey')
+                remaining = [item for item in items if start is None or item['SK'] > start['SK']]
+                page = remaining[:kwargs['Limit']]
+                response = {'Items': page}
+                if len(remaining) > len(page):
+                    response['LastEvaluatedKey'] = {'PK': 'P', 'SK': page[-1]['SK']}
+                return response
+            
+            table.query.side_effect = query
+            
+            with patch('utils.database.get_table', return_value=table):
+                # Act
+                page1, cursor1 = query_page(key_condition_expression='condition', limit=2, cursor_scope='P')
+                page2, cursor2 = query_page(key_condition_expression='condition', limit=2,
+                                            cursor=cursor1, cursor_scope='P')
+                page3, cursor3 = query_page(key_condition_expression='condition', limit=2,
+                                            cursor=cursor2, cursor_scope='P')
+            
+            # Assert
+            assert [item['SK'] for item in page1] == ['00', '01']
+            assert [item['SK'] for item in page2] == ['02', '03']
+            assert [item['SK'] for item in page3] == ['04']
+            assert cursor1 is not None and cursor2 is not None
+            assert cursor3 is None
+    
+    def test_cursor_is_tamper_proof(self, app):
+        """Test cursors cannot be modified or reused in another scope."""
+        with app.app_context():
+            # Arrange
+            key = {'PK': 'USER#parent', 'SK': 'CHILD#child'}
+            cursor = encode_cursor(key, scope='parent')
+            payload, signature = cursor.split('.')
+            forged = encode_cursor({'PK': 'USER#other', 'SK': 'CHILD#child'}, scope='parent').split('.')[0]
+            
+            # Act / Assert
+            assert decode_cursor(cursor, scope='parent') == key
+            with pytest.raises(ValueError):
+                decode_cursor(f"{forged}.{signature}", scope='parent')
+            with pytest.raises(ValueError):
+                decode_cursor(cursor, scope='someone-else')
+            with pytest.raises(ValueError):
+                decode_cursor('not-a-cursor')
+    
+    def test_cursor_requires_secret_key(self, app):
+        """Test cursors are never signed or accepted without a SECRET_KEY."""
+        with app.app_context():
+            # Arrange
+            key = {'PK': 'USER#parent', 'SK': 'CHILD#child'}
+            cursor = encode_cursor(key, scope='parent')
+            app.config['SECRET_KEY'] = None
+            
+            # Act / Assert
+            with pytest.raises(RuntimeError):
+                encode_cursor(key, scope='parent')
+            with pytest.raises(RuntimeError):
+                decode_cursor(cursor, scope='parent')
+    
+    def test_batch_get_items(self, mock_db, app):
+        """Test batch getting items keeps the requested order."""
+        # We need app context for current_app.config
+        with app.app_context():
+            # Arrange
+            for i in range(3):
+                mock_db[f'TEST#{i}#DETAILS'] = {'PK': f'TEST#{i}', 'SK': 'DETAILS', 'Name': f'Item {i}'}
+            
+            # Act
+            results = batch_get_items([
+                {'PK': 'TEST#2', 'SK': 'DETAILS'},
+                {'PK': 'MISSING#1', 'SK': 'DETAILS'},
+                {'PK': 'TEST#0', 'SK': 'DETAILS'},
+                {'PK': 'TEST#1', 'SK': 'DETAILS'}
+            ])
+            
+            # Assert - missing keys are skipped and order is preserved
+            assert [item['Name'] for item in results] == ['Item 2', 'Item 0', 'Item 1']
+    
+    def test_batch_get_items_chunks_and_retries(self, app):
+        """Test batch gets are chunked and unprocessed keys are retried."""
+        with app.app_context():
+            # Arrange
+            table_name = app.config['DYNAMODB_TABLE']
+            keys = [{'PK': f'TEST#{i}', 'SK': 'DETAILS'} for i in range(150)]
+            
+            def batch_get_item(RequestItems, **kwargs):
+                requested = RequestItems[table_name]['Keys']
+                # Throttle the last key of the first full chunk once
+                if len(requested) == 100:
+                    return {
+                        'Responses': {table_name: [dict(key) for key in requested[:-1]]},
+                        'UnprocessedKeys': {table_name: {'Keys': requested[-1:]}}
+                    }
+                return {'Responses': {table_name: [dict(key) for key in requested]}}
+            
+            mock_resource = MagicMock()
+            mock_resource.batch_get_item.side_effect = batch_get_item
+            
+            with patch('utils.database.get_dynamodb_resource', return_value=mock_resource), \
+                 patch('utils.database.time.sleep') as mock_sleep:
+                # Act
+                results = batch_get_items(keys)
+            
+            # Assert - 100 + 50 keys, plus one retry for the unprocessed key
+            assert mock_resource.batch_get_item.call_count == 3
+            assert mock_sleep.call_count == 1
+            assert [item['PK'] for item in results] == [key['PK'] for key in keys]
+    
+    def test_batch_get_items_raises_when_keys_stay_unprocessed(self, app):
+        """Test keys still unprocessed after every retry are raised rather than dropped."""
+        with app.app_context():
+            # Arrange
+            table_name = app.config['DYNAMODB_TABLE']
+            keys = [{'PK': 'TEST#1', 'SK': 'DETAILS'}, {'PK': 'TEST#2', 'SK': 'DETAILS'}]
+            mock_resource = MagicMock()
+            mock_resource.batch_get_item.return_value = {
+                'Responses': {table_name: [dict(keys[0])]},
+                'UnprocessedKeys': {table_name: {'Keys': [keys[1]]}}
+            }
+            
+            with patch('utils.database.get_dynamodb_resource', return_value=mock_resource), \
+                 patch('utils.database.time.sleep'):
+                # Act
+                with pytest.raises(UnprocessedKeysError) as error:
+                    batch_get_items(keys)
+            
+            # Assert
+            assert error.value.keys == [keys[1]]
+    
+    def test_batch_get_items_empty(self, app):
+        """Test batch getting no keys makes no requests."""
+        with app.app_context():
+            with patch('utils.database.get_dynamodb_resource') as mock_get_resource:
+                # Act
+                results = batch_get_items([])
+            
+            # Assert
+            assert results == []
+            mock_get_resource.assert_not_called()
+    
+    def test_bulk_writer(self, mock_db, app):
+        """Test BulkWriter writes puts and deletes in batches of 25."""
+        with app.app_context():
+            # Arrange
+            mock_db['OLD#1#DETAILS'] = {'PK': 'OLD#1', 'SK': 'DETAILS'}
+            
+            # Act
+            with BulkWriter() as writer:
+                for i in range(60):
+                    writer.put({'PK': f'BULK#{i}', 'SK': 'DETAILS', 'Index': i})
+                writer.delete('OLD#1', 'DETAILS')
+            
+            # Assert
+            assert 'OLD#1#DETAILS' not in mock_db
+            assert all(f'BULK#{i}#DETAILS' in mock_db for i in range(60))
+            assert writer.stats['batches'] == 3
+            assert writer.stats['written'] == 61
+            assert writer.stats['failed'] == 0
+            assert writer.stats['items_per_second'] > 0
+    
+    def test_bulk_writer_deduplicates_and_retries(self, app):
+        """Test duplicate keys are collapsed and unprocessed items are resubmitted."""
+        with app.app_context():
+            # Arrange
+            table_name = app.config['DYNAMODB_TABLE']
+            batches = []
+            
+            def batch_write_item(RequestItems):
+                requests = RequestItems[table_name]
+                batches.append(requests)
+                # Throttle the first item of the first request only
+                if len(batches) == 1:
+                    return {'UnprocessedItems': {table_name: requests[:1]}}
+                return {'UnprocessedItems': {}}
+            
+            mock_resource = MagicMock()
+            mock_resource.batch_write_item.side_effect = batch_write_item
+            
+            with patch('utils.database.get_dynamodb_resource', return_value=mock_resource), \
+                 patch('utils.database.time.sleep'):
+                # Act
+                with BulkWriter() as writer:
+                    writer.put({'PK': 'A', 'SK': 'X', 'Version': 1})
+                    writer.put({'PK': 'B', 'SK': 'X'})
+                    writer.put({'PK': 'A', 'SK': 'X', 'Version': 2})
+            
+            # Assert - A was only sent once, with its latest version
+            first_batch = batches[0]
+            assert len(first_batch) == 2
+            assert first_batch[1]['PutRequest']['Item']['Version'] == 2
+            assert len(batches) == 2
+            assert writer.stats['batches'] == 1
+            assert writer.stats['throttles'] == 1
+            assert writer.stats['retries'] == 1
+            assert writer.stats['written'] == 2
+    
+    def test_bulk_writer_discards_buffer_on_error(self, app):
+        """Test writes buffered before an error in the with-body are not sent."""
+        with app.app_context():
+            # Arrange
+            mock_resource = MagicMock()
+            
+            with patch('utils.database.get_dynamodb_resource', return_value=mock_resource):
+                # Act
+                with pytest.raises(RuntimeError):
+                    with BulkWriter() as writer:
+                        writer.put({'PK': 'A', 'SK': 'X'})
+                        raise RuntimeError('import failed')
+            
+            # Assert
+            mock_resource.batch_write_item.assert_not_called()
+            assert writer.stats['written'] == 0
+    
+    def test_bulk_writer_parallel(self, mock_db, app):
+        """Test BulkWriter can flush batches from several threads."""
+        with app.app_context():
+            # Act
+            with BulkWriter(max_workers=4) as writer:
+                for i in range(200):
+                    writer.put({'PK': f'PAR#{i}', 'SK': 'DETAILS'})
+            
+            # Assert
+            assert writer.stats['written'] == 200
+            assert writer.stats['batches'] == 8
+            assert all(f'PAR#{i}#DETAILS' in mock_db for i in range(200))
+    
     # TODO: FIX this. Likely a mocking issue
     # def test_query_items(self, mock_db, app):
     #     """Test querying items from DynamoDB."""
@@ -253,6 +628,60 @@ class TestDatabaseUtils:
             assert found_child is True
             assert found_relationship is True
     
+    def test_create_child_user_single_transaction(self, app, mock_db, test_user):
+        """Test child registration writes all items in one transaction."""
+        with app.app_context():
+            # Arrange
+            child_data = {
+                'email': 'Atomic@Example.com',
+                'name': 'Atomic Child',
+                'password_hash': 'hashed_password',
+                'role': 'child',
+                'parent_id': test_user['user_id']
+            }
+            
+            with patch('utils.database.transact_write', wraps=transact_write) as mock_transact, \
+                 patch('utils.database.create_item') as mock_create_item:
+                # Act
+                result = create_user(child_data)
+            
+            # Assert
+            mock_transact.assert_called_once()
+            mock_create_item.assert_not_called()
+            actions = mock_transact.call_args[0][0]
+            assert [action['Put']['Item']['SK'] for action in actions] == [
+                'EMAIL', 'PROFILE', f"CHILD#{result['user_id']}"
+            ]
+            assert 'EMAIL#atomic@example.com#EMAIL' in mock_db
+    
+    def test_create_user_duplicate_email(self, app, mock_db):
+        """Test creating a second user with the same email is rejected atomically."""
+        with app.app_context():
+            # Arrange
+            user_data = {
+                'email': 'dupe@example.com',
+                'name': 'First User',
+                'password_hash': 'hashed_password',
+                'role': 'parent'
+            }
+            create_user(user_data)
+            items_before = dict(mock_db)
+            
+            # Act / Assert
+            with pytest.raises(ValueError, match='already exists'):
+                create_user(dict(user_data, email='DUPE@example.com', name='Second User'))
+            
+            assert mock_db == items_before
+    
+    def test_transact_write_validates_size(self, app):
+        """Test transactions must contain between 1 and 100 actions."""
+        with app.app_context():
+            # Act / Assert
+            with pytest.raises(ValueError):
+                transact_write([])
+            with pytest.raises(ValueError):
+                transact_write([{'ConditionCheck': {}}] * 101)
+    
     # TODO: FIX this. Likely a mocking issue
     # def test_get_user_by_email(self, app, test_user):
     #     """Test getting a user by email."""
@@ -337,29 +766,317 @@ class TestDatabaseUtils:
     #         assert result[0]['email'] == test_child_user['email']
     #         assert result[0]['role'] == test_child_user['role']
     
-    def test_delete_user(self, app, mock_db):
-        """Test deleting a user."""
+    def test_get_children_by_parent_id_batches_profiles(self, app, test_user, test_child_user, mock_db):
+        """Test children are hydrated with one batch request."""
+        with app.app_context():
+            # Arrange
+            relationship = mock_db[f"USER#{test_user['user_id']}#CHILD#{test_child_user['user_id']}"]
+            
+            with patch('utils.database.query_items', return_value=[relationship]), \
+                 patch('utils.database.get_item') as mock_get_item:
+                # Act
+                result = get_children_by_parent_id(test_user['user_id'])
+            
+            # Assert
+            mock_get_item.assert_not_called()
+            assert len(result) == 1
+            assert result[0]['user_id'] == test_child_user['user_id']
+            assert result[0]['name'] == test_child_user['name']
+            assert result[0]['role'] == 'child'
+    
+    def test_get_children_by_parent_id_single_query(self, app, memory_db):
+        """Test children are listed from relationship snippets with one Query."""
+        with app.app_context():
+            # Arrange
+            parent = create_user({'email': 'family@example.com', 'name': 'Parent',
+                                  'password_hash': 'hash', 'role': 'parent'})
+            child = create_user({'email': 'kid@example.com', 'name': 'Kid', 'password_hash': 'hash',
+                                 'role': 'child', 'parent_id': parent['user_id'],
+                                 'avatar_key': 'avatars/kid.png', 'points': 5})
+            memory_db.requests.clear()
+            
+            # Act
+            result = get_children_by_parent_id(parent['user_id'])
+            
+            # Assert
+            assert result == [child]
+            assert result[0]['avatar_key'] == 'avatars/kid.png'
+            assert 'password_hash' not in result[0]
+            assert memory_db.requests == {'Query': 1}
+    
+    def test_update_user_syncs_child_snippet(self, app, memory_db):
+        """Test profile changes are copied onto the parent's relationship item."""
+        with app.app_context():
+            # Arrange
+            parent = create_user({'email': 'family@example.com', 'name': 'Parent',
+                                  'password_hash': 'hash', 'role': 'parent'})
+            child = create_user({'email': 'kid@example.com', 'name': 'Kid', 'password_hash': 'hash',
+                                 'role': 'child', 'parent_id': parent['user_id']})
+            
+            # Act
+            update_user(child['user_id'], {'name': 'Kiddo', 'points': 40})
+            
+            # Assert
+            relationship = get_item(f"USER#{parent['user_id']}", f"CHILD#{child['user_id']}")
+            assert relationship['Name'] == 'Kiddo'
+            assert relationship['Points'] == 40
+            assert get_children_by_parent_id(parent['user_id'])[0]['points'] == 40
+    
+    def test_delete_user(self, app, memory_db):
+        """Test deleting a user removes their items, relationships and email claim."""
         # We need app context for current_app.config
         with app.app_context():
-            # Arrange - Create a user specifically for deletion
-            user_data = {
-                'PK': 'USER#todelete',
-                'SK': 'PROFILE',
-                'EntityType': 'USER',
-                'GSI1PK': 'EMAIL#delete@example.com',
-                'GSI1SK': 'USER',
-                'UserId': 'todelete',
-                'Email': 'delete@example.com',
-                'Name': 'User To Delete',
-                'Role': 'parent',
-                'CreatedAt': int(time.time()),
-                'UpdatedAt': int(time.time())
-            }
-            mock_db['USER#todelete#PROFILE'] = user_data
+            # Arrange - A parent with a child, so both relationship directions exist
+            parent = create_user({'email': 'delete@example.com', 'name': 'User To Delete',
+                                  'password_hash': 'hash', 'role': 'parent'})
+            child = create_user({'email': 'kid@example.com', 'name': 'Kid', 'password_hash': 'hash',
+                                 'role': 'child', 'parent_id': parent['user_id']})
+            table = memory_db.Table(app.config['DYNAMODB_TABLE'])
             
             # Act
-            success = delete_user('todelete')
+            success = delete_user(child['user_id'])
             
             # Assert
             assert success is True
-            assert 'USER#todelete#PROFILE' not in mock_db
+            assert get_user_by_id(child['user_id']) is None
+            assert get_children_by_parent_id(parent['user_id']) == []
+            keys = {(item['PK'], item['SK']) for item in table.items()}
+            assert keys == {(f"USER#{parent['user_id']}", 'PROFILE'), ('EMAIL#delete@example.com', 'EMAIL')}
+            
+            # Act - Removing the parent frees their email
+            assert delete_user(parent['user_id']) is True
+            
+            # Assert
+            assert len(table) == 0
+            assert delete_user(parent['user_id']) is False
+    
+    def test_delete_user_with_large_collection(self, app, memory_db):
+        """Test collections too big for one transaction are deleted in batches."""
+        with app.app_context():
+            # Arrange
+            user = create_user({'email': 'big@example.com', 'name': 'Big', 'password_hash': 'hash', 'role': 'parent'})
+            with BulkWriter() as writer:
+                for index in range(150):
+                    writer.put({'PK': f"USER#{user['user_id']}", 'SK': f"ACTIVITY#{index:04d}"})
+            
+            # Act
+            success = delete_user(user['user_id'])
+            
+            # Assert
+            assert success is True
+            assert len(memory_db.Table(app.config['DYNAMODB_TABLE'])) == 0
+            assert memory_db.requests['BatchWriteItem'] >= 6
+
+
+class TestShardedListing:
+    def _create_users(self, count):
+        return [
+            create_user({'email': f'user{index}@example.com', 'name': f'User {index}',
+                         'password_hash': 'hash', 'role': 'parent'})
+            for index in range(count)
+        ]
+    
+    def test_create_item_sets_entity_shard(self, app, memory_db):
+        """Test sharded entity types get an EntityShard key and others don't."""
+        app.config['ENTITY_SHARD_COUNT'] = 4
+        with app.app_context():
+            # Act
+            user = create_item({'PK': 'USER#abc', 'SK': 'PROFILE', 'EntityType': 'USER'})
+            other = create_item({'PK': 'USER#abc', 'SK': 'CHILD#def', 'EntityType': 'RELATIONSHIP'})
+            
+            # Assert
+            assert user['EntityShard'] in {f'USER#{shard}' for shard in range(4)}
+            assert 'EntityShard' not in other
+    
+    def test_list_users_paginates_across_shards(self, app, memory_db):
+        """Test pages are merged in ID order with no user skipped or repeated."""
+        app.config['ENTITY_SHARD_COUNT'] = 4
+        with app.app_context():
+            # Arrange
+            users = self._create_users(11)
+            
+            # Act
+            listed, cursor, pages = [], None, 0
+            while True:
+                page, cursor = list_users(limit=3, cursor=cursor)
+                listed.extend(page)
+                pages += 1
+                if cursor is None:
+                    break
+            
+            # Assert
+            assert [user['user_id'] for user in listed] == sorted(user['user_id'] for user in users)
+            assert pages == 4
+            assert 'password_hash' not in listed[0]
+    
+    def test_sharded_cursor_is_bound_to_shard_count(self, app, memory_db):
+        """Test a cursor can't be reused after the shard count changes."""
+        app.config['ENTITY_SHARD_COUNT'] = 4
+        with app.app_context():
+            # Arrange
+            self._create_users(3)
+            _, cursor = query_sharded_page('USER', limit=1)
+            app.config['ENTITY_SHARD_COUNT'] = 8
+            
+            # Act / Assert
+            with pytest.raises(ValueError):
+                query_sharded_page('USER', limit=1, cursor=cursor)
+
+
+class TestProfileCache:
+    @pytest.fixture
+    def cached_app(self, app):
+        """Enable the profile cache for a test."""
+        app.config['PROFILE_CACHE_ENABLED'] = True
+        reset_profile_cache()
+        yield app
+        reset_profile_cache()
+    
+    def test_cache_disabled_in_testing_config(self, app):
+        """Test the testing config turns the cache off."""
+        with app.app_context():
+            # Assert
+            assert get_profile_cache_stats() == {'enabled': False}
+    
+    def test_get_user_by_id_is_cached(self, cached_app, test_user):
+        """Test repeated profile lookups only read DynamoDB once."""
+        with cached_app.app_context():
+            with patch('utils.database.get_item', wraps=get_item) as mock_get_item:
+                # Act
+                first = get_user_by_id(test_user['user_id'])
+                second = get_user_by_id(test_user['user_id'])
+            
+            # Assert
+            assert mock_get_item.call_count == 1
+            assert first == second
+            assert first is second  # immutable records are shared, not copied
+            assert get_profile_cache_stats()['hits'] == 1
+    
+    def test_update_user_invalidates_cache(self, cached_app, test_user):
+        """Test update_user drops the cached profile."""
+        with cached_app.app_context():
+            # Arrange
+            get_user_by_id(test_user['user_id'])
+            
+            # Act
+            update_user(test_user['user_id'], {'name': 'Renamed User'})
+            result = get_user_by_id(test_user['user_id'])
+            
+            # Assert
+            assert result['name'] == 'Renamed User'
+    
+    def test_missing_email_is_negatively_cached(self, cached_app, mock_db):
+        """Test unknown emails are cached until a user is created with them."""
+        with cached_app.app_context():
+            with patch('utils.database.iter_query', side_effect=lambda **kwargs: iter([])) as mock_query:
+                # Act
+                assert get_user_by_email('nobody@example.com') is None
+                assert get_user_by_email('nobody@example.com') is None
+                
+                # Assert
+                assert mock_query.call_count == 1
+                
+                # Creating the user must invalidate the cached miss
+                create_user({
+                    'email': 'nobody@example.com',
+                    'name': 'Somebody',
+                    'password_hash': 'hashed_password',
+                    'role': 'parent'
+                })
+                get_user_by_email('nobody@example.com')
+                assert mock_query.call_count == 2
+    
+    def test_failed_reads_are_not_cached_as_misses(self, cached_app, test_user):
+        """Test a throttled read raises instead of making the user look nonexistent."""
+        with cached_app.app_context():
+            # Arrange
+            throttled = ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException'}}, 'GetItem')
+            
+            with patch('utils.database.call_dynamodb', side_effect=throttled):
+                # Act / Assert
+                with pytest.raises(ClientError):
+                    get_user_by_id(test_user['user_id'])
+            
+            # The next lookup reads DynamoDB again and finds the user
+            assert get_user_by_id(test_user['user_id'])['email'] == test_user['email']
+
+class TestChildrenCache:
+    @pytest.fixture
+    def cached_app(self, app):
+        """Enable the children cache for a test."""
+        app.config['CHILDREN_CACHE_ENABLED'] = True
+        reset_children_cache()
+        yield app
+        reset_children_cache()
+    
+    def test_pages_are_cached(self, cached_app, memory_db):
+        """Test repeated page reads only query DynamoDB once."""
+        with cached_app.app_context():
+            # Arrange
+            put_child_relationships('parent-1', [{'user_id': 'kid-1', 'email': 'kid@example.com', 'name': 'Kid'}])
+            memory_db.requests.clear()
+            
+            # Act
+            first = get_children_page('parent-1', limit=10)
+            second = get_children_page('parent-1', limit=10)
+            
+            # Assert
+            assert first == second
+            assert memory_db.requests == {'Query': 1}
+            assert get_children_cache_stats()['hits'] == 1
+    
+    def test_child_changes_invalidate_pages(self, cached_app, memory_db):
+        """Test creating and updating a child drops the parent's cached pages."""
+        with cached_app.app_context():
+            # Arrange
+            parent = create_user({'email': 'family@example.com', 'name': 'Parent',
+                                  'password_hash': 'hash', 'role': 'parent'})
+            assert get_children_page(parent['user_id']) == ([], None)
+            
+            # Act
+            child = create_user({'email': 'kid@example.com', 'name': 'Kid', 'password_hash': 'hash',
+                                 'role': 'child', 'parent_id': parent['user_id']})
+            created, _ = get_children_page(parent['user_id'])
+            update_user(child['user_id'], {'name': 'Kiddo'})
+            renamed, _ = get_children_page(parent['user_id'])
+            delete_user(child['user_id'])
+            deleted, _ = get_children_page(parent['user_id'])
+            
+            # Assert
+            assert [kid['name'] for kid in created] == ['Kid']
+            assert [kid['name'] for kid in renamed] == ['Kiddo']
+            assert deleted == []
+    
+    def test_page_loaded_during_invalidation_is_not_cached(self, cached_app, memory_db):
+        """Test a page read before a concurrent family change is not served from the cache."""
+        with cached_app.app_context():
+            # Arrange
+            put_child_relationships('parent-1', [{'user_id': 'kid-1', 'email': 'kid@example.com', 'name': 'Kid'}])
+            def racing_query(*args, **kwargs):
+                # Another request adds a child after this page was read
+                page = query_page(*args, **kwargs)
+                put_child_relationships('parent-1', [{'user_id': 'kid-2', 'email': 'kid2@example.com',
+                                                      'name': 'Kid Two'}])
+                return page
+            
+            # Act
+            with patch('utils.database.query_page', side_effect=racing_query):
+                stale, _ = get_children_page('parent-1')
+            fresh, _ = get_children_page('parent-1')
+            
+            # Assert
+            assert [kid['user_id'] for kid in stale] == ['kid-1']
+            assert [kid['user_id'] for kid in fresh] == ['kid-1', 'kid-2']
+    
+    def test_children_imported(self, cached_app, memory_db):
+        """Test the import marker is recorded with the imported family."""
+        with cached_app.app_context():
+            # Arrange
+            assert not children_imported('parent-1')
+            
+            # Act
+            put_child_relationships('parent-1', [], imported=True)
+            
+            # Assert
+            assert children_imported('parent-1')
+            assert get_children_page('parent-1') == ([], None)
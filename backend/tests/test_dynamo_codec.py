@@ -0,0 +1,189 @@
+import pytest
+from decimal import Decimal
+from boto3.dynamodb.conditions import Key, Attr
+from botocore.stub import Stubber
+from unittest.mock import patch
+from utils.aws import BotoRegistry
+from utils.dynamo_codec import decode_item, decode_value, encode_item, encode_value, to_client_params
+from utils.database import batch_get_items, get_item, get_user_by_id, query_items
+
+@pytest.fixture
+def stubbed_client(app):
+    """Run reads through a stubbed low-level client."""
+    app.config['DYNAMODB_ACCESS_MODE'] = 'client'
+    client = BotoRegistry().client('dynamodb', 'eu-west-2')
+
+    with Stubber(client) as stubber, patch('utils.database.get_dynamodb_client', return_value=client):
+        yield stubber
+
+class TestDynamoCodec:
+    def test_decode_numbers(self):
+        """Test numbers decode straight to int or float, not Decimal."""
+        # Act
+        whole = decode_value({'N': '42'})
+        fraction = decode_value({'N': '1.5'})
+        exponent = decode_value({'N': '1E+3'})
+
+        # Assert
+        assert whole == 42 and isinstance(whole, int)
+        assert fraction == 1.5 and isinstance(fraction, float)
+        assert exponent == 1000.0
+
+    def test_decode_nested_item(self):
+        """Test maps, lists, sets, booleans and nulls are decoded."""
+        # Arrange
+        item = {
+            'PK': {'S': 'USER#1'},
+            'Settings': {'M': {'On': {'BOOL': True}, 'Limit': {'N': '3'}}},
+            'Tags': {'L': [{'S': 'a'}, {'NULL': True}]},
+            'Ids': {'SS': ['x', 'y']},
+            'Scores': {'NS': ['1', '2.5']}
+        }
+
+        # Act
+        decoded = decode_item(item)
+
+        # Assert
+        assert decoded == {
+            'PK': 'USER#1',
+            'Settings': {'On': True, 'Limit': 3},
+            'Tags': ['a', None],
+            'Ids': {'x', 'y'},
+            'Scores': {1, 2.5}
+        }
+
+    def test_decode_item_with_attribute_map(self):
+        """Test only mapped attributes are decoded, under their output names."""
+        # Arrange
+        item = {'UserId': {'S': '1'}, 'Email': {'S': 'a@example.com'}, 'GSI1PK': {'S': 'EMAIL#a'}}
+
+        # Act
+        decoded = decode_item(item, {'UserId': 'id', 'Email': 'email', 'Name': 'name'})
+
+        # Assert
+        assert decoded == {'id': '1', 'email': 'a@example.com'}
+
+    def test_encode_round_trip(self):
+        """Test encoding matches what decoding expects."""
+        # Arrange
+        item = {'S': 'text', 'N': 7, 'F': 0.1, 'D': Decimal('2.50'), 'B': False,
+                'Z': None, 'M': {'L': [1, 'two']}}
+
+        # Act
+        encoded = encode_item(item)
+
+        # Assert
+        assert encoded['N'] == {'N': '7'}
+        assert encoded['F'] == {'N': '0.1'}
+        assert encoded['B'] == {'BOOL': False}
+        assert decode_item(encoded) == dict(item, D=2.5)
+
+    def test_encode_rejects_unsupported_types(self):
+        """Test values DynamoDB can't store raise TypeError."""
+        with pytest.raises(TypeError):
+            encode_value(object())
+
+    def test_to_client_params_builds_conditions(self):
+        """Test condition objects become expression strings with encoded values."""
+        # Arrange
+        params = {
+            'IndexName': 'GSI1',
+            'KeyConditionExpression': Key('GSI1PK').eq('EMAIL#a@example.com'),
+            'FilterExpression': Attr('Role').eq('parent'),
+            'ExclusiveStartKey': {'PK': 'USER#1', 'SK': 'PROFILE'}
+        }
+
+        # Act
+        client_params = to_client_params(params, 'ActivityHub-test')
+
+        # Assert
+        assert client_params['TableName'] == 'ActivityHub-test'
+        assert isinstance(client_params['KeyConditionExpression'], str)
+        assert isinstance(client_params['FilterExpression'], str)
+        assert {'S': 'EMAIL#a@example.com'} in client_params['ExpressionAttributeValues'].values()
+        assert {'S': 'parent'} in client_params['ExpressionAttributeValues'].values()
+        assert client_params['ExclusiveStartKey'] == {'PK': {'S': 'USER#1'}, 'SK': {'S': 'PROFILE'}}
+
+
+class TestClientFastPath:
+    def test_get_item(self, app, stubbed_client):
+        """Test get_item uses the low-level client and decodes numbers natively."""
+        # Arrange
+        stubbed_client.add_response(
+            'get_item',
+            {'Item': {'PK': {'S': 'USER#1'}, 'SK': {'S': 'PROFILE'}, 'CreatedAt': {'N': '1700000000'}}},
+            {
+                'TableName': app.config['DYNAMODB_TABLE'],
+                'Key': {'PK': {'S': 'USER#1'}, 'SK': {'S': 'PROFILE'}},
+                'ReturnConsumedCapacity': 'INDEXES'
+            }
+        )
+
+        # Act
+        item = get_item('USER#1', 'PROFILE')
+
+        # Assert
+        assert item == {'PK': 'USER#1', 'SK': 'PROFILE', 'CreatedAt': 1700000000}
+        assert isinstance(item['CreatedAt'], int)
+        stubbed_client.assert_no_pending_responses()
+
+    def test_query_items_follows_pages(self, app, stubbed_client):
+        """Test query_items encodes the start key of each following page."""
+        # Arrange
+        table_name = app.config['DYNAMODB_TABLE']
+        first_key = {'PK': {'S': 'USER#1'}, 'SK': {'S': 'CHILD#a'}}
+        stubbed_client.add_response('query', {
+            'Items': [{'PK': {'S': 'USER#1'}, 'SK': {'S': 'CHILD#a'}}],
+            'LastEvaluatedKey': first_key
+        })
+        stubbed_client.add_response('query', {
+            'Items': [{'PK': {'S': 'USER#1'}, 'SK': {'S': 'CHILD#b'}}]
+        }, {
+            'TableName': table_name,
+            'KeyConditionExpression': '#n0 = :v0',
+            'ExpressionAttributeNames': {'#n0': 'PK'},
+            'ExpressionAttributeValues': {':v0': {'S': 'USER#1'}},
+            'ExclusiveStartKey': first_key,
+            'ReturnConsumedCapacity': 'INDEXES'
+        })
+
+        # Act
+        items = query_items(key_condition_expression=Key('PK').eq('USER#1'))
+
+        # Assert
+        assert [item['SK'] for item in items] == ['CHILD#a', 'CHILD#b']
+        stubbed_client.assert_no_pending_responses()
+
+    def test_batch_get_items(self, app, stubbed_client):
+        """Test batch gets encode keys and decode responses."""
+        # Arrange
+        table_name = app.config['DYNAMODB_TABLE']
+        stubbed_client.add_response('batch_get_item', {
+            'Responses': {table_name: [{'PK': {'S': 'USER#2'}, 'SK': {'S': 'PROFILE'}, 'Age': {'N': '9'}}]}
+        }, {
+            'RequestItems': {table_name: {'Keys': [{'PK': {'S': 'USER#2'}, 'SK': {'S': 'PROFILE'}}]}},
+            'ReturnConsumedCapacity': 'INDEXES'
+        })
+
+        # Act
+        items = batch_get_items([{'PK': 'USER#2', 'SK': 'PROFILE'}])
+
+        # Assert
+        assert items == [{'PK': 'USER#2', 'SK': 'PROFILE', 'Age': 9}]
+
+    def test_user_profile_decodes_only_mapped_attributes(self, app, stubbed_client):
+        """Test profiles on the fast path are decoded straight to UserRecord fields."""
+        # Arrange
+        stubbed_client.add_response('get_item', {'Item': {
+            'UserId': {'S': '1'}, 'Email': {'S': 'user@example.com'}, 'Name': {'S': 'User'},
+            'Role': {'S': 'parent'}, 'Points': {'N': '12'}, 'GSI1PK': {'S': 'EMAIL#user@example.com'}
+        }})
+
+        # Act
+        with patch('utils.dynamo_codec.decode_value', wraps=decode_value) as mock_decode:
+            user = get_user_by_id('1')
+
+        # Assert
+        assert user['email'] == 'user@example.com'
+        assert user['points'] == 12
+        assert mock_decode.call_count == 5  # GSI1PK is skipped, not decoded
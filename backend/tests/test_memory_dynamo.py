@@ -0,0 +1,351 @@
+import os
+import pytest
+import subprocess
+import sys
+from boto3.dynamodb.conditions import Key, Attr
+from botocore.exceptions import ClientError
+from utils.memory_dynamo import MemoryDynamoDB
+from utils.database import (
+    BulkWriter,
+    create_user,
+    delete_user,
+    get_children_by_parent_id,
+    get_user_by_email,
+    get_user_by_id,
+    iter_query,
+    query_page,
+    update_user
+)
+from utils.scan import parallel_scan
+
+@pytest.fixture
+def table():
+    return MemoryDynamoDB().Table('ActivityHub-test')
+
+def _relationship(parent_id, child_id):
+    return {
+        'PK': f"USER#{parent_id}",
+        'SK': f"CHILD#{child_id}",
+        'EntityType': 'RELATIONSHIP',
+        'GSI1PK': f"PARENT#{parent_id}",
+        'GSI1SK': f"CHILD#{child_id}",
+        'ChildId': child_id
+    }
+
+class TestMemoryTable:
+    def test_put_get_delete(self, table):
+        """Test basic item operations and projections."""
+        # Arrange
+        table.put_item(Item={'PK': 'USER#1', 'SK': 'PROFILE', 'Name': 'One', 'Role': 'parent'})
+
+        # Act
+        full = table.get_item(Key={'PK': 'USER#1', 'SK': 'PROFILE'})['Item']
+        projected = table.get_item(
+            Key={'PK': 'USER#1', 'SK': 'PROFILE'},
+            ProjectionExpression='#n',
+            ExpressionAttributeNames={'#n': 'Name'}
+        )['Item']
+        table.delete_item(Key={'PK': 'USER#1', 'SK': 'PROFILE'})
+
+        # Assert
+        assert full['Role'] == 'parent'
+        assert projected == {'Name': 'One'}
+        assert 'Item' not in table.get_item(Key={'PK': 'USER#1', 'SK': 'PROFILE'})
+
+    def test_stored_items_are_copies(self, table):
+        """Test callers can't mutate stored items through their references."""
+        # Arrange
+        item = {'PK': 'A', 'SK': 'B', 'Tags': ['x']}
+        table.put_item(Item=item)
+
+        # Act
+        item['Tags'].append('y')
+        read = table.get_item(Key={'PK': 'A', 'SK': 'B'})['Item']
+        read['Tags'].append('z')
+
+        # Assert
+        assert table.get_item(Key={'PK': 'A', 'SK': 'B'})['Item']['Tags'] == ['x']
+
+    def test_conditional_put(self, table):
+        """Test condition expressions are enforced."""
+        # Arrange
+        table.put_item(Item={'PK': 'EMAIL#a', 'SK': 'EMAIL'})
+
+        # Act
+        with pytest.raises(ClientError) as excinfo:
+            table.put_item(Item={'PK': 'EMAIL#a', 'SK': 'EMAIL'}, ConditionExpression='attribute_not_exists(PK)')
+
+        # Assert
+        assert excinfo.value.response['Error']['Code'] == 'ConditionalCheckFailedException'
+
+    def test_update_expression(self, table):
+        """Test SET, arithmetic, if_not_exists, REMOVE and ADD."""
+        # Arrange
+        table.put_item(Item={'PK': 'A', 'SK': 'B', 'Count': 1, 'Old': 'x'})
+
+        # Act
+        response = table.update_item(
+            Key={'PK': 'A', 'SK': 'B'},
+            UpdateExpression='SET #c = #c + :one, #f = if_not_exists(#f, :now) REMOVE Old ADD Tags :tags',
+            ExpressionAttributeNames={'#c': 'Count', '#f': 'First'},
+            ExpressionAttributeValues={':one': 1, ':now': 100, ':tags': {'a'}},
+            ReturnValues='ALL_NEW'
+        )
+
+        # Assert
+        assert response['Attributes'] == {'PK': 'A', 'SK': 'B', 'Count': 2, 'First': 100, 'Tags': {'a'}}
+
+    def test_query_ranges_and_order(self, table):
+        """Test sort key conditions select the right range in both directions."""
+        # Arrange
+        for child in ['a', 'b', 'c', 'd']:
+            table.put_item(Item=_relationship('1', child))
+        table.put_item(Item={'PK': 'USER#1', 'SK': 'PROFILE'})
+
+        # Act
+        children = table.query(KeyConditionExpression=Key('PK').eq('USER#1') & Key('SK').begins_with('CHILD#'))
+        between = table.query(
+            KeyConditionExpression='PK = :pk AND SK BETWEEN :low AND :high',
+            ExpressionAttributeValues={':pk': 'USER#1', ':low': 'CHILD#b', ':high': 'CHILD#c'},
+            ScanIndexForward=False
+        )
+
+        # Assert
+        assert [item['SK'] for item in children['Items']] == ['CHILD#a', 'CHILD#b', 'CHILD#c', 'CHILD#d']
+        assert [item['SK'] for item in between['Items']] == ['CHILD#c', 'CHILD#b']
+
+    def test_gsi_is_maintained(self, table):
+        """Test index entries follow puts, key changes and deletes."""
+        # Arrange
+        table.put_item(Item={'PK': 'USER#1', 'SK': 'PROFILE', 'GSI1PK': 'EMAIL#old', 'GSI1SK': 'USER'})
+
+        # Act
+        table.update_item(
+            Key={'PK': 'USER#1', 'SK': 'PROFILE'},
+            UpdateExpression='SET GSI1PK = :email',
+            ExpressionAttributeValues={':email': 'EMAIL#new'}
+        )
+        old = table.query(IndexName='GSI1', KeyConditionExpression=Key('GSI1PK').eq('EMAIL#old'))
+        new = table.query(IndexName='GSI1', KeyConditionExpression=Key('GSI1PK').eq('EMAIL#new'))
+        table.delete_item(Key={'PK': 'USER#1', 'SK': 'PROFILE'})
+        deleted = table.query(IndexName='GSI1', KeyConditionExpression=Key('GSI1PK').eq('EMAIL#new'))
+
+        # Assert
+        assert old['Items'] == []
+        assert [item['PK'] for item in new['Items']] == ['USER#1']
+        assert deleted['Items'] == []
+
+    def test_query_pagination_and_filter(self, table):
+        """Test Limit counts evaluated items and pages resume from the last key."""
+        # Arrange
+        for index in range(5):
+            item = _relationship('1', f'{index}')
+            item['Active'] = index % 2 == 0
+            table.put_item(Item=item)
+
+        # Act
+        pages = []
+        start_key = None
+        while True:
+            params = {
+                'KeyConditionExpression': Key('PK').eq('USER#1'),
+                'FilterExpression': Attr('Active').eq(True),
+                'Limit': 2
+            }
+            if start_key:
+                params['ExclusiveStartKey'] = start_key
+            response = table.query(**params)
+            pages.append(response)
+            start_key = response.get('LastEvaluatedKey')
+            if not start_key:
+                break
+
+        # Assert
+        assert [page['ScannedCount'] for page in pages] == [2, 2, 1]
+        assert [item['ChildId'] for page in pages for item in page['Items']] == ['0', '2', '4']
+
+    def test_scan_segments_cover_table_once(self, table):
+        """Test parallel scan segments partition the table."""
+        # Arrange
+        for index in range(50):
+            table.put_item(Item={'PK': f'USER#{index}', 'SK': 'PROFILE'})
+
+        # Act
+        seen = []
+        for segment in range(4):
+            start_key = None
+            while True:
+                params = {'Segment': segment, 'TotalSegments': 4, 'Limit': 7}
+                if start_key:
+                    params['ExclusiveStartKey'] = start_key
+                response = table.scan(**params)
+                seen += [item['PK'] for item in response['Items']]
+                start_key = response.get('LastEvaluatedKey')
+                if not start_key:
+                    break
+
+        # Assert
+        assert sorted(seen) == sorted(f'USER#{index}' for index in range(50))
+
+    def test_consumed_capacity(self, table):
+        """Test capacity is reported per table and index."""
+        # Act
+        response = table.put_item(
+            Item={'PK': 'USER#1', 'SK': 'PROFILE', 'GSI1PK': 'EMAIL#a', 'GSI1SK': 'USER'},
+            ReturnConsumedCapacity='INDEXES'
+        )
+
+        # Assert
+        consumed = response['ConsumedCapacity']
+        assert consumed['Table'] == {'CapacityUnits': 1.0}
+        assert consumed['GlobalSecondaryIndexes'] == {'GSI1': {'CapacityUnits': 1.0}}
+        assert consumed['CapacityUnits'] == 2.0
+
+    def test_invalid_key_condition(self, table):
+        """Test queries must constrain the partition key."""
+        with pytest.raises(ClientError) as excinfo:
+            table.query(KeyConditionExpression=Key('SK').eq('PROFILE'))
+
+        assert excinfo.value.response['Error']['Code'] == 'ValidationException'
+
+    def test_injected_throttling(self):
+        """Test throttling is raised for single requests and leaves batch entries unprocessed."""
+        # Arrange
+        engine = MemoryDynamoDB(throttle_rate=1.0, seed=1)
+
+        # Act
+        with pytest.raises(ClientError) as excinfo:
+            engine.Table('t').get_item(Key={'PK': 'a', 'SK': 'b'})
+        response = engine.batch_write_item(RequestItems={'t': [{'PutRequest': {'Item': {'PK': 'a', 'SK': 'b'}}}]})
+
+        # Assert
+        assert excinfo.value.response['Error']['Code'] == 'ProvisionedThroughputExceededException'
+        assert len(response['UnprocessedItems']['t']) == 1
+        assert engine.throttled['BatchWriteItem'] == 1
+
+
+class TestMemoryEngineWithDatabase:
+    def test_user_lifecycle(self, app, memory_db):
+        """Test the user functions against realistic key conditions and GSIs."""
+        with app.app_context():
+            # Arrange
+            parent = create_user({'email': 'Parent@Example.com', 'name': 'Parent',
+                                  'password_hash': 'hash', 'role': 'parent'})
+            child = create_user({'email': 'kid@example.com', 'name': 'Kid', 'password_hash': 'hash',
+                                 'role': 'child', 'parent_id': parent['user_id']})
+
+            # Act
+            by_email = get_user_by_email('parent@example.com')
+            children = get_children_by_parent_id(parent['user_id'])
+            updated = update_user(child['user_id'], {'name': 'Kiddo'})
+
+            # Assert
+            assert by_email['user_id'] == parent['user_id']
+            assert by_email['password_hash'] == 'hash'
+            assert [record['user_id'] for record in children] == [child['user_id']]
+            assert updated['name'] == 'Kiddo'
+            assert memory_db.requests['TransactWriteItems'] == 2
+
+    def test_duplicate_email_is_rejected(self, app, memory_db):
+        """Test the email claim item keeps emails unique."""
+        with app.app_context():
+            # Arrange
+            user_data = {'email': 'dup@example.com', 'name': 'Dup', 'password_hash': 'hash', 'role': 'parent'}
+            create_user(user_data)
+
+            # Act / Assert
+            with pytest.raises(ValueError):
+                create_user(user_data)
+            assert len(memory_db.Table(app.config['DYNAMODB_TABLE'])) == 2
+
+    def test_delete_and_lookup(self, app, memory_db):
+        """Test deleted profiles are no longer found."""
+        with app.app_context():
+            # Arrange
+            user = create_user({'email': 'gone@example.com', 'name': 'Gone', 'password_hash': 'h', 'role': 'parent'})
+
+            # Act
+            deleted = delete_user(user['user_id'])
+
+            # Assert
+            assert deleted is True
+            assert get_user_by_id(user['user_id']) is None
+
+    def test_query_page_cursor_round_trip(self, app, memory_db):
+        """Test cursors resume on the in-memory engine."""
+        with app.app_context():
+            # Arrange
+            table = memory_db.Table(app.config['DYNAMODB_TABLE'])
+            for index in range(5):
+                table.put_item(Item=_relationship('p', f'{index}'))
+            condition = Key('PK').eq('USER#p') & Key('SK').begins_with('CHILD#')
+
+            # Act
+            first, cursor = query_page(key_condition_expression=condition, limit=3)
+            second, last_cursor = query_page(key_condition_expression=condition, limit=3, cursor=cursor)
+
+            # Assert
+            assert [item['ChildId'] for item in first + second] == ['0', '1', '2', '3', '4']
+            assert last_cursor is None
+            assert len(list(iter_query(key_condition_expression=condition, page_size=2))) == 5
+
+    def test_bulk_writer_retries_throttled_items(self, app, memory_db):
+        """Test BulkWriter writes everything despite unprocessed items."""
+        with app.app_context():
+            # Arrange
+            memory_db.throttle_rate = 0.3
+
+            # Act
+            with BulkWriter() as writer:
+                for index in range(60):
+                    writer.put({'PK': f'ITEM#{index}', 'SK': 'DATA'})
+
+            # Assert
+            memory_db.throttle_rate = 0
+            assert len(memory_db.Table(app.config['DYNAMODB_TABLE'])) == 60
+            assert writer.stats['retries'] > 0
+
+    def test_client_fast_path(self, app, memory_db):
+        """Test the low-level client mode reads what the resource mode wrote."""
+        with app.app_context():
+            # Arrange
+            user = create_user({'email': 'fast@example.com', 'name': 'Fast', 'password_hash': 'h', 'role': 'parent'})
+            app.config['DYNAMODB_ACCESS_MODE'] = 'client'
+
+            # Act
+            by_id = get_user_by_id(user['user_id'])
+            by_email = get_user_by_email('fast@example.com')
+
+            # Assert
+            assert by_id['email'] == 'fast@example.com'
+            assert isinstance(by_id['created_at'], int)
+            assert by_email['user_id'] == user['user_id']
+
+    def test_parallel_scan(self, app, memory_db):
+        """Test the parallel scan reads every user once."""
+        with app.app_context():
+            # Arrange
+            for index in range(20):
+                create_user({'email': f'u{index}@example.com', 'name': 'U', 'password_hash': 'h', 'role': 'parent'})
+            seen = []
+
+            # Act
+            stats = parallel_scan(lambda segment, items: seen.extend(items), total_segments=3,
+                                  entity_type='USER', page_size=4)
+
+            # Assert
+            assert len(seen) == 20
+            assert stats['scanned'] == 40  # profiles plus email claims
+    
+    def test_engine_is_not_imported_by_default(self):
+        """Test the app only imports the in-memory engine when it is configured."""
+        # Act - A fresh interpreter, since this test run has already imported it
+        result = subprocess.run(
+            [sys.executable, '-c',
+             "import sys, app; app.create_app('production'); print('utils.memory_dynamo' in sys.modules)"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True, text=True, check=True
+        )
+        
+        # Assert
+        assert result.stdout.strip() == 'False'
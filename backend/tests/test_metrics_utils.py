@@ -0,0 +1,123 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from flask import g
+from utils.metrics import (
+    call_dynamodb,
+    get_dynamodb_metrics,
+    get_request_dynamodb_usage,
+    reset_dynamodb_metrics
+)
+from utils.database import get_item, query_items
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    reset_dynamodb_metrics()
+    yield
+    reset_dynamodb_metrics()
+
+class TestDynamoDBMetrics:
+    def test_capacity_is_requested_and_recorded(self, app):
+        """Test calls ask for consumed capacity and attribute it per table and index."""
+        with app.test_request_context('/api/users'):
+            # Arrange
+            method = MagicMock(return_value={
+                'Items': [{'PK': 'USER#1'}],
+                'ScannedCount': 1,
+                'ConsumedCapacity': {
+                    'TableName': 'ActivityHub-test',
+                    'CapacityUnits': 1.5,
+                    'Table': {'CapacityUnits': 0.0},
+                    'GlobalSecondaryIndexes': {'GSI1': {'CapacityUnits': 1.5}}
+                }
+            })
+
+            # Act
+            call_dynamodb('Query', method, 'ActivityHub-test/GSI1', IndexName='GSI1')
+
+            # Assert
+            _, kwargs = method.call_args
+            assert kwargs['ReturnConsumedCapacity'] == 'INDEXES'
+
+            metrics = {entry['target']: entry for entry in get_dynamodb_metrics()}
+            index_metrics = metrics['ActivityHub-test/GSI1']
+            assert index_metrics['calls'] == 1
+            assert index_metrics['rcu'] == 1.5
+            assert index_metrics['items_returned'] == 1
+            assert sum(index_metrics['latency_buckets'].values()) == 1
+            assert metrics['ActivityHub-test']['rcu'] == 0.0
+
+    def test_request_totals_on_g(self, app):
+        """Test per-request totals accumulate on flask.g."""
+        with app.test_request_context('/api/users'):
+            # Arrange
+            read = MagicMock(return_value={'Item': {}, 'ConsumedCapacity': {'TableName': 't', 'CapacityUnits': 0.5}})
+            write = MagicMock(return_value={'ConsumedCapacity': {'TableName': 't', 'CapacityUnits': 2.0}})
+
+            # Act
+            call_dynamodb('GetItem', read, 't')
+            call_dynamodb('PutItem', write, 't')
+            usage = get_request_dynamodb_usage()
+
+            # Assert
+            assert usage['calls'] == 2
+            assert usage['rcu'] == 0.5
+            assert usage['wcu'] == 2.0
+            assert g.dynamodb_usage['time_ms'] >= 0
+
+    def test_errors_are_counted(self, app):
+        """Test failed calls are recorded and re-raised."""
+        # Arrange
+        method = MagicMock(side_effect=RuntimeError('boom'))
+
+        # Act
+        with pytest.raises(RuntimeError):
+            call_dynamodb('GetItem', method, 't')
+
+        # Assert
+        entry = get_dynamodb_metrics()[0]
+        assert entry['errors'] == 1
+
+    def test_slow_and_wasteful_reads_are_logged(self, app):
+        """Test a warning is logged for slow calls and reads that discard most items."""
+        # Arrange
+        app.config['DYNAMODB_SLOW_CALL_MS'] = 0
+        method = MagicMock(return_value={'Items': [], 'ScannedCount': 500})
+
+        # Act
+        with patch.object(app.logger, 'warning') as warning:
+            call_dynamodb('Query', method, 't')
+
+        # Assert
+        message = warning.call_args[0][0]
+        assert 'Slow DynamoDB Query on t' in message
+        assert 'read 500 items to return 0' in message
+
+    def test_disabled(self, app):
+        """Test metrics can be switched off."""
+        # Arrange
+        app.config['DYNAMODB_METRICS_ENABLED'] = False
+        method = MagicMock(return_value={})
+
+        # Act
+        call_dynamodb('GetItem', method, 't', Key={'PK': 'a'})
+
+        # Assert
+        method.assert_called_once_with(Key={'PK': 'a'})
+        assert get_dynamodb_metrics() == []
+
+    def test_database_helpers_are_instrumented(self, app, mock_db):
+        """Test the generic helpers record their calls per operation and index."""
+        # Arrange
+        mock_db['USER#1#PROFILE'] = {'PK': 'USER#1', 'SK': 'PROFILE', 'EntityType': 'USER'}
+
+        # Act
+        with app.test_request_context('/api/users/1'):
+            get_item('USER#1', 'PROFILE')
+            query_items(index_name='GSI1', key_condition_expression='GSI1PK = :pk',
+                        expression_attribute_values={':pk': 'EMAIL#a@example.com'})
+
+        # Assert
+        table_name = app.config['DYNAMODB_TABLE']
+        calls = {(entry['target'], entry['operation']) for entry in get_dynamodb_metrics()}
+        assert (table_name, 'GetItem') in calls
+        assert (f"{table_name}/GSI1", 'Query') in calls
@@ -0,0 +1,284 @@
+import pytest
+import json
+import os
+from datetime import datetime
+from unittest.mock import patch, MagicMock
+from utils.cognito import import_cognito_children
+from utils.database import batch_get_items, children_imported, create_user, delete_item, get_item, list_users, put_child_relationships, put_cognito_username
+from utils.scan import (
+    TokenBucket, ScanCheckpoint, parallel_scan, export_table, read_export, sweep_orphans,
+    backfill_email_claims, backfill_entity_shards
+)
+
+def make_scan_table(segments, page_size=2, fail_on=None):
+    """Build a mock table whose scan pages through per-segment item lists."""
+    table = MagicMock()
+    
+    def scan(**kwargs):
+        items = segments[kwargs['Segment']]
+        start = int(kwargs.get('ExclusiveStartKey', {}).get('offset', 0))
+        if fail_on is not None and (kwargs['Segment'], start) == fail_on:
+            raise RuntimeError('scan failed')
+        page = items[start:start + page_size]
+        response = {
+            'Items': page,
+            'ScannedCount': len(page),
+            'ConsumedCapacity': {'CapacityUnits': 0.5}
+        }
+        if start + page_size < len(items):
+            response['LastEvaluatedKey'] = {'offset': start + page_size}
+        return response
+    
+    table.scan.side_effect = scan
+    return table
+
+SEGMENTS = {
+    segment: [{'PK': f'USER#{segment}-{i}', 'SK': 'PROFILE', 'EntityType': 'USER'} for i in range(5)]
+    for segment in range(3)
+}
+
+class TestScanUtils:
+    def test_parallel_scan_reads_every_segment(self, app):
+        """Test every segment is scanned to the end."""
+        with app.app_context():
+            # Arrange
+            table = make_scan_table(SEGMENTS)
+            seen = []
+            
+            with patch('utils.scan.get_table', return_value=table):
+                # Act
+                stats = parallel_scan(lambda segment, items: seen.extend(items),
+                                      total_segments=3, entity_type='USER')
+            
+            # Assert
+            assert sorted(item['PK'] for item in seen) == sorted(
+                item['PK'] for items in SEGMENTS.values() for item in items
+            )
+            assert stats['returned'] == 15
+            assert stats['pages'] == 9
+            assert stats['consumed_rcu'] == 4.5
+            _, kwargs = table.scan.call_args
+            assert kwargs['TotalSegments'] == 3
+            assert 'FilterExpression' in kwargs
+    
+    def test_export_and_resume(self, app, tmp_path):
+        """Test an interrupted export resumes from its checkpoint."""
+        with app.app_context():
+            # Arrange
+            output = str(tmp_path / 'export.ndjson')
+            checkpoint = str(tmp_path / 'export.ckpt')
+            
+            # Act - the first run fails part way through segment 1
+            with patch('utils.scan.get_table', return_value=make_scan_table(SEGMENTS, fail_on=(1, 4))):
+                with pytest.raises(RuntimeError):
+                    export_table(output, total_segments=3, checkpoint_path=checkpoint)
+            
+            assert os.path.exists(checkpoint)
+            with open(checkpoint) as f:
+                state = json.load(f)
+            assert state['segments']['1']['done'] is False
+            
+            with patch('utils.scan.get_table', return_value=make_scan_table(SEGMENTS)):
+                stats = export_table(output, total_segments=3, checkpoint_path=checkpoint)
+            
+            # Assert - nothing is lost and the finished checkpoint is removed
+            exported = {item['PK'] for item in read_export(output)}
+            assert exported == {item['PK'] for items in SEGMENTS.values() for item in items}
+            assert stats['returned'] < 15  # finished segments were not rescanned
+            assert not os.path.exists(checkpoint)
+    
+    def test_export_gzip(self, app, tmp_path):
+        """Test exporting to compressed NDJSON."""
+        with app.app_context():
+            # Arrange
+            output = str(tmp_path / 'export.ndjson.gz')
+            
+            with patch('utils.scan.get_table', return_value=make_scan_table(SEGMENTS)):
+                # Act
+                export_table(output, output_format='ndjson.gz', total_segments=3)
+            
+            # Assert
+            assert len(list(read_export(output))) == 15
+    
+    def test_checkpoint_segment_mismatch(self, tmp_path):
+        """Test a checkpoint can't be resumed with a different segment count."""
+        # Arrange
+        path = str(tmp_path / 'scan.ckpt')
+        ScanCheckpoint(path, 4).record(0, {'PK': 'USER#1', 'SK': 'PROFILE'})
+        
+        # Act / Assert
+        with pytest.raises(ValueError):
+            ScanCheckpoint(path, 8)
+    
+    def test_token_bucket_waits_for_refill(self):
+        """Test the bucket blocks once the budget is overspent."""
+        # Arrange
+        bucket = TokenBucket(rate=10)
+        bucket.consume(15)  # 0.5 seconds in debt
+        
+        with patch('utils.scan.time.sleep') as mock_sleep, \
+             patch('utils.scan.time.monotonic', side_effect=[100.0, 100.6]):
+            bucket._updated_at = 100.0
+            # Act
+            bucket.wait()
+        
+        # Assert
+        mock_sleep.assert_called_once()
+        assert mock_sleep.call_args[0][0] == pytest.approx(0.5)
+    
+    def test_export_command(self, app, tmp_path):
+        """Test the export-table CLI command."""
+        # Arrange
+        output = str(tmp_path / 'cli.ndjson')
+        runner = app.test_cli_runner()
+        
+        with patch('utils.scan.get_table', return_value=make_scan_table(SEGMENTS)):
+            # Act
+            result = runner.invoke(args=['export-table', '--output', output, '--segments', '3'])
+        
+        # Assert
+        assert result.exit_code == 0, result.output
+        assert json.loads(result.output)['returned'] == 15
+    
+    def test_sweep_orphans(self, app, memory_db):
+        """Test items of users without a profile are found and deleted."""
+        with app.app_context():
+            # Arrange - Remove profiles directly, as an old delete_user did
+            parent = create_user({'email': 'parent@example.com', 'name': 'Parent',
+                                  'password_hash': 'hash', 'role': 'parent'})
+            child = create_user({'email': 'kid@example.com', 'name': 'Kid', 'password_hash': 'hash',
+                                 'role': 'child', 'parent_id': parent['user_id']})
+            other = create_user({'email': 'other@example.com', 'name': 'Other',
+                                 'password_hash': 'hash', 'role': 'parent'})
+            delete_item(f"USER#{child['user_id']}", 'PROFILE')
+            delete_item(f"USER#{other['user_id']}", 'PROFILE')
+            table = memory_db.Table(app.config['DYNAMODB_TABLE'])
+            
+            # Act
+            preview = sweep_orphans(total_segments=3, dry_run=True)
+            stats = sweep_orphans(total_segments=3)
+            
+            # Assert
+            assert preview['orphans'] == 3
+            assert preview['deleted'] == 0
+            assert stats['orphans'] == 3
+            assert stats['deleted'] == 3
+            keys = {(item['PK'], item['SK']) for item in table.items()}
+            assert keys == {(f"USER#{parent['user_id']}", 'PROFILE'), ('EMAIL#parent@example.com', 'EMAIL')}
+    
+    def test_sweep_orphans_keeps_cognito_families(self, app, memory_db):
+        """Test relationships of users that only exist in Cognito are not orphans."""
+        with app.app_context():
+            # Arrange
+            put_cognito_username('parent-sub', 'parent@example.com')
+            put_cognito_username('kid-sub', 'kid@example.com')
+            put_child_relationships('parent-sub', [{'user_id': 'kid-sub', 'email': 'kid@example.com', 'name': 'Kid'}],
+                                    imported=True)
+            
+            # Act
+            stats = sweep_orphans(total_segments=2)
+            
+            # Assert
+            assert stats['orphans'] == 0
+            assert len(memory_db.Table(app.config['DYNAMODB_TABLE'])) == 4
+    
+    def test_sweep_orphans_keeps_imported_families(self, app, memory_db):
+        """Test a family imported for a parent with no profile or username record survives a sweep."""
+        with app.app_context():
+            # Arrange
+            client = MagicMock()
+            client.list_users.return_value = {'Users': [{
+                'Username': 'kid@example.com',
+                'UserCreateDate': datetime(2023, 1, 1),
+                'Attributes': [{'Name': 'sub', 'Value': 'kid-1'}, {'Name': 'email', 'Value': 'kid@example.com'},
+                               {'Name': 'name', 'Value': 'Kid'}]
+            }]}
+            import_cognito_children('old-parent', client)
+            
+            # Act
+            stats = sweep_orphans(total_segments=2)
+            
+            # Assert
+            assert stats['orphans'] == 0
+            assert children_imported('old-parent')
+            assert get_item('USER#old-parent', 'CHILD#kid-1') is not None
+    
+    def test_sweep_orphans_checks_each_page(self, app, memory_db):
+        """Test candidates are re-checked page by page, keeping users whose profile is on a later page."""
+        with app.app_context():
+            # Arrange
+            parent = create_user({'email': 'parent@example.com', 'name': 'Parent',
+                                  'password_hash': 'hash', 'role': 'parent'})
+            create_user({'email': 'kid@example.com', 'name': 'Kid', 'password_hash': 'hash',
+                         'role': 'child', 'parent_id': parent['user_id']})
+            other = create_user({'email': 'other@example.com', 'name': 'Other',
+                                 'password_hash': 'hash', 'role': 'parent'})
+            delete_item(f"USER#{other['user_id']}", 'PROFILE')
+            
+            # Act
+            with patch('utils.scan.batch_get_items', wraps=batch_get_items) as mock_batch_get:
+                stats = sweep_orphans(total_segments=1, page_size=1)
+            
+            # Assert
+            assert stats['orphans'] == 1
+            assert stats['deleted'] == 1
+            assert get_item('EMAIL#other@example.com', 'EMAIL') is None
+            assert get_item(f"USER#{parent['user_id']}", 'PROFILE') is not None
+            assert mock_batch_get.call_count > 1
+    
+    def test_sweep_orphans_command(self, app, memory_db):
+        """Test the sweep-orphans CLI command reports its statistics."""
+        # Arrange
+        with app.app_context():
+            create_user({'email': 'kept@example.com', 'name': 'Kept', 'password_hash': 'hash', 'role': 'parent'})
+        runner = app.test_cli_runner()
+        
+        # Act
+        result = runner.invoke(args=['sweep-orphans', '--segments', '2', '--dry-run'])
+        
+        # Assert
+        assert result.exit_code == 0, result.output
+        stats = json.loads(result.output)
+        assert stats['users'] == 1
+        assert stats['orphans'] == 0
+    
+    def test_backfill_email_claims(self, app, memory_db):
+        """Test users created before email claims get one, so their email can't be reused."""
+        with app.app_context():
+            # Arrange - Two profiles without claims sharing an email, as before claims
+            table = memory_db.Table(app.config['DYNAMODB_TABLE'])
+            for user_id in ('legacy-1', 'legacy-2'):
+                table.put_item(Item={'PK': f'USER#{user_id}', 'SK': 'PROFILE', 'EntityType': 'USER',
+                                     'UserId': user_id, 'Email': 'Legacy@example.com',
+                                     'Name': 'Legacy', 'Role': 'parent'})
+            create_user({'email': 'new@example.com', 'name': 'New', 'password_hash': 'hash', 'role': 'parent'})
+            
+            # Act
+            stats = backfill_email_claims(total_segments=2)
+            
+            # Assert - The new user already held their claim
+            assert stats['claimed'] == 2
+            assert stats['duplicates'] == 1
+            holder = get_item('EMAIL#legacy@example.com', 'EMAIL')['UserId']
+            assert {holder, *stats['duplicate_users']} == {'legacy-1', 'legacy-2'}
+            with pytest.raises(ValueError):
+                create_user({'email': 'legacy@example.com', 'name': 'Copy', 'password_hash': 'hash', 'role': 'parent'})
+    
+    def test_backfill_entity_shards(self, app, memory_db):
+        """Test items written before sharding are moved onto their shard."""
+        app.config['ENTITY_SHARD_COUNT'] = 4
+        with app.app_context():
+            # Arrange - A profile written without EntityShard, as before sharding
+            table = memory_db.Table(app.config['DYNAMODB_TABLE'])
+            table.put_item(Item={'PK': 'USER#legacy', 'SK': 'PROFILE', 'EntityType': 'USER',
+                                 'UserId': 'legacy', 'Email': 'legacy@example.com',
+                                 'Name': 'Legacy', 'Role': 'parent'})
+            create_user({'email': 'new@example.com', 'name': 'New', 'password_hash': 'hash', 'role': 'parent'})
+            
+            # Act
+            stats = backfill_entity_shards(total_segments=2)
+            
+            # Assert
+            assert stats['updated'] == 1
+            assert get_item('USER#legacy', 'PROFILE')['EntityShard'].startswith('USER#')
+            assert 'legacy' in [user['user_id'] for user in list_users(limit=10)[0]]
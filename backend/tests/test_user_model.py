@@ -1,5 +1,9 @@
+import json
+import pickle
 import pytest
 from models.user import User
+from models.records import UserRecord
+from utils.database import create_user
 
 class TestUserModel:
     def test_create_user(self, app, mock_db):
@@ -143,6 +147,20 @@ class TestUserModel:
             assert user is None
             assert token is None
     
+    def test_authenticate_mirrored_user_without_password(self, app, memory_db):
+        """Test a user mirrored from Cognito, who has no password hash, fails to authenticate."""
+        with app.app_context():
+            # Arrange
+            create_user({'user_id': 'cognito-sub', 'email': 'mirrored@example.com',
+                         'name': 'Mirrored', 'role': 'parent'})
+            
+            # Act
+            user, token = User.authenticate('mirrored@example.com', 'anypassword')
+            
+            # Assert
+            assert user is None
+            assert token is None
+    
     def test_get_by_id(self, app, test_user):
         """Test User.get_by_id method."""
         # We need app context for current_app.config
@@ -175,4 +193,75 @@ class TestUserModel:
                 assert user.get('email') == test_user['email']
                 assert user.get('name') == test_user['name']
                 assert user.get('role') == test_user['role']
-                assert 'password_hash' not in user  # Should remove sensitive data
\ No newline at end of file
+                assert 'password_hash' not in user  # Should remove sensitive data
+
+class TestUserRecord:
+    def _item(self):
+        return {
+            'PK': 'USER#1',
+            'SK': 'PROFILE',
+            'UserId': '1',
+            'Email': 'record@example.com',
+            'Name': 'Record User',
+            'Role': 'parent',
+            'CreatedAt': 1700000000,
+            'PasswordHash': 'hash',
+            'GSI1PK': 'EMAIL#record@example.com'
+        }
+    
+    def test_from_item(self):
+        """Test records map item attributes and drop the password hash by default."""
+        # Act
+        record = UserRecord.from_item(self._item())
+        
+        # Assert
+        assert record == {
+            'user_id': '1',
+            'email': 'record@example.com',
+            'name': 'Record User',
+            'role': 'parent',
+            'created_at': 1700000000
+        }
+        assert 'password_hash' not in record
+        assert 'updated_at' not in record
+        assert record.get('updated_at') is None
+    
+    def test_password_is_opt_in(self):
+        """Test the hash is only kept on request and never serialized."""
+        # Arrange
+        record = UserRecord.from_item(self._item(), include_password=True)
+        
+        # Act
+        public = record.without_password()
+        
+        # Assert
+        assert record['password_hash'] == 'hash'
+        assert 'password_hash' not in public
+        assert 'password_hash' not in record.to_dict()
+        assert 'hash' not in repr(record)
+        assert public.without_password() is public
+    
+    def test_record_is_immutable_and_compact(self):
+        """Test records can't be modified and have no per-instance dict."""
+        # Arrange
+        record = UserRecord.from_item(self._item())
+        
+        # Act / Assert
+        with pytest.raises(AttributeError):
+            record.name = 'Changed'
+        with pytest.raises(TypeError):
+            record['name'] = 'Changed'
+        assert not hasattr(record, '__dict__')
+    
+    def test_serialization(self, app):
+        """Test records serialize to the API shape and survive pickling."""
+        # Arrange
+        record = UserRecord.from_item(self._item())
+        
+        # Act
+        payload = json.loads(app.json.dumps({'user': record}))
+        restored = pickle.loads(pickle.dumps(record))
+        
+        # Assert
+        assert payload['user'] == record.to_dict()
+        assert restored == record
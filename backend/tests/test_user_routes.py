@@ -4,10 +4,13 @@ from unittest.mock import patch, MagicMock
 from flask import g
 import time
 from datetime import datetime
+from models.records import UserRecord
+from botocore.exceptions import ClientError
+from utils.database import create_user, get_user_by_id, put_child_relationships, put_cognito_username
 
 class TestUserRoutes:
-    def test_get_user_by_id_success(self, client):
-        """Test getting a user by ID."""
+    def test_get_user_by_id_success(self, client, memory_db):
+        """Test getting a user by ID records their username on first lookup."""
         # Mock the verify_cognito_token function to set g.user_id and g.user_role
         with patch('utils.cognito_auth.verify_cognito_token') as mock_verify:
             mock_verify.return_value = {
@@ -16,7 +19,7 @@ class TestUserRoutes:
             }
             
             # Mock the boto3 client
-            with patch('boto3.client') as mock_boto_client:
+            with patch('routes.users.get_cognito_client') as mock_boto_client:
                 mock_client = MagicMock()
                 mock_boto_client.return_value = mock_client
                 
@@ -28,14 +31,24 @@ class TestUserRoutes:
                             'UserCreateDate': datetime(2023, 1, 1),
                             'Attributes': [
                                 {'Name': 'sub', 'Value': 'test-user-id'},
-                                {'Name': 'email', 'Value': 'test@example.com'},
-                                {'Name': 'name', 'Value': 'Test User'},
-                                {'Name': 'custom:role', 'Value': 'parent'}
+                                {'Name': 'email', 'Value': 'test@example.com'}
                             ]
                         }
                     ]
                 }
                 
+                # Mock the admin_get_user response
+                mock_client.admin_get_user.return_value = {
+                    'Username': 'test@example.com',
+                    'UserCreateDate': datetime(2023, 1, 1),
+                    'UserAttributes': [
+                        {'Name': 'sub', 'Value': 'test-user-id'},
+                        {'Name': 'email', 'Value': 'test@example.com'},
+                        {'Name': 'name', 'Value': 'Test User'},
+                        {'Name': 'custom:role', 'Value': 'parent'}
+                    ]
+                }
+                
                 # Act
                 response = client.get(
                     '/api/users/test-user-id',
@@ -55,6 +68,160 @@ class TestUserRoutes:
                 mock_client.list_users.assert_called_once()
                 args, kwargs = mock_client.list_users.call_args
                 assert kwargs['Filter'] == 'sub = "test-user-id"'
+                _, kwargs = mock_client.admin_get_user.call_args
+                assert kwargs['Username'] == 'test@example.com'
+                
+                # The username is recorded for the next lookup
+                stored = memory_db.Table('ActivityHub-test').get_item(Key={'PK': 'COGNITO#test-user-id', 'SK': 'USERNAME'}).get('Item')
+                assert stored['Username'] == 'test@example.com'
+    
+    def test_get_user_by_id_uses_recorded_username(self, client, memory_db):
+        """Test a recorded username is used without calling ListUsers."""
+        with patch('utils.cognito_auth.verify_cognito_token') as mock_verify:
+            mock_verify.return_value = {
+                'sub': 'test-user-id',
+                'custom:role': 'parent'
+            }
+            
+            with patch('routes.users.get_cognito_client') as mock_boto_client:
+                # Arrange
+                with client.application.app_context():
+                    put_cognito_username('test-user-id', 'test@example.com')
+                
+                mock_client = MagicMock()
+                mock_boto_client.return_value = mock_client
+                mock_client.admin_get_user.return_value = {
+                    'Username': 'test@example.com',
+                    'UserCreateDate': datetime(2023, 1, 1),
+                    'UserAttributes': [
+                        {'Name': 'email', 'Value': 'test@example.com'},
+                        {'Name': 'name', 'Value': 'Test User'},
+                        {'Name': 'custom:role', 'Value': 'parent'}
+                    ]
+                }
+                
+                # Act
+                response = client.get(
+                    '/api/users/test-user-id',
+                    headers={'Authorization': 'Bearer mock-token'}
+                )
+                
+                # Assert
+                assert response.status_code == 200
+                assert json.loads(response.data)['user']['name'] == 'Test User'
+                mock_client.list_users.assert_not_called()
+                mock_client.admin_get_user.assert_called_once()
+    
+    def test_get_user_with_stale_username(self, client, memory_db):
+        """Test a username recorded for a deleted user is dropped."""
+        with patch('utils.cognito_auth.verify_cognito_token') as mock_verify:
+            mock_verify.return_value = {
+                'sub': 'test-user-id',
+                'custom:role': 'parent'
+            }
+            
+            with patch('routes.users.get_cognito_client') as mock_boto_client:
+                # Arrange
+                with client.application.app_context():
+                    put_cognito_username('test-user-id', 'test@example.com')
+                
+                mock_client = MagicMock()
+                mock_boto_client.return_value = mock_client
+                mock_client.admin_get_user.side_effect = ClientError(
+                    {'Error': {'Code': 'UserNotFoundException', 'Message': 'User does not exist.'}},
+                    'AdminGetUser'
+                )
+                
+                # Act
+                response = client.get(
+                    '/api/users/test-user-id',
+                    headers={'Authorization': 'Bearer mock-token'}
+                )
+                
+                # Assert
+                assert response.status_code == 404
+                assert memory_db.Table('ActivityHub-test').get_item(Key={'PK': 'COGNITO#test-user-id', 'SK': 'USERNAME'}).get('Item') is None
+    
+    def test_get_me_from_claims(self, client):
+        """Test the caller's profile is built from their token without calling Cognito."""
+        with patch('utils.cognito_auth.verify_cognito_token') as mock_verify:
+            mock_verify.return_value = {
+                'sub': 'child-user-id',
+                'token_use': 'id',
+                'email': 'child@example.com',
+                'name': 'Child User',
+                'custom:role': 'child',
+                'custom:parentId': 'parent-user-id'
+            }
+            
+            with patch('routes.users.get_cognito_client') as mock_boto_client, \
+                 patch('routes.users.get_user_by_id') as mock_get_user:
+                # Act
+                response = client.get(
+                    '/api/users/me',
+                    headers={'Authorization': 'Bearer mock-token'}
+                )
+                
+                # Assert
+                assert response.status_code == 200
+                assert json.loads(response.data)['user'] == {
+                    'user_id': 'child-user-id',
+                    'email': 'child@example.com',
+                    'name': 'Child User',
+                    'role': 'child',
+                    'parent_id': 'parent-user-id'
+                }
+                mock_boto_client.assert_not_called()
+                mock_get_user.assert_not_called()
+    
+    def test_get_me_enriched_from_profile(self, client):
+        """Test ?profile=true fills in stored fields the token doesn't carry."""
+        with patch('utils.cognito_auth.verify_cognito_token') as mock_verify:
+            mock_verify.return_value = {
+                'sub': 'test-user-id',
+                'token_use': 'access',
+                'custom:role': 'parent'
+            }
+            profile = UserRecord('test-user-id', 'test@example.com', 'Test User', 'parent', 1672531200,
+                                 avatar_key='avatars/test.png', points=5)
+            
+            with patch('routes.users.get_user_by_id', return_value=profile) as mock_get_user:
+                # Act
+                response = client.get(
+                    '/api/users/me?profile=true',
+                    headers={'Authorization': 'Bearer mock-token'}
+                )
+                
+                # Assert
+                assert response.status_code == 200
+                user = json.loads(response.data)['user']
+                assert user['email'] == 'test@example.com'
+                assert user['role'] == 'parent'
+                assert user['avatar_key'] == 'avatars/test.png'
+                assert user['points'] == 5
+                mock_get_user.assert_called_once_with('test-user-id')
+    
+    def test_get_me_reports_enforced_role(self, client):
+        """Test /me reports the role from cognito:groups that authorization uses."""
+        with patch('utils.cognito_auth.verify_cognito_token') as mock_verify:
+            mock_verify.return_value = {
+                'sub': 'test-user-id',
+                'token_use': 'id',
+                'email': 'admin@example.com',
+                'name': 'Admin User',
+                'cognito:groups': ['admin'],
+                'custom:role': 'parent'
+            }
+            
+            # Act
+            response = client.get(
+                '/api/users/me',
+                headers={'Authorization': 'Bearer mock-token'}
+            )
+            
+            # Assert
+            assert response.status_code == 200
+            assert json.loads(response.data)['user']['role'] == 'admin'
     
     def test_get_user_unauthorized(self, client):
         """Test getting a user without auth token."""
@@ -90,7 +257,7 @@ class TestUserRoutes:
             assert 'error' in data
             assert "You do not have permission to access this user's profile" in data['message']
     
-    def test_get_user_not_found(self, client):
+    def test_get_user_not_found(self, client, memory_db):
         """Test getting a non-existent user."""
         # Mock the verify_cognito_token function
         with patch('utils.cognito_auth.verify_cognito_token') as mock_verify:
@@ -100,7 +267,7 @@ class TestUserRoutes:
             }
             
             # Mock the boto3 client
-            with patch('boto3.client') as mock_boto_client:
+            with patch('routes.users.get_cognito_client') as mock_boto_client:
                 mock_client = MagicMock()
                 mock_boto_client.return_value = mock_client
                 
@@ -121,7 +288,7 @@ class TestUserRoutes:
                 assert 'error' in data
                 assert data['message'] == 'User not found'
     
-    def test_parent_can_access_child_profile(self, client):
+    def test_parent_can_access_child_profile(self, client, memory_db):
         """Test parent can access their child's profile."""
         # This would require additional mocking to properly test the parent-child relationship
         # For now, we'll assume the relationship check passes
@@ -134,7 +301,7 @@ class TestUserRoutes:
             }
             
             # Mock the boto3 client
-            with patch('boto3.client') as mock_boto_client:
+            with patch('routes.users.get_cognito_client') as mock_boto_client:
                 mock_client = MagicMock()
                 mock_boto_client.return_value = mock_client
                 
@@ -167,7 +334,7 @@ class TestUserRoutes:
                 args, kwargs = mock_client.list_users.call_args
                 assert kwargs['Filter'] == 'sub = "child-user-id"'
     
-    def test_update_user_profile_success(self, client):
+    def test_update_user_profile_success(self, client, memory_db):
         """Test updating a user's profile."""
         # Mock the verify_cognito_token function
         with patch('utils.cognito_auth.verify_cognito_token') as mock_verify:
@@ -182,7 +349,7 @@ class TestUserRoutes:
             }
             
             # Mock the boto3 client
-            with patch('boto3.client') as mock_boto_client:
+            with patch('routes.users.get_cognito_client') as mock_boto_client:
                 mock_client = MagicMock()
                 mock_boto_client.return_value = mock_client
                 
@@ -234,8 +401,131 @@ class TestUserRoutes:
                 assert any(attr['Name'] == 'name' and attr['Value'] == 'Updated Name' 
                            for attr in kwargs['UserAttributes'])
     
-    def test_get_children_success(self, client):
-        """Test getting children for a parent."""
+    def test_update_mirrored_profile_single_cognito_call(self, client, memory_db):
+        """Test updating a mirrored profile costs one Cognito call and reports the stored state."""
+        with patch('utils.cognito_auth.verify_cognito_token') as mock_verify:
+            mock_verify.return_value = {
+                'sub': 'test-user-id',
+                'token_use': 'access',
+                'custom:role': 'parent'
+            }
+            
+            with patch('routes.users.get_cognito_client') as mock_boto_client:
+                # Arrange
+                with client.application.app_context():
+                    put_cognito_username('test-user-id', 'test@example.com')
+                    create_user({'user_id': 'test-user-id', 'email': 'test@example.com',
+                                 'name': 'Test User', 'role': 'parent'})
+                mock_client = MagicMock()
+                mock_boto_client.return_value = mock_client
+                
+                # Act
+                response = client.put(
+                    '/api/users/test-user-id',
+                    headers={'Authorization': 'Bearer mock-token'},
+                    data=json.dumps({'name': 'Updated Name', 'role': 'admin'}),
+                    content_type='application/json'
+                )
+                
+                # Assert
+                assert response.status_code == 200
+                user = json.loads(response.data)['user']
+                assert user['name'] == 'Updated Name'
+                assert user['email'] == 'test@example.com'
+                assert user['role'] == 'parent'  # only admins can change roles
+                _, kwargs = mock_client.admin_update_user_attributes.call_args
+                assert kwargs['UserAttributes'] == [{'Name': 'name', 'Value': 'Updated Name'}]
+                mock_client.list_users.assert_not_called()
+                mock_client.admin_get_user.assert_not_called()
+                with client.application.app_context():
+                    assert get_user_by_id('test-user-id', consistent_read=True)['name'] == 'Updated Name'
+    
+    def test_update_mirrored_child_profile_keeps_parent(self, client, memory_db):
+        """Test updating a mirrored child reports their parent and refreshes the family listing."""
+        with patch('utils.cognito_auth.verify_cognito_token') as mock_verify:
+            mock_verify.return_value = {
+                'sub': 'parent-user-id',
+                'token_use': 'access',
+                'custom:role': 'parent'
+            }
+            
+            with patch('routes.users.get_cognito_client') as mock_boto_client:
+                # Arrange
+                with client.application.app_context():
+                    put_cognito_username('child-user-id', 'child@example.com')
+                    create_user({'user_id': 'child-user-id', 'email': 'child@example.com', 'name': 'Child User',
+                                 'role': 'child', 'parent_id': 'parent-user-id'})
+                mock_client = MagicMock()
+                mock_boto_client.return_value = mock_client
+                
+                # Act
+                response = client.put(
+                    '/api/users/child-user-id',
+                    headers={'Authorization': 'Bearer mock-token'},
+                    data=json.dumps({'name': 'Renamed Child'}),
+                    content_type='application/json'
+                )
+                
+                # Assert
+                assert response.status_code == 200
+                user = json.loads(response.data)['user']
+                assert user['name'] == 'Renamed Child'
+                assert user['role'] == 'child'
+                assert user['parent_id'] == 'parent-user-id'
+                mock_client.admin_get_user.assert_not_called()
+                relationship = memory_db.Table('ActivityHub-test').get_item(
+                    Key={'PK': 'USER#parent-user-id', 'SK': 'CHILD#child-user-id'}
+                ).get('Item')
+                assert relationship['Name'] == 'Renamed Child'
+    
+    def test_update_child_profile_refreshes_relationship(self, client, memory_db):
+        """Test a child's new name is copied onto the parent's relationship item."""
+        with patch('utils.cognito_auth.verify_cognito_token') as mock_verify:
+            mock_verify.return_value = {
+                'sub': 'parent-user-id',
+                'custom:role': 'parent'
+            }
+            
+            with patch('routes.users.get_cognito_client') as mock_boto_client:
+                # Arrange
+                with client.application.app_context():
+                    put_cognito_username('child-user-id', 'child@example.com')
+                    put_child_relationships('parent-user-id', [
+                        {'user_id': 'child-user-id', 'email': 'child@example.com', 'name': 'Child User'}
+                    ])
+                mock_client = MagicMock()
+                mock_boto_client.return_value = mock_client
+                mock_client.admin_get_user.return_value = {
+                    'Username': 'child@example.com',
+                    'UserAttributes': [
+                        {'Name': 'sub', 'Value': 'child-user-id'},
+                        {'Name': 'email', 'Value': 'child@example.com'},
+                        {'Name': 'name', 'Value': 'Child User'},
+                        {'Name': 'custom:role', 'Value': 'child'},
+                        {'Name': 'custom:parentId', 'Value': 'parent-user-id'}
+                    ]
+                }
+                
+                # Act
+                response = client.put(
+                    '/api/users/child-user-id',
+                    headers={'Authorization': 'Bearer mock-token'},
+                    data=json.dumps({'name': 'Renamed Child'}),
+                    content_type='application/json'
+                )
+                
+                # Assert
+                assert response.status_code == 200
+                user = json.loads(response.data)['user']
+                assert user['name'] == 'Renamed Child'
+                assert user['parent_id'] == 'parent-user-id'
+                relationship = memory_db.Table('ActivityHub-test').get_item(
+                    Key={'PK': 'USER#parent-user-id', 'SK': 'CHILD#child-user-id'}
+                ).get('Item')
+                assert relationship['Name'] == 'Renamed Child'
+    
+    def test_get_children_success(self, client, memory_db):
+        """Test a family that only exists in Cognito is imported on first request."""
         # Mock the verify_cognito_token function
         with patch('utils.cognito_auth.verify_cognito_token') as mock_verify:
             mock_verify.return_value = {
@@ -243,8 +533,8 @@ class TestUserRoutes:
                 'custom:role': 'parent'
             }
             
-            # Mock the boto3 client
-            with patch('boto3.client') as mock_boto_client:
+            # Mock the boto3 client; no family is recorded in DynamoDB yet
+            with patch('routes.users.get_cognito_client') as mock_boto_client:
                 mock_client = MagicMock()
                 mock_boto_client.return_value = mock_client
                 
@@ -299,6 +589,163 @@ class TestUserRoutes:
                 mock_client.list_users.assert_called_once()
                 args, kwargs = mock_client.list_users.call_args
                 assert kwargs['Filter'] == 'custom:parentId = "parent-user-id"'
+                
+                # The family is served from DynamoDB from now on
+                response = client.get(
+                    '/api/users/children',
+                    headers={'Authorization': 'Bearer mock-token'}
+                )
+                assert len(json.loads(response.data)['children']) == 2
+                mock_client.list_users.assert_called_once()
+    
+    def test_get_children_paginated(self, client, memory_db):
+        """Test children are returned a page at a time with a cursor."""
+        with patch('utils.cognito_auth.verify_cognito_token') as mock_verify:
+            mock_verify.return_value = {
+                'sub': 'parent-user-id',
+                'custom:role': 'parent'
+            }
+            
+            # Arrange
+            with client.application.app_context():
+                put_child_relationships('parent-user-id', [
+                    {'user_id': f'child{index}-user-id', 'email': f'child{index}@example.com',
+                     'name': f'Child {index}', 'role': 'child'}
+                    for index in range(3)
+                ], imported=True)
+            
+            with patch('routes.users.get_cognito_client') as mock_boto_client:
+                # Act
+                first = json.loads(client.get(
+                    '/api/users/children?limit=2',
+                    headers={'Authorization': 'Bearer mock-token'}
+                ).data)
+                second = json.loads(client.get(
+                    f"/api/users/children?limit=2&cursor={first['next_cursor']}",
+                    headers={'Authorization': 'Bearer mock-token'}
+                ).data)
+                
+                # Assert
+                assert [child['user_id'] for child in first['children']] == ['child0-user-id', 'child1-user-id']
+                assert [child['user_id'] for child in second['children']] == ['child2-user-id']
+                assert second['next_cursor'] is None
+                mock_boto_client.return_value.list_users.assert_not_called()
+    
+    def test_get_children_rejects_bad_paging(self, client):
+        """Test invalid limits and cursors are bad requests."""
+        with patch('utils.cognito_auth.verify_cognito_token') as mock_verify:
+            mock_verify.return_value = {
+                'sub': 'parent-user-id',
+                'custom:role': 'parent'
+            }
+            
+            with patch('routes.users.get_children_page', side_effect=ValueError("Invalid cursor")):
+                # Act
+                bad_limit = client.get('/api/users/children?limit=0',
+                                       headers={'Authorization': 'Bearer mock-token'})
+                bad_cursor = client.get('/api/users/children?cursor=tampered',
+                                        headers={'Authorization': 'Bearer mock-token'})
+                
+                # Assert
+                assert bad_limit.status_code == 400
+                assert bad_cursor.status_code == 400
+    
+    def test_get_children_from_family_collection(self, client):
+        """Test children are served from DynamoDB without calling Cognito."""
+        # Mock the verify_cognito_token function
+        with patch('utils.cognito_auth.verify_cognito_token') as mock_verify:
+            mock_verify.return_value = {
+                'sub': 'parent-user-id',
+                'custom:role': 'parent'
+            }
+            family = [UserRecord('child1-user-id', 'child1@example.com', 'Child User 1', 'child',
+                                 1672531200, avatar_key='avatars/child1.png', points=12)]
+            
+            with patch('routes.users.get_cognito_client') as mock_boto_client, \
+                 patch('routes.users.children_imported', return_value=True), \
+                 patch('routes.users.get_children_page', return_value=(family, None)) as mock_family:
+                # Act
+                response = client.get(
+                    '/api/users/children',
+                    headers={'Authorization': 'Bearer mock-token'}
+                )
+                
+                # Assert
+                assert response.status_code == 200
+                data = json.loads(response.data)
+                assert data['children'] == [{
+                    'user_id': 'child1-user-id',
+                    'email': 'child1@example.com',
+                    'name': 'Child User 1',
+                    'role': 'child',
+                    'created_at': 1672531200,
+                    'avatar_key': 'avatars/child1.png',
+                    'points': 12
+                }]
+                assert data['next_cursor'] is None
+                mock_family.assert_called_once_with('parent-user-id', limit=50, cursor=None, consistent_read=False)
+                mock_boto_client.return_value.list_users.assert_not_called()
+    
+    def test_list_users_as_admin(self, client):
+        """Test admins can page through all users."""
+        # Mock the verify_cognito_token function
+        with patch('utils.cognito_auth.verify_cognito_token') as mock_verify:
+            mock_verify.return_value = {
+                'sub': 'admin-user-id',
+                'custom:role': 'admin'
+            }
+            users = [UserRecord('user-1', 'one@example.com', 'User One', 'parent', 1672531200)]
+            
+            with patch('routes.users.list_users', return_value=(users, 'next-page')) as mock_list:
+                # Act
+                response = client.get(
+                    '/api/users?limit=1&cursor=this-page',
+                    headers={'Authorization': 'Bearer mock-token'}
+                )
+                
+                # Assert
+                assert response.status_code == 200
+                data = json.loads(response.data)
+                assert data['users'][0]['user_id'] == 'user-1'
+                assert data['next_cursor'] == 'next-page'
+                mock_list.assert_called_once_with(limit=1, cursor='this-page')
+    
+    def test_list_users_rejects_bad_cursor(self, client):
+        """Test an invalid cursor is a bad request."""
+        # Mock the verify_cognito_token function
+        with patch('utils.cognito_auth.verify_cognito_token') as mock_verify:
+            mock_verify.return_value = {
+                'sub': 'admin-user-id',
+                'custom:role': 'admin'
+            }
+            
+            with patch('routes.users.list_users', side_effect=ValueError("Invalid cursor")):
+                # Act
+                response = client.get(
+                    '/api/users?cursor=tampered',
+                    headers={'Authorization': 'Bearer mock-token'}
+                )
+                
+                # Assert
+                assert response.status_code == 400
+    
+    def test_list_users_forbidden_for_parent_role(self, client):
+        """Test only admins can list all users."""
+        # Mock the verify_cognito_token function
+        with patch('utils.cognito_auth.verify_cognito_token') as mock_verify:
+            mock_verify.return_value = {
+                'sub': 'parent-user-id',
+                'custom:role': 'parent'
+            }
+            
+            # Act
+            response = client.get(
+                '/api/users',
+                headers={'Authorization': 'Bearer mock-token'}
+            )
+            
+            # Assert
+            assert response.status_code == 403
     
     def test_get_children_forbidden_for_child_role(self, client):
         """Test child user cannot access the children endpoint."""
@@ -0,0 +1,261 @@
+import os
+import threading
+import time
+import boto3
+from botocore.config import Config
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Process-wide registry of boto3 clients and resources.
+#
+# Creating a boto3 client or resource is expensive (session setup, endpoint
+# resolution, loading service models) and every new client owns a fresh
+# urllib3 connection pool, so building one per call also costs a TLS handshake
+# per call. Entries created here live for the lifetime of the process, which on
+# Lambda means they are reused by every warm invocation of the container.
+
+
+class BotoRegistry:
+    """
+    Thread-safe, fork-aware cache of boto3 clients, resources and tables.
+
+    Entries are keyed by (kind, service, region, endpoint URL[, table]). Each
+    key gets its own boto3 Session because the default session is not safe to
+    share between threads while clients are being created.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._pid = os.getpid()
+
+    def _check_pid(self):
+        # Connection pools must never be shared across a fork: the child would
+        # end up writing to sockets owned by the parent.
+        if self._pid != os.getpid():
+            self.reset_after_fork()
+
+    def _get_or_create(self, key: Tuple, factory: Callable[[], Any]) -> Any:
+        self._check_pid()
+
+        entry = self._entries.get(key)
+        if entry is None:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = {
+                        'value': factory(),
+                        'created_at': time.time(),
+                        'hits': 0
+                    }
+                    self._entries[key] = entry
+
+        entry['hits'] += 1
+        return entry['value']
+
+    def client(self, service: str, region: str, endpoint_url: Optional[str] = None,
+               config: Optional[Config] = None, on_create: Optional[Callable[[Any], Any]] = None) -> Any:
+        """
+        Get a pooled low-level client
+
+        Args:
+            service (str): AWS service name, e.g. 'dynamodb'
+            region (str): AWS region
+            endpoint_url (str, optional): Custom endpoint URL. Defaults to None.
+            config (botocore.config.Config or callable, optional): Client
+                configuration, or a function returning one, used when the client
+                is first created. Defaults to None.
+            on_create (callable, optional): Called with the new client once, when
+                it is created, e.g. to register event handlers. Defaults to None.
+
+        Returns:
+            botocore.client.BaseClient: The shared client
+        """
+        def create():
+            client = boto3.session.Session().client(
+                service, region_name=region, endpoint_url=endpoint_url,
+                config=_resolve_config(config)
+            )
+            if on_create:
+                on_create(client)
+            return client
+
+        key = ('client', service, region, endpoint_url)
+        return self._get_or_create(key, create)
+
+    def resource(self, service: str, region: str, endpoint_url: Optional[str] = None,
+                 config: Optional[Config] = None) -> Any:
+        """
+        Get a pooled service resource
+
+        Args:
+            service (str): AWS service name, e.g. 'dynamodb'
+            region (str): AWS region
+            endpoint_url (str, optional): Custom endpoint URL. Defaults to None.
+            config (botocore.config.Config or callable, optional): Client
+                configuration, or a function returning one, used when the
+                resource is first created. Defaults to None.
+
+        Returns:
+            boto3.resources.base.ServiceResource: The shared resource
+        """
+        key = ('resource', service, region, endpoint_url)
+        return self._get_or_create(
+            key,
+            lambda: boto3.session.Session().resource(
+                service, region_name=region, endpoint_url=endpoint_url,
+                config=_resolve_config(config)
+            )
+        )
+
+    def table(self, table_name: str, region: str, endpoint_url: Optional[str] = None,
+              config: Optional[Config] = None) -> Any:
+        """
+        Get a pooled DynamoDB Table resource
+
+        Args:
+            table_name (str): Name of the table
+            region (str): AWS region
+            endpoint_url (str, optional): Custom endpoint URL. Defaults to None.
+            config (botocore.config.Config or callable, optional): Client
+                configuration, or a function returning one, used when the
+                underlying resource is first created. Defaults to None.
+
+        Returns:
+            boto3.resources.factory.dynamodb.Table: The shared table resource
+        """
+        key = ('table', 'dynamodb', region, endpoint_url, table_name)
+        return self._get_or_create(
+            key,
+            lambda: self.resource('dynamodb', region, endpoint_url, config).Table(table_name)
+        )
+
+    def reset(self):
+        """
+        Drop every cached client and resource
+        """
+        with self._lock:
+            self._entries = {}
+
+    def reset_after_fork(self):
+        """
+        Reset the registry in a freshly forked child process.
+
+        The lock is replaced rather than acquired because another thread of the
+        parent may have been holding it at the moment of the fork.
+        """
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._pid = os.getpid()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report registry entries and connection pool utilisation
+
+        Returns:
+            dict: Per-entry creation time, hand-out count and pool statistics
+        """
+        self._check_pid()
+
+        entries = []
+        for key, entry in list(self._entries.items()):
+            kind, service, region, endpoint_url = key[:4]
+            stats = {
+                'kind': kind,
+                'service': service,
+                'region': region,
+                'endpoint_url': endpoint_url,
+                'age_seconds': round(time.time() - entry['created_at'], 3),
+                'hits': entry['hits']
+            }
+            if kind == 'table':
+                stats['table'] = key[4]
+            else:
+                client = entry['value'] if kind == 'client' else entry['value'].meta.client
+                stats['pools'] = _connection_pool_stats(client)
+            entries.append(stats)
+
+        return {
+            'pid': self._pid,
+            'entries': entries
+        }
+
+
+def _resolve_config(config: Any) -> Optional[Config]:
+    # Configs can be passed lazily so callers don't rebuild one on every lookup
+    return config() if callable(config) else config
+
+
+def _connection_pool_stats(client: Any) -> list:
+    """
+    Read urllib3 pool statistics from a botocore client.
+
+    botocore does not expose its connection pools publicly, so this walks the
+    private attributes defensively and returns an empty list if they move.
+    """
+    try:
+        http_session = client._endpoint.http_session
+        pool_manager = http_session._manager
+        pools = [pool_manager.pools[pool_key] for pool_key in pool_manager.pools.keys()]
+    except (AttributeError, KeyError):
+        return []
+
+    results = []
+    for pool in pools:
+        queue = pool.pool
+        if queue is None:
+            continue
+
+        # The pool queue is pre-filled with None placeholders up to maxsize, so
+        # whatever is missing from it is currently checked out.
+        max_size = queue.maxsize
+        in_use = max_size - queue.qsize()
+        idle = sum(1 for conn in list(queue.queue) if conn is not None)
+
+        results.append({
+            'host': pool.host,
+            'max_size': max_size,
+            'in_use': in_use,
+            'idle': idle,
+            'connections_created': pool.num_connections,
+            'requests': pool.num_requests,
+            'utilisation': round(in_use / max_size, 3) if max_size else 0.0
+        })
+
+    return results
+
+
+def build_client_config(max_pool_connections: int = 10, connect_timeout: float = 60,
+                        read_timeout: float = 60, tcp_keepalive: bool = False,
+                        max_attempts: int = 3) -> Config:
+    """
+    Build a botocore client configuration
+
+    Args:
+        max_pool_connections (int, optional): Connection pool size. Defaults to 10.
+        connect_timeout (float, optional): Connect timeout in seconds. Defaults to 60.
+        read_timeout (float, optional): Read timeout in seconds. Defaults to 60.
+        tcp_keepalive (bool, optional): Enable TCP keep-alive. Defaults to False.
+        max_attempts (int, optional): Total attempts including retries. Defaults to 3.
+
+    Returns:
+        botocore.config.Config: Client configuration
+    """
+    return Config(
+        max_pool_connections=max_pool_connections,
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+        tcp_keepalive=tcp_keepalive,
+        retries={
+            'max_attempts': max_attempts,
+            'mode': 'standard'
+        }
+    )
+
+
+# The shared registry for this process
+registry = BotoRegistry()
+
+# Gunicorn (and any other pre-fork server) forks workers after the app module
+# has been imported; make sure no pooled connection crosses that boundary.
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry.reset_after_fork)
@@ -0,0 +1,91 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from flask import current_app
+from typing import Any, Callable, Optional
+
+# Background tasks.
+#
+# Work that doesn't change a response, such as refreshing secondary copies of
+# data after a write, runs on a small per-process thread pool instead of on
+# the request path. Tasks run inside an app context and their errors are
+# logged rather than raised. A Lambda container is frozen once the response
+# is returned, so a task still running then finishes on the next invocation;
+# only hand off work that is safe to delay.
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def get_background_executor() -> ThreadPoolExecutor:
+    """
+    Get the process-wide background thread pool, creating it on first use
+
+    Returns:
+        ThreadPoolExecutor: The pool
+    """
+    global _executor, _executor_pid, _executor_lock
+
+    # Worker threads don't survive a fork, so a forked child needs its own pool
+    if _executor_pid is not None and _executor_pid != os.getpid():
+        _executor_lock = threading.Lock()
+        _executor = None
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=current_app.config.get('BACKGROUND_WORKERS', 4),
+                    thread_name_prefix='background'
+                )
+                _executor_pid = os.getpid()
+
+    return _executor
+
+
+def run_in_background(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Optional[Future]:
+    """
+    Run a function off the request path
+
+    With BACKGROUND_TASKS_ENABLED off the function runs inline, which keeps
+    tests deterministic.
+
+    Args:
+        fn (callable): Function to run
+        *args: Positional arguments for the function
+        **kwargs: Keyword arguments for the function
+
+    Returns:
+        Future or None: The task's future, or None if it ran inline
+    """
+    app = current_app._get_current_object()
+
+    def task():
+        with app.app_context():
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                app.logger.exception(f"Background task {getattr(fn, '__name__', fn)} failed")
+
+    if not app.config.get('BACKGROUND_TASKS_ENABLED', True):
+        task()
+        return None
+
+    return get_background_executor().submit(task)
+
+
+def reset_background_executor(wait: bool = True):
+    """
+    Shut the background pool down so it is rebuilt from the current configuration
+
+    Args:
+        wait (bool, optional): Wait for queued tasks to finish. Defaults to True.
+    """
+    global _executor
+
+    with _executor_lock:
+        executor, _executor = _executor, None
+
+    if executor is not None:
+        executor.shutdown(wait=wait)
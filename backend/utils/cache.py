@@ -0,0 +1,261 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# Marker stored for negative (not found) cache entries
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded LRU cache with per-entry expiry.
+
+    Misses can be cached too (negative caching) with their own, usually
+    shorter, TTL so repeated lookups for something that doesn't exist don't
+    all go to the backing store.
+
+    Loads run outside the lock. A key that is invalidated or set while it is
+    being loaded gets a new version, and the load's (possibly stale) result
+    is then returned to its caller but not cached.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300, negative_ttl: float = 30):
+        """
+        Args:
+            max_size (int, optional): Maximum number of entries. Defaults to 1024.
+            ttl (float, optional): Default lifetime of an entry in seconds. Defaults to 300.
+            negative_ttl (float, optional): Lifetime of a cached miss in seconds.
+                Defaults to 30.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        self._entries = OrderedDict()
+        # key -> [version, loads in flight], only for keys being loaded
+        self._loading = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            'hits': 0,
+            'negative_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0
+        }
+
+    def _lookup(self, key: Hashable) -> Any:
+        # Must be called with the lock held
+        entry = self._entries.get(key)
+        if entry is None:
+            self._counters['misses'] += 1
+            return None
+
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self._counters['expirations'] += 1
+            self._counters['misses'] += 1
+            return None
+
+        self._entries.move_to_end(key)
+        if value is _MISSING:
+            self._counters['negative_hits'] += 1
+        else:
+            self._counters['hits'] += 1
+        return entry
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a cached value
+
+        Args:
+            key: Cache key
+            default (optional): Returned when the key is absent, expired or a
+                cached miss. Defaults to None.
+
+        Returns:
+            The cached value or the default
+        """
+        with self._lock:
+            entry = self._lookup(key)
+
+        if entry is None or entry[0] is _MISSING:
+            return default
+        return entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """
+        Store a value
+
+        Args:
+            key: Cache key
+            value: Value to cache
+            ttl (float, optional): Lifetime in seconds. Defaults to the cache TTL.
+        """
+        self._store(key, value, self.ttl if ttl is None else ttl)
+
+    def set_missing(self, key: Hashable, ttl: Optional[float] = None):
+        """
+        Remember that a key has no value in the backing store
+
+        Args:
+            key: Cache key
+            ttl (float, optional): Lifetime in seconds. Defaults to the negative TTL.
+        """
+        self._store(key, _MISSING, self.negative_ttl if ttl is None else ttl)
+
+    def _store(self, key: Hashable, value: Any, ttl: float):
+        with self._lock:
+            self._bump(key)
+            self._store_locked(key, value, ttl)
+
+    def _store_locked(self, key: Hashable, value: Any, ttl: float):
+        # Must be called with the lock held
+        if ttl <= 0 or self.max_size <= 0:
+            return
+
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._counters['evictions'] += 1
+
+    def _bump(self, key: Hashable):
+        # Must be called with the lock held; makes in-flight loads of the key stale
+        loading = self._loading.get(key)
+        if loading is not None:
+            loading[0] += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """
+        Read-through lookup: return the cached value or load and cache it
+
+        A loader result of None is cached as a miss. Exceptions raised by the
+        loader propagate and nothing is cached, so a failed read is never
+        remembered as a miss.
+
+        Args:
+            key: Cache key
+            loader (callable): Function returning the value from the backing store
+            ttl (float, optional): Lifetime in seconds. Defaults to the cache TTL.
+
+        Returns:
+            The cached or freshly loaded value, or None if it doesn't exist
+        """
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None:
+                version = self._begin_load(key)
+
+        if entry is not None:
+            return None if entry[0] is _MISSING else entry[0]
+
+        value = _MISSING
+        try:
+            value = loader()
+            return value
+        finally:
+            with self._lock:
+                # Skip storing if the load failed or the key changed while loading
+                if self._end_load(key, version) and value is not _MISSING:
+                    if value is None:
+                        self._store_locked(key, _MISSING, self.negative_ttl)
+                    else:
+                        self._store_locked(key, value, self.ttl if ttl is None else ttl)
+
+    def load_into(self, key: Hashable, loader: Callable[[], Any], merge: Callable[[Any, Any], Any],
+                  ttl: Optional[float] = None) -> Any:
+        """
+        Load a value and merge it into a key's cached value
+
+        Used for entries built up piece by piece, e.g. several pages under one
+        key. The merge runs under the lock against the entry as it is when
+        the load finishes, and its result is stored only if the key was not
+        set or invalidated while loading. Exceptions raised by the loader
+        propagate and nothing is cached.
+
+        Args:
+            key: Cache key
+            loader (callable): Function returning the value from the backing store
+            merge (callable): Function of (cached value or None, loaded value)
+                returning the value to cache
+            ttl (float, optional): Lifetime in seconds. Defaults to the cache TTL.
+
+        Returns:
+            The loaded value
+        """
+        with self._lock:
+            version = self._begin_load(key)
+
+        value = _MISSING
+        try:
+            value = loader()
+            return value
+        finally:
+            with self._lock:
+                if self._end_load(key, version) and value is not _MISSING:
+                    entry = self._entries.get(key)
+                    current = None
+                    if entry is not None and entry[0] is not _MISSING and entry[1] > time.monotonic():
+                        current = entry[0]
+                    self._store_locked(key, merge(current, value), self.ttl if ttl is None else ttl)
+
+    def _begin_load(self, key: Hashable) -> int:
+        # Must be called with the lock held; returns the version the load started at
+        loading = self._loading.setdefault(key, [0, 0])
+        loading[1] += 1
+        return loading[0]
+
+    def _end_load(self, key: Hashable, version: int) -> bool:
+        # Must be called with the lock held; True if the key is unchanged since the load began
+        loading = self._loading[key]
+        loading[1] -= 1
+        if not loading[1]:
+            del self._loading[key]
+        return loading[0] == version
+
+    def invalidate(self, *keys: Hashable):
+        """
+        Remove entries from the cache
+
+        Args:
+            *keys: Keys to remove
+        """
+        with self._lock:
+            for key in keys:
+                self._bump(key)
+                if self._entries.pop(key, None) is not None:
+                    self._counters['invalidations'] += 1
+
+    def clear(self):
+        """
+        Remove every entry and reset the counters
+        """
+        with self._lock:
+            self._entries.clear()
+            for key in self._loading:
+                self._bump(key)
+            for name in self._counters:
+                self._counters[name] = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters
+
+        Returns:
+            dict: Size, capacity and hit/miss/eviction counters
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats['size'] = len(self._entries)
+
+        stats['max_size'] = self.max_size
+        lookups = stats['hits'] + stats['negative_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['hits'] + stats['negative_hits']) / lookups, 3) if lookups else 0.0
+        return stats
@@ -0,0 +1,384 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from flask import current_app
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+
+from utils.aws import registry, build_client_config
+from utils.cache import TTLCache
+from utils.background import run_in_background
+from utils.database import (
+    delete_cognito_username,
+    get_cognito_username,
+    invalidate_user_cache,
+    put_child_relationships,
+    put_cognito_username,
+    sync_child_snippet,
+    update_user
+)
+from utils.metrics import record_cognito_call
+
+# Shared Cognito client.
+#
+# The route blueprints used to build a new cognito-idp client in every
+# handler, paying for client construction and a cold TLS connection on each
+# request. The client now comes from the process-wide registry, so it is
+# created once per process (once per warm Lambda container), reset after a
+# fork, and every call is timed per operation through botocore's events.
+
+
+def get_cognito_config() -> Config:
+    """
+    Build the botocore configuration for the Cognito client
+
+    Returns:
+        botocore.config.Config: Client configuration
+    """
+    config = current_app.config
+    return build_client_config(
+        max_pool_connections=config.get('COGNITO_MAX_POOL_CONNECTIONS', 10),
+        connect_timeout=config.get('COGNITO_CONNECT_TIMEOUT', 2),
+        read_timeout=config.get('COGNITO_READ_TIMEOUT', 5),
+        tcp_keepalive=config.get('COGNITO_TCP_KEEPALIVE', True),
+        max_attempts=config.get('COGNITO_MAX_ATTEMPTS', 3)
+    )
+
+
+def _instrument(client):
+    """
+    Time every API call made with a client
+
+    Args:
+        client: botocore client to instrument
+
+    Returns:
+        The same client
+    """
+    def before_build(model, context, **kwargs):
+        context['activityhub_call'] = (model.name, time.perf_counter())
+
+    def after_call(context, parsed=None, **kwargs):
+        call = context.pop('activityhub_call', None)
+        if call:
+            operation, started_at = call
+            error = bool(parsed and 'Error' in parsed)
+            record_cognito_call(operation, (time.perf_counter() - started_at) * 1000, error=error)
+
+    # Raised before a response was parsed, e.g. a connection timeout
+    def after_call_error(context, **kwargs):
+        call = context.pop('activityhub_call', None)
+        if call:
+            operation, started_at = call
+            record_cognito_call(operation, (time.perf_counter() - started_at) * 1000, error=True)
+
+    events = client.meta.events
+    # Start the clock before the request is built; before-call handlers may short-circuit it
+    events.register('before-parameter-build.cognito-identity-provider', before_build)
+    events.register('after-call.cognito-identity-provider', after_call)
+    events.register('after-call-error.cognito-identity-provider', after_call_error)
+    return client
+
+
+def get_cognito_client():
+    """
+    Get the shared Cognito identity provider client for the configured region
+
+    Returns:
+        boto3.client: cognito-idp client
+    """
+    config = current_app.config
+    return registry.client(
+        'cognito-idp',
+        config['COGNITO_REGION'],
+        endpoint_url=config.get('COGNITO_ENDPOINT_URL'),
+        config=get_cognito_config,
+        on_create=_instrument
+    )
+
+
+def warm_cognito_client(app):
+    """
+    Create the Cognito client up front so the first request doesn't pay for it
+
+    Args:
+        app: Flask application instance
+    """
+    if not app.config.get('COGNITO_WARM_CLIENT', True):
+        return
+
+    with app.app_context():
+        get_cognito_client()
+
+
+# Cognito sub -> username lookups
+#
+# Cognito has no "get user by sub" API, and the filtered ListUsers call that
+# finds one is throttled at a few requests per second per pool. Usernames are
+# recorded in DynamoDB at registration (or the first time a sub is looked up)
+# and held in a bounded in-process cache, so a lookup is normally a cache hit
+# or one GetItem. Usernames never change for a sub, so entries only go stale
+# when the user is deleted.
+_username_cache = None
+_username_cache_lock = threading.Lock()
+
+
+def get_username_cache() -> Optional[TTLCache]:
+    """
+    Get the process-wide sub -> username cache
+
+    Returns:
+        TTLCache or None: The cache, or None if COGNITO_USERNAME_CACHE_ENABLED is off
+    """
+    global _username_cache
+
+    config = current_app.config
+    if not config.get('COGNITO_USERNAME_CACHE_ENABLED', True):
+        return None
+
+    if _username_cache is None:
+        with _username_cache_lock:
+            if _username_cache is None:
+                _username_cache = TTLCache(
+                    max_size=config.get('COGNITO_USERNAME_CACHE_SIZE', 10000),
+                    ttl=config.get('COGNITO_USERNAME_CACHE_TTL', 86400),
+                    negative_ttl=config.get('COGNITO_USERNAME_CACHE_NEGATIVE_TTL', 30)
+                )
+
+    return _username_cache
+
+
+def get_username_cache_stats() -> Dict[str, Any]:
+    """
+    Get hit/miss/eviction counters for the sub -> username cache
+
+    Returns:
+        dict: Cache statistics, or {'enabled': False} if the cache is off
+    """
+    cache = get_username_cache()
+    if cache is None:
+        return {'enabled': False}
+
+    return dict(cache.stats(), enabled=True)
+
+
+def reset_username_cache():
+    """
+    Drop the sub -> username cache so it is rebuilt from the current configuration
+    """
+    global _username_cache
+
+    with _username_cache_lock:
+        _username_cache = None
+
+
+def remember_cognito_username(sub: str, username: str):
+    """
+    Record a sub's username in DynamoDB and the local cache
+
+    Failing to record it only costs a ListUsers call later, so errors are
+    logged rather than raised.
+
+    Args:
+        sub (str): Cognito user's sub
+        username (str): Cognito username
+    """
+    cache = get_username_cache()
+    if cache is not None:
+        cache.set(sub, username)
+
+    try:
+        put_cognito_username(sub, username)
+    except (BotoCoreError, ClientError) as e:
+        current_app.logger.warning(f"Could not record Cognito username for {sub}: {str(e)}")
+
+
+def forget_cognito_username(sub: str):
+    """
+    Remove a sub's username from DynamoDB and the local cache
+
+    Args:
+        sub (str): Cognito user's sub
+    """
+    cache = get_username_cache()
+    if cache is not None:
+        cache.invalidate(sub)
+
+    try:
+        delete_cognito_username(sub)
+    except BotoCoreError as e:
+        current_app.logger.warning(f"Could not remove Cognito username for {sub}: {str(e)}")
+
+
+def _load_cognito_username(sub: str, client=None) -> Optional[str]:
+    """
+    Read a sub's username from DynamoDB, falling back to ListUsers
+
+    Args:
+        sub (str): Cognito user's sub
+        client (optional): cognito-idp client. Defaults to the shared client.
+
+    Returns:
+        str or None: The username, or None if Cognito has no such user
+    """
+    try:
+        username = get_cognito_username(sub)
+    except BotoCoreError as e:
+        current_app.logger.warning(f"Error reading Cognito username for {sub}: {str(e)}")
+        username = None
+
+    if username:
+        return username
+
+    response = (client or get_cognito_client()).list_users(
+        UserPoolId=current_app.config['COGNITO_USER_POOL_ID'],
+        Filter=f'sub = "{sub}"',
+        Limit=1
+    )
+    if not response.get('Users'):
+        return None
+
+    username = response['Users'][0]['Username']
+    try:
+        put_cognito_username(sub, username)
+    except (BotoCoreError, ClientError) as e:
+        current_app.logger.warning(f"Could not record Cognito username for {sub}: {str(e)}")
+    return username
+
+
+def resolve_cognito_username(sub: str, client=None) -> Optional[str]:
+    """
+    Find the Cognito username for a sub
+
+    Lookups go to the local cache, then DynamoDB, and only call ListUsers
+    for subs that were never recorded. Subs that Cognito doesn't know are
+    cached as misses for COGNITO_USERNAME_CACHE_NEGATIVE_TTL seconds.
+
+    Args:
+        sub (str): Cognito user's sub
+        client (optional): cognito-idp client. Defaults to the shared client.
+
+    Returns:
+        str or None: The username, or None if Cognito has no such user
+    """
+    cache = get_username_cache()
+    if cache is None:
+        return _load_cognito_username(sub, client)
+
+    return cache.get_or_load(sub, lambda: _load_cognito_username(sub, client))
+
+
+# Cognito attribute behind each editable profile field
+PROFILE_FIELD_ATTRIBUTES = {
+    'name': 'name',
+    'role': 'custom:role'
+}
+
+
+def cognito_attributes(attributes: List[Dict[str, str]]) -> Dict[str, str]:
+    """
+    Turn a Cognito attribute list into a dict
+
+    Args:
+        attributes (list): [{'Name': ..., 'Value': ...}, ...]
+
+    Returns:
+        dict: Attribute values by name
+    """
+    return {attribute['Name']: attribute['Value'] for attribute in attributes}
+
+
+def list_cognito_children(parent_id: str, client=None) -> List[Dict[str, Any]]:
+    """
+    List every child whose custom:parentId is the parent, following all pages
+
+    This is a filtered ListUsers scan of the pool, so it is only used to
+    import families that predate the relationship items in DynamoDB.
+
+    Args:
+        parent_id (str): Parent's ID
+        client (optional): cognito-idp client. Defaults to the shared client.
+
+    Returns:
+        list: Children with user_id, username, email, name, role and created_at
+    """
+    client = client or get_cognito_client()
+    params = {
+        'UserPoolId': current_app.config['COGNITO_USER_POOL_ID'],
+        'Filter': f'custom:parentId = "{parent_id}"'
+    }
+
+    children = []
+    while True:
+        response = client.list_users(**params)
+        for cognito_user in response.get('Users', []):
+            attributes = cognito_attributes(cognito_user['Attributes'])
+            if not attributes.get('sub') or not attributes.get('email'):
+                continue
+            children.append({
+                'user_id': attributes['sub'],
+                'username': cognito_user.get('Username', attributes['email']),
+                'email': attributes['email'],
+                'name': attributes.get('name'),
+                'role': 'child',
+                'created_at': cognito_user['UserCreateDate'].timestamp()
+            })
+
+        if not response.get('PaginationToken'):
+            return children
+        params['PaginationToken'] = response['PaginationToken']
+
+
+def import_cognito_children(parent_id: str, client=None) -> List[Dict[str, Any]]:
+    """
+    Copy a parent's Cognito family into relationship items in DynamoDB
+
+    Children registered since relationship items were introduced already
+    have one; this brings older families across once, after which the
+    children listing never needs ListUsers for the parent again.
+
+    Args:
+        parent_id (str): Parent's ID
+        client (optional): cognito-idp client. Defaults to the shared client.
+
+    Returns:
+        list: The imported children
+    """
+    children = list_cognito_children(parent_id, client)
+    for child in children:
+        remember_cognito_username(child['user_id'], child['username'])
+
+    put_child_relationships(parent_id, children, imported=True)
+    current_app.logger.info(f"Imported {len(children)} children of {parent_id} from Cognito")
+    return children
+
+
+def refresh_profile_copies(user_id: str, parent_id: Optional[str], changes: Dict[str, Any]):
+    """
+    Bring copies of a Cognito profile in line after it was updated
+
+    This process's cached profile is dropped straight away. The copies in
+    DynamoDB are refreshed in the background: the mirrored USER#<id>/PROFILE
+    item, which carries the change on to the parent's relationship item, or
+    just the relationship item for users that were never mirrored.
+
+    Args:
+        user_id (str): User's ID
+        parent_id (str, optional): Parent's ID if the user is a child
+        changes (dict): Updated fields by UserRecord name
+    """
+    invalidate_user_cache(user_id)
+    run_in_background(_refresh_profile_copies, user_id, parent_id, changes)
+
+
+def _refresh_profile_copies(user_id: str, parent_id: Optional[str], changes: Dict[str, Any]):
+    """
+    Apply a profile change to the mirrored profile, or else to the relationship item
+
+    Args:
+        user_id (str): User's ID
+        parent_id (str, optional): Parent's ID if the user is a child
+        changes (dict): Updated fields by UserRecord name
+    """
+    if update_user(user_id, changes, must_exist=True) is None and parent_id:
+        sync_child_snippet(parent_id, user_id, changes)
@@ -1,107 +1,383 @@
+import hashlib
 import json
+import os
 import requests
+import threading
 import time
 from functools import wraps
 from jose import jwk, jwt
+from jose.exceptions import JOSEError
 from jose.utils import base64url_decode
 from flask import request, current_app, g
+from utils.cache import TTLCache
 from utils.errors import error_response
 
-# Cache for Cognito JWKS
-_JWKS_CACHE = {}
-_JWKS_CACHE_TIME = 0
-_JWKS_CACHE_TTL = 3600  # 1 hour
+# Role of users with neither a Cognito group nor a custom:role attribute
+DEFAULT_ROLE = 'user'
+
+# Cognito JWKS
+#
+# Signing keys are served from memory and refreshed in the background shortly
+# before they expire, so no request ever waits on Cognito once keys are
+# loaded. Concurrent refreshes are collapsed into one fetch, stale keys keep
+# being served while it runs, and a token signed with an unknown kid (a key
+# rotation) triggers an immediate, rate-limited refresh.
+
+
+class JWKSProvider:
+    """
+    Thread-safe, fork-aware holder of a user pool's JWKS and public keys.
+
+    The JWKS and the kid -> public key map built from it are replaced
+    together in a single assignment, so readers never see a partial update.
+    """
+
+    def __init__(self, url, ttl=3600, refresh_ahead=300, max_stale=86400, min_refresh_interval=30,
+                 timeout=(2, 5), logger=None):
+        """
+        Args:
+            url (str): JWKS URL
+            ttl (float, optional): Seconds keys are considered fresh. Defaults to 3600.
+            refresh_ahead (float, optional): Seconds before expiry that a background
+                refresh starts. Defaults to 300.
+            max_stale (float, optional): Seconds past expiry that stale keys are still
+                served while refreshes fail. Defaults to 86400.
+            min_refresh_interval (float, optional): Minimum seconds between refreshes
+                caused by unknown kids. Defaults to 30.
+            timeout (tuple, optional): (connect, read) timeouts in seconds. Defaults to (2, 5).
+            logger (logging.Logger, optional): Logger for fetch errors. Defaults to None.
+        """
+        self.url = url
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.max_stale = max_stale
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self._logger = logger
+
+        # (jwks, kid -> key, fetched_at) or None until the first fetch succeeds
+        self._state = None
+        self._last_attempt = float('-inf')
+        self._counters = {'fetches': 0, 'failures': 0, 'background_refreshes': 0, 'unknown_kid_refreshes': 0}
+        self._reset_connections()
+
+    def _reset_connections(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._inflight = None
+        self._session = requests.Session()
+
+    def _check_pid(self):
+        # The session's connection pool and any in-flight refresh belong to the parent
+        if self._pid != os.getpid():
+            self._reset_connections()
+
+    def get_jwks(self):
+        """
+        Get the JWKS, fetching it on first use
+
+        Returns:
+            dict or None: JWKS, or None if it could not be fetched
+        """
+        state = self._current_state()
+        return state[0] if state else None
+
+    def get_key(self, kid):
+        """
+        Get the public key for a kid, refreshing once if the kid is unknown
+
+        Args:
+            kid (str): Key ID from the token header
+
+        Returns:
+            Key or None: The public key, or None if the kid is unknown
+        """
+        state = self._current_state()
+        if state and kid in state[1]:
+            return state[1][kid]
+
+        # Keys may have been rotated; refresh now unless we just did
+        if time.monotonic() - self._last_attempt < self.min_refresh_interval:
+            return None
+
+        self._counters['unknown_kid_refreshes'] += 1
+        self.refresh(wait=True)
+        state = self._state
+        return state[1].get(kid) if state else None
+
+    def _current_state(self):
+        self._check_pid()
+        state = self._state
+
+        if state is None:
+            self.refresh(wait=True)
+            return self._state
+
+        age = time.monotonic() - state[2]
+        if age >= self.ttl + self.max_stale:
+            # Too old to trust; only serve keys from a successful refresh
+            self.refresh(wait=True)
+            state = self._state
+            return state if time.monotonic() - state[2] < self.ttl + self.max_stale else None
+
+        if age >= self.ttl - self.refresh_ahead:
+            # Serve what we have while a background refresh revalidates it
+            self.refresh(wait=False)
+
+        return state
+
+    def refresh(self, wait=True):
+        """
+        Fetch the JWKS, joining a fetch that is already in flight
+
+        Args:
+            wait (bool, optional): Block until the fetch finishes. Defaults to True.
+        """
+        self._check_pid()
+
+        with self._lock:
+            inflight = self._inflight
+            leader = inflight is None
+            if leader:
+                inflight = self._inflight = threading.Event()
+
+        if not leader:
+            if wait:
+                inflight.wait(sum(self.timeout))
+            return
+
+        if wait:
+            self._fetch(inflight)
+        else:
+            self._counters['background_refreshes'] += 1
+            threading.Thread(target=self._fetch, args=(inflight,), name='jwks-refresh', daemon=True).start()
+
+    def _fetch(self, inflight):
+        try:
+            self._counters['fetches'] += 1
+            response = self._session.get(self.url, timeout=self.timeout)
+            response.raise_for_status()
+            jwks = response.json()
+            self._state = (jwks, self._build_keys(jwks), time.monotonic())
+        except (requests.exceptions.RequestException, ValueError) as e:
+            self._counters['failures'] += 1
+            if self._logger:
+                self._logger.error(f"Error fetching Cognito JWKS: {str(e)}")
+        finally:
+            self._last_attempt = time.monotonic()
+            with self._lock:
+                self._inflight = None
+            inflight.set()
+
+    def _build_keys(self, jwks):
+        keys = {}
+        for key_data in jwks.get('keys', []):
+            try:
+                keys[key_data['kid']] = jwk.construct(key_data)
+            except (KeyError, JOSEError) as e:
+                if self._logger:
+                    self._logger.warning(f"Skipping unusable Cognito JWKS key {key_data.get('kid')}: {str(e)}")
+        return keys
+
+    def stats(self):
+        """
+        Get fetch counters and the age of the keys
+
+        Returns:
+            dict: Counters, number of keys and age in seconds (None before the first fetch)
+        """
+        state = self._state
+        stats = dict(self._counters)
+        stats['keys'] = len(state[1]) if state else 0
+        stats['age_seconds'] = round(time.monotonic() - state[2], 1) if state else None
+        return stats
+
+
+_jwks_provider = None
+_jwks_provider_lock = threading.Lock()
+
+def get_jwks_provider():
+    """
+    Get the process-wide JWKS provider for the configured user pool
+    
+    Returns:
+        JWKSProvider: The provider
+    """
+    global _jwks_provider
+    
+    config = current_app.config
+    region = config['COGNITO_REGION']
+    pool_id = config['COGNITO_USER_POOL_ID']
+    jwks_url = f"https://cognito-idp.{region}.amazonaws.com/{pool_id}/.well-known/jwks.json"
+    
+    provider = _jwks_provider
+    if provider is None or provider.url != jwks_url:
+        with _jwks_provider_lock:
+            provider = _jwks_provider
+            if provider is None or provider.url != jwks_url:
+                provider = _jwks_provider = JWKSProvider(
+                    jwks_url,
+                    ttl=config.get('JWKS_TTL', 3600),
+                    refresh_ahead=config.get('JWKS_REFRESH_AHEAD', 300),
+                    max_stale=config.get('JWKS_MAX_STALE', 86400),
+                    min_refresh_interval=config.get('JWKS_MIN_REFRESH_INTERVAL', 30),
+                    timeout=(config.get('JWKS_CONNECT_TIMEOUT', 2), config.get('JWKS_READ_TIMEOUT', 5)),
+                    logger=current_app.logger
+                )
+    
+    return provider
 
 def get_cognito_jwks():
     """
     Get the JSON Web Key Set (JWKS) from Cognito.
-    Includes caching to avoid unnecessary requests.
+    Keys are cached and refreshed in the background by the JWKS provider.
     
     Returns:
         dict: JWKS
     """
-    global _JWKS_CACHE, _JWKS_CACHE_TIME
+    return get_jwks_provider().get_jwks()
+
+def get_cognito_public_key(kid):
+    """
+    Get the public key for a token's kid
     
-    # Check if the cache is valid
-    current_time = time.time()
-    if _JWKS_CACHE and current_time - _JWKS_CACHE_TIME < _JWKS_CACHE_TTL:
-        return _JWKS_CACHE
+    Args:
+        kid (str): Key ID from the token header
     
-    # Fetch new JWKS
-    region = current_app.config['COGNITO_REGION']
-    pool_id = current_app.config['COGNITO_USER_POOL_ID']
+    Returns:
+        Key or None: The public key, or None if the kid is unknown
+    """
+    return get_jwks_provider().get_key(kid)
+
+def reset_jwks_cache():
+    """
+    Forget the JWKS provider and its cached keys
+    """
+    global _jwks_provider
     
-    jwks_url = f"https://cognito-idp.{region}.amazonaws.com/{pool_id}/.well-known/jwks.json"
+    with _jwks_provider_lock:
+        _jwks_provider = None
+
+# Verified token cache
+#
+# Clients send the same access token on every request until it expires, so
+# the claims of tokens whose signature checked out are kept, keyed by a hash
+# of the token, until their exp. Hits skip the header parsing, key lookup and
+# RSA verification; the claim checks still run so expiry and audience hold.
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+def get_token_cache():
+    """
+    Get the process-wide verified token cache
     
-    try:
-        response = requests.get(jwks_url)
-        response.raise_for_status()
-        
-        _JWKS_CACHE = response.json()
-        _JWKS_CACHE_TIME = current_time
-        
-        return _JWKS_CACHE
-    except requests.exceptions.RequestException as e:
-        current_app.logger.error(f"Error fetching Cognito JWKS: {str(e)}")
+    Returns:
+        TTLCache or None: The cache, or None if TOKEN_CACHE_ENABLED is off
+    """
+    global _token_cache
+    
+    config = current_app.config
+    if not config.get('TOKEN_CACHE_ENABLED', True):
         return None
+    
+    if _token_cache is None:
+        with _token_cache_lock:
+            if _token_cache is None:
+                _token_cache = TTLCache(
+                    max_size=config.get('TOKEN_CACHE_SIZE', 10000),
+                    ttl=config.get('TOKEN_CACHE_TTL', 3600),
+                    negative_ttl=0
+                )
+    
+    return _token_cache
+
+def get_token_cache_stats():
+    """
+    Get hit/miss/eviction counters for the verified token cache
+    
+    Returns:
+        dict: Cache statistics, or {'enabled': False} if the cache is off
+    """
+    cache = get_token_cache()
+    if cache is None:
+        return {'enabled': False}
+    
+    return dict(cache.stats(), enabled=True)
+
+def reset_token_cache():
+    """
+    Drop the token cache so it is rebuilt from the current configuration
+    """
+    global _token_cache
+    
+    with _token_cache_lock:
+        _token_cache = None
+
+def _claims_valid(claims):
+    """
+    Check the expiry, token use and audience of token claims
+    
+    Args:
+        claims (dict): Token claims
+    
+    Returns:
+        bool: True if the claims are acceptable, False otherwise
+    """
+    # Verify expiration
+    if 'exp' in claims and time.time() > claims['exp']:
+        return False
+    
+    # Verify token use
+    token_use = claims.get('token_use')
+    if token_use != 'access' and token_use != 'id':
+        return False
+    
+    # Verify the audience (client ID)
+    client_id = current_app.config['COGNITO_APP_CLIENT_ID']
+    return claims.get('client_id') == client_id or claims.get('aud') == client_id
 
-# Fix in utils/cognito_auth.py
 def verify_cognito_token(token):
     """
     Verify a Cognito JWT token
     
+    Tokens that verified before are served from the token cache until they
+    expire.
+    
     Args:
         token (str): The JWT token to verify
     
     Returns:
         dict or None: The decoded token payload if valid, None otherwise
     """
-    try:
-        # Get JWKS
-        jwks = get_cognito_jwks()
-        if not jwks:
+    cache = get_token_cache()
+    cache_key = hashlib.sha256(token.encode('utf-8')).digest() if cache is not None else None
+    
+    if cache is not None:
+        cached_claims = cache.get(cache_key)
+        if cached_claims is not None:
+            if _claims_valid(cached_claims):
+                return dict(cached_claims)
+            cache.invalidate(cache_key)
             return None
-        
+    
+    try:
         # Get the header and payload from the token
         header = jwt.get_unverified_header(token)
         if not header or 'kid' not in header:
             return None
         
         # Find the key with matching kid
-        key = None
-        for jwk_key in jwks['keys']:
-            if jwk_key['kid'] == header['kid']:
-                key = jwk_key
-                break
-        
-        if not key:
+        public_key = get_cognito_public_key(header['kid'])
+        if not public_key:
             return None
         
         # Get the claims for validation
         claims = jwt.get_unverified_claims(token)
         
-        # Verify expiration
-        if 'exp' in claims and time.time() > claims['exp']:
-            return None
-        
-        # Verify token use
-        token_use = claims.get('token_use')
-        if token_use != 'access' and token_use != 'id':
+        # Verify expiration, token use and audience
+        if not _claims_valid(claims):
             return None
         
-        # Verify the audience (client ID)
-        audience_valid = False
-        if 'client_id' in claims and claims['client_id'] == current_app.config['COGNITO_APP_CLIENT_ID']:
-            audience_valid = True
-        elif 'aud' in claims and claims['aud'] == current_app.config['COGNITO_APP_CLIENT_ID']:
-            audience_valid = True
-        
-        if not audience_valid:
-            return None
-        
-        # Verify the signature
-        public_key = jwk.construct(key)
-        
         # Split token to get message and signature parts
         if token.count('.') != 2:
             return None
@@ -112,6 +388,10 @@ def verify_cognito_token(token):
         # If signature verification fails, return None
         if not public_key.verify(message.encode('utf-8'), decoded_signature):
             return None
+        
+        # Remember the verified claims until the token expires
+        if cache is not None and 'exp' in claims:
+            cache.set(cache_key, dict(claims), ttl=min(claims['exp'] - time.time(), cache.ttl))
             
         # If all checks pass, return the claims
         return claims
@@ -120,6 +400,27 @@ def verify_cognito_token(token):
         current_app.logger.error(f"Error verifying Cognito token: {str(e)}")
         return None
 
+def user_from_claims(claims):
+    """
+    Build the API user payload from verified ID token claims
+    
+    Args:
+        claims (dict): Verified token claims
+    
+    Returns:
+        dict: user_id, email, name, role and, for children, parent_id
+    """
+    user_data = {
+        'user_id': claims.get('sub'),
+        'email': claims.get('email'),
+        'name': claims.get('name'),
+        'role': claims.get('custom:role')
+    }
+    if user_data['role'] == 'child' and claims.get('custom:parentId'):
+        user_data['parent_id'] = claims['custom:parentId']
+    
+    return user_data
+
 def cognito_token_required(f):
     """
     Decorator to protect routes with Cognito JWT authentication
@@ -150,6 +451,7 @@ def cognito_token_required(f):
         # Store user info in g object for the route to use
         if 'sub' in payload:
             g.user_id = payload['sub']
+            g.claims = payload
             
             # Get user role from Cognito 
             # Note: This might come from Cognito groups or custom attributes
@@ -158,7 +460,7 @@ def cognito_token_required(f):
             elif 'custom:role' in payload:
                 g.user_role = payload['custom:role']
             else:
-                g.user_role = 'user'  # Default role
+                g.user_role = DEFAULT_ROLE
         else:
             return error_response('UNAUTHORIZED', 'Invalid token format')
         
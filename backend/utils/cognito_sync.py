@@ -0,0 +1,315 @@
+from typing import Any, Dict, List, Optional
+from flask import current_app
+
+from utils.cognito import cognito_attributes, get_cognito_client, remember_cognito_username
+from utils.cognito_auth import DEFAULT_ROLE, user_from_claims
+from utils.database import create_user, delete_user, get_user_by_id, update_user
+from utils.scan import TokenBucket, parallel_scan
+
+# Cognito -> DynamoDB profile mirror.
+#
+# Cognito is the source of truth for users, but reading a profile from it
+# costs a throttled API call. A trigger Lambda copies each user into the
+# USER#<sub>/PROFILE item when they confirm sign-up and again whenever tokens
+# are issued, so profile reads are served from DynamoDB and the profile
+# cache. Mirroring is best effort: a failure never blocks sign-in, and the
+# reconciliation below finds and repairs whatever the triggers missed.
+
+# Trigger sources that mirror the user; every other trigger is passed through
+MIRRORED_TRIGGER_PREFIXES = ('PostConfirmation_', 'TokenGeneration_')
+
+# Fields kept in step with Cognito after the profile has been created
+MIRRORED_FIELDS = ('name', 'role')
+
+# ListUsers returns at most 60 users per page
+LIST_USERS_PAGE_SIZE = 60
+
+# Ids reported per difference in reconciliation statistics
+RECONCILE_SAMPLE_SIZE = 10
+
+
+def cognito_profile(attributes: Dict[str, str], username: Optional[str] = None,
+                    created_at: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """
+    Build the user data to mirror from a Cognito user's attributes
+
+    Args:
+        attributes (dict): Attribute values by name, e.g. a trigger's userAttributes
+        username (str, optional): Cognito username. Defaults to the email.
+        created_at (float, optional): When the Cognito user was created. Defaults to now.
+
+    Returns:
+        dict or None: User data for create_user, or None without a sub or email
+    """
+    user_data = user_from_claims(attributes)
+    if not user_data['user_id'] or not user_data['email']:
+        return None
+
+    user_data['name'] = user_data['name'] or user_data['email']
+    # Same default as authorization, so the mirror never grants a different role
+    user_data['role'] = user_data['role'] or DEFAULT_ROLE
+    user_data['username'] = username or user_data['email']
+    if created_at is not None:
+        user_data['created_at'] = created_at
+
+    return user_data
+
+
+def profile_changes(profile: Dict[str, Any], user_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Find the mirrored fields where a profile differs from Cognito
+
+    Args:
+        profile (dict): Stored profile
+        user_data (dict): User data built by cognito_profile
+
+    Returns:
+        dict: Cognito's value for each field that differs
+    """
+    return {
+        field: user_data[field]
+        for field in MIRRORED_FIELDS
+        if profile.get(field) != user_data[field]
+    }
+
+
+def _create_mirror(user_data: Dict[str, Any]) -> bool:
+    """
+    Create the mirrored profile of a Cognito user
+
+    Args:
+        user_data (dict): User data built by cognito_profile
+
+    Returns:
+        bool: True if created, False if the email belongs to another profile
+    """
+    try:
+        create_user(user_data)
+    except ValueError:
+        return False
+
+    remember_cognito_username(user_data['user_id'], user_data['username'])
+    return True
+
+
+def mirror_cognito_user(user_data: Dict[str, Any], consistent_read: bool = False) -> str:
+    """
+    Create or update the DynamoDB profile of a Cognito user
+
+    Writes only happen when the profile is missing or differs, so mirroring
+    on every token issue normally costs one (usually cached) read.
+
+    Args:
+        user_data (dict): User data built by cognito_profile
+        consistent_read (bool, optional): Read the stored profile with a
+            consistent read. Defaults to False.
+
+    Returns:
+        str: 'created', 'updated', 'unchanged' or 'conflict' when the email
+            is claimed by a different user
+    """
+    user_id = user_data['user_id']
+    profile = get_user_by_id(user_id, consistent_read=consistent_read)
+
+    if profile is None:
+        if _create_mirror(user_data):
+            return 'created'
+
+        # Either another trigger mirrored the user first or the email is taken
+        profile = get_user_by_id(user_id, consistent_read=True)
+        if profile is None:
+            current_app.logger.warning(f"Cannot mirror Cognito user {user_id}: email belongs to another user")
+            return 'conflict'
+
+    changes = profile_changes(profile, user_data)
+    if not changes:
+        return 'unchanged'
+
+    update_user(user_id, changes, must_exist=True)
+    return 'updated'
+
+
+def handle_cognito_trigger(event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Mirror the user of a post-confirmation or pre-token-generation trigger
+
+    Args:
+        event (dict): Cognito trigger event
+
+    Returns:
+        dict: The event, unchanged, as Cognito expects
+    """
+    logger = current_app.logger
+    source = event.get('triggerSource', '')
+    if not source.startswith(MIRRORED_TRIGGER_PREFIXES):
+        return event
+
+    user_data = cognito_profile(event.get('request', {}).get('userAttributes', {}), event.get('userName'))
+    if user_data is None:
+        logger.warning(f"{source} trigger for {event.get('userName')} has no sub or email; not mirrored")
+        return event
+
+    # Any error would fail the sign-up or sign-in; reconciliation repairs missed users
+    try:
+        result = mirror_cognito_user(user_data, consistent_read=source.startswith('PostConfirmation_'))
+        logger.info(f"{source} trigger mirrored {user_data['user_id']}: {result}")
+    except Exception:
+        logger.exception(f"{source} trigger failed to mirror {user_data['user_id']}")
+
+    return event
+
+
+def list_cognito_profiles(client=None, rate: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Read every user in the pool
+
+    ListUsers has a low per-pool quota shared with the API, so pages are
+    requested at no more than COGNITO_LIST_USERS_RPS per second.
+
+    Args:
+        client (optional): cognito-idp client. Defaults to the shared client.
+        rate (float, optional): ListUsers requests per second. Defaults to COGNITO_LIST_USERS_RPS.
+
+    Returns:
+        dict: User data built by cognito_profile, by sub
+    """
+    client = client or get_cognito_client()
+    bucket = TokenBucket(rate or current_app.config.get('COGNITO_LIST_USERS_RPS', 4))
+    params = {
+        'UserPoolId': current_app.config['COGNITO_USER_POOL_ID'],
+        'Limit': LIST_USERS_PAGE_SIZE
+    }
+
+    users = {}
+    while True:
+        bucket.wait()
+        response = client.list_users(**params)
+        bucket.consume(1)
+
+        for cognito_user in response.get('Users', []):
+            user_data = cognito_profile(
+                cognito_attributes(cognito_user.get('Attributes', [])),
+                cognito_user.get('Username'),
+                cognito_user['UserCreateDate'].timestamp() if cognito_user.get('UserCreateDate') else None
+            )
+            if user_data is not None:
+                users[user_data['user_id']] = user_data
+
+        if not response.get('PaginationToken'):
+            return users
+        params['PaginationToken'] = response['PaginationToken']
+
+
+def _cognito_user_exists(sub: str, client) -> bool:
+    """
+    Check whether the pool still has a user
+
+    Args:
+        sub (str): Cognito user's sub
+        client: cognito-idp client
+
+    Returns:
+        bool: True if the user exists
+    """
+    response = client.list_users(
+        UserPoolId=current_app.config['COGNITO_USER_POOL_ID'],
+        Filter=f'sub = "{sub}"',
+        Limit=1
+    )
+    return bool(response.get('Users'))
+
+
+def reconcile_cognito_profiles(total_segments: int = 4, rcu_budget: Optional[float] = None,
+                               page_size: Optional[int] = None, fix: bool = False,
+                               delete_orphaned: bool = False, client=None,
+                               list_users_rate: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Compare the user pool with the mirrored profiles in DynamoDB
+
+    The whole pool is listed, then the table's USER profiles are read with a
+    rate-limited parallel scan and matched by sub. Differences found:
+
+    - missing: Cognito users without a profile
+    - stale: profiles whose name or role differ from Cognito
+    - orphaned: profiles without a password hash (so created by the mirror)
+      whose user is no longer in the pool
+    - conflicts: missing users whose email is claimed by another profile,
+      found when fixing
+
+    Args:
+        total_segments (int, optional): Number of parallel segments. Defaults to 4.
+        rcu_budget (float, optional): Read capacity units per second. Defaults to unlimited.
+        page_size (int, optional): Items evaluated per Scan request. Defaults to None.
+        fix (bool, optional): Create missing and update stale profiles. Defaults to False.
+        delete_orphaned (bool, optional): Delete orphaned profiles once each is
+            confirmed gone from the pool. Defaults to False.
+        client (optional): cognito-idp client. Defaults to the shared client.
+        list_users_rate (float, optional): ListUsers requests per second.
+            Defaults to COGNITO_LIST_USERS_RPS.
+
+    Returns:
+        dict: Scan statistics plus counts and sample IDs of each difference
+    """
+    client = client or get_cognito_client()
+    pool = list_cognito_profiles(client, list_users_rate)
+    unmatched = dict(pool)
+    stale = {}
+    orphaned = []
+
+    def compare(segment: int, items: List[Dict[str, Any]]):
+        for item in items:
+            if item.get('SK') != 'PROFILE':
+                continue
+            user_id = item.get('UserId')
+            user_data = unmatched.pop(user_id, None)
+            if user_data is not None:
+                changes = profile_changes({'name': item.get('Name'), 'role': item.get('Role')}, user_data)
+                if changes:
+                    stale[user_id] = changes
+            elif user_id not in pool and not item.get('PasswordHash'):
+                orphaned.append(user_id)
+
+    stats = parallel_scan(compare, total_segments=total_segments, entity_type='USER',
+                          rcu_budget=rcu_budget, page_size=page_size)
+
+    missing = list(unmatched)
+    created = updated = deleted = 0
+    conflicts = []
+    if fix:
+        for user_id in missing:
+            result = mirror_cognito_user(unmatched[user_id], consistent_read=True)
+            if result == 'conflict':
+                conflicts.append(user_id)
+            elif result == 'created':
+                created += 1
+        for user_id, changes in stale.items():
+            if update_user(user_id, changes, must_exist=True) is not None:
+                updated += 1
+
+    if delete_orphaned:
+        # Users created after the pool was listed look orphaned; ask Cognito again
+        for user_id in orphaned:
+            if not _cognito_user_exists(user_id, client) and delete_user(user_id):
+                deleted += 1
+
+    stats.update({
+        'cognito_users': len(pool),
+        'missing': len(missing),
+        'stale': len(stale),
+        'orphaned': len(orphaned),
+        'conflicts': len(conflicts),
+        'created': created,
+        'updated': updated,
+        'deleted': deleted,
+        'samples': {
+            'missing': sorted(missing)[:RECONCILE_SAMPLE_SIZE],
+            'stale': sorted(stale)[:RECONCILE_SAMPLE_SIZE],
+            'orphaned': sorted(orphaned)[:RECONCILE_SAMPLE_SIZE],
+            'conflicts': sorted(conflicts)[:RECONCILE_SAMPLE_SIZE]
+        }
+    })
+    current_app.logger.info(
+        f"Cognito reconciliation finished: {len(missing)} missing, {len(stale)} stale, "
+        f"{len(orphaned)} orphaned; {created} created, {updated} updated, {deleted} deleted"
+    )
+    return stats
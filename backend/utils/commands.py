@@ -0,0 +1,100 @@
+import click
+import json
+
+from utils.cognito_sync import reconcile_cognito_profiles
+from utils.scan import backfill_email_claims, backfill_entity_shards, export_table, sweep_orphans, EXPORT_FORMATS
+
+def register_commands(app):
+    """
+    Register custom Flask CLI commands
+    
+    Args:
+        app: Flask application instance
+    """
+    @app.cli.command('export-table')
+    @click.option('--output', '-o', required=True, help='File to write the exported items to')
+    @click.option('--format', 'output_format', type=click.Choice(EXPORT_FORMATS), default='ndjson',
+                  show_default=True, help='Output format')
+    @click.option('--segments', type=click.IntRange(1, 1000000), default=4, show_default=True,
+                  help='Number of parallel scan segments')
+    @click.option('--entity-type', default=None, help='Only export items with this EntityType, e.g. USER')
+    @click.option('--rcu-budget', type=float, default=None, help='Read capacity units per second to spend')
+    @click.option('--page-size', type=int, default=None, help='Items evaluated per Scan request')
+    @click.option('--checkpoint', default=None, help='Checkpoint file used to resume an interrupted export')
+    def export_table_command(output, output_format, segments, entity_type, rcu_budget, page_size, checkpoint):
+        """Export the DynamoDB table with a parallel scan."""
+        stats = export_table(
+            output,
+            output_format=output_format,
+            total_segments=segments,
+            entity_type=entity_type,
+            rcu_budget=rcu_budget,
+            page_size=page_size,
+            checkpoint_path=checkpoint
+        )
+        click.echo(json.dumps(stats))
+    
+    @app.cli.command('sweep-orphans')
+    @click.option('--segments', type=click.IntRange(1, 1000000), default=4, show_default=True,
+                  help='Number of parallel scan segments')
+    @click.option('--rcu-budget', type=float, default=None, help='Read capacity units per second to spend')
+    @click.option('--page-size', type=int, default=None, help='Items evaluated per Scan request')
+    @click.option('--dry-run', is_flag=True, help='Report orphans without deleting them')
+    def sweep_orphans_command(segments, rcu_budget, page_size, dry_run):
+        """Delete items left behind by deleted users."""
+        stats = sweep_orphans(
+            total_segments=segments,
+            rcu_budget=rcu_budget,
+            page_size=page_size,
+            dry_run=dry_run
+        )
+        click.echo(json.dumps(stats))
+    
+    @app.cli.command('backfill-entity-shards')
+    @click.option('--segments', type=click.IntRange(1, 1000000), default=4, show_default=True,
+                  help='Number of parallel scan segments')
+    @click.option('--rcu-budget', type=float, default=None, help='Read capacity units per second to spend')
+    @click.option('--page-size', type=int, default=None, help='Items evaluated per Scan request')
+    def backfill_entity_shards_command(segments, rcu_budget, page_size):
+        """Set EntityShard on items written before sharding."""
+        stats = backfill_entity_shards(
+            total_segments=segments,
+            rcu_budget=rcu_budget,
+            page_size=page_size
+        )
+        click.echo(json.dumps(stats))
+    
+    @app.cli.command('backfill-email-claims')
+    @click.option('--segments', type=click.IntRange(1, 1000000), default=4, show_default=True,
+                  help='Number of parallel scan segments')
+    @click.option('--rcu-budget', type=float, default=None, help='Read capacity units per second to spend')
+    @click.option('--page-size', type=int, default=None, help='Items evaluated per Scan request')
+    def backfill_email_claims_command(segments, rcu_budget, page_size):
+        """Write email uniqueness claims for users created before claims existed."""
+        stats = backfill_email_claims(
+            total_segments=segments,
+            rcu_budget=rcu_budget,
+            page_size=page_size
+        )
+        click.echo(json.dumps(stats))
+    
+    @app.cli.command('reconcile-cognito')
+    @click.option('--segments', type=click.IntRange(1, 1000000), default=4, show_default=True,
+                  help='Number of parallel scan segments')
+    @click.option('--rcu-budget', type=float, default=None, help='Read capacity units per second to spend')
+    @click.option('--page-size', type=int, default=None, help='Items evaluated per Scan request')
+    @click.option('--list-users-rps', type=float, default=None,
+                  help='ListUsers requests per second (defaults to COGNITO_LIST_USERS_RPS)')
+    @click.option('--fix', is_flag=True, help='Create missing and update stale profiles')
+    @click.option('--delete-orphaned', is_flag=True, help='Delete mirrored profiles of users no longer in the pool')
+    def reconcile_cognito_command(segments, rcu_budget, page_size, list_users_rps, fix, delete_orphaned):
+        """Compare the Cognito user pool with the profiles in DynamoDB."""
+        stats = reconcile_cognito_profiles(
+            total_segments=segments,
+            rcu_budget=rcu_budget,
+            page_size=page_size,
+            fix=fix,
+            delete_orphaned=delete_orphaned,
+            list_users_rate=list_users_rps
+        )
+        click.echo(json.dumps(stats))
@@ -1,49 +1,234 @@
 import boto3
 from boto3.dynamodb.conditions import Key, Attr
+from boto3.dynamodb.types import TypeSerializer
 from flask import current_app
 import uuid
 import time
+import random
 import decimal
 import json
+import hmac
+import hashlib
+import base64
+import binascii
+import threading
+import heapq
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from botocore.exceptions import ClientError
-from typing import Dict, List, Any, Optional
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Iterator, Tuple
+
+from utils.aws import registry, build_client_config
+from utils.cache import TTLCache
+from utils.metrics import call_dynamodb
+from utils.dynamo_codec import decode_item, encode_item, to_client_params
+from models.records import UserRecord, USER_ATTRIBUTE_MAP
+
+if TYPE_CHECKING:
+    from utils.memory_dynamo import MemoryDynamoDB
 
 # Decimal values will be handled by the CustomJSONProvider in app.py
 
+_serializer = TypeSerializer()
+
+# Key attributes of the table and each index, used to build ExclusiveStartKey
+INDEX_KEY_ATTRIBUTES = {
+    None: ('PK', 'SK'),
+    'GSI1': ('GSI1PK', 'GSI1SK', 'PK', 'SK'),
+    'EntityTypeIndex': ('EntityType', 'SK', 'PK'),
+    'EntityShardIndex': ('EntityShard', 'PK', 'SK')
+}
+
+# Write-sharded entity listings
+#
+# EntityTypeIndex is hashed on EntityType alone, so every USER item lands in
+# one GSI partition. Items of sharded entity types also carry EntityShard,
+# '<type>#<n>' with n derived from the item's PK, the hash key of
+# EntityShardIndex (sorted by PK). Listings query every shard in parallel and
+# merge the results. Changing ENTITY_SHARD_COUNT moves items between shards,
+# so run `flask backfill-entity-shards` afterwards.
+ENTITY_SHARD_INDEX = 'EntityShardIndex'
+SHARDED_ENTITY_TYPES = ('USER',)
+
+# BatchGetItem accepts at most 100 keys per request
+BATCH_GET_MAX_KEYS = 100
+
+# BatchWriteItem accepts at most 25 put/delete requests
+BATCH_WRITE_MAX_ITEMS = 25
+
+# Error codes that mean a batch request was throttled and should be retried
+THROTTLING_ERROR_CODES = ('ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded')
+
+# TransactWriteItems accepts at most 100 actions
+TRANSACT_MAX_ITEMS = 100
+
+# Retry settings for unprocessed batch keys (exponential backoff with full jitter)
+BATCH_MAX_RETRIES = 8
+BATCH_BACKOFF_BASE = 0.05
+BATCH_BACKOFF_CAP = 2.0
+
+class UnprocessedKeysError(Exception):
+    """
+    Raised when BatchGetItem keys are still unprocessed after every retry.
+    
+    Attributes:
+        keys (list): Keys that were never read, each a dict with 'PK' and 'SK'
+    """
+    
+    def __init__(self, keys: List[Dict[str, Any]]):
+        super().__init__(f"{len(keys)} keys unprocessed after {BATCH_MAX_RETRIES} retries")
+        self.keys = keys
+
+# Read paths: 'resource' uses the boto3 Table API, 'client' the low-level
+# client with the direct codec in utils.dynamo_codec
+DYNAMODB_ACCESS_MODES = ('resource', 'client')
+
+def get_dynamodb_config():
+    """
+    Build the botocore configuration for DynamoDB from the app config
+    
+    Returns:
+        botocore.config.Config: Client configuration
+    """
+    config = current_app.config
+    return build_client_config(
+        max_pool_connections=config.get('DYNAMODB_MAX_POOL_CONNECTIONS', 50),
+        connect_timeout=config.get('DYNAMODB_CONNECT_TIMEOUT', 2),
+        read_timeout=config.get('DYNAMODB_READ_TIMEOUT', 5),
+        tcp_keepalive=config.get('DYNAMODB_TCP_KEEPALIVE', True),
+        max_attempts=config.get('DYNAMODB_MAX_ATTEMPTS', 3)
+    )
+
+# In-process engine used when DYNAMODB_ENGINE is 'memory'
+_memory_engine = None
+_memory_engine_lock = threading.Lock()
+
+def use_memory_engine() -> bool:
+    """
+    Check whether the in-memory engine stands in for DynamoDB
+    
+    Returns:
+        bool: True when DYNAMODB_ENGINE is 'memory'
+    """
+    return current_app.config.get('DYNAMODB_ENGINE', 'aws') == 'memory'
+
+def get_memory_engine() -> 'MemoryDynamoDB':
+    """
+    Get the process-wide in-memory DynamoDB engine
+    
+    Returns:
+        MemoryDynamoDB: The engine, created from the app config on first use
+    """
+    global _memory_engine
+    
+    if _memory_engine is None:
+        with _memory_engine_lock:
+            if _memory_engine is None:
+                # Only test and benchmark runs use the engine, so production never imports it
+                from utils.memory_dynamo import MemoryDynamoDB
+                
+                config = current_app.config
+                latency_ms = config.get('MEMORY_DYNAMODB_LATENCY_MS', 0)
+                _memory_engine = MemoryDynamoDB(
+                    latency=latency_ms / 1000 if latency_ms else None,
+                    throttle_rate=config.get('MEMORY_DYNAMODB_THROTTLE_RATE', 0.0)
+                )
+    
+    return _memory_engine
+
+def reset_memory_engine():
+    """
+    Drop the in-memory engine and all of its data
+    """
+    global _memory_engine
+    
+    with _memory_engine_lock:
+        _memory_engine = None
+
 # Initialize DynamoDB client
 def get_dynamodb_client():
     """
-    Get a DynamoDB client
+    Get the shared DynamoDB client for the configured region and endpoint
     
     Returns:
         boto3.client: DynamoDB client
     """
-    return boto3.client(
+    if use_memory_engine():
+        return get_memory_engine().client
+    
+    return registry.client(
         'dynamodb',
-        region_name=current_app.config['AWS_REGION']
+        current_app.config['AWS_REGION'],
+        endpoint_url=current_app.config.get('DYNAMODB_ENDPOINT_URL'),
+        config=get_dynamodb_config
     )
 
 def get_dynamodb_resource():
     """
-    Get a DynamoDB resource
+    Get the shared DynamoDB resource for the configured region and endpoint
     
     Returns:
         boto3.resource: DynamoDB resource
     """
-    return boto3.resource(
+    if use_memory_engine():
+        return get_memory_engine()
+    
+    return registry.resource(
         'dynamodb',
-        region_name=current_app.config['AWS_REGION']
+        current_app.config['AWS_REGION'],
+        endpoint_url=current_app.config.get('DYNAMODB_ENDPOINT_URL'),
+        config=get_dynamodb_config
     )
 
 def get_table():
     """
-    Get the DynamoDB table
+    Get the shared DynamoDB table
     
     Returns:
         boto3.resource.Table: DynamoDB table
     """
-    dynamodb = get_dynamodb_resource()
-    return dynamodb.Table(current_app.config['DYNAMODB_TABLE'])
+    if use_memory_engine():
+        return get_memory_engine().Table(current_app.config['DYNAMODB_TABLE'])
+    
+    return registry.table(
+        current_app.config['DYNAMODB_TABLE'],
+        current_app.config['AWS_REGION'],
+        endpoint_url=current_app.config.get('DYNAMODB_ENDPOINT_URL'),
+        config=get_dynamodb_config
+    )
+
+def get_dynamodb_pool_stats() -> Dict[str, Any]:
+    """
+    Get statistics for the pooled DynamoDB clients of this process
+    
+    Returns:
+        dict: Registry entries with connection pool utilisation
+    """
+    stats = registry.stats()
+    stats['entries'] = [entry for entry in stats['entries'] if entry['service'] == 'dynamodb']
+    return stats
+
+def reset_dynamodb_registry():
+    """
+    Drop all pooled clients and resources, e.g. after changing endpoints in tests
+    """
+    registry.reset()
+
+def use_client_fast_path() -> bool:
+    """
+    Check whether reads should use the low-level client and direct codec
+    
+    Returns:
+        bool: True when DYNAMODB_ACCESS_MODE is 'client'
+    """
+    return current_app.config.get('DYNAMODB_ACCESS_MODE', 'resource') == 'client'
+
+def _metrics_target(index_name: str = None) -> str:
+    """
+    Name a table or index for capacity and latency metrics
+    """
+    table_name = current_app.config['DYNAMODB_TABLE']
+    return f"{table_name}/{index_name}" if index_name else table_name
 
 def generate_id():
     """
@@ -54,6 +239,34 @@ def generate_id():
     """
     return str(uuid.uuid4())
 
+def entity_shard(entity_type: str, pk: str) -> str:
+    """
+    Get the EntityShard key for an item
+    
+    Args:
+        entity_type (str): The item's EntityType
+        pk (str): The item's partition key
+    
+    Returns:
+        str: Shard key such as 'USER#3'
+    """
+    shard = zlib.crc32(pk.encode()) % current_app.config['ENTITY_SHARD_COUNT']
+    return f"{entity_type}#{shard}"
+
+def with_entity_shard(item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Add the EntityShard key to an item of a sharded entity type, in place
+    
+    Args:
+        item (dict): The item to be written
+    
+    Returns:
+        dict: The same item
+    """
+    if item.get('EntityType') in SHARDED_ENTITY_TYPES:
+        item['EntityShard'] = entity_shard(item['EntityType'], item['PK'])
+    return item
+
 def create_item(item: Dict[str, Any]) -> Dict[str, Any]:
     """
     Generic function to create an item in DynamoDB
@@ -65,42 +278,100 @@ def create_item(item: Dict[str, Any]) -> Dict[str, Any]:
         dict: The created item
     """
     table = get_table()
+    with_entity_shard(item)
     
     try:
-        response = table.put_item(Item=item)
+        call_dynamodb('PutItem', table.put_item, _metrics_target(), Item=item)
         return item
     except ClientError as e:
         current_app.logger.error(f"Error creating item in DynamoDB: {e}")
         raise
 
-def get_item(pk: str, sk: str) -> Optional[Dict[str, Any]]:
+def build_projection(attributes: List[str],
+                     expression_attribute_names: Dict[str, str] = None) -> Tuple[str, Dict[str, str]]:
+    """
+    Build a ProjectionExpression with a #name alias for every attribute
+    
+    Aliasing every attribute keeps reserved words such as Name or Role safe.
+    
+    Args:
+        attributes (list): Top-level attribute names to return
+        expression_attribute_names (dict, optional): Names already used by the
+            request, merged into the result. Defaults to None.
+    
+    Returns:
+        tuple: (projection_expression, expression_attribute_names)
+    """
+    names = dict(expression_attribute_names or {})
+    placeholders = []
+    
+    for index, attribute in enumerate(dict.fromkeys(attributes)):
+        placeholder = f'#proj{index}'
+        names[placeholder] = attribute
+        placeholders.append(placeholder)
+    
+    return ', '.join(placeholders), names
+
+def get_item(pk: str, sk: str, projection: List[str] = None,
+             consistent_read: bool = False, raise_errors: bool = False,
+             attribute_map: Dict[str, str] = None) -> Optional[Dict[str, Any]]:
     """
     Generic function to get an item from DynamoDB
     
     Args:
         pk (str): Partition key
         sk (str): Sort key
+        projection (list, optional): Attributes to return. Defaults to all.
+        consistent_read (bool, optional): Use a strongly consistent read. Defaults to False.
+        raise_errors (bool, optional): Raise ClientError instead of returning
+            None, for callers that must tell a failed read from a missing item.
+            Defaults to False.
+        attribute_map (dict, optional): Stored attribute -> returned name. Only
+            mapped attributes are returned; on the client fast path the others
+            are never decoded. Defaults to returning the item as stored.
     
     Returns:
         dict or None: The item if found, None otherwise
     """
-    table = get_table()
+    table = None if use_client_fast_path() else get_table()
+    
+    get_params = {
+        'Key': {
+            'PK': pk,
+            'SK': sk
+        }
+    }
+    
+    if projection:
+        get_params['ProjectionExpression'], get_params['ExpressionAttributeNames'] = build_projection(projection)
+    
+    if consistent_read:
+        get_params['ConsistentRead'] = True
     
     try:
-        response = table.get_item(
-            Key={
-                'PK': pk,
-                'SK': sk
-            }
-        )
+        if use_client_fast_path():
+            response = call_dynamodb(
+                'GetItem',
+                get_dynamodb_client().get_item,
+                _metrics_target(),
+                **to_client_params(get_params, current_app.config['DYNAMODB_TABLE'])
+            )
+            item = response.get('Item')
+            return decode_item(item, attribute_map) if item else None
+        
+        response = call_dynamodb('GetItem', table.get_item, _metrics_target(), **get_params)
         
-        return response.get('Item')
+        item = response.get('Item')
+        return _map_attributes(item, attribute_map) if item and attribute_map else item
     except ClientError as e:
         current_app.logger.error(f"Error getting item from DynamoDB: {e}")
+        if raise_errors:
+            raise
         return None
 
 def update_item(pk: str, sk: str, update_expression: str, expression_attribute_values: Dict[str, Any], 
-                expression_attribute_names: Dict[str, str] = None) -> Optional[Dict[str, Any]]:
+                expression_attribute_names: Dict[str, str] = None,
+                condition_expression: str = None) -> Optional[Dict[str, Any]]:
     """
     Generic function to update an item in DynamoDB
     
@@ -110,9 +381,11 @@ def update_item(pk: str, sk: str, update_expression: str, expression_attribute_v
         update_expression (str): Update expression
         expression_attribute_values (dict): Expression attribute values
         expression_attribute_names (dict, optional): Expression attribute names
+        condition_expression (str, optional): Condition the item must meet. Defaults to None.
     
     Returns:
-        dict or None: The updated item if successful, None otherwise
+        dict or None: The updated item if successful, None otherwise, including
+            when the condition is not met
     """
     table = get_table()
     
@@ -129,10 +402,17 @@ def update_item(pk: str, sk: str, update_expression: str, expression_attribute_v
     if expression_attribute_names:
         update_params['ExpressionAttributeNames'] = expression_attribute_names
     
+    if condition_expression:
+        update_params['ConditionExpression'] = condition_expression
+    
     try:
-        response = table.update_item(**update_params)
+        response = call_dynamodb('UpdateItem', table.update_item, _metrics_target(), **update_params)
         return response.get('Attributes')
     except ClientError as e:
+        # A failed condition is an expected outcome, e.g. updating a profile that was never mirrored
+        if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+            current_app.logger.debug(f"Condition not met updating {pk}/{sk}")
+            return None
         current_app.logger.error(f"Error updating item in DynamoDB: {e}")
         return None
 
@@ -150,7 +430,10 @@ def delete_item(pk: str, sk: str) -> bool:
     table = get_table()
     
     try:
-        table.delete_item(
+        call_dynamodb(
+            'DeleteItem',
+            table.delete_item,
+            _metrics_target(),
             Key={
                 'PK': pk,
                 'SK': sk
@@ -161,23 +444,21 @@ def delete_item(pk: str, sk: str) -> bool:
         current_app.logger.error(f"Error deleting item from DynamoDB: {e}")
         return False
 
-def query_items(index_name: str = None, key_condition_expression=None, 
-               filter_expression=None, expression_attribute_values: Dict[str, Any] = None,
-               expression_attribute_names: Dict[str, str] = None) -> List[Dict[str, Any]]:
+def _build_query_params(index_name: str = None, key_condition_expression=None,
+                        filter_expression=None, expression_attribute_values: Dict[str, Any] = None,
+                        expression_attribute_names: Dict[str, str] = None,
+                        scan_index_forward: bool = True, page_size: int = None,
+                        projection: List[str] = None, consistent_read: bool = False) -> Dict[str, Any]:
     """
-    Generic function to query items from DynamoDB
-    
-    Args:
-        index_name (str, optional): Name of the index to query. Defaults to None.
-        key_condition_expression: Key condition expression
-        filter_expression: Filter expression
-        expression_attribute_values (dict, optional): Expression attribute values
-        expression_attribute_names (dict, optional): Expression attribute names
+    Build the keyword arguments for a Table.query call
     
     Returns:
-        list: List of items matching the query
+        dict: Query parameters
     """
-    table = get_table()
+    if projection:
+        projection_expression, expression_attribute_names = build_projection(
+            projection, expression_attribute_names
+        )
     
     query_params = {}
     
@@ -196,242 +477,1582 @@ def query_items(index_name: str = None, key_condition_expression=None,
     if expression_attribute_names:
         query_params['ExpressionAttributeNames'] = expression_attribute_names
     
-    try:
-        response = table.query(**query_params)
-        return response.get('Items', [])
-    except ClientError as e:
-        current_app.logger.error(f"Error querying items from DynamoDB: {e}")
-        return []
+    if not scan_index_forward:
+        query_params['ScanIndexForward'] = False
+    
+    if page_size:
+        query_params['Limit'] = page_size
+    
+    if projection:
+        query_params['ProjectionExpression'] = projection_expression
+    
+    if consistent_read:
+        query_params['ConsistentRead'] = True
+    
+    return query_params
 
-# User-specific operations
-def create_user(user_data: Dict[str, Any]) -> Dict[str, Any]:
+def _map_attributes(item: Dict[str, Any], attribute_map: Dict[str, str]) -> Dict[str, Any]:
     """
-    Create a new user in DynamoDB
+    Rename an item's attributes, dropping those not in the map
     
     Args:
-        user_data (dict): User data including email, name, role, etc.
+        item (dict): Decoded item
+        attribute_map (dict): Stored attribute -> returned name
     
     Returns:
-        dict: The created user data
+        dict: The mapped attributes
     """
-    # Generate a unique ID for the user
-    user_id = generate_id()
-    timestamp = int(time.time())
+    return {name: item[attribute] for attribute, name in attribute_map.items() if attribute in item}
+
+def _iter_query_pages(query_params: Dict[str, Any], exclusive_start_key: Dict[str, Any] = None,
+                      attribute_map: Dict[str, str] = None):
+    """
+    Lazily follow LastEvaluatedKey across query pages
     
-    # Create the item to store in DynamoDB
-    item = {
-        'PK': f"USER#{user_id}",
-        'SK': 'PROFILE',
-        'EntityType': 'USER',
-        'GSI1PK': f"EMAIL#{user_data['email'].lower()}",
-        'GSI1SK': 'USER',
-        'UserId': user_id,
-        'Email': user_data['email'].lower(),
-        'Name': user_data['name'],
-        'Role': user_data['role'],
-        'PasswordHash': user_data['password_hash'],
-        'CreatedAt': timestamp,
-        'UpdatedAt': timestamp
-    }
+    Args:
+        query_params (dict): Parameters for Table.query
+        exclusive_start_key (dict, optional): Key to start after. Defaults to None.
+        attribute_map (dict, optional): Stored attribute -> returned name. Defaults to None.
     
-    # Add optional fields if they exist
-    if 'parent_id' in user_data and user_data['role'] == 'child':
-        item['ParentId'] = user_data['parent_id']
-        
-        # Create relationship between child and parent
-        parent_relation = {
-            'PK': f"USER#{user_data['parent_id']}",
-            'SK': f"CHILD#{user_id}",
-            'EntityType': 'RELATIONSHIP',
-            'GSI1PK': f"PARENT#{user_data['parent_id']}",
-            'GSI1SK': f"CHILD#{user_id}",
-            'ChildId': user_id,
-            'ParentId': user_data['parent_id'],
-            'CreatedAt': timestamp
-        }
-        try:
-            create_item(parent_relation)
-        except Exception as e:
-            current_app.logger.warning(f"Failed to create parent-child relationship: {str(e)}")
+    Yields:
+        tuple: (items, last_evaluated_key) for each page read
+    """
+    target = _metrics_target(query_params.get('IndexName'))
+    fast_path = use_client_fast_path()
     
-    # Put the item in the table
-    try:
-        create_item(item)
-    except Exception as e:
-        current_app.logger.error(f"Failed to create user: {str(e)}")
-        raise
+    if fast_path:
+        query = get_dynamodb_client().query
+        query_params = to_client_params(query_params, current_app.config['DYNAMODB_TABLE'])
+    else:
+        query = get_table().query
     
-    # Return the user data (excluding password hash)
-    return {
-        'user_id': user_id,
-        'email': user_data['email'],
-        'name': user_data['name'],
-        'role': user_data['role'],
-        'created_at': timestamp
-    }
+    while True:
+        if exclusive_start_key:
+            query_params['ExclusiveStartKey'] = encode_item(exclusive_start_key) if fast_path else exclusive_start_key
+        
+        response = call_dynamodb('Query', query, target, **query_params)
+        exclusive_start_key = response.get('LastEvaluatedKey')
+        items = response.get('Items', [])
+        
+        if fast_path:
+            items = [decode_item(item, attribute_map) for item in items]
+            if exclusive_start_key:
+                exclusive_start_key = decode_item(exclusive_start_key)
+        elif attribute_map:
+            items = [_map_attributes(item, attribute_map) for item in items]
+        
+        yield items, exclusive_start_key
+        
+        if not exclusive_start_key:
+            return
 
-def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
+def iter_query(index_name: str = None, key_condition_expression=None,
+               filter_expression=None, expression_attribute_values: Dict[str, Any] = None,
+               expression_attribute_names: Dict[str, str] = None, limit: int = None,
+               scan_index_forward: bool = True, page_size: int = None,
+               exclusive_start_key: Dict[str, Any] = None, projection: List[str] = None,
+               consistent_read: bool = False, attribute_map: Dict[str, str] = None) -> Iterator[Dict[str, Any]]:
     """
-    Get a user by email
+    Generic generator that streams query results from DynamoDB
+    
+    Pages are only requested from DynamoDB as the caller consumes items, so
+    stopping early never reads (or pays for) the rest of the partition.
     
     Args:
-        email (str): User's email
+        index_name (str, optional): Name of the index to query. Defaults to None.
+        key_condition_expression: Key condition expression
+        filter_expression: Filter expression
+        expression_attribute_values (dict, optional): Expression attribute values
+        expression_attribute_names (dict, optional): Expression attribute names
+        limit (int, optional): Maximum number of items to yield. Defaults to None.
+        scan_index_forward (bool, optional): Sort key order. Defaults to True.
+        page_size (int, optional): Items DynamoDB evaluates per request. Defaults to None.
+        exclusive_start_key (dict, optional): Key to start after. Defaults to None.
+        projection (list, optional): Attributes to return. Defaults to all.
+        consistent_read (bool, optional): Use strongly consistent reads (base
+            table only; GSIs reject this). Defaults to False.
+        attribute_map (dict, optional): Stored attribute -> returned name. Only
+            mapped attributes are returned; on the client fast path the others
+            are never decoded. Defaults to returning items as stored.
     
-    Returns:
-        dict or None: User data if found, None otherwise
+    Yields:
+        dict: Items matching the query
     """
-    # Query the GSI1 index to find the user by email
-    items = query_items(
-        index_name='GSI1',
-        key_condition_expression=Key('GSI1PK').eq(f"EMAIL#{email.lower()}") & Key('GSI1SK').eq('USER')
-    )
+    if limit is not None and limit <= 0:
+        return
     
-    # Return the user if found
-    if items:
-        item = items[0]
-        return {
-            'user_id': item['UserId'],
-            'email': item['Email'],
-            'name': item['Name'],
-            'role': item['Role'],
-            'password_hash': item['PasswordHash'],
-            'created_at': item['CreatedAt']
-        }
+    query_params = _build_query_params(
+        index_name, key_condition_expression, filter_expression,
+        expression_attribute_values, expression_attribute_names,
+        scan_index_forward, page_size or limit, projection, consistent_read
+    )
     
-    return None
+    count = 0
+    for items, _ in _iter_query_pages(query_params, exclusive_start_key, attribute_map):
+        for item in items:
+            yield item
+            count += 1
+            if limit is not None and count >= limit:
+                return
 
-def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
+def query_page(index_name: str = None, key_condition_expression=None,
+               filter_expression=None, expression_attribute_values: Dict[str, Any] = None,
+               expression_attribute_names: Dict[str, str] = None, limit: int = 50,
+               scan_index_forward: bool = True, cursor: str = None,
+               cursor_scope: str = '', projection: List[str] = None,
+               consistent_read: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str]]:
     """
-    Get a user by ID
+    Generic function to read one page of query results for an API response
     
     Args:
-        user_id (str): User's ID
+        index_name (str, optional): Name of the index to query. Defaults to None.
+        key_condition_expression: Key condition expression
+        filter_expression: Filter expression
+        expression_attribute_values (dict, optional): Expression attribute values
+        expression_attribute_names (dict, optional): Expression attribute names
+        limit (int, optional): Maximum number of items in the page. Defaults to 50.
+        scan_index_forward (bool, optional): Sort key order. Defaults to True.
+        cursor (str, optional): Cursor returned with the previous page. Defaults to None.
+        cursor_scope (str, optional): Value the cursor is bound to, e.g. the
+            partition being listed. Defaults to ''.
+        projection (list, optional): Attributes to return; key attributes are
+            always included so the cursor can be built. Defaults to all.
+        consistent_read (bool, optional): Use strongly consistent reads. Defaults to False.
     
     Returns:
-        dict or None: User data if found, None otherwise
+        tuple: (items, next_cursor) where next_cursor is None on the last page
+    
+    Raises:
+        ValueError: If the cursor is malformed, tampered with or out of scope
     """
-    # Get the user by ID
-    item = get_item(f"USER#{user_id}", 'PROFILE')
+    exclusive_start_key = decode_cursor(cursor, cursor_scope) if cursor else None
     
-    # Return the user if found
-    if item:
-        return {
-            'user_id': item['UserId'],
-            'email': item['Email'],
-            'name': item['Name'],
-            'role': item['Role'],
-            'created_at': item['CreatedAt']
-        }
+    if projection:
+        projection = list(projection) + list(INDEX_KEY_ATTRIBUTES[index_name])
     
-    return None
+    query_params = _build_query_params(
+        index_name, key_condition_expression, filter_expression,
+        expression_attribute_values, expression_attribute_names,
+        scan_index_forward, limit, projection, consistent_read
+    )
+    
+    results = []
+    for items, last_evaluated_key in _iter_query_pages(query_params, exclusive_start_key):
+        for position, item in enumerate(items):
+            results.append(item)
+            if len(results) >= limit:
+                # Resume after the last returned item rather than the end of the
+                # page, so nothing that was read but not returned is skipped
+                more = position < len(items) - 1 or last_evaluated_key
+                next_cursor = encode_cursor(_item_key(item, index_name), cursor_scope) if more else None
+                return results, next_cursor
+    
+    return results, None
 
-def update_user(user_id: str, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+def query_sharded_page(entity_type: str, limit: int = 50, cursor: str = None,
+                       projection: List[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
     """
-    Update a user in DynamoDB
+    Read one page of a sharded entity type, ordered by PK
+    
+    Every shard is queried in parallel for up to limit items and the results
+    are merge-sorted. The cursor records the position reached in each shard,
+    so items read but not returned are read again on the next page.
     
     Args:
-        user_id (str): User's ID
-        updates (dict): Updates to apply to the user
+        entity_type (str): A type in SHARDED_ENTITY_TYPES
+        limit (int, optional): Maximum number of items in the page. Defaults to 50.
+        cursor (str, optional): Cursor returned with the previous page. Defaults to None.
+        projection (list, optional): Attributes to return; key attributes are
+            always included so the cursor can be built. Defaults to all.
     
     Returns:
-        dict or None: The updated user data if successful, None otherwise
+        tuple: (items, next_cursor) where next_cursor is None on the last page
+    
+    Raises:
+        ValueError: If the cursor is malformed, tampered with or was issued for
+            another entity type or shard count
     """
-    # Build update expression and attribute values
-    update_parts = []
-    expression_attribute_values = {
-        ':updated_at': int(time.time())
-    }
-    expression_attribute_names = {
-        '#updated_at': 'UpdatedAt'
-    }
+    shard_count = current_app.config['ENTITY_SHARD_COUNT']
+    scope = f"{ENTITY_SHARD_INDEX}:{entity_type}:{shard_count}"
     
-    for key, value in updates.items():
-        # Skip certain fields that should not be updated directly
-        if key in ['user_id', 'email', 'password_hash', 'created_at']:
-            continue
-        
-        # Add to update expression and values
-        field_name = key[0].upper() + key[1:]  # Convert camelCase to PascalCase for DynamoDB
-        expression_attribute_names[f'#{key}'] = field_name
-        update_parts.append(f'#{key} = :{key}')
-        expression_attribute_values[f':{key}'] = value
+    # Shard -> key to resume after (None for the start); finished shards are dropped
+    if cursor:
+        positions = decode_cursor(cursor, scope)
+    else:
+        positions = {str(shard): None for shard in range(shard_count)}
     
-    # Add UpdatedAt to update expression
-    update_parts.append('#updated_at = :updated_at')
+    if projection:
+        projection = list(projection) + list(INDEX_KEY_ATTRIBUTES[ENTITY_SHARD_INDEX])
     
-    # If there's nothing to update, return None
-    if not update_parts:
-        return None
+    app = current_app._get_current_object()
     
-    update_expression = 'SET ' + ', '.join(update_parts)
+    def read_shard(shard: str) -> List[Dict[str, Any]]:
+        with app.app_context():
+            # One extra item tells us whether the shard has more after this page
+            return list(iter_query(
+                index_name=ENTITY_SHARD_INDEX,
+                key_condition_expression=Key('EntityShard').eq(f"{entity_type}#{shard}"),
+                limit=limit + 1,
+                exclusive_start_key=positions[shard],
+                projection=projection
+            ))
     
-    # Update the item
-    updated_item = update_item(
-        pk=f"USER#{user_id}",
-        sk='PROFILE',
-        update_expression=update_expression,
-        expression_attribute_values=expression_attribute_values,
-        expression_attribute_names=expression_attribute_names
+    shards = list(positions)
+    with ThreadPoolExecutor(max_workers=max(len(shards), 1), thread_name_prefix='shard') as executor:
+        results = dict(zip(shards, executor.map(read_shard, shards)))
+    
+    merged = heapq.merge(
+        *[[(shard, item) for item in items] for shard, items in results.items()],
+        key=lambda entry: (entry[1]['PK'], entry[1]['SK'])
     )
     
-    # Return the updated user data if successful
-    if updated_item:
-        return {
-            'user_id': updated_item['UserId'],
-            'email': updated_item['Email'],
-            'name': updated_item['Name'],
-            'role': updated_item['Role'],
-            'created_at': updated_item['CreatedAt'],
-            'updated_at': updated_item['UpdatedAt']
-        }
+    page = []
+    returned = dict.fromkeys(shards, 0)
+    last_returned = {}
+    for shard, item in merged:
+        if len(page) >= limit:
+            break
+        page.append(item)
+        returned[shard] += 1
+        last_returned[shard] = item
     
-    return None
+    # A shard is finished once everything it returned made it onto the page
+    next_positions = {}
+    for shard, items in results.items():
+        if returned[shard] < len(items):
+            next_positions[shard] = (
+                _item_key(last_returned[shard], ENTITY_SHARD_INDEX) if shard in last_returned else positions[shard]
+            )
+    
+    return page, encode_cursor(next_positions, scope) if next_positions else None
 
-def delete_user(user_id: str) -> bool:
+def _item_key(item: Dict[str, Any], index_name: str = None) -> Dict[str, Any]:
     """
-    Delete a user from DynamoDB
+    Extract the key attributes DynamoDB expects in ExclusiveStartKey
     
     Args:
-        user_id (str): User's ID
+        item (dict): Item returned by a query
+        index_name (str, optional): Index the item was read from. Defaults to None.
     
     Returns:
-        bool: True if deleted successfully, False otherwise
+        dict: Table key plus index key attributes
     """
-    # First get the user to check their role and related data
-    user = get_user_by_id(user_id)
-    if not user:
-        return False
+    return {name: item[name] for name in INDEX_KEY_ATTRIBUTES[index_name] if name in item}
+
+def _cursor_signature(payload: bytes, scope: str) -> bytes:
+    secret = current_app.config.get('SECRET_KEY')
+    # An empty key would let anyone forge a cursor for any scope
+    if not secret:
+        raise RuntimeError("SECRET_KEY must be set to sign pagination cursors")
+    return hmac.new(secret.encode(), scope.encode() + b'|' + payload, hashlib.sha256).digest()
+
+def encode_cursor(key: Dict[str, Any], scope: str = '') -> str:
+    """
+    Encode a DynamoDB key as an opaque, signed cursor token
     
-    # Delete the user's profile
-    success = delete_item(f"USER#{user_id}", 'PROFILE')
+    Args:
+        key (dict): ExclusiveStartKey to resume from
+        scope (str, optional): Value the cursor is bound to. Defaults to ''.
     
-    # If the user is a parent, we might need to handle their children
-    # If the user is a child, we might need to update the parent's records
-    # This would be implemented based on specific business requirements
+    Returns:
+        str: URL-safe cursor token
     
-    return success
+    Raises:
+        RuntimeError: If SECRET_KEY is not set
+    """
+    payload = json.dumps(key, separators=(',', ':'), sort_keys=True,
+                         default=lambda value: {'$n': str(value)}).encode()
+    signature = _cursor_signature(payload, scope)
+    return f"{_b64encode(payload)}.{_b64encode(signature)}"
 
-def get_children_by_parent_id(parent_id: str) -> List[Dict[str, Any]]:
+def decode_cursor(token: str, scope: str = '') -> Dict[str, Any]:
     """
-    Get all children for a parent
+    Decode and verify a cursor token produced by encode_cursor
     
     Args:
-        parent_id (str): Parent's ID
+        token (str): Cursor token
+        scope (str, optional): Value the cursor must be bound to. Defaults to ''.
     
     Returns:
-        list: List of children data
+        dict: ExclusiveStartKey to resume from
+    
+    Raises:
+        ValueError: If the token is malformed, tampered with or out of scope
+        RuntimeError: If SECRET_KEY is not set
     """
-    # Query to find all children relationships for the parent
-    items = query_items(
-        key_condition_expression=Key('PK').eq(f"USER#{parent_id}") & Key('SK').begins_with('CHILD#')
-    )
+    try:
+        encoded_payload, encoded_signature = token.split('.')
+        payload = _b64decode(encoded_payload)
+        signature = _b64decode(encoded_signature)
+    except (ValueError, binascii.Error):
+        raise ValueError("Malformed cursor")
     
-    # Get the full user data for each child
-    children = []
+    if not hmac.compare_digest(signature, _cursor_signature(payload, scope)):
+        raise ValueError("Invalid cursor")
+    
+    return json.loads(payload, object_hook=_decode_cursor_value)
+
+def _decode_cursor_value(value: Dict[str, Any]) -> Any:
+    if set(value) == {'$n'}:
+        return decimal.Decimal(value['$n'])
+    return value
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+def query_items(index_name: str = None, key_condition_expression=None, 
+               filter_expression=None, expression_attribute_values: Dict[str, Any] = None,
+               expression_attribute_names: Dict[str, str] = None, limit: int = None,
+               scan_index_forward: bool = True, projection: List[str] = None,
+               consistent_read: bool = False) -> List[Dict[str, Any]]:
+    """
+    Generic function to query items from DynamoDB
+    
+    Follows LastEvaluatedKey, so results are not truncated at the 1 MB page
+    boundary. Use iter_query to stream large result sets instead.
+    
+    Args:
+        index_name (str, optional): Name of the index to query. Defaults to None.
+        key_condition_expression: Key condition expression
+        filter_expression: Filter expression
+        expression_attribute_values (dict, optional): Expression attribute values
+        expression_attribute_names (dict, optional): Expression attribute names
+        limit (int, optional): Maximum number of items to return. Defaults to None.
+        scan_index_forward (bool, optional): Sort key order. Defaults to True.
+        projection (list, optional): Attributes to return. Defaults to all.
+        consistent_read (bool, optional): Use strongly consistent reads. Defaults to False.
+    
+    Returns:
+        list: List of items matching the query
+    """
+    try:
+        return list(iter_query(
+            index_name=index_name,
+            key_condition_expression=key_condition_expression,
+            filter_expression=filter_expression,
+            expression_attribute_values=expression_attribute_values,
+            expression_attribute_names=expression_attribute_names,
+            limit=limit,
+            scan_index_forward=scan_index_forward,
+            projection=projection,
+            consistent_read=consistent_read
+        ))
+    except ClientError as e:
+        current_app.logger.error(f"Error querying items from DynamoDB: {e}")
+        return []
+
+def _backoff_sleep(attempt: int):
+    """
+    Sleep for a jittered, exponentially growing interval before a retry
+    
+    Args:
+        attempt (int): Zero-based retry attempt
+    """
+    time.sleep(random.uniform(0, min(BATCH_BACKOFF_CAP, BATCH_BACKOFF_BASE * (2 ** attempt))))
+
+def batch_get_items(keys: List[Dict[str, Any]], projection: List[str] = None,
+                    consistent_read: bool = False) -> List[Dict[str, Any]]:
+    """
+    Generic function to get many items from DynamoDB with BatchGetItem
+    
+    Keys are fetched in chunks of 100 and unprocessed keys are retried with
+    jittered exponential backoff. Duplicate keys are only fetched once.
+    
+    Args:
+        keys (list): Keys to fetch, each a dict with 'PK' and 'SK'
+        projection (list, optional): Attributes to return; PK and SK are always
+            included so results can be matched to keys. Defaults to all.
+        consistent_read (bool, optional): Use strongly consistent reads. Defaults to False.
+    
+    Returns:
+        list: The items found, in the order of the requested keys
+    
+    Raises:
+        UnprocessedKeysError: If keys are still unprocessed after BATCH_MAX_RETRIES
+        ClientError: If a request fails
+    """
+    if not keys:
+        return []
+    
+    fast_path = use_client_fast_path()
+    dynamodb = get_dynamodb_client() if fast_path else get_dynamodb_resource()
+    table_name = current_app.config['DYNAMODB_TABLE']
+    encode_key = encode_item if fast_path else dict
+    
+    # De-duplicate while preserving the requested order
+    unique_keys = list({(key['PK'], key['SK']): key for key in keys}.values())
+    
+    request_options = {}
+    if projection:
+        request_options['ProjectionExpression'], request_options['ExpressionAttributeNames'] = build_projection(
+            ['PK', 'SK'] + list(projection)
+        )
+    if consistent_read:
+        request_options['ConsistentRead'] = True
+    
+    found = {}
+    try:
+        for start in range(0, len(unique_keys), BATCH_GET_MAX_KEYS):
+            request_items = {
+                table_name: dict(
+                    request_options,
+                    Keys=[encode_key({'PK': key['PK'], 'SK': key['SK']})
+                          for key in unique_keys[start:start + BATCH_GET_MAX_KEYS]]
+                )
+            }
+            
+            attempt = 0
+            while request_items:
+                response = call_dynamodb('BatchGetItem', dynamodb.batch_get_item, table_name, RequestItems=request_items)
+                
+                for item in response.get('Responses', {}).get(table_name, []):
+                    if fast_path:
+                        item = decode_item(item)
+                    found[(item['PK'], item['SK'])] = item
+                
+                request_items = response.get('UnprocessedKeys') or {}
+                if request_items:
+                    if attempt >= BATCH_MAX_RETRIES:
+                        unprocessed = request_items.get(table_name, {}).get('Keys', [])
+                        if fast_path:
+                            unprocessed = [decode_item(key) for key in unprocessed]
+                        current_app.logger.error(f"Giving up on {len(unprocessed)} unprocessed keys after {attempt} retries")
+                        # A partial result would look complete to callers
+                        raise UnprocessedKeysError(unprocessed)
+                    _backoff_sleep(attempt)
+                    attempt += 1
+    except ClientError as e:
+        current_app.logger.error(f"Error batch getting items from DynamoDB: {e}")
+        raise
+    
+    return [found[(key['PK'], key['SK'])] for key in keys if (key['PK'], key['SK']) in found]
+
+class BulkWriter:
+    """
+    Context manager that buffers puts and deletes into BatchWriteItem requests
+    
+    Requests are de-duplicated by key (the last write wins), sent in batches of
+    25, and unprocessed items are resubmitted with jittered exponential backoff.
+    With max_workers > 1 full batches are flushed from a thread pool. If the
+    with-body raises, requests still buffered are discarded rather than sent;
+    batches already dispatched are waited for.
+    
+    Example:
+        with BulkWriter(max_workers=4) as writer:
+            for item in items:
+                writer.put(item)
+        print(writer.stats['items_per_second'])
+    """
+    
+    def __init__(self, max_workers: int = 1):
+        """
+        Args:
+            max_workers (int, optional): Threads used to flush batches. Defaults to 1.
+        """
+        # Captured up front so worker threads don't need an app context
+        self._resource = get_dynamodb_resource()
+        self._table_name = current_app.config['DYNAMODB_TABLE']
+        self._logger = current_app.logger
+        
+        self._pending = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+        self._futures = []
+        self._lock = threading.Lock()
+        self._started_at = None
+        
+        self.failed = []
+        self.stats = {
+            'puts': 0,
+            'deletes': 0,
+            'written': 0,
+            'failed': 0,
+            'batches': 0,
+            'retries': 0,
+            'throttles': 0,
+            'elapsed_seconds': 0.0,
+            'items_per_second': 0.0
+        }
+    
+    def __enter__(self):
+        self._started_at = time.monotonic()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.flush()
+            else:
+                # Don't write half of a failed operation
+                if self._pending:
+                    self._logger.warning(f"Discarding {len(self._pending)} buffered writes after an error")
+                self._pending = {}
+        finally:
+            if self._executor:
+                self._executor.shutdown(wait=True)
+        
+        elapsed = time.monotonic() - self._started_at
+        self.stats['elapsed_seconds'] = round(elapsed, 3)
+        self.stats['items_per_second'] = round(self.stats['written'] / elapsed, 1) if elapsed > 0 else 0.0
+        self._logger.info(
+            f"Bulk write finished: {self.stats['written']} written, {self.stats['failed']} failed, "
+            f"{self.stats['items_per_second']} items/sec, {self.stats['throttles']} throttles"
+        )
+        return False
+    
+    def put(self, item: Dict[str, Any]):
+        """
+        Queue an item to be written
+        
+        Args:
+            item (dict): The item to put
+        """
+        self.stats['puts'] += 1
+        self._add((item['PK'], item['SK']), {'PutRequest': {'Item': item}})
+    
+    def delete(self, pk: str, sk: str):
+        """
+        Queue an item to be deleted
+        
+        Args:
+            pk (str): Partition key
+            sk (str): Sort key
+        """
+        self.stats['deletes'] += 1
+        self._add((pk, sk), {'DeleteRequest': {'Key': {'PK': pk, 'SK': sk}}})
+    
+    def _add(self, key: Tuple[str, str], request: Dict[str, Any]):
+        # Re-inserting moves the key to the end; a batch never repeats a key
+        self._pending.pop(key, None)
+        self._pending[key] = request
+        
+        if len(self._pending) >= BATCH_WRITE_MAX_ITEMS:
+            self._dispatch()
+    
+    def _dispatch(self):
+        requests = list(self._pending.values())
+        self._pending = {}
+        
+        if self._executor:
+            self._futures.append(self._executor.submit(self._write_batch, requests))
+        else:
+            self._write_batch(requests)
+    
+    def flush(self):
+        """
+        Send everything buffered so far and wait for in-flight batches
+        """
+        if self._pending:
+            self._dispatch()
+        
+        futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+    
+    def _write_batch(self, requests: List[Dict[str, Any]]):
+        attempt = 0
+        while requests:
+            try:
+                response = self._resource.batch_write_item(RequestItems={self._table_name: requests})
+                written = len(requests)
+                requests = response.get('UnprocessedItems', {}).get(self._table_name, [])
+                written -= len(requests)
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') not in THROTTLING_ERROR_CODES:
+                    self._logger.error(f"Error batch writing items to DynamoDB: {e}")
+                    raise
+                written = 0
+            
+            with self._lock:
+                self.stats['written'] += written
+                # Resubmissions are counted as retries, not batches
+                if attempt == 0:
+                    self.stats['batches'] += 1
+                if requests:
+                    self.stats['throttles'] += 1
+            
+            if requests:
+                if attempt >= BATCH_MAX_RETRIES:
+                    self._logger.error(f"Giving up on {len(requests)} unprocessed items after {attempt} retries")
+                    with self._lock:
+                        self.stats['failed'] += len(requests)
+                        self.failed.extend(requests)
+                    return
+                _backoff_sleep(attempt)
+                attempt += 1
+                with self._lock:
+                    self.stats['retries'] += 1
+
+def _serialize_transact_action(action: Dict[str, Any], table_name: str) -> Dict[str, Any]:
+    """
+    Convert a high-level transaction action into the low-level client format
+    
+    Args:
+        action (dict): A single-key dict such as {'Put': {'Item': {...}}}
+        table_name (str): Table used when the action doesn't name one
+    
+    Returns:
+        dict: The action with attribute values serialized
+    """
+    (action_type, params), = action.items()
+    params = dict(params)
+    params.setdefault('TableName', table_name)
+    
+    for field in ('Item', 'Key', 'ExpressionAttributeValues'):
+        if field in params:
+            params[field] = {name: _serializer.serialize(value) for name, value in params[field].items()}
+    
+    return {action_type: params}
+
+def transact_write(actions: List[Dict[str, Any]]) -> None:
+    """
+    Generic function to write several items atomically with TransactWriteItems
+    
+    Each action is a dict with a single 'Put', 'Update', 'Delete' or
+    'ConditionCheck' key whose value takes the same parameters as the
+    matching Table method (plain Python values, string expressions).
+    TableName defaults to the configured table.
+    
+    Args:
+        actions (list): Up to 100 transaction actions
+    
+    Raises:
+        ValueError: If there are no actions or more than 100
+        ClientError: If the transaction is cancelled or fails
+    """
+    if not actions or len(actions) > TRANSACT_MAX_ITEMS:
+        raise ValueError(f"A transaction needs between 1 and {TRANSACT_MAX_ITEMS} actions")
+    
+    table_name = current_app.config['DYNAMODB_TABLE']
+    client = get_dynamodb_client()
+    
+    try:
+        call_dynamodb(
+            'TransactWriteItems',
+            client.transact_write_items,
+            table_name,
+            TransactItems=[_serialize_transact_action(action, table_name) for action in actions]
+        )
+    except ClientError as e:
+        current_app.logger.error(f"Error writing transaction to DynamoDB: {e}")
+        raise
+
+def transaction_cancellation_codes(error: ClientError) -> List[Optional[str]]:
+    """
+    Get the per-action cancellation codes from a cancelled transaction
+    
+    Args:
+        error (ClientError): The error raised by transact_write
+    
+    Returns:
+        list: One code per action (e.g. 'ConditionalCheckFailed'), None for actions
+              that did not cause the cancellation
+    """
+    if error.response.get('Error', {}).get('Code') != 'TransactionCanceledException':
+        return []
+    
+    codes = []
+    for reason in error.response.get('CancellationReasons', []):
+        code = reason.get('Code')
+        codes.append(None if code in (None, 'None') else code)
+    return codes
+
+# Attributes read by the user mapping functions
+USER_PROFILE_ATTRIBUTES = ['UserId', 'Email', 'Name', 'Role', 'CreatedAt', 'AvatarKey', 'Points', 'ParentId']
+USER_CREDENTIAL_ATTRIBUTES = USER_PROFILE_ATTRIBUTES + ['PasswordHash']
+
+# Public field -> stored attribute, for building update expressions
+USER_FIELD_ATTRIBUTES = {field: attribute for attribute, field in USER_ATTRIBUTE_MAP.items()}
+
+# Profile attributes copied onto the CHILD#<id> relationship items under
+# USER#<parent>, so a family is listed with a single Query on the parent's
+# partition. Email is copied too; it never changes after sign-up.
+CHILD_SNIPPET_ATTRIBUTES = ['Email', 'Name', 'Role', 'AvatarKey', 'Points']
+
+# User profile cache
+#
+# Profiles are read far more often than they change, so lookups by ID and by
+# email go through an in-process read-through cache. Each worker process has
+# its own cache, so a change made by another process can be served stale for
+# up to PROFILE_CACHE_TTL seconds; writes made through this module invalidate
+# the local entries immediately.
+_profile_cache = None
+_profile_cache_lock = threading.Lock()
+
+def get_profile_cache() -> Optional[TTLCache]:
+    """
+    Get the process-wide user profile cache
+    
+    Returns:
+        TTLCache or None: The cache, or None if PROFILE_CACHE_ENABLED is off
+    """
+    global _profile_cache
+    
+    config = current_app.config
+    if not config.get('PROFILE_CACHE_ENABLED', True):
+        return None
+    
+    if _profile_cache is None:
+        with _profile_cache_lock:
+            if _profile_cache is None:
+                _profile_cache = TTLCache(
+                    max_size=config.get('PROFILE_CACHE_SIZE', 10000),
+                    ttl=config.get('PROFILE_CACHE_TTL', 300),
+                    negative_ttl=config.get('PROFILE_CACHE_NEGATIVE_TTL', 30)
+                )
+    
+    return _profile_cache
+
+def get_profile_cache_stats() -> Dict[str, Any]:
+    """
+    Get hit/miss/eviction counters for the profile cache
+    
+    Returns:
+        dict: Cache statistics, or {'enabled': False} if the cache is off
+    """
+    cache = get_profile_cache()
+    if cache is None:
+        return {'enabled': False}
+    
+    return dict(cache.stats(), enabled=True)
+
+def reset_profile_cache():
+    """
+    Drop the profile cache so it is rebuilt from the current configuration
+    """
+    global _profile_cache
+    
+    with _profile_cache_lock:
+        _profile_cache = None
+
+def invalidate_user_cache(user_id: str = None, email: str = None):
+    """
+    Remove a user's cached profile entries
+    
+    Args:
+        user_id (str, optional): User's ID. Defaults to None.
+        email (str, optional): User's email. Defaults to None.
+    """
+    cache = get_profile_cache()
+    if cache is None:
+        return
+    
+    keys = []
+    if user_id:
+        keys.append(('id', user_id))
+    if email:
+        keys.append(('email', email.lower()))
+    cache.invalidate(*keys)
+
+def get_cached_user(user_id: str) -> Optional[UserRecord]:
+    """
+    Get a user's profile only if it is already in the profile cache
+    
+    Args:
+        user_id (str): User's ID
+    
+    Returns:
+        UserRecord or None: The cached profile, or None without reading DynamoDB
+    """
+    cache = get_profile_cache()
+    if cache is None:
+        return None
+    
+    return cache.get(('id', user_id))
+
+def _cached_user(key: Tuple[str, str], loader) -> Optional[UserRecord]:
+    """
+    Read a user through the profile cache
+    
+    Args:
+        key (tuple): Cache key
+        loader (callable): Function that reads the user from DynamoDB
+    
+    Returns:
+        UserRecord or None: The user if found, None otherwise
+    """
+    cache = get_profile_cache()
+    if cache is None:
+        return loader()
+    
+    # Records are immutable, so the cached instance is shared without copying
+    return cache.get_or_load(key, loader)
+
+# Children cache
+#
+# The children listing is read on every dashboard load, so pages are cached
+# per parent for a short time. Each parent's pages live under one entry, so
+# registering, updating or deleting a child drops all of them at once.
+_children_cache = None
+_children_cache_lock = threading.Lock()
+
+def get_children_cache() -> Optional[TTLCache]:
+    """
+    Get the process-wide children page cache
+    
+    Returns:
+        TTLCache or None: The cache, or None if CHILDREN_CACHE_ENABLED is off
+    """
+    global _children_cache
+    
+    config = current_app.config
+    if not config.get('CHILDREN_CACHE_ENABLED', True):
+        return None
+    
+    if _children_cache is None:
+        with _children_cache_lock:
+            if _children_cache is None:
+                _children_cache = TTLCache(
+                    max_size=config.get('CHILDREN_CACHE_SIZE', 10000),
+                    ttl=config.get('CHILDREN_CACHE_TTL', 60),
+                    negative_ttl=0
+                )
+    
+    return _children_cache
+
+def get_children_cache_stats() -> Dict[str, Any]:
+    """
+    Get hit/miss/eviction counters for the children page cache
+    
+    Returns:
+        dict: Cache statistics, or {'enabled': False} if the cache is off
+    """
+    cache = get_children_cache()
+    if cache is None:
+        return {'enabled': False}
+    
+    return dict(cache.stats(), enabled=True)
+
+def reset_children_cache():
+    """
+    Drop the children page cache so it is rebuilt from the current configuration
+    """
+    global _children_cache
+    
+    with _children_cache_lock:
+        _children_cache = None
+
+def invalidate_children_cache(*parent_ids: str):
+    """
+    Remove the cached children pages of parents
+    
+    Args:
+        *parent_ids (str): Parents' IDs
+    """
+    cache = get_children_cache()
+    if cache is not None:
+        cache.invalidate(*parent_ids)
+
+# User-specific operations
+def create_user(user_data: Dict[str, Any]) -> UserRecord:
+    """
+    Create a new user in DynamoDB
+    
+    The profile, an email uniqueness claim and (for children) the parent
+    relationship are written in a single transaction.
+    
+    Users mirrored from Cognito pass their sub as user_id and have no
+    password hash.
+    
+    Args:
+        user_data (dict): User data including email, name, role, etc.
+    
+    Returns:
+        UserRecord: The created user data
+    
+    Raises:
+        ValueError: If a user with the same email already exists
+    """
+    # Generate a unique ID for the user unless one is given
+    user_id = user_data.get('user_id') or generate_id()
+    timestamp = int(time.time())
+    created_at = int(user_data.get('created_at') or timestamp)
+    
+    email = user_data['email'].lower()
+    
+    # Create the item to store in DynamoDB
+    item = {
+        'PK': f"USER#{user_id}",
+        'SK': 'PROFILE',
+        'EntityType': 'USER',
+        'GSI1PK': f"EMAIL#{email}",
+        'GSI1SK': 'USER',
+        'UserId': user_id,
+        'Email': email,
+        'Name': user_data['name'],
+        'Role': user_data['role'],
+        'CreatedAt': created_at,
+        'UpdatedAt': timestamp
+    }
+    if user_data.get('password_hash'):
+        item['PasswordHash'] = user_data['password_hash']
+    with_entity_shard(item)
+    
+    # Claim the email address; a conditional put on this item is what keeps
+    # two profiles from ever sharing the same EMAIL# GSI key
+    actions = [
+        {
+            'Put': {
+                'Item': {
+                    'PK': f"EMAIL#{email}",
+                    'SK': 'EMAIL',
+                    'EntityType': 'EMAIL',
+                    'UserId': user_id,
+                    'CreatedAt': timestamp
+                },
+                'ConditionExpression': 'attribute_not_exists(PK)'
+            }
+        },
+        {
+            'Put': {
+                'Item': item,
+                'ConditionExpression': 'attribute_not_exists(PK)'
+            }
+        }
+    ]
+    
+    # Add optional fields if they exist
+    for field in ('avatar_key', 'points'):
+        if user_data.get(field) is not None:
+            item[USER_FIELD_ATTRIBUTES[field]] = user_data[field]
+    
+    if 'parent_id' in user_data and user_data['role'] == 'child':
+        item['ParentId'] = user_data['parent_id']
+        
+        # Create relationship between child and parent, carrying the child's snippet
+        parent_relation = {
+            'PK': f"USER#{user_data['parent_id']}",
+            'SK': f"CHILD#{user_id}",
+            'EntityType': 'RELATIONSHIP',
+            'GSI1PK': f"PARENT#{user_data['parent_id']}",
+            'GSI1SK': f"CHILD#{user_id}",
+            'ChildId': user_id,
+            'ParentId': user_data['parent_id'],
+            'CreatedAt': created_at,
+            **_child_snippet(item)
+        }
+        actions.append({'Put': {'Item': parent_relation}})
+    
+    # Write the email claim, profile and relationship in one round trip
+    try:
+        transact_write(actions)
+    except ClientError as e:
+        if transaction_cancellation_codes(e)[:1] == ['ConditionalCheckFailed']:
+            raise ValueError("User with this email already exists")
+        current_app.logger.error(f"Failed to create user: {str(e)}")
+        raise
+    
+    # Forget any cached "no such user" answer for this email
+    invalidate_user_cache(email=email)
+    if item.get('ParentId'):
+        invalidate_children_cache(item['ParentId'])
+    
+    # Return the user data (excluding password hash)
+    return UserRecord(user_id, user_data['email'], user_data['name'], user_data['role'], created_at,
+                      avatar_key=item.get('AvatarKey'), points=item.get('Points'), parent_id=item.get('ParentId'))
+
+def _child_snippet(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Get the part of a child's profile copied onto their relationship item
+    
+    Args:
+        profile (dict): The child's PROFILE item
+    
+    Returns:
+        dict: Snippet attributes that are set
+    """
+    return {
+        attribute: profile[attribute]
+        for attribute in CHILD_SNIPPET_ATTRIBUTES
+        if profile.get(attribute) is not None
+    }
+
+def _sync_child_snippet(profile: Dict[str, Any]) -> bool:
+    """
+    Copy a child's current snippet onto their parent's relationship item
+    
+    Args:
+        profile (dict): The child's updated PROFILE item
+    
+    Returns:
+        bool: True if the relationship item was updated, False otherwise
+    """
+    snippet = _child_snippet(profile)
+    if not snippet:
+        return False
+    
+    names = {f"#s{index}": attribute for index, attribute in enumerate(snippet)}
+    values = {f":s{index}": snippet[attribute] for index, attribute in enumerate(snippet)}
+    
+    # Never recreate a relationship that has been removed
+    updated = update_item(
+        pk=f"USER#{profile['ParentId']}",
+        sk=f"CHILD#{profile['UserId']}",
+        update_expression='SET ' + ', '.join(f"{name} = :{name[1:]}" for name in names),
+        expression_attribute_values=values,
+        expression_attribute_names=names,
+        condition_expression='attribute_exists(PK)'
+    )
+    invalidate_children_cache(profile['ParentId'])
+    return updated is not None
+
+def sync_child_snippet(parent_id: str, child_id: str, fields: Dict[str, Any]) -> bool:
+    """
+    Copy changed profile fields of a child onto their parent's relationship item
+    
+    Args:
+        parent_id (str): Parent's ID
+        child_id (str): Child's ID
+        fields (dict): Changed fields by UserRecord name, e.g. {'name': 'New Name'}
+    
+    Returns:
+        bool: True if the relationship item was updated, False otherwise
+    """
+    profile = {
+        USER_FIELD_ATTRIBUTES[field]: value
+        for field, value in fields.items()
+        if field in USER_FIELD_ATTRIBUTES
+    }
+    return _sync_child_snippet({**profile, 'ParentId': parent_id, 'UserId': child_id})
+
+def get_user_by_email(email: str) -> Optional[UserRecord]:
+    """
+    Get a user by email
+    
+    Args:
+        email (str): User's email
+    
+    Returns:
+        UserRecord or None: User data including the password hash if found, None otherwise
+    """
+    return _cached_user(('email', email.lower()), lambda: _load_user_by_email(email))
+
+def _load_user_by_email(email: str) -> Optional[UserRecord]:
+    """
+    Read a user by email from DynamoDB, bypassing the cache
+    
+    Args:
+        email (str): User's email
+    
+    Returns:
+        UserRecord or None: User data including the password hash if found, None otherwise
+    
+    Raises:
+        ClientError: If the read fails, so it is never cached as a miss
+    """
+    # Query the GSI1 index to find the user by email
+    items = list(iter_query(
+        index_name='GSI1',
+        key_condition_expression=Key('GSI1PK').eq(f"EMAIL#{email.lower()}") & Key('GSI1SK').eq('USER'),
+        projection=USER_CREDENTIAL_ATTRIBUTES,
+        limit=1,
+        attribute_map=USER_ATTRIBUTE_MAP
+    ))
+    
+    # Return the user if found
+    if items:
+        return UserRecord.from_fields(items[0], include_password=True)
+    
+    return None
+
+def get_user_by_id(user_id: str, consistent_read: bool = False) -> Optional[UserRecord]:
+    """
+    Get a user by ID
+    
+    Args:
+        user_id (str): User's ID
+        consistent_read (bool, optional): Read the latest committed profile,
+            bypassing the cache. Defaults to False.
+    
+    Returns:
+        UserRecord or None: User data if found, None otherwise
+    """
+    if consistent_read:
+        user = _load_user_by_id(user_id, consistent_read=True)
+        
+        # Refresh the cache with what we just read
+        cache = get_profile_cache()
+        if cache is not None:
+            if user is None:
+                cache.set_missing(('id', user_id))
+            else:
+                cache.set(('id', user_id), user)
+        return user
+    
+    return _cached_user(('id', user_id), lambda: _load_user_by_id(user_id))
+
+def _load_user_by_id(user_id: str, consistent_read: bool = False) -> Optional[UserRecord]:
+    """
+    Read a user by ID from DynamoDB, bypassing the cache
+    
+    Args:
+        user_id (str): User's ID
+        consistent_read (bool, optional): Use a strongly consistent read. Defaults to False.
+    
+    Returns:
+        UserRecord or None: User data if found, None otherwise
+    
+    Raises:
+        ClientError: If the read fails, so it is never cached as a miss
+    """
+    # Get the user by ID
+    fields = get_item(f"USER#{user_id}", 'PROFILE', projection=USER_PROFILE_ATTRIBUTES,
+                      consistent_read=consistent_read, raise_errors=True,
+                      attribute_map=USER_ATTRIBUTE_MAP)
+    
+    # Return the user if found
+    if fields:
+        return UserRecord.from_fields(fields)
+    
+    return None
+
+def update_user(user_id: str, updates: Dict[str, Any], must_exist: bool = False) -> Optional[UserRecord]:
+    """
+    Update a user in DynamoDB
+    
+    Args:
+        user_id (str): User's ID
+        updates (dict): Updates to apply to the user
+        must_exist (bool, optional): Only update an existing profile instead of
+            creating a partial one. Defaults to False.
+    
+    Returns:
+        UserRecord or None: The updated user data if successful, None otherwise
+    """
+    # Build update expression and attribute values
+    update_parts = []
+    expression_attribute_values = {
+        ':updated_at': int(time.time())
+    }
+    expression_attribute_names = {
+        '#updated_at': 'UpdatedAt'
+    }
+    
+    for key, value in updates.items():
+        # Skip certain fields that should not be updated directly
+        if key in ['user_id', 'email', 'password_hash', 'created_at']:
+            continue
+        
+        # Add to update expression and values
+        field_name = USER_FIELD_ATTRIBUTES.get(key, key[0].upper() + key[1:])  # Convert to PascalCase for DynamoDB
+        expression_attribute_names[f'#{key}'] = field_name
+        update_parts.append(f'#{key} = :{key}')
+        expression_attribute_values[f':{key}'] = value
+    
+    # Add UpdatedAt to update expression
+    update_parts.append('#updated_at = :updated_at')
+    
+    # If there's nothing to update, return None
+    if not update_parts:
+        return None
+    
+    update_expression = 'SET ' + ', '.join(update_parts)
+    
+    # Update the item
+    updated_item = update_item(
+        pk=f"USER#{user_id}",
+        sk='PROFILE',
+        update_expression=update_expression,
+        expression_attribute_values=expression_attribute_values,
+        expression_attribute_names=expression_attribute_names,
+        condition_expression='attribute_exists(PK)' if must_exist else None
+    )
+    
+    # Drop stale cache entries whether or not the update succeeded
+    invalidate_user_cache(user_id, updated_item.get('Email') if updated_item else None)
+    
+    # Keep the snippet on the parent's relationship item in step with the profile
+    changed = set(expression_attribute_names.values())
+    if updated_item and updated_item.get('ParentId') and changed.intersection(CHILD_SNIPPET_ATTRIBUTES):
+        _sync_child_snippet(updated_item)
+    
+    # Return the updated user data if successful
+    if updated_item:
+        return UserRecord.from_item(updated_item)
+    
+    return None
+
+def user_item_keys(user_id: str, email: str = None) -> List[Dict[str, Any]]:
+    """
+    Find the keys of every item that belongs to a user
+    
+    This is the user's whole item collection (profile, CHILD# relationships
+    and any other USER#<id> items), the CHILD# relationship items under other
+    users that point at them, and their EMAIL# uniqueness claim.
+    
+    Args:
+        user_id (str): User's ID
+        email (str, optional): User's email, read from the profile if not given
+    
+    Returns:
+        list: Keys with 'PK' and 'SK'
+    """
+    collection = query_items(
+        key_condition_expression=Key('PK').eq(f"USER#{user_id}"),
+        projection=['PK', 'SK', 'Email'],
+        consistent_read=True
+    )
+    
+    inverse = query_items(
+        index_name='EntityTypeIndex',
+        key_condition_expression=Key('EntityType').eq('RELATIONSHIP') & Key('SK').eq(f"CHILD#{user_id}"),
+        projection=['PK', 'SK']
+    )
+    
+    keys = [{'PK': item['PK'], 'SK': item['SK']} for item in collection + inverse]
+    
+    if email is None:
+        email = next((item.get('Email') for item in collection if item['SK'] == 'PROFILE'), None)
+    if email:
+        keys.append({'PK': f"EMAIL#{email.lower()}", 'SK': 'EMAIL'})
+    
+    # A transaction may not touch the same item twice
+    return list({(key['PK'], key['SK']): key for key in keys}.values())
+
+def delete_user(user_id: str) -> bool:
+    """
+    Delete a user and everything that belongs to them from DynamoDB
+    
+    The profile, the user's item collection, relationship items pointing at
+    the user and the email claim are removed. Collections of up to 100 items
+    are deleted in one transaction; larger ones are deleted in batches with the
+    profile and email claim removed last, so a failed run can be repeated.
+    
+    Args:
+        user_id (str): User's ID
+    
+    Returns:
+        bool: True if deleted successfully, False otherwise
+    """
+    profile = get_item(f"USER#{user_id}", 'PROFILE', projection=['Email'], consistent_read=True)
+    if not profile:
+        return False
+    
+    email = profile['Email'].lower()
+    keys = user_item_keys(user_id, email)
+    
+    profile_key = (f"USER#{user_id}", 'PROFILE')
+    claim_key = (f"EMAIL#{email}", 'EMAIL')
+    
+    # Only release the email claim if it is still ours (or predates claims)
+    final_actions = [
+        {'Delete': {'Key': {'PK': profile_key[0], 'SK': profile_key[1]}}},
+        {
+            'Delete': {
+                'Key': {'PK': claim_key[0], 'SK': claim_key[1]},
+                'ConditionExpression': 'attribute_not_exists(PK) OR UserId = :user_id',
+                'ExpressionAttributeValues': {':user_id': user_id}
+            }
+        }
+    ]
+    others = [key for key in keys if (key['PK'], key['SK']) not in (profile_key, claim_key)]
+    
+    try:
+        if len(others) + len(final_actions) <= TRANSACT_MAX_ITEMS:
+            transact_write([{'Delete': {'Key': key}} for key in others] + final_actions)
+        else:
+            with BulkWriter() as writer:
+                for key in others:
+                    writer.delete(key['PK'], key['SK'])
+            if writer.failed:
+                current_app.logger.error(f"Failed to delete {len(writer.failed)} items of user {user_id}")
+                return False
+            transact_write(final_actions)
+    except ClientError as e:
+        current_app.logger.error(f"Failed to delete user {user_id}: {str(e)}")
+        return False
+    finally:
+        invalidate_user_cache(user_id, email)
+        invalidate_children_cache(user_id, *{
+            key['PK'][len('USER#'):] for key in keys
+            if key['SK'] == f"CHILD#{user_id}"
+        })
+    
+    return True
+
+def get_children_by_parent_id(parent_id: str) -> List[UserRecord]:
+    """
+    Get all children for a parent
+    
+    The relationship items under the parent carry each child's profile
+    snippet, so the family is usually served by a single Query. Children
+    whose relationship predates snippets are read from their profiles.
+    
+    Args:
+        parent_id (str): Parent's ID
+    
+    Returns:
+        list: List of children data
+    """
+    # Query the parent's partition for all children relationships
+    items = query_items(
+        key_condition_expression=Key('PK').eq(f"USER#{parent_id}") & Key('SK').begins_with('CHILD#'),
+        projection=['ChildId', 'ParentId', 'CreatedAt'] + CHILD_SNIPPET_ATTRIBUTES
+    )
+    
+    return _children_from_relationships(items)
+
+def _children_from_relationships(items: List[Dict[str, Any]]) -> List[UserRecord]:
+    """
+    Build children from their relationship items
+    
+    Args:
+        items (list): CHILD# relationship items, in order
+    
+    Returns:
+        list: Children, reading profiles only for relationships without a snippet
+    """
+    # Fetch the profiles of children without a snippet in one batch
+    profiles = {
+        profile['UserId']: profile
+        for profile in batch_get_items([
+            {'PK': f"USER#{item['ChildId']}", 'SK': 'PROFILE'}
+            for item in items
+            if 'Name' not in item
+        ], projection=USER_PROFILE_ATTRIBUTES)
+    }
+    
+    children = []
     for item in items:
-        child_id = item['ChildId']
-        child_data = get_user_by_id(child_id)
-        if child_data:
-            children.append(child_data)
+        if 'Name' in item:
+            children.append(UserRecord.from_item({**item, 'UserId': item['ChildId']}))
+        elif item['ChildId'] in profiles:
+            children.append(UserRecord.from_item(profiles[item['ChildId']]))
+    
+    return children
+
+def _load_children_page(parent_id: str, limit: int, cursor: Optional[str],
+                        consistent_read: bool = False) -> Tuple[List[UserRecord], Optional[str]]:
+    items, next_cursor = query_page(
+        key_condition_expression=Key('PK').eq(f"USER#{parent_id}") & Key('SK').begins_with('CHILD#'),
+        limit=limit,
+        cursor=cursor,
+        cursor_scope=f"CHILDREN:{parent_id}",
+        projection=['ChildId', 'ParentId', 'CreatedAt'] + CHILD_SNIPPET_ATTRIBUTES,
+        consistent_read=consistent_read
+    )
+    return _children_from_relationships(items), next_cursor
+
+def get_children_page(parent_id: str, limit: int = 50, cursor: str = None,
+                      consistent_read: bool = False) -> Tuple[List[UserRecord], Optional[str]]:
+    """
+    Get one page of a parent's children, ordered by child ID
+    
+    Pages are served from the children cache for up to CHILDREN_CACHE_TTL
+    seconds unless a consistent read is requested.
+    
+    Args:
+        parent_id (str): Parent's ID
+        limit (int, optional): Maximum number of children in the page. Defaults to 50.
+        cursor (str, optional): Cursor returned with the previous page. Defaults to None.
+        consistent_read (bool, optional): Read the table directly with a strongly
+            consistent query. Defaults to False.
+    
+    Returns:
+        tuple: (children, next_cursor) where next_cursor is None on the last page
+    
+    Raises:
+        ValueError: If the cursor is invalid
+    """
+    cache = get_children_cache()
+    if cache is None or consistent_read:
+        return _load_children_page(parent_id, limit, cursor, consistent_read)
+    
+    # Pages are stored with their own expiry so adding one doesn't extend the others
+    entry = (cache.get(parent_id) or {}).get((limit, cursor))
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+    
+    def add_page(pages, page):
+        now = time.monotonic()
+        pages = {page_key: entry for page_key, entry in (pages or {}).items() if entry[0] > now}
+        pages[(limit, cursor)] = (now + cache.ttl, page)
+        return pages
+    
+    # The page is dropped rather than cached if the family changes while it loads
+    return cache.load_into(parent_id, lambda: _load_children_page(parent_id, limit, cursor), add_page)
+
+def children_imported(parent_id: str) -> bool:
+    """
+    Check whether a parent's Cognito family has been copied to the table
+    
+    Args:
+        parent_id (str): Parent's ID
+    
+    Returns:
+        bool: True if import_children has run for the parent
+    """
+    def load():
+        marker = get_item(f"USER#{parent_id}", 'FAMILY_IMPORT', projection=['ParentId'])
+        return True if marker else None
+    
+    cache = get_children_cache()
+    if cache is None:
+        return bool(load())
+    
+    # Imports are never undone, so only the positive answer is cached
+    return bool(cache.get_or_load(('imported', parent_id), load))
+
+def put_child_relationships(parent_id: str, children: List[Dict[str, Any]], imported: bool = False) -> Dict[str, Any]:
+    """
+    Write relationship items, with snippets, for children that exist outside the table
+    
+    Args:
+        parent_id (str): Parent's ID
+        children (list): Children with user_id, email, name, role and
+            optionally created_at
+        imported (bool, optional): Also record that the parent's whole family
+            has been imported. Defaults to False.
+    
+    Returns:
+        dict: BulkWriter statistics
+    """
+    timestamp = int(time.time())
+    
+    with BulkWriter() as writer:
+        for child in children:
+            writer.put({
+                'PK': f"USER#{parent_id}",
+                'SK': f"CHILD#{child['user_id']}",
+                'EntityType': 'RELATIONSHIP',
+                'GSI1PK': f"PARENT#{parent_id}",
+                'GSI1SK': f"CHILD#{child['user_id']}",
+                'ChildId': child['user_id'],
+                'ParentId': parent_id,
+                'CreatedAt': int(child.get('created_at') or timestamp),
+                **_child_snippet({
+                    'Email': child.get('email'),
+                    'Name': child.get('name'),
+                    'Role': child.get('role', 'child')
+                })
+            })
+        if imported:
+            writer.put({
+                'PK': f"USER#{parent_id}",
+                'SK': 'FAMILY_IMPORT',
+                'EntityType': 'FAMILY_IMPORT',
+                'ParentId': parent_id,
+                'CreatedAt': timestamp
+            })
+    
+    invalidate_children_cache(parent_id)
+    return writer.stats
+
+def list_users(limit: int = 50, cursor: str = None) -> Tuple[List[UserRecord], Optional[str]]:
+    """
+    List all users, ordered by ID, across the USER shards of EntityShardIndex
+    
+    Args:
+        limit (int, optional): Maximum number of users in the page. Defaults to 50.
+        cursor (str, optional): Cursor returned with the previous page. Defaults to None.
+    
+    Returns:
+        tuple: (users, next_cursor) where next_cursor is None on the last page
+    
+    Raises:
+        ValueError: If the cursor is invalid
+    """
+    items, next_cursor = query_sharded_page('USER', limit=limit, cursor=cursor,
+                                            projection=USER_PROFILE_ATTRIBUTES)
+    return [UserRecord.from_item(item) for item in items], next_cursor
+
+# Cognito sub -> username index
+#
+# Cognito can only find a user by sub with a filtered ListUsers call, which
+# has a very low request quota. The username for each sub is stored under
+# COGNITO#<sub> so it can be read back with a single GetItem.
+def cognito_username_key(sub: str) -> Dict[str, str]:
+    """
+    Get the key of a Cognito sub's username item
+    
+    Args:
+        sub (str): Cognito user's sub
+    
+    Returns:
+        dict: PK and SK of the item
+    """
+    return {'PK': f"COGNITO#{sub}", 'SK': 'USERNAME'}
+
+def get_cognito_username(sub: str) -> Optional[str]:
+    """
+    Get the Cognito username recorded for a sub
+    
+    Args:
+        sub (str): Cognito user's sub
+    
+    Returns:
+        str or None: The username if recorded, None otherwise
+    """
+    key = cognito_username_key(sub)
+    item = get_item(key['PK'], key['SK'], projection=['Username'])
+    return item.get('Username') if item else None
+
+def put_cognito_username(sub: str, username: str) -> Dict[str, Any]:
+    """
+    Record the Cognito username for a sub
+    
+    Args:
+        sub (str): Cognito user's sub
+        username (str): Cognito username
+    
+    Returns:
+        dict: The stored item
+    """
+    return create_item({
+        **cognito_username_key(sub),
+        'EntityType': 'COGNITO_USERNAME',
+        'UserId': sub,
+        'Username': username,
+        'CreatedAt': int(time.time())
+    })
+
+def delete_cognito_username(sub: str) -> bool:
+    """
+    Remove the Cognito username recorded for a sub, e.g. after the user was deleted
+    
+    Args:
+        sub (str): Cognito user's sub
+    
+    Returns:
+        bool: True if deleted successfully, False otherwise
+    """
+    key = cognito_username_key(sub)
+    return delete_item(key['PK'], key['SK'])
+
+def claim_email(email: str, user_id: str, created_at: int = None) -> bool:
+    """
+    Write the EMAIL#<email> uniqueness claim for an existing user
+    
+    create_user writes claims for new users; this brings users created
+    before claims existed across. Re-claiming an email the user already
+    holds succeeds.
+    
+    Args:
+        email (str): User's email
+        user_id (str): User's ID
+        created_at (int, optional): When the claim was made. Defaults to now.
     
-    return children
\ No newline at end of file
+    Returns:
+        bool: True if the user holds the claim, False if another user does
+    """
+    try:
+        call_dynamodb(
+            'PutItem', get_table().put_item, _metrics_target(),
+            Item={
+                'PK': f"EMAIL#{email.lower()}",
+                'SK': 'EMAIL',
+                'EntityType': 'EMAIL',
+                'UserId': user_id,
+                'CreatedAt': created_at or int(time.time())
+            },
+            ConditionExpression='attribute_not_exists(PK) OR UserId = :user_id',
+            ExpressionAttributeValues={':user_id': user_id}
+        )
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+            return False
+        current_app.logger.error(f"Error claiming email for {user_id}: {e}")
+        raise
+    return True
\ No newline at end of file
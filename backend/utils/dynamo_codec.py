@@ -0,0 +1,182 @@
+import decimal
+from boto3.dynamodb.conditions import ConditionBase, ConditionExpressionBuilder
+from boto3.dynamodb.types import Binary
+from typing import Any, Dict, Mapping, Optional
+
+# Direct DynamoDB attribute-value codec for the low-level client.
+#
+# The resource API runs every item through TypeSerializer/TypeDeserializer,
+# which dispatch through several method lookups per value and turn every number
+# into a Decimal that the JSON provider later has to convert again. Our schema
+# only stores strings, numbers, booleans, nulls, maps and lists (plus the odd
+# set), so a small dispatch table is enough. Numbers are decoded straight to
+# int or float.
+
+# Parameters whose values are items or keys and need encoding
+_ITEM_PARAMS = ('Key', 'ExclusiveStartKey', 'Item')
+
+# Parameters that may hold boto3 condition objects
+_CONDITION_PARAMS = (
+    ('KeyConditionExpression', True),
+    ('FilterExpression', False),
+    ('ConditionExpression', False)
+)
+
+
+def _decode_number(value: str) -> Any:
+    # Integers are by far the most common case, so try them first
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+_DECODERS = {
+    'S': lambda value: value,
+    'N': _decode_number,
+    'BOOL': lambda value: value,
+    'NULL': lambda value: None,
+    'B': lambda value: bytes(value),
+    'SS': set,
+    'NS': lambda values: {_decode_number(value) for value in values},
+    'BS': lambda values: {bytes(value) for value in values},
+}
+
+
+def decode_value(attribute_value: Dict[str, Any]) -> Any:
+    """
+    Decode one DynamoDB attribute value
+
+    Args:
+        attribute_value (dict): Typed value, e.g. {'N': '42'}
+
+    Returns:
+        The plain Python value; numbers become int or float
+    """
+    (type_code, value), = attribute_value.items()
+
+    if type_code == 'M':
+        return {name: decode_value(nested) for name, nested in value.items()}
+    if type_code == 'L':
+        return [decode_value(nested) for nested in value]
+    return _DECODERS[type_code](value)
+
+
+def decode_item(item: Dict[str, Dict[str, Any]],
+                attribute_map: Optional[Mapping[str, str]] = None) -> Dict[str, Any]:
+    """
+    Decode a low-level item
+
+    Args:
+        item (dict): Item as returned by the low-level client
+        attribute_map (dict, optional): Stored attribute name to output name.
+            Attributes not in the map are skipped without being decoded.
+            Defaults to keeping every attribute under its stored name.
+
+    Returns:
+        dict: The decoded item
+    """
+    if attribute_map is None:
+        return {name: decode_value(value) for name, value in item.items()}
+
+    return {
+        output_name: decode_value(item[name])
+        for name, output_name in attribute_map.items()
+        if name in item
+    }
+
+
+def encode_value(value: Any) -> Dict[str, Any]:
+    """
+    Encode a Python value as a DynamoDB attribute value
+
+    Args:
+        value: str, int, float, Decimal, bool, None, bytes, dict, list or set
+
+    Returns:
+        dict: Typed value
+
+    Raises:
+        TypeError: If the value can't be stored in DynamoDB
+    """
+    # bool must be checked before int, which it subclasses
+    if isinstance(value, str):
+        return {'S': value}
+    if isinstance(value, bool):
+        return {'BOOL': value}
+    if value is None:
+        return {'NULL': True}
+    if isinstance(value, (int, decimal.Decimal)):
+        return {'N': str(value)}
+    if isinstance(value, float):
+        # repr gives the shortest string that round-trips
+        return {'N': repr(value)}
+    if isinstance(value, dict):
+        return {'M': {name: encode_value(nested) for name, nested in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return {'L': [encode_value(nested) for nested in value]}
+    if isinstance(value, (bytes, bytearray, Binary)):
+        return {'B': bytes(value.value if isinstance(value, Binary) else value)}
+    if isinstance(value, (set, frozenset)) and value:
+        sample = next(iter(value))
+        if isinstance(sample, str):
+            return {'SS': list(value)}
+        if isinstance(sample, (int, float, decimal.Decimal)) and not isinstance(sample, bool):
+            return {'NS': [encode_value(number)['N'] for number in value]}
+        if isinstance(sample, (bytes, bytearray)):
+            return {'BS': [bytes(member) for member in value]}
+    raise TypeError(f"Unsupported type {type(value).__name__} for DynamoDB")
+
+
+def encode_item(item: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Encode an item or key for the low-level client
+
+    Args:
+        item (dict): Plain Python item
+
+    Returns:
+        dict: Item of typed values
+    """
+    return {name: encode_value(value) for name, value in item.items()}
+
+
+def to_client_params(params: Dict[str, Any], table_name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Convert Table-style request parameters for the low-level client
+
+    Keys, items and expression values are encoded, and boto3 condition objects
+    are built into expression strings.
+
+    Args:
+        params (dict): Parameters as passed to a Table method
+        table_name (str, optional): Added as TableName when given. Defaults to None.
+
+    Returns:
+        dict: Parameters for the matching client method
+    """
+    client_params = dict(params)
+    names = dict(params.get('ExpressionAttributeNames') or {})
+    values = dict(params.get('ExpressionAttributeValues') or {})
+
+    builder = ConditionExpressionBuilder()
+    for param, is_key_condition in _CONDITION_PARAMS:
+        condition = params.get(param)
+        if isinstance(condition, ConditionBase):
+            built = builder.build_expression(condition, is_key_condition=is_key_condition)
+            client_params[param] = built.condition_expression
+            names.update(built.attribute_name_placeholders)
+            values.update(built.attribute_value_placeholders)
+
+    for param in _ITEM_PARAMS:
+        if param in params:
+            client_params[param] = encode_item(params[param])
+
+    if names:
+        client_params['ExpressionAttributeNames'] = names
+    if values:
+        client_params['ExpressionAttributeValues'] = encode_item(values)
+    if table_name:
+        client_params['TableName'] = table_name
+
+    return client_params
@@ -0,0 +1,1243 @@
+import bisect
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from decimal import Decimal
+from boto3.dynamodb.conditions import ConditionBase, ConditionExpressionBuilder
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from utils.dynamo_codec import encode_item
+
+# In-process stand-in for the single DynamoDB table.
+#
+# Implements the subset of the boto3 Table, resource and client APIs that
+# utils/database.py and utils/scan.py use, with the same request and response
+# shapes, so the real data-access code can be load tested and benchmarked
+# without AWS. Every partition of the table and of each GSI is kept as a
+# sorted list, so a Query costs O(log n + k) like the real service.
+#
+# Expressions (key conditions, filters, conditions, projections and updates)
+# are parsed and evaluated for the operators we use; boto3 condition objects
+# are built into expression strings first, exactly as boto3 does on the wire.
+# Latency and throttling can be injected to exercise timeouts and retries.
+
+# Index name -> (partition key, sort key), matching terraform/modules/dynamodb
+DEFAULT_INDEXES = {
+    'GSI1': ('GSI1PK', 'GSI1SK'),
+    'EntityTypeIndex': ('EntityType', 'SK'),
+    'EntityShardIndex': ('EntityShard', 'PK')
+}
+
+TRANSACT_MAX_ITEMS = 100
+BATCH_GET_MAX_KEYS = 100
+BATCH_WRITE_MAX_ITEMS = 25
+
+# Query and Scan stop after reading this much data, like DynamoDB's 1 MB page limit
+PAGE_SIZE_LIMIT = 1024 * 1024
+
+_MISSING = object()
+
+# Sorts after any string starting with the same prefix
+_PREFIX_END = chr(0x10FFFF)
+
+_TOKEN_RE = re.compile(r'\s*(?:(<>|<=|>=|[=<>(),+\-])|([#:]?[A-Za-z0-9_.]+))')
+
+_COMPARATORS = ('=', '<>', '<', '<=', '>', '>=')
+_CONDITION_FUNCTIONS = ('attribute_exists', 'attribute_not_exists', 'attribute_type', 'begins_with', 'contains')
+_OPERAND_FUNCTIONS = ('size', 'if_not_exists', 'list_append')
+_UPDATE_CLAUSES = ('SET', 'REMOVE', 'ADD', 'DELETE')
+
+_deserializer = TypeDeserializer()
+
+
+def _client_error(code: str, message: str, operation: str, **extra: Any) -> ClientError:
+    response = {'Error': {'Code': code, 'Message': message}}
+    response.update(extra)
+    return ClientError(response, operation)
+
+
+def _validation_error(message: str, operation: str = 'Expression') -> ClientError:
+    return _client_error('ValidationException', message, operation)
+
+
+# Expression parsing
+
+def _tokenize(expression: str) -> List[str]:
+    tokens = []
+    expression = expression.strip()
+    position = 0
+
+    while position < len(expression):
+        match = _TOKEN_RE.match(expression, position)
+        if not match or not (match.group(1) or match.group(2)):
+            raise _validation_error(f"Invalid expression near: {expression[position:]}")
+        tokens.append(match.group(1) or match.group(2))
+        position = match.end()
+
+    return tokens
+
+
+class _Parser:
+    """
+    Recursive-descent parser for DynamoDB condition and update expressions.
+
+    Conditions parse to nested tuples: ('or', a, b), ('and', a, b), ('not', a),
+    ('cmp', op, left, right), ('between', operand, low, high),
+    ('in', operand, [options]) and ('func', name, [args]). Operands are
+    ('path', token), ('value', token), ('func', name, [args]) or
+    ('arith', op, left, right).
+    """
+
+    def __init__(self, expression: str):
+        self.tokens = _tokenize(expression)
+        self.position = 0
+
+    def peek(self, offset: int = 0) -> Optional[str]:
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else None
+
+    def next(self) -> str:
+        token = self.peek()
+        if token is None:
+            raise _validation_error("Unexpected end of expression")
+        self.position += 1
+        return token
+
+    def expect(self, expected: str):
+        token = self.next()
+        if token.upper() != expected:
+            raise _validation_error(f"Expected '{expected}' but found '{token}'")
+
+    def at_keyword(self, keyword: str) -> bool:
+        token = self.peek()
+        return token is not None and token.upper() == keyword
+
+    def finish(self):
+        if self.peek() is not None:
+            raise _validation_error(f"Unexpected token '{self.peek()}'")
+
+    def condition(self) -> tuple:
+        node = self.conjunction()
+        while self.at_keyword('OR'):
+            self.position += 1
+            node = ('or', node, self.conjunction())
+        return node
+
+    def conjunction(self) -> tuple:
+        node = self.negation()
+        while self.at_keyword('AND'):
+            self.position += 1
+            node = ('and', node, self.negation())
+        return node
+
+    def negation(self) -> tuple:
+        if self.at_keyword('NOT'):
+            self.position += 1
+            return ('not', self.negation())
+        return self.comparison()
+
+    def comparison(self) -> tuple:
+        if self.peek() == '(':
+            self.position += 1
+            node = self.condition()
+            self.expect(')')
+            return node
+
+        token = self.peek()
+        if token and token.lower() in _CONDITION_FUNCTIONS and self.peek(1) == '(':
+            self.position += 2
+            return ('func', token.lower(), self.arguments())
+
+        left = self.operand()
+
+        if self.at_keyword('BETWEEN'):
+            self.position += 1
+            low = self.operand()
+            self.expect('AND')
+            return ('between', left, low, self.operand())
+
+        if self.at_keyword('IN'):
+            self.position += 1
+            self.expect('(')
+            return ('in', left, self.arguments())
+
+        comparator = self.next()
+        if comparator not in _COMPARATORS:
+            raise _validation_error(f"Expected a comparator but found '{comparator}'")
+        return ('cmp', comparator, left, self.operand())
+
+    def arguments(self) -> List[tuple]:
+        # The opening parenthesis has already been consumed
+        arguments = [self.value_expression()]
+        while self.peek() == ',':
+            self.position += 1
+            arguments.append(self.value_expression())
+        self.expect(')')
+        return arguments
+
+    def operand(self) -> tuple:
+        token = self.next()
+
+        if token.lower() in _OPERAND_FUNCTIONS and self.peek() == '(':
+            self.position += 1
+            return ('func', token.lower(), self.arguments())
+        if token.startswith(':'):
+            return ('value', token)
+        if token in _COMPARATORS or token in ('(', ')', ',', '+', '-') \
+                or token.upper() in ('AND', 'OR', 'NOT', 'BETWEEN', 'IN'):
+            raise _validation_error(f"Unexpected token '{token}'")
+        return ('path', token)
+
+    def value_expression(self) -> tuple:
+        node = self.operand()
+        if self.peek() in ('+', '-'):
+            operator = self.next()
+            node = ('arith', operator, node, self.operand())
+        return node
+
+    def update(self) -> List[Tuple[str, tuple, Optional[tuple]]]:
+        """
+        Parse an update expression into (clause, path, value) actions
+        """
+        actions = []
+        clause = None
+
+        while self.peek() is not None:
+            token = self.peek()
+            if token.upper() in _UPDATE_CLAUSES:
+                clause = token.upper()
+                self.position += 1
+            elif token == ',' and clause:
+                self.position += 1
+            elif clause is None:
+                raise _validation_error(f"Expected SET, REMOVE, ADD or DELETE but found '{token}'")
+
+            path = self.operand()
+            if path[0] != 'path':
+                raise _validation_error("Update actions must start with an attribute path")
+
+            if clause == 'SET':
+                self.expect('=')
+                actions.append((clause, path, self.value_expression()))
+            elif clause == 'REMOVE':
+                actions.append((clause, path, None))
+            else:
+                actions.append((clause, path, self.operand()))
+
+        if not actions:
+            raise _validation_error("Update expression has no actions")
+        return actions
+
+
+_parse_cache = {}
+_parse_cache_lock = threading.Lock()
+
+
+def _parse(expression: str, kind: str) -> Any:
+    """
+    Parse an expression, caching the result since the same few are reused constantly
+    """
+    cache_key = (kind, expression)
+    parsed = _parse_cache.get(cache_key)
+    if parsed is None:
+        parser = _Parser(expression)
+        parsed = parser.update() if kind == 'update' else parser.condition()
+        parser.finish()
+        with _parse_cache_lock:
+            if len(_parse_cache) > 4096:
+                _parse_cache.clear()
+            _parse_cache[cache_key] = parsed
+    return parsed
+
+
+# Expression evaluation
+
+class _Scope:
+    """
+    Resolves #name and :value placeholders for one request
+    """
+
+    __slots__ = ('names', 'values')
+
+    def __init__(self, names: Optional[Dict[str, str]], values: Optional[Dict[str, Any]]):
+        self.names = names or {}
+        self.values = values or {}
+
+    def path(self, token: str) -> List[str]:
+        parts = []
+        for part in token.split('.'):
+            if part.startswith('#'):
+                if part not in self.names:
+                    raise _validation_error(f"An expression attribute name used in the document path is not defined: {part}")
+                part = self.names[part]
+            parts.append(part)
+        return parts
+
+    def value(self, token: str) -> Any:
+        if token not in self.values:
+            raise _validation_error(f"An expression attribute value used in expression is not defined: {token}")
+        return self.values[token]
+
+
+def _lookup(item: Dict[str, Any], path: List[str]) -> Any:
+    value = item
+    for part in path:
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _operand_value(node: tuple, item: Dict[str, Any], scope: _Scope) -> Any:
+    kind = node[0]
+
+    if kind == 'path':
+        return _lookup(item, scope.path(node[1]))
+    if kind == 'value':
+        return scope.value(node[1])
+    if kind == 'arith':
+        left = _operand_value(node[2], item, scope)
+        right = _operand_value(node[3], item, scope)
+        if left is _MISSING or right is _MISSING:
+            raise _validation_error("An operand in the update expression does not exist")
+        return left + right if node[1] == '+' else left - right
+
+    name, arguments = node[1], node[2]
+    if name == 'size':
+        value = _operand_value(arguments[0], item, scope)
+        return _MISSING if value is _MISSING else len(value)
+    if name == 'if_not_exists':
+        value = _operand_value(arguments[0], item, scope)
+        return _operand_value(arguments[1], item, scope) if value is _MISSING else value
+    if name == 'list_append':
+        left = _operand_value(arguments[0], item, scope)
+        right = _operand_value(arguments[1], item, scope)
+        return list(left) + list(right)
+    raise _validation_error(f"Invalid function name: {name}")
+
+
+_ATTRIBUTE_TYPES = {
+    'S': str, 'N': (int, float, Decimal), 'BOOL': bool, 'M': dict, 'L': list,
+    'SS': set, 'NS': set, 'BS': set, 'B': (bytes, bytearray), 'NULL': type(None)
+}
+
+
+def _compare(operator: str, left: Any, right: Any) -> bool:
+    if left is _MISSING or right is _MISSING:
+        return operator == '<>'
+    try:
+        if operator == '=':
+            return left == right
+        if operator == '<>':
+            return left != right
+        if operator == '<':
+            return left < right
+        if operator == '<=':
+            return left <= right
+        if operator == '>':
+            return left > right
+        return left >= right
+    except TypeError:
+        # DynamoDB treats comparisons between different types as false
+        return False
+
+
+def _evaluate(node: tuple, item: Dict[str, Any], scope: _Scope) -> bool:
+    kind = node[0]
+
+    if kind == 'and':
+        return _evaluate(node[1], item, scope) and _evaluate(node[2], item, scope)
+    if kind == 'or':
+        return _evaluate(node[1], item, scope) or _evaluate(node[2], item, scope)
+    if kind == 'not':
+        return not _evaluate(node[1], item, scope)
+    if kind == 'cmp':
+        return _compare(node[1], _operand_value(node[2], item, scope), _operand_value(node[3], item, scope))
+    if kind == 'between':
+        value = _operand_value(node[1], item, scope)
+        return (_compare('>=', value, _operand_value(node[2], item, scope))
+                and _compare('<=', value, _operand_value(node[3], item, scope)))
+    if kind == 'in':
+        value = _operand_value(node[1], item, scope)
+        return any(_compare('=', value, _operand_value(option, item, scope)) for option in node[2])
+
+    name, arguments = node[1], node[2]
+    value = _operand_value(arguments[0], item, scope)
+    if name == 'attribute_exists':
+        return value is not _MISSING
+    if name == 'attribute_not_exists':
+        return value is _MISSING
+    if value is _MISSING:
+        return False
+
+    argument = _operand_value(arguments[1], item, scope)
+    if name == 'begins_with':
+        return isinstance(value, (str, bytes)) and isinstance(argument, type(value)) and value.startswith(argument)
+    if name == 'contains':
+        if isinstance(value, str):
+            return isinstance(argument, str) and argument in value
+        return isinstance(value, (set, list)) and argument in value
+    if name == 'attribute_type':
+        expected = _ATTRIBUTE_TYPES.get(argument)
+        return expected is not None and isinstance(value, expected) and not (
+            argument == 'N' and isinstance(value, bool)
+        )
+    raise _validation_error(f"Invalid function name: {name}")
+
+
+def _set_path(item: Dict[str, Any], path: List[str], value: Any):
+    target = item
+    for part in path[:-1]:
+        target = target.setdefault(part, {})
+    target[path[-1]] = value
+
+
+def _remove_path(item: Dict[str, Any], path: List[str]):
+    target = _lookup(item, path[:-1]) if len(path) > 1 else item
+    if isinstance(target, dict):
+        target.pop(path[-1], None)
+
+
+def _apply_update(item: Dict[str, Any], actions: list, scope: _Scope):
+    # All values are computed against the item as it was before the update
+    original = _copy_value(item)
+
+    for clause, path_node, value_node in actions:
+        path = scope.path(path_node[1])
+        if clause == 'SET':
+            _set_path(item, path, _operand_value(value_node, original, scope))
+        elif clause == 'REMOVE':
+            _remove_path(item, path)
+        elif clause == 'ADD':
+            value = _operand_value(value_node, original, scope)
+            current = _lookup(item, path)
+            if current is _MISSING:
+                _set_path(item, path, value)
+            elif isinstance(current, set):
+                _set_path(item, path, current | set(value))
+            else:
+                _set_path(item, path, current + value)
+        else:  # DELETE from a set
+            value = _operand_value(value_node, original, scope)
+            current = _lookup(item, path)
+            if isinstance(current, set):
+                remaining = current - set(value)
+                if remaining:
+                    _set_path(item, path, remaining)
+                else:
+                    _remove_path(item, path)
+
+
+def _normalize_expressions(params: Dict[str, Any], key_condition: bool = False) -> Tuple[Dict[str, Any], _Scope]:
+    """
+    Build boto3 condition objects into expression strings and collect placeholders
+    """
+    params = dict(params)
+    names = dict(params.get('ExpressionAttributeNames') or {})
+    values = dict(params.get('ExpressionAttributeValues') or {})
+    builder = ConditionExpressionBuilder()
+
+    for param, is_key_condition in (('KeyConditionExpression', True), ('FilterExpression', False),
+                                    ('ConditionExpression', False)):
+        condition = params.get(param)
+        if isinstance(condition, ConditionBase):
+            built = builder.build_expression(condition, is_key_condition=is_key_condition)
+            params[param] = built.condition_expression
+            names.update(built.attribute_name_placeholders)
+            values.update(built.attribute_value_placeholders)
+
+    return params, _Scope(names, values)
+
+
+# Items
+
+def _copy_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {name: _copy_value(nested) for name, nested in value.items()}
+    if isinstance(value, list):
+        return [_copy_value(nested) for nested in value]
+    if isinstance(value, set):
+        return set(value)
+    return value
+
+
+def _value_size(value: Any) -> int:
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, bool) or value is None:
+        return 1
+    if isinstance(value, (int, float, Decimal)):
+        return len(str(value)) // 2 + 1
+    if isinstance(value, dict):
+        return 3 + sum(len(name) + _value_size(nested) for name, nested in value.items())
+    if isinstance(value, (list, set)):
+        return 3 + sum(_value_size(nested) + 1 for nested in value)
+    return len(str(value))
+
+
+def item_size(item: Optional[Dict[str, Any]]) -> int:
+    """
+    Approximate the stored size of an item in bytes, as DynamoDB bills it
+
+    Args:
+        item (dict, optional): The item
+
+    Returns:
+        int: Size in bytes
+    """
+    if not item:
+        return 0
+    return sum(len(name.encode('utf-8')) + _value_size(value) for name, value in item.items())
+
+
+def _project(item: Dict[str, Any], projection: Optional[str], scope: _Scope) -> Dict[str, Any]:
+    if not projection:
+        return _copy_value(item)
+
+    projected = {}
+    for token in projection.split(','):
+        path = scope.path(token.strip())
+        value = _lookup(item, path)
+        if value is not _MISSING:
+            _set_path(projected, path, _copy_value(value))
+    return projected
+
+
+class _Partition:
+    """
+    One partition of the table or an index, ordered by (sort key, PK, SK)
+    """
+
+    __slots__ = ('sort_keys', 'entries')
+
+    def __init__(self):
+        self.sort_keys = []
+        self.entries = []
+
+    def insert(self, entry: Tuple[Any, Any, Any]):
+        position = bisect.bisect_left(self.entries, entry)
+        self.entries.insert(position, entry)
+        self.sort_keys.insert(position, entry[0])
+
+    def remove(self, entry: Tuple[Any, Any, Any]):
+        position = bisect.bisect_left(self.entries, entry)
+        if position < len(self.entries) and self.entries[position] == entry:
+            del self.entries[position]
+            del self.sort_keys[position]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def bounds(self, condition: Optional[tuple]) -> Tuple[int, int]:
+        """
+        Get the [start, end) range of entries matching a sort key condition
+        """
+        keys = self.sort_keys
+        if condition is None:
+            return 0, len(keys)
+
+        operator, operands = condition[0], condition[1:]
+        try:
+            if operator == '=':
+                return bisect.bisect_left(keys, operands[0]), bisect.bisect_right(keys, operands[0])
+            if operator == '<':
+                return 0, bisect.bisect_left(keys, operands[0])
+            if operator == '<=':
+                return 0, bisect.bisect_right(keys, operands[0])
+            if operator == '>':
+                return bisect.bisect_right(keys, operands[0]), len(keys)
+            if operator == '>=':
+                return bisect.bisect_left(keys, operands[0]), len(keys)
+            if operator == 'between':
+                return bisect.bisect_left(keys, operands[0]), bisect.bisect_right(keys, operands[1])
+            # begins_with
+            prefix = operands[0]
+            return bisect.bisect_left(keys, prefix), bisect.bisect_left(keys, prefix + _PREFIX_END)
+        except TypeError:
+            # Sort key condition of the wrong type matches nothing
+            return 0, 0
+
+
+def _flatten_and(node: tuple) -> List[tuple]:
+    if node[0] == 'and':
+        return _flatten_and(node[1]) + _flatten_and(node[2])
+    return [node]
+
+
+def _key_condition(expression: str, scope: _Scope, hash_key: str, range_key: str) -> Tuple[Any, Optional[tuple]]:
+    """
+    Split a key condition into the partition key value and a sort key condition
+    """
+    partition_value = _MISSING
+    sort_condition = None
+
+    for clause in _flatten_and(_parse(expression, 'condition')):
+        kind = clause[0]
+        if kind == 'cmp' and clause[2][0] == 'path':
+            attribute = scope.path(clause[2][1])[0]
+            value = _operand_value(clause[3], {}, scope)
+            if attribute == hash_key and clause[1] == '=':
+                partition_value = value
+                continue
+            if attribute == range_key and clause[1] != '<>':
+                sort_condition = (clause[1], value)
+                continue
+        elif kind == 'between' and clause[1][0] == 'path' and scope.path(clause[1][1])[0] == range_key:
+            sort_condition = ('between', _operand_value(clause[2], {}, scope), _operand_value(clause[3], {}, scope))
+            continue
+        elif kind == 'func' and clause[1] == 'begins_with' and scope.path(clause[2][0][1])[0] == range_key:
+            sort_condition = ('begins_with', _operand_value(clause[2][1], {}, scope))
+            continue
+        raise _validation_error("Query key condition not supported", 'Query')
+
+    if partition_value is _MISSING:
+        raise _validation_error("Query condition missed key schema element", 'Query')
+    return partition_value, sort_condition
+
+
+class MemoryTable:
+    """
+    In-memory table exposing the boto3 Table methods we use.
+    """
+
+    def __init__(self, engine: 'MemoryDynamoDB', name: str, indexes: Dict[str, Tuple[str, str]]):
+        self.engine = engine
+        self.name = name
+        self.table_name = name
+        self.key_schema = ('PK', 'SK')
+        self.indexes = dict(indexes)
+
+        self._items = {}
+        self._partitions = {None: {}}
+        for index_name in self.indexes:
+            self._partitions[index_name] = {}
+        self._partition_keys = []
+
+    # Storage
+
+    def _index_entry(self, index_name: Optional[str], item: Dict[str, Any]) -> Optional[Tuple[Any, tuple]]:
+        hash_key, range_key = self.key_schema if index_name is None else self.indexes[index_name]
+        if hash_key not in item or range_key not in item:
+            return None
+        return item[hash_key], (item[range_key], item['PK'], item['SK'])
+
+    def _store(self, item: Dict[str, Any]):
+        key = (item['PK'], item['SK'])
+        self._discard(key)
+
+        self._items[key] = item
+        for index_name, partitions in self._partitions.items():
+            entry = self._index_entry(index_name, item)
+            if entry is None:
+                continue
+            partition_value, position = entry
+            partition = partitions.get(partition_value)
+            if partition is None:
+                partition = partitions[partition_value] = _Partition()
+                if index_name is None:
+                    bisect.insort(self._partition_keys, partition_value)
+            partition.insert(position)
+
+    def _discard(self, key: Tuple[Any, Any]) -> Optional[Dict[str, Any]]:
+        item = self._items.pop(key, None)
+        if item is None:
+            return None
+
+        for index_name, partitions in self._partitions.items():
+            entry = self._index_entry(index_name, item)
+            if entry is None:
+                continue
+            partition_value, position = entry
+            partition = partitions[partition_value]
+            partition.remove(position)
+            if not partition:
+                del partitions[partition_value]
+                if index_name is None:
+                    del self._partition_keys[bisect.bisect_left(self._partition_keys, partition_value)]
+        return item
+
+    def _key(self, key: Dict[str, Any], operation: str) -> Tuple[Any, Any]:
+        if set(key) != set(self.key_schema):
+            raise _validation_error("The provided key element does not match the schema", operation)
+        return key['PK'], key['SK']
+
+    def __len__(self):
+        return len(self._items)
+
+    def items(self) -> List[Dict[str, Any]]:
+        """
+        Copy every stored item, in partition and sort key order
+        """
+        with self.engine.lock:
+            return [
+                _copy_value(self._items[(pk, sk)])
+                for partition_key in self._partition_keys
+                for _, pk, sk in self._partitions[None][partition_key].entries
+            ]
+
+    # Capacity
+
+    def _write_units(self, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> Dict[Optional[str], float]:
+        size = max(item_size(old), item_size(new))
+        units = {None: float(max(1, math.ceil(size / 1024)))}
+        for index_name in self.indexes:
+            touched = [item for item in (old, new) if item and self._index_entry(index_name, item)]
+            if touched:
+                units[index_name] = float(len(touched) * max(1, math.ceil(size / 1024)))
+        return units
+
+    @staticmethod
+    def _read_units(size: int, consistent: bool) -> float:
+        units = max(1, math.ceil(size / 4096))
+        return float(units) if consistent else units / 2
+
+    def _capacity(self, mode: Optional[str], units: Dict[Optional[str], float]) -> Optional[Dict[str, Any]]:
+        if not mode or mode == 'NONE':
+            return None
+
+        consumed = {'TableName': self.name, 'CapacityUnits': sum(units.values())}
+        if mode == 'INDEXES':
+            for target, target_units in units.items():
+                if target is None:
+                    consumed['Table'] = {'CapacityUnits': target_units}
+                else:
+                    consumed.setdefault('GlobalSecondaryIndexes', {})[target] = {'CapacityUnits': target_units}
+        return consumed
+
+    def _respond(self, response: Dict[str, Any], mode: Optional[str],
+                 units: Dict[Optional[str], float]) -> Dict[str, Any]:
+        consumed = self._capacity(mode, units)
+        if consumed:
+            response['ConsumedCapacity'] = consumed
+        return response
+
+    # Conditions
+
+    def _check_condition(self, params: Dict[str, Any], scope: _Scope, current: Optional[Dict[str, Any]],
+                         operation: str):
+        expression = params.get('ConditionExpression')
+        if expression and not _evaluate(_parse(expression, 'condition'), current or {}, scope):
+            raise _client_error('ConditionalCheckFailedException', 'The conditional request failed', operation)
+
+    @staticmethod
+    def _return_values(mode: Optional[str], old: Optional[Dict[str, Any]],
+                       new: Optional[Dict[str, Any]], operation: str) -> Dict[str, Any]:
+        if not mode or mode == 'NONE':
+            return {}
+        if mode == 'ALL_OLD':
+            return {'Attributes': _copy_value(old)} if old else {}
+        if mode in ('ALL_NEW', 'UPDATED_NEW', 'UPDATED_OLD') and operation == 'UpdateItem':
+            source = old if mode == 'UPDATED_OLD' else new
+            return {'Attributes': _copy_value(source)} if source else {}
+        raise _validation_error(f"ReturnValues {mode} is not valid for {operation}", operation)
+
+    # Table API
+
+    def get_item(self, Key: Dict[str, Any], ProjectionExpression: Optional[str] = None,
+                 ExpressionAttributeNames: Optional[Dict[str, str]] = None, ConsistentRead: bool = False,
+                 ReturnConsumedCapacity: Optional[str] = None, **kwargs: Any) -> Dict[str, Any]:
+        self.engine.simulate('GetItem')
+        scope = _Scope(ExpressionAttributeNames, None)
+
+        with self.engine.lock:
+            item = self._items.get(self._key(Key, 'GetItem'))
+            response = {'Item': _project(item, ProjectionExpression, scope)} if item else {}
+
+        return self._respond(response, ReturnConsumedCapacity,
+                             {None: self._read_units(item_size(item), ConsistentRead)})
+
+    def put_item(self, Item: Dict[str, Any], ReturnValues: Optional[str] = None,
+                 ReturnConsumedCapacity: Optional[str] = None, **params: Any) -> Dict[str, Any]:
+        self.engine.simulate('PutItem')
+        params, scope = _normalize_expressions(params)
+        item = _copy_value(Item)
+        key = self._key({name: item.get(name) for name in self.key_schema}, 'PutItem')
+
+        with self.engine.lock:
+            old = self._items.get(key)
+            self._check_condition(params, scope, old, 'PutItem')
+            self._store(item)
+            response = self._return_values(ReturnValues, old, item, 'PutItem')
+
+        return self._respond(response, ReturnConsumedCapacity, self._write_units(old, item))
+
+    def update_item(self, Key: Dict[str, Any], UpdateExpression: str, ReturnValues: Optional[str] = None,
+                    ReturnConsumedCapacity: Optional[str] = None, **params: Any) -> Dict[str, Any]:
+        self.engine.simulate('UpdateItem')
+        params, scope = _normalize_expressions(params)
+        actions = _parse(UpdateExpression, 'update')
+        key = self._key(Key, 'UpdateItem')
+
+        with self.engine.lock:
+            old = self._items.get(key)
+            self._check_condition(params, scope, old, 'UpdateItem')
+
+            item = _copy_value(old) if old else dict(Key)
+            _apply_update(item, actions, scope)
+            if (item['PK'], item['SK']) != key:
+                raise _validation_error("Cannot update attribute PK or SK; they are part of the key", 'UpdateItem')
+            self._store(item)
+            response = self._return_values(ReturnValues, old, item, 'UpdateItem')
+
+        return self._respond(response, ReturnConsumedCapacity, self._write_units(old, item))
+
+    def delete_item(self, Key: Dict[str, Any], ReturnValues: Optional[str] = None,
+                    ReturnConsumedCapacity: Optional[str] = None, **params: Any) -> Dict[str, Any]:
+        self.engine.simulate('DeleteItem')
+        params, scope = _normalize_expressions(params)
+        key = self._key(Key, 'DeleteItem')
+
+        with self.engine.lock:
+            old = self._items.get(key)
+            self._check_condition(params, scope, old, 'DeleteItem')
+            self._discard(key)
+            response = self._return_values(ReturnValues, old, None, 'DeleteItem')
+
+        return self._respond(response, ReturnConsumedCapacity, self._write_units(old, None))
+
+    def query(self, KeyConditionExpression: Any, IndexName: Optional[str] = None,
+              ScanIndexForward: bool = True, Limit: Optional[int] = None,
+              ExclusiveStartKey: Optional[Dict[str, Any]] = None, ConsistentRead: bool = False,
+              ProjectionExpression: Optional[str] = None, Select: Optional[str] = None,
+              ReturnConsumedCapacity: Optional[str] = None, **params: Any) -> Dict[str, Any]:
+        self.engine.simulate('Query')
+        params, scope = _normalize_expressions(dict(params, KeyConditionExpression=KeyConditionExpression))
+
+        if IndexName is not None and IndexName not in self.indexes:
+            raise _validation_error(f"The table does not have the specified index: {IndexName}", 'Query')
+        if IndexName is not None and ConsistentRead:
+            raise _validation_error("Consistent reads are not supported on global secondary indexes", 'Query')
+
+        hash_key, range_key = self.key_schema if IndexName is None else self.indexes[IndexName]
+        partition_value, sort_condition = _key_condition(params['KeyConditionExpression'], scope, hash_key, range_key)
+        filter_node = _parse(params['FilterExpression'], 'condition') if params.get('FilterExpression') else None
+
+        with self.engine.lock:
+            partition = self._partitions[IndexName].get(partition_value)
+            entries = partition.entries if partition else []
+            start, end = partition.bounds(sort_condition) if partition else (0, 0)
+
+            if ExclusiveStartKey:
+                position = (ExclusiveStartKey.get(range_key), ExclusiveStartKey['PK'], ExclusiveStartKey['SK'])
+                if ScanIndexForward:
+                    start = max(start, bisect.bisect_right(entries, position))
+                else:
+                    end = min(end, bisect.bisect_left(entries, position))
+
+            positions = range(start, end) if ScanIndexForward else range(end - 1, start - 1, -1)
+            items, scanned, size, last_key = self._read(
+                (entries[index] for index in positions), filter_node, scope,
+                ProjectionExpression, Limit, IndexName
+            )
+
+        response = {'Count': len(items), 'ScannedCount': scanned}
+        if Select != 'COUNT':
+            response['Items'] = items
+        if last_key:
+            response['LastEvaluatedKey'] = last_key
+        return self._respond(response, ReturnConsumedCapacity, {IndexName: self._read_units(size, ConsistentRead)})
+
+    def scan(self, Segment: Optional[int] = None, TotalSegments: Optional[int] = None,
+             Limit: Optional[int] = None, ExclusiveStartKey: Optional[Dict[str, Any]] = None,
+             ConsistentRead: bool = False, ProjectionExpression: Optional[str] = None,
+             Select: Optional[str] = None, ReturnConsumedCapacity: Optional[str] = None,
+             **params: Any) -> Dict[str, Any]:
+        self.engine.simulate('Scan')
+        params, scope = _normalize_expressions(params)
+        filter_node = _parse(params['FilterExpression'], 'condition') if params.get('FilterExpression') else None
+
+        if (Segment is None) != (TotalSegments is None):
+            raise _validation_error("Segment and TotalSegments must be provided together", 'Scan')
+
+        with self.engine.lock:
+            partition_keys = self._partition_keys
+            first = 0
+            if ExclusiveStartKey:
+                first = bisect.bisect_left(partition_keys, ExclusiveStartKey['PK'])
+
+            def entries():
+                for partition_key in partition_keys[first:]:
+                    if TotalSegments and zlib.crc32(str(partition_key).encode()) % TotalSegments != Segment:
+                        continue
+                    partition_entries = self._partitions[None][partition_key].entries
+                    start = 0
+                    if ExclusiveStartKey and partition_key == ExclusiveStartKey['PK']:
+                        start = bisect.bisect_right(partition_entries, (
+                            ExclusiveStartKey['SK'], ExclusiveStartKey['PK'], ExclusiveStartKey['SK']))
+                    yield from partition_entries[start:]
+
+            items, scanned, size, last_key = self._read(
+                entries(), filter_node, scope, ProjectionExpression, Limit, None
+            )
+
+        response = {'Count': len(items), 'ScannedCount': scanned}
+        if Select != 'COUNT':
+            response['Items'] = items
+        if last_key:
+            response['LastEvaluatedKey'] = last_key
+        return self._respond(response, ReturnConsumedCapacity, {None: self._read_units(size, ConsistentRead)})
+
+    def _read(self, entries, filter_node: Optional[tuple], scope: _Scope, projection: Optional[str],
+              limit: Optional[int], index_name: Optional[str]):
+        """
+        Evaluate entries in order, honouring Limit and the page size limit
+
+        Returns:
+            tuple: (items, scanned count, bytes read, last evaluated key)
+        """
+        items = []
+        scanned = 0
+        size = 0
+        last_item = None
+
+        for _, pk, sk in entries:
+            item = self._items[(pk, sk)]
+            scanned += 1
+            size += item_size(item)
+
+            if filter_node is None or _evaluate(filter_node, item, scope):
+                items.append(_project(item, projection, scope))
+
+            # Like DynamoDB, a page cut short returns a key even if nothing is left
+            if (limit and scanned >= limit) or size >= PAGE_SIZE_LIMIT:
+                last_item = item
+                break
+
+        last_key = None
+        if last_item is not None:
+            key_names = list(self.key_schema)
+            if index_name is not None:
+                key_names += list(self.indexes[index_name])
+            last_key = {name: last_item[name] for name in key_names}
+
+        return items, scanned, size, last_key
+
+
+class MemoryDynamoClient:
+    """
+    Low-level client facade over a MemoryDynamoDB engine.
+
+    Requests and responses use typed attribute values; they are converted and
+    handed to the matching table so both APIs share the same data.
+    """
+
+    def __init__(self, engine: 'MemoryDynamoDB'):
+        self.engine = engine
+
+    @staticmethod
+    def _decode(params: Dict[str, Any]) -> Dict[str, Any]:
+        params = dict(params)
+        for name in ('Key', 'Item', 'ExclusiveStartKey', 'ExpressionAttributeValues'):
+            if name in params:
+                params[name] = {field: _deserializer.deserialize(value) for field, value in params[name].items()}
+        return params
+
+    @staticmethod
+    def _encode(response: Dict[str, Any]) -> Dict[str, Any]:
+        for name in ('Item', 'Attributes', 'LastEvaluatedKey'):
+            if name in response:
+                response[name] = encode_item(response[name])
+        if 'Items' in response:
+            response['Items'] = [encode_item(item) for item in response['Items']]
+        return response
+
+    def _call(self, method: str, TableName: str, **params: Any) -> Dict[str, Any]:
+        table = self.engine.Table(TableName)
+        return self._encode(getattr(table, method)(**self._decode(params)))
+
+    def get_item(self, **params: Any) -> Dict[str, Any]:
+        return self._call('get_item', **params)
+
+    def put_item(self, **params: Any) -> Dict[str, Any]:
+        return self._call('put_item', **params)
+
+    def update_item(self, **params: Any) -> Dict[str, Any]:
+        return self._call('update_item', **params)
+
+    def delete_item(self, **params: Any) -> Dict[str, Any]:
+        return self._call('delete_item', **params)
+
+    def query(self, **params: Any) -> Dict[str, Any]:
+        return self._call('query', **params)
+
+    def scan(self, **params: Any) -> Dict[str, Any]:
+        return self._call('scan', **params)
+
+    def batch_get_item(self, RequestItems: Dict[str, Any], **params: Any) -> Dict[str, Any]:
+        decoded = {
+            table_name: dict(request, Keys=[self._decode({'Key': key})['Key'] for key in request['Keys']])
+            for table_name, request in RequestItems.items()
+        }
+        response = self.engine.batch_get_item(RequestItems=decoded, **params)
+        response['Responses'] = {
+            table_name: [encode_item(item) for item in items]
+            for table_name, items in response['Responses'].items()
+        }
+        response['UnprocessedKeys'] = {
+            table_name: dict(request, Keys=[encode_item(key) for key in request['Keys']])
+            for table_name, request in response['UnprocessedKeys'].items()
+        }
+        return response
+
+    def transact_write_items(self, TransactItems: List[Dict[str, Any]],
+                             ReturnConsumedCapacity: Optional[str] = None, **kwargs: Any) -> Dict[str, Any]:
+        """
+        Apply up to 100 actions atomically, or none if any condition fails
+        """
+        self.engine.simulate('TransactWriteItems')
+
+        if not TransactItems or len(TransactItems) > TRANSACT_MAX_ITEMS:
+            raise _validation_error(f"Member must have length between 1 and {TRANSACT_MAX_ITEMS}",
+                                    'TransactWriteItems')
+
+        actions = []
+        for action in TransactItems:
+            (action_type, params), = action.items()
+            params = self._decode(params)
+            table = self.engine.Table(params.pop('TableName'))
+            key_source = params['Item'] if action_type == 'Put' else params['Key']
+            key = table._key({name: key_source.get(name) for name in table.key_schema}, 'TransactWriteItems')
+            actions.append((action_type, table, key, params))
+
+        keys = Counter((table.name, key) for _, table, key, _ in actions)
+        if any(count > 1 for count in keys.values()):
+            raise _validation_error("Transaction request cannot include multiple operations on one item",
+                                    'TransactWriteItems')
+
+        with self.engine.lock:
+            # Evaluate every condition before writing anything
+            reasons = []
+            for action_type, table, key, params in actions:
+                params, scope = _normalize_expressions(params)
+                expression = params.get('ConditionExpression')
+                current = table._items.get(key)
+                if expression and not _evaluate(_parse(expression, 'condition'), current or {}, scope):
+                    reasons.append({'Code': 'ConditionalCheckFailed', 'Message': 'The conditional request failed'})
+                else:
+                    reasons.append({'Code': 'None'})
+
+            if any(reason['Code'] != 'None' for reason in reasons):
+                codes = ', '.join(reason['Code'] for reason in reasons)
+                raise _client_error(
+                    'TransactionCanceledException',
+                    f"Transaction cancelled, please refer cancellation reasons for specific reasons [{codes}]",
+                    'TransactWriteItems',
+                    CancellationReasons=reasons
+                )
+
+            consumed = {}
+            for action_type, table, key, params in actions:
+                old = table._items.get(key)
+                if action_type == 'Put':
+                    new = _copy_value(params['Item'])
+                    table._store(new)
+                elif action_type == 'Update':
+                    params, scope = _normalize_expressions(params)
+                    new = _copy_value(old) if old else dict(params['Key'])
+                    _apply_update(new, _parse(params['UpdateExpression'], 'update'), scope)
+                    table._store(new)
+                elif action_type == 'Delete':
+                    new = None
+                    table._discard(key)
+                else:  # ConditionCheck
+                    continue
+
+                # Transactional writes cost twice as much as standard writes
+                for target, units in table._write_units(old, new).items():
+                    table_units = consumed.setdefault(table.name, {})
+                    table_units[target] = table_units.get(target, 0.0) + units * 2
+
+        response = {}
+        if ReturnConsumedCapacity and ReturnConsumedCapacity != 'NONE':
+            response['ConsumedCapacity'] = [
+                self.engine.Table(table_name)._capacity(ReturnConsumedCapacity, units)
+                for table_name, units in consumed.items()
+            ]
+        return response
+
+
+class MemoryDynamoDB:
+    """
+    In-memory DynamoDB engine exposing the boto3 resource methods we use.
+
+    Args:
+        indexes (dict, optional): GSI name -> (partition key, sort key) for every
+            table. Defaults to the indexes of the ActivityHub table.
+        latency (float, tuple or callable, optional): Seconds added to every
+            request: a fixed delay, a (min, max) range, or a function of the
+            operation name. Defaults to no delay.
+        throttle_rate (float, optional): Probability in [0, 1] that a request
+            is throttled; batch requests leave that share of entries
+            unprocessed instead. Defaults to 0.
+        seed (int, optional): Seed for latency and throttling. Defaults to None.
+    """
+
+    def __init__(self, indexes: Optional[Dict[str, Tuple[str, str]]] = None,
+                 latency: Union[None, float, Tuple[float, float], Callable[[str], float]] = None,
+                 throttle_rate: float = 0.0, seed: Optional[int] = None):
+        self.indexes = dict(DEFAULT_INDEXES if indexes is None else indexes)
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.lock = threading.RLock()
+        self.client = MemoryDynamoClient(self)
+        self.requests = Counter()
+        self.throttled = Counter()
+
+        self._random = random.Random(seed)
+        self._tables = {}
+
+    def Table(self, name: str) -> MemoryTable:
+        table = self._tables.get(name)
+        if table is None:
+            with self.lock:
+                table = self._tables.setdefault(name, MemoryTable(self, name, self.indexes))
+        return table
+
+    def reset(self):
+        """
+        Drop every table and request counter
+        """
+        with self.lock:
+            self._tables = {}
+            self.requests.clear()
+            self.throttled.clear()
+
+    def simulate(self, operation: str):
+        """
+        Count a request and apply injected latency and throttling
+
+        Args:
+            operation (str): DynamoDB operation name
+
+        Raises:
+            ClientError: ProvisionedThroughputExceededException when throttled
+        """
+        self._delay(operation)
+
+        if self._throttle_entry(operation):
+            raise _client_error(
+                'ProvisionedThroughputExceededException',
+                'The level of configured provisioned throughput for the table was exceeded',
+                operation
+            )
+
+    def _delay(self, operation: str):
+        with self.lock:
+            self.requests[operation] += 1
+
+        latency = self.latency
+        if callable(latency):
+            delay = latency(operation)
+        elif isinstance(latency, tuple):
+            delay = self._random.uniform(*latency)
+        else:
+            delay = latency or 0
+        if delay > 0:
+            time.sleep(delay)
+
+    def _throttle_entry(self, operation: str) -> bool:
+        if self.throttle_rate and self._random.random() < self.throttle_rate:
+            with self.lock:
+                self.throttled[operation] += 1
+            return True
+        return False
+
+    def batch_get_item(self, RequestItems: Dict[str, Any], ReturnConsumedCapacity: Optional[str] = None,
+                       **kwargs: Any) -> Dict[str, Any]:
+        # Batch requests are never throttled as a whole; entries are left unprocessed instead
+        self._delay('BatchGetItem')
+
+        if sum(len(request['Keys']) for request in RequestItems.values()) > BATCH_GET_MAX_KEYS:
+            raise _validation_error("Too many items requested for the BatchGetItem call", 'BatchGetItem')
+
+        responses = {}
+        unprocessed = {}
+        consumed = []
+
+        for table_name, request in RequestItems.items():
+            table = self.Table(table_name)
+            scope = _Scope(request.get('ExpressionAttributeNames'), None)
+            found = []
+            size = 0
+            left = []
+
+            with self.lock:
+                for key in request['Keys']:
+                    if self._throttle_entry('BatchGetItem'):
+                        left.append(key)
+                        continue
+                    item = table._items.get(table._key(key, 'BatchGetItem'))
+                    if item:
+                        size += item_size(item)
+                        found.append(_project(item, request.get('ProjectionExpression'), scope))
+
+            responses[table_name] = found
+            if left:
+                unprocessed[table_name] = dict(request, Keys=left)
+            capacity = table._capacity(ReturnConsumedCapacity, {
+                None: table._read_units(size, request.get('ConsistentRead', False))
+            })
+            if capacity:
+                consumed.append(capacity)
+
+        response = {'Responses': responses, 'UnprocessedKeys': unprocessed}
+        if consumed:
+            response['ConsumedCapacity'] = consumed
+        return response
+
+    def batch_write_item(self, RequestItems: Dict[str, List[Dict[str, Any]]],
+                         ReturnConsumedCapacity: Optional[str] = None, **kwargs: Any) -> Dict[str, Any]:
+        self._delay('BatchWriteItem')
+
+        if sum(len(requests) for requests in RequestItems.values()) > BATCH_WRITE_MAX_ITEMS:
+            raise _validation_error("Too many items requested for the BatchWriteItem call", 'BatchWriteItem')
+
+        unprocessed = {}
+        consumed = []
+
+        for table_name, requests in RequestItems.items():
+            table = self.Table(table_name)
+            keys = [
+                table._key({name: (request.get('PutRequest', {}).get('Item')
+                                   or request['DeleteRequest']['Key']).get(name) for name in table.key_schema},
+                           'BatchWriteItem')
+                for request in requests
+            ]
+            if len(set(keys)) != len(keys):
+                raise _validation_error("Provided list of item keys contains duplicates", 'BatchWriteItem')
+
+            units = {}
+            left = []
+            with self.lock:
+                for request, key in zip(requests, keys):
+                    if self._throttle_entry('BatchWriteItem'):
+                        left.append(request)
+                        continue
+                    old = table._items.get(key)
+                    if 'PutRequest' in request:
+                        new = _copy_value(request['PutRequest']['Item'])
+                        table._store(new)
+                    else:
+                        new = None
+                        table._discard(key)
+                    for target, target_units in table._write_units(old, new).items():
+                        units[target] = units.get(target, 0.0) + target_units
+
+            if left:
+                unprocessed[table_name] = left
+            capacity = table._capacity(ReturnConsumedCapacity, units)
+            if capacity:
+                consumed.append(capacity)
+
+        response = {'UnprocessedItems': unprocessed}
+        if consumed:
+            response['ConsumedCapacity'] = consumed
+        return response
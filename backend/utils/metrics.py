@@ -0,0 +1,325 @@
+import bisect
+import threading
+import time
+from flask import current_app, g, has_app_context, has_request_context, request
+from typing import Any, Callable, Dict, List, Optional
+
+# DynamoDB capacity and latency instrumentation.
+#
+# Every call made through call_dynamodb asks DynamoDB for its consumed
+# capacity (broken down per table and index) and is timed. Results are added
+# to the current request's totals on flask.g and to process-wide counters and
+# latency histograms keyed by Flask endpoint, table/index and operation.
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is unbounded
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+
+# Operations that consume read capacity; everything else consumes write capacity
+READ_OPERATIONS = ('GetItem', 'Query', 'Scan', 'BatchGetItem', 'TransactGetItems')
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+# Cognito calls made with the shared client are timed per (endpoint, operation)
+_cognito_metrics = {}
+
+
+def _setting(name: str, default: Any) -> Any:
+    if has_app_context():
+        return current_app.config.get(name, default)
+    return default
+
+
+def _new_series() -> Dict[str, Any]:
+    return {
+        'calls': 0,
+        'errors': 0,
+        'rcu': 0.0,
+        'wcu': 0.0,
+        'items_returned': 0,
+        'items_scanned': 0,
+        'latency_ms_sum': 0.0,
+        'latency_ms_max': 0.0,
+        'latency_buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1)
+    }
+
+
+def _capacity_by_target(consumed: Any) -> Dict[str, float]:
+    """
+    Flatten a ConsumedCapacity response into units per table and index
+
+    Args:
+        consumed: ConsumedCapacity dict, or a list of them for batch operations
+
+    Returns:
+        dict: Capacity units keyed by 'Table' or 'Table/Index'
+    """
+    if not consumed:
+        return {}
+
+    entries = consumed if isinstance(consumed, list) else [consumed]
+    units = {}
+
+    for entry in entries:
+        table_name = entry.get('TableName', 'unknown')
+        breakdown = False
+
+        if 'Table' in entry:
+            breakdown = True
+            units[table_name] = units.get(table_name, 0.0) + entry['Table'].get('CapacityUnits', 0.0)
+
+        for section in ('GlobalSecondaryIndexes', 'LocalSecondaryIndexes'):
+            for index_name, index_units in entry.get(section, {}).items():
+                breakdown = True
+                target = f"{table_name}/{index_name}"
+                units[target] = units.get(target, 0.0) + index_units.get('CapacityUnits', 0.0)
+
+        if not breakdown:
+            units[table_name] = units.get(table_name, 0.0) + entry.get('CapacityUnits', 0.0)
+
+    return units
+
+
+def record_dynamodb_call(operation: str, target: str, elapsed_ms: float, consumed: Any = None,
+                         items_returned: Optional[int] = None, items_scanned: Optional[int] = None,
+                         error: bool = False):
+    """
+    Record one DynamoDB call
+
+    Args:
+        operation (str): DynamoDB operation, e.g. 'Query'
+        target (str): Table or 'Table/Index' the call was made against
+        elapsed_ms (float): Wall time of the call in milliseconds
+        consumed (optional): ConsumedCapacity from the response. Defaults to None.
+        items_returned (int, optional): Items returned by a read. Defaults to None.
+        items_scanned (int, optional): Items evaluated by a query or scan. Defaults to None.
+        error (bool, optional): Whether the call failed. Defaults to False.
+    """
+    endpoint = (request.endpoint or 'unknown') if has_request_context() else 'background'
+    capacity = _capacity_by_target(consumed)
+    capacity_type = 'rcu' if operation in READ_OPERATIONS else 'wcu'
+    bucket = bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)
+
+    with _metrics_lock:
+        series = _metrics.setdefault((endpoint, target, operation), _new_series())
+        series['calls'] += 1
+        series['errors'] += 1 if error else 0
+        series['items_returned'] += items_returned or 0
+        series['items_scanned'] += items_scanned or 0
+        series['latency_ms_sum'] += elapsed_ms
+        series['latency_ms_max'] = max(series['latency_ms_max'], elapsed_ms)
+        series['latency_buckets'][bucket] += 1
+
+        # Capacity is attributed to whichever table or index actually consumed it
+        for capacity_target, units in capacity.items():
+            capacity_series = _metrics.setdefault((endpoint, capacity_target, operation), _new_series())
+            capacity_series[capacity_type] += units
+
+    total_units = sum(capacity.values())
+
+    if has_request_context():
+        usage = g.setdefault('dynamodb_usage', {'calls': 0, 'rcu': 0.0, 'wcu': 0.0, 'time_ms': 0.0})
+        usage['calls'] += 1
+        usage[capacity_type] += total_units
+        usage['time_ms'] += elapsed_ms
+
+    _log_if_slow(endpoint, operation, target, elapsed_ms, total_units, items_returned, items_scanned)
+
+
+def _log_if_slow(endpoint: str, operation: str, target: str, elapsed_ms: float, units: float,
+                 items_returned: Optional[int], items_scanned: Optional[int]):
+    """
+    Warn about calls that were slow or read far more than they returned
+    """
+    if not has_app_context():
+        return
+
+    slow_ms = _setting('DYNAMODB_SLOW_CALL_MS', 100)
+    ratio = _setting('DYNAMODB_SLOW_READ_RATIO', 10)
+    min_scanned = _setting('DYNAMODB_SLOW_READ_MIN_SCANNED', 50)
+
+    reasons = []
+    if elapsed_ms >= slow_ms:
+        reasons.append(f"took {elapsed_ms:.1f}ms")
+    if items_scanned is not None and items_scanned >= min_scanned \
+            and items_scanned > ratio * max(items_returned or 0, 1):
+        reasons.append(f"read {items_scanned} items to return {items_returned or 0}")
+
+    if reasons:
+        current_app.logger.warning(
+            f"Slow DynamoDB {operation} on {target} from {endpoint}: {', '.join(reasons)} ({units:.1f} CU)"
+        )
+
+
+def call_dynamodb(operation: str, method: Callable[..., Dict[str, Any]], target: str,
+                  **params: Any) -> Dict[str, Any]:
+    """
+    Make an instrumented DynamoDB call
+
+    Args:
+        operation (str): DynamoDB operation name, e.g. 'GetItem'
+        method (callable): Bound boto3 method to call, e.g. table.get_item
+        target (str): Table or 'Table/Index' the call is made against
+        **params: Parameters for the call
+
+    Returns:
+        dict: The DynamoDB response
+    """
+    if not _setting('DYNAMODB_METRICS_ENABLED', True):
+        return method(**params)
+
+    params.setdefault('ReturnConsumedCapacity', 'INDEXES')
+    started_at = time.perf_counter()
+
+    try:
+        response = method(**params)
+    except Exception:
+        record_dynamodb_call(operation, target, (time.perf_counter() - started_at) * 1000, error=True)
+        raise
+
+    elapsed_ms = (time.perf_counter() - started_at) * 1000
+
+    items_returned = None
+    if 'Items' in response:
+        items_returned = len(response['Items'])
+    elif 'Item' in response or operation == 'GetItem':
+        items_returned = 1 if response.get('Item') else 0
+
+    record_dynamodb_call(
+        operation,
+        target,
+        elapsed_ms,
+        consumed=response.get('ConsumedCapacity'),
+        items_returned=items_returned,
+        items_scanned=response.get('ScannedCount')
+    )
+
+    return response
+
+
+def record_cognito_call(operation: str, elapsed_ms: float, error: bool = False):
+    """
+    Record one Cognito call
+
+    Args:
+        operation (str): Cognito operation, e.g. 'InitiateAuth'
+        elapsed_ms (float): Wall time of the call, including retries, in milliseconds
+        error (bool, optional): Whether the call failed. Defaults to False.
+    """
+    endpoint = (request.endpoint or 'unknown') if has_request_context() else 'background'
+    bucket = bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)
+
+    with _metrics_lock:
+        series = _cognito_metrics.setdefault((endpoint, operation), {
+            'calls': 0,
+            'errors': 0,
+            'latency_ms_sum': 0.0,
+            'latency_ms_max': 0.0,
+            'latency_buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        })
+        series['calls'] += 1
+        series['errors'] += 1 if error else 0
+        series['latency_ms_sum'] += elapsed_ms
+        series['latency_ms_max'] = max(series['latency_ms_max'], elapsed_ms)
+        series['latency_buckets'][bucket] += 1
+
+
+def get_cognito_metrics() -> List[Dict[str, Any]]:
+    """
+    Get process-wide Cognito metrics
+
+    Returns:
+        list: One entry per (endpoint, operation) with call and error counts
+              and a latency histogram
+    """
+    with _metrics_lock:
+        snapshot = [(key, dict(series, latency_buckets=list(series['latency_buckets'])))
+                    for key, series in _cognito_metrics.items()]
+
+    results = []
+    for (endpoint, operation), series in sorted(snapshot):
+        calls = series['calls']
+        series.update({
+            'endpoint': endpoint,
+            'operation': operation,
+            'latency_ms_avg': round(series['latency_ms_sum'] / calls, 2) if calls else 0.0,
+            'latency_buckets': dict(zip([str(bound) for bound in LATENCY_BUCKETS_MS] + ['+Inf'],
+                                        series['latency_buckets']))
+        })
+        results.append(series)
+
+    return results
+
+
+def reset_cognito_metrics():
+    """
+    Clear the process-wide Cognito metrics
+    """
+    with _metrics_lock:
+        _cognito_metrics.clear()
+
+
+def get_request_dynamodb_usage() -> Dict[str, Any]:
+    """
+    Get DynamoDB totals for the current request
+
+    Returns:
+        dict: Calls, RCUs, WCUs and time spent in DynamoDB so far
+    """
+    return dict(g.get('dynamodb_usage', {'calls': 0, 'rcu': 0.0, 'wcu': 0.0, 'time_ms': 0.0}))
+
+
+def get_dynamodb_metrics() -> List[Dict[str, Any]]:
+    """
+    Get process-wide DynamoDB metrics
+
+    Returns:
+        list: One entry per (endpoint, table/index, operation) with call counts,
+              capacity, item counts and a latency histogram
+    """
+    with _metrics_lock:
+        snapshot = [(key, dict(series, latency_buckets=list(series['latency_buckets'])))
+                    for key, series in _metrics.items()]
+
+    results = []
+    for (endpoint, target, operation), series in sorted(snapshot):
+        calls = series['calls']
+        series.update({
+            'endpoint': endpoint,
+            'target': target,
+            'operation': operation,
+            'rcu': round(series['rcu'], 2),
+            'wcu': round(series['wcu'], 2),
+            'latency_ms_avg': round(series['latency_ms_sum'] / calls, 2) if calls else 0.0,
+            'latency_buckets': dict(zip([str(bound) for bound in LATENCY_BUCKETS_MS] + ['+Inf'],
+                                        series['latency_buckets']))
+        })
+        results.append(series)
+
+    return results
+
+
+def reset_dynamodb_metrics():
+    """
+    Clear the process-wide DynamoDB metrics
+    """
+    with _metrics_lock:
+        _metrics.clear()
+
+
+def register_dynamodb_metrics(app):
+    """
+    Log each request's DynamoDB totals once it has been handled
+
+    Args:
+        app: Flask application instance
+    """
+    @app.after_request
+    def log_dynamodb_usage(response):
+        usage = g.get('dynamodb_usage')
+        if usage:
+            app.logger.debug(
+                f"{request.method} {request.path}: {usage['calls']} DynamoDB calls, "
+                f"{usage['rcu']:.1f} RCU, {usage['wcu']:.1f} WCU, {usage['time_ms']:.1f}ms"
+            )
+        return response
@@ -0,0 +1,554 @@
+import decimal
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Attr
+from flask import current_app
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from utils.database import (
+    BulkWriter,
+    SHARDED_ENTITY_TYPES,
+    batch_get_items,
+    claim_email,
+    cognito_username_key,
+    entity_shard,
+    get_table,
+    update_item
+)
+
+# Parallel segmented scans over the single table.
+#
+# Every segment is scanned by its own worker thread. Pages are handed to a
+# single consumer through a bounded queue, so memory use is capped at a few
+# pages per segment no matter how large the table is. Read capacity is shared
+# through a token bucket, and progress is recorded per segment so an
+# interrupted run can resume where it stopped.
+
+EXPORT_FORMATS = ('ndjson', 'ndjson.gz')
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket used to cap read capacity per second.
+
+    Capacity is debited after each request with what DynamoDB reports as
+    consumed, which may push the balance below zero; callers then wait until
+    the bucket has refilled before sending the next request.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate (float): Tokens added per second
+            capacity (float, optional): Maximum balance. Defaults to one second of tokens.
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def wait(self):
+        """
+        Block until the balance is positive
+        """
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens > 0:
+                    return
+                delay = -self._tokens / self.rate
+            time.sleep(delay)
+
+    def consume(self, tokens: float):
+        """
+        Debit tokens that have been spent
+
+        Args:
+            tokens (float): Tokens to remove from the balance
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+
+
+class ScanCheckpoint:
+    """
+    Per-segment scan progress persisted to a JSON file.
+
+    A segment is either finished or has the LastEvaluatedKey of the last page
+    that was fully handed to the consumer. Pages are recorded after they have
+    been written, so a resumed run delivers every item at least once.
+    """
+
+    def __init__(self, path: Optional[str], total_segments: int):
+        """
+        Args:
+            path (str, optional): Checkpoint file, or None to keep progress in memory only
+            total_segments (int): Number of scan segments
+        """
+        self.path = path
+        self.total_segments = total_segments
+        self.segments = {}
+
+        if path and os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f, parse_float=decimal.Decimal, parse_int=decimal.Decimal)
+            if int(state['total_segments']) != total_segments:
+                raise ValueError(
+                    f"Checkpoint was written for {state['total_segments']} segments, not {total_segments}"
+                )
+            self.segments = {int(segment): progress for segment, progress in state['segments'].items()}
+
+    @property
+    def resumed(self) -> bool:
+        return bool(self.segments)
+
+    def is_done(self, segment: int) -> bool:
+        return self.segments.get(segment, {}).get('done', False)
+
+    def start_key(self, segment: int) -> Optional[Dict[str, Any]]:
+        return self.segments.get(segment, {}).get('last_key')
+
+    def record(self, segment: int, last_key: Optional[Dict[str, Any]]):
+        """
+        Record that a segment has been processed up to a key
+
+        Args:
+            segment (int): Segment number
+            last_key (dict, optional): LastEvaluatedKey of the page, None when the
+                segment is finished
+        """
+        self.segments[segment] = {'done': last_key is None, 'last_key': last_key}
+        self.save()
+
+    def save(self):
+        if not self.path:
+            return
+
+        # Write to a temporary file and rename so a crash never leaves a torn checkpoint
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({
+                'total_segments': self.total_segments,
+                'segments': {str(segment): progress for segment, progress in self.segments.items()}
+            }, f, default=_json_default)
+        os.replace(temp_path, self.path)
+
+
+def _json_default(value: Any) -> Any:
+    """
+    Convert DynamoDB types that json can't serialize
+    """
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('latin-1')
+    if hasattr(value, 'value'):  # boto3 Binary
+        return bytes(value.value).decode('latin-1')
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def parallel_scan(handle_page: Callable[[int, List[Dict[str, Any]]], None], total_segments: int = 4,
+                  entity_type: Optional[str] = None, rcu_budget: Optional[float] = None,
+                  page_size: Optional[int] = None, checkpoint: Optional[ScanCheckpoint] = None,
+                  max_queued_pages: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Scan the whole table with parallel segments
+
+    Worker threads scan the segments; pages are passed to handle_page on the
+    calling thread one at a time, so the handler needs no locking.
+
+    Args:
+        handle_page (callable): Called with (segment, items) for every page read
+        total_segments (int, optional): Number of parallel segments. Defaults to 4.
+        entity_type (str, optional): Only return items with this EntityType. Defaults to None.
+        rcu_budget (float, optional): Read capacity units per second shared by all
+            segments. Defaults to unlimited.
+        page_size (int, optional): Items evaluated per Scan request. Defaults to None.
+        checkpoint (ScanCheckpoint, optional): Progress to resume from and update.
+            Defaults to an in-memory checkpoint.
+        max_queued_pages (int, optional): Pages buffered between the workers and
+            the handler. Defaults to two per segment.
+
+    Returns:
+        dict: Scan statistics (segments, pages, items scanned/returned, RCUs, elapsed seconds)
+    """
+    table = get_table()
+    logger = current_app.logger
+    checkpoint = checkpoint or ScanCheckpoint(None, total_segments)
+    bucket = TokenBucket(rcu_budget) if rcu_budget else None
+
+    pages = queue.Queue(maxsize=max_queued_pages or total_segments * 2)
+    stop = threading.Event()
+    stats = {
+        'segments': total_segments,
+        'pages': 0,
+        'scanned': 0,
+        'returned': 0,
+        'consumed_rcu': 0.0,
+        'elapsed_seconds': 0.0
+    }
+    stats_lock = threading.Lock()
+    _SEGMENT_DONE = object()
+
+    def scan_segment(segment: int):
+        try:
+            start_key = checkpoint.start_key(segment)
+            while not stop.is_set():
+                scan_params = {
+                    'Segment': segment,
+                    'TotalSegments': total_segments,
+                    'ReturnConsumedCapacity': 'TOTAL'
+                }
+                if entity_type:
+                    scan_params['FilterExpression'] = Attr('EntityType').eq(entity_type)
+                if page_size:
+                    scan_params['Limit'] = page_size
+                if start_key:
+                    scan_params['ExclusiveStartKey'] = start_key
+
+                if bucket:
+                    bucket.wait()
+
+                response = table.scan(**scan_params)
+                consumed = response.get('ConsumedCapacity', {}).get('CapacityUnits', 0)
+                if bucket:
+                    bucket.consume(consumed)
+
+                with stats_lock:
+                    stats['consumed_rcu'] += consumed
+                    stats['scanned'] += response.get('ScannedCount', 0)
+
+                start_key = response.get('LastEvaluatedKey')
+                _put(pages, (segment, response.get('Items', []), start_key), stop)
+
+                if not start_key:
+                    return
+        except Exception:
+            # Stop the other segments early; the error is re-raised from the future
+            stop.set()
+            raise
+        finally:
+            _put(pages, (segment, _SEGMENT_DONE, None), stop)
+
+    started_at = time.monotonic()
+    segments = [segment for segment in range(total_segments) if not checkpoint.is_done(segment)]
+
+    with ThreadPoolExecutor(max_workers=max(len(segments), 1), thread_name_prefix='scan') as executor:
+        futures = [executor.submit(scan_segment, segment) for segment in segments]
+
+        try:
+            remaining = len(segments)
+            while remaining:
+                try:
+                    segment, items, last_key = pages.get(timeout=0.1)
+                except queue.Empty:
+                    # A stopped worker may not have been able to queue its done marker
+                    if all(future.done() for future in futures) and pages.empty():
+                        break
+                    continue
+
+                if items is _SEGMENT_DONE:
+                    remaining -= 1
+                    continue
+
+                handle_page(segment, items)
+                checkpoint.record(segment, last_key)
+                with stats_lock:
+                    stats['pages'] += 1
+                    stats['returned'] += len(items)
+        finally:
+            stop.set()
+            # Unblock any worker waiting on a full queue
+            while any(not future.done() for future in futures):
+                try:
+                    pages.get(timeout=0.05)
+                except queue.Empty:
+                    pass
+
+        # Surface the first worker error, if any
+        for future in futures:
+            future.result()
+
+    stats['elapsed_seconds'] = round(time.monotonic() - started_at, 3)
+    stats['consumed_rcu'] = round(stats['consumed_rcu'], 1)
+    logger.info(
+        f"Parallel scan finished: {stats['returned']} items from {stats['scanned']} scanned "
+        f"in {stats['pages']} pages, {stats['consumed_rcu']} RCUs, {stats['elapsed_seconds']}s"
+    )
+    return stats
+
+
+def _put(pages: queue.Queue, entry: tuple, stop: threading.Event):
+    """
+    Put an entry on the page queue, giving up once the scan is being stopped
+    """
+    while True:
+        try:
+            pages.put(entry, timeout=0.1)
+            return
+        except queue.Full:
+            if stop.is_set():
+                return
+
+
+def export_table(output_path: str, output_format: str = 'ndjson', total_segments: int = 4,
+                 entity_type: Optional[str] = None, rcu_budget: Optional[float] = None,
+                 page_size: Optional[int] = None, checkpoint_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Export table items to newline-delimited JSON
+
+    Args:
+        output_path (str): File to write
+        output_format (str, optional): 'ndjson' or the gzip-compressed 'ndjson.gz'.
+            Defaults to 'ndjson'.
+        total_segments (int, optional): Number of parallel segments. Defaults to 4.
+        entity_type (str, optional): Only export items with this EntityType. Defaults to None.
+        rcu_budget (float, optional): Read capacity units per second. Defaults to unlimited.
+        page_size (int, optional): Items evaluated per Scan request. Defaults to None.
+        checkpoint_path (str, optional): Checkpoint file used to resume an
+            interrupted export. Defaults to None.
+
+    Returns:
+        dict: Scan statistics
+    """
+    if output_format not in EXPORT_FORMATS:
+        raise ValueError(f"Invalid format. Must be one of: {', '.join(EXPORT_FORMATS)}")
+
+    checkpoint = ScanCheckpoint(checkpoint_path, total_segments)
+
+    # Append when resuming so pages written before the interruption are kept
+    mode = 'ab' if checkpoint.resumed else 'wb'
+    opener = gzip.open if output_format == 'ndjson.gz' else open
+
+    with opener(output_path, mode) as output:
+        def write_page(segment: int, items: List[Dict[str, Any]]):
+            for item in items:
+                output.write(json.dumps(item, separators=(',', ':'), default=_json_default).encode())
+                output.write(b'\n')
+            output.flush()
+
+        stats = parallel_scan(
+            write_page,
+            total_segments=total_segments,
+            entity_type=entity_type,
+            rcu_budget=rcu_budget,
+            page_size=page_size,
+            checkpoint=checkpoint
+        )
+
+    # The export is complete; a stale checkpoint would make the next run a no-op
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    return stats
+
+
+def sweep_orphans(total_segments: int = 4, rcu_budget: Optional[float] = None,
+                  page_size: Optional[int] = None, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Find and delete items left behind by deleted users
+    
+    An item is an orphan when a user it belongs to has no PROFILE item, no
+    COGNITO#<sub> username record and no FAMILY_IMPORT marker (the last two
+    are how users that only exist in Cognito show up): CHILD# relationships
+    whose parent or child is gone, EMAIL# claims of a deleted user and any
+    other USER#<id> item without a profile.
+    Each page's candidates whose users have not been seen yet are re-checked
+    with consistent reads and deleted as the page is handled, so memory stays
+    bounded by the number of users rather than the number of items, and users
+    created while the scan is running are never touched.
+    
+    Args:
+        total_segments (int, optional): Number of parallel segments. Defaults to 4.
+        rcu_budget (float, optional): Read capacity units per second. Defaults to unlimited.
+        page_size (int, optional): Items evaluated per Scan request. Defaults to None.
+        dry_run (bool, optional): Only report orphans. Defaults to False.
+    
+    Returns:
+        dict: Scan statistics plus users, orphans found and orphans deleted
+    """
+    users = set()
+    orphans = 0
+    
+    def sweep(segment: int, items: List[Dict[str, Any]], writer: Optional[BulkWriter]):
+        nonlocal orphans
+        candidates = []
+        for item in items:
+            pk, sk = item['PK'], item['SK']
+            if pk.startswith('USER#'):
+                # An imported family's parent may have no other item in the table
+                if sk in ('PROFILE', 'FAMILY_IMPORT'):
+                    users.add(pk[len('USER#'):])
+                    continue
+                referenced = {pk[len('USER#'):]}
+                if sk.startswith('CHILD#'):
+                    referenced.add(sk[len('CHILD#'):])
+            elif pk.startswith('COGNITO#') and sk == 'USERNAME':
+                users.add(pk[len('COGNITO#'):])
+                continue
+            elif pk.startswith('EMAIL#') and sk == 'EMAIL' and item.get('UserId'):
+                referenced = {item['UserId']}
+            else:
+                continue
+            candidates.append(({'PK': pk, 'SK': sk}, referenced))
+        
+        # Users not seen yet may live in another segment or be newly created; check each page's now
+        suspects = [(key, referenced) for key, referenced in candidates if not referenced <= users]
+        missing = {user_id for _, referenced in suspects for user_id in referenced} - users
+        if not missing:
+            return
+        found = batch_get_items(
+            [{'PK': f"USER#{user_id}", 'SK': sk} for user_id in missing for sk in ('PROFILE', 'FAMILY_IMPORT')]
+            + [cognito_username_key(user_id) for user_id in missing],
+            projection=['UserId'],
+            consistent_read=True
+        )
+        users.update(item['PK'].split('#', 1)[1] for item in found)
+        
+        for key, referenced in suspects:
+            if referenced <= users:
+                continue
+            orphans += 1
+            if writer is not None:
+                writer.delete(key['PK'], key['SK'])
+    
+    def run(writer: Optional[BulkWriter] = None) -> Dict[str, Any]:
+        return parallel_scan(lambda segment, items: sweep(segment, items, writer),
+                             total_segments=total_segments, rcu_budget=rcu_budget, page_size=page_size)
+    
+    deleted = 0
+    if dry_run:
+        stats = run()
+    else:
+        with BulkWriter() as writer:
+            stats = run(writer)
+        deleted = writer.stats['written']
+    
+    stats.update({
+        'users': len(users),
+        'orphans': orphans,
+        'deleted': deleted,
+        'dry_run': dry_run
+    })
+    current_app.logger.info(
+        f"Orphan sweep finished: {orphans} orphans found, {deleted} deleted"
+        + (" (dry run)" if dry_run else "")
+    )
+    return stats
+
+
+def backfill_entity_shards(total_segments: int = 4, rcu_budget: Optional[float] = None,
+                           page_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Set EntityShard on every item of a sharded entity type that lacks it
+    
+    Items written before sharding, or before ENTITY_SHARD_COUNT changed, are
+    moved to their current shard. Each item is updated in place, so concurrent
+    writes to other attributes are never overwritten.
+    
+    Args:
+        total_segments (int, optional): Number of parallel segments. Defaults to 4.
+        rcu_budget (float, optional): Read capacity units per second. Defaults to unlimited.
+        page_size (int, optional): Items evaluated per Scan request. Defaults to None.
+    
+    Returns:
+        dict: Scan statistics plus the number of items updated
+    """
+    updated = 0
+    
+    def reshard(segment: int, items: List[Dict[str, Any]]):
+        nonlocal updated
+        for item in items:
+            if item.get('EntityType') not in SHARDED_ENTITY_TYPES:
+                continue
+            shard = entity_shard(item['EntityType'], item['PK'])
+            if item.get('EntityShard') == shard:
+                continue
+            # Skip items deleted since they were scanned
+            if update_item(
+                pk=item['PK'],
+                sk=item['SK'],
+                update_expression='SET EntityShard = :shard',
+                expression_attribute_values={':shard': shard},
+                condition_expression='attribute_exists(PK)'
+            ):
+                updated += 1
+    
+    stats = parallel_scan(reshard, total_segments=total_segments, rcu_budget=rcu_budget, page_size=page_size)
+    stats['updated'] = updated
+    current_app.logger.info(f"Entity shard backfill finished: {updated} items updated")
+    return stats
+
+
+def backfill_email_claims(total_segments: int = 4, rcu_budget: Optional[float] = None,
+                          page_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Write the EMAIL#<email> uniqueness claim of every profile that lacks one
+    
+    create_user relies on the claim to keep emails unique, so run this once
+    for users created before claims existed. Profiles whose email is already
+    claimed by a different user are duplicates and are only reported.
+    
+    Args:
+        total_segments (int, optional): Number of parallel segments. Defaults to 4.
+        rcu_budget (float, optional): Read capacity units per second. Defaults to unlimited.
+        page_size (int, optional): Items evaluated per Scan request. Defaults to None.
+    
+    Returns:
+        dict: Scan statistics plus the number of profiles claimed and of duplicates
+    """
+    claimed = 0
+    duplicates = []
+    
+    def claim(segment: int, items: List[Dict[str, Any]]):
+        nonlocal claimed
+        for item in items:
+            if item.get('SK') != 'PROFILE' or not item.get('Email'):
+                continue
+            if claim_email(item['Email'], item['UserId'], item.get('CreatedAt')):
+                claimed += 1
+            else:
+                duplicates.append(item['UserId'])
+    
+    stats = parallel_scan(claim, total_segments=total_segments, entity_type='USER',
+                          rcu_budget=rcu_budget, page_size=page_size)
+    stats.update({
+        'claimed': claimed,
+        'duplicates': len(duplicates),
+        'duplicate_users': sorted(duplicates)[:100]
+    })
+    current_app.logger.info(
+        f"Email claim backfill finished: {claimed} profiles claimed, {len(duplicates)} duplicates"
+    )
+    return stats
+
+
+def read_export(path: str) -> Iterable[Dict[str, Any]]:
+    """
+    Stream items back from an export file
+
+    Args:
+        path (str): File written by export_table
+
+    Yields:
+        dict: Exported items
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -1,9 +1,10 @@
 # Set up Cognito
 module "cognito" {
-  source      = "./modules/cognito"
-  app_name    = var.app_name
-  environment = var.environment
-  auto_verify = var.cognito_auto_verify
+  source             = "./modules/cognito"
+  app_name           = var.app_name
+  environment        = var.environment
+  auto_verify        = var.cognito_auto_verify
+  trigger_lambda_arn = module.lambda.cognito_trigger_function_arn
 }
 
 # Set up IAM roles
@@ -24,7 +25,7 @@ module "api_gateway" {
   stage_name  = var.api_gateway_stage_name
 }
 
-# Set up Lambda function placeholder
+# Set up the Cognito trigger Lambda function
 module "lambda" {
   source                    = "./modules/lambda"
   app_name                  = var.app_name
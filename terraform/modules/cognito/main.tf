@@ -39,11 +39,25 @@ resource "aws_cognito_user_pool" "main" {
     email_sending_account = "COGNITO_DEFAULT"
   }
 
+  # Mirror users into DynamoDB when they confirm sign-up and when tokens are issued
+  lambda_config {
+    post_confirmation    = var.trigger_lambda_arn
+    pre_token_generation = var.trigger_lambda_arn
+  }
+
   tags = {
     Name = "${var.app_name}-${var.environment}-user-pool"
   }
 }
 
+resource "aws_lambda_permission" "cognito_trigger" {
+  statement_id  = "AllowCognitoInvoke"
+  action        = "lambda:InvokeFunction"
+  function_name = var.trigger_lambda_arn
+  principal     = "cognito-idp.amazonaws.com"
+  source_arn    = aws_cognito_user_pool.main.arn
+}
+
 resource "aws_cognito_user_pool_client" "client" {
   name                         = "${var.app_name}-${var.environment}-client"
   user_pool_id                 = aws_cognito_user_pool.main.id
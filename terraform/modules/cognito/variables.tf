@@ -13,3 +13,9 @@ variable "auto_verify" {
   type        = bool
   default     = true
 }
+
+
+variable "trigger_lambda_arn" {
+  description = "ARN of the Lambda run on post confirmation and pre token generation"
+  type        = string
+}
@@ -20,6 +20,11 @@ resource "aws_dynamodb_table" "main" {
     type = "S"
   }
 
+  attribute {
+    name = "EntityShard"
+    type = "S"
+  }
+
   attribute {
     name = "GSI1PK"
     type = "S"
@@ -37,6 +42,14 @@ resource "aws_dynamodb_table" "main" {
     projection_type    = "ALL"
   }
 
+  # Write-sharded entity listings (EntityShard is "<type>#<n>")
+  global_secondary_index {
+    name               = "EntityShardIndex"
+    hash_key           = "EntityShard"
+    range_key          = "PK"
+    projection_type    = "ALL"
+  }
+
   # Global Secondary Index for flexible querying
   global_secondary_index {
     name               = "GSI1"
@@ -1,5 +1,27 @@
+import os
+
+from app import create_app
+from utils.cognito_sync import handle_cognito_trigger
+
+# Cognito trigger Lambda.
+#
+# Mirrors users into their USER#<sub>/PROFILE item on post confirmation and
+# pre token generation. The function is packaged with the backend (see the
+# Terraform README), and the app is created once per container so the
+# DynamoDB client and profile cache are reused across invocations.
+app = create_app(os.environ.get('FLASK_CONFIG', 'production'))
+
+
 def lambda_handler(event, context):
-    return {
-        'statusCode': 200,
-        'body': 'Placeholder Lambda function'
-    }
+    """
+    Handle a Cognito user pool trigger
+
+    Args:
+        event (dict): Cognito trigger event
+        context: Lambda context
+
+    Returns:
+        dict: The event, as Cognito expects
+    """
+    with app.app_context():
+        return handle_cognito_trigger(event)
@@ -1,47 +1,35 @@
-# Lambda Function Placeholder - This will be expanded as specific functions are developed
-resource "aws_lambda_function" "placeholder" {
-  function_name = "${var.app_name}-${var.environment}-placeholder"
+# Cognito trigger Lambda - mirrors users into DynamoDB on post confirmation and pre token generation
+resource "aws_lambda_function" "cognito_trigger" {
+  function_name = "${var.app_name}-${var.environment}-cognito-trigger"
   role          = var.lambda_execution_role_arn
   handler       = "lambda_function.lambda_handler"
   runtime       = var.runtime
   timeout       = var.timeout
   memory_size   = var.memory_size
 
-  # Placeholder for code
-  filename      = "${path.module}/placeholder_lambda.zip"
-  
+  filename         = data.archive_file.cognito_trigger_zip.output_path
+  source_code_hash = data.archive_file.cognito_trigger_zip.output_base64sha256
+
   environment {
     variables = {
-      ENVIRONMENT        = var.environment
-      DYNAMODB_TABLE     = var.dynamodb_table_name
-      RAW_BUCKET         = var.raw_bucket_name
-      PROCESSED_BUCKET   = var.processed_bucket_name
+      ENVIRONMENT              = var.environment
+      FLASK_CONFIG             = "production"
+      DYNAMODB_TABLE           = var.dynamodb_table_name
+      RAW_BUCKET               = var.raw_bucket_name
+      PROCESSED_BUCKET         = var.processed_bucket_name
+      # The container is frozen once the trigger returns, so run tasks inline
+      BACKGROUND_TASKS_ENABLED = "false"
     }
   }
 
   tags = {
-    Name = "${var.app_name}-${var.environment}-placeholder"
+    Name = "${var.app_name}-${var.environment}-cognito-trigger"
   }
 }
 
-# Create a placeholder zip file for Lambda
-resource "local_file" "placeholder_lambda_code" {
-  content  = <<EOF
-def lambda_handler(event, context):
-    return {
-        'statusCode': 200,
-        'body': 'Placeholder Lambda function'
-    }
-EOF
-  filename = "${path.module}/lambda_function.py"
-}
-
-data "archive_file" "placeholder_lambda_zip" {
+# The package is the backend, its dependencies and lambda_function.py (see README)
+data "archive_file" "cognito_trigger_zip" {
   type        = "zip"
-  output_path = "${path.module}/placeholder_lambda.zip"
-  source_file = local_file.placeholder_lambda_code.filename
-
-  depends_on = [
-    local_file.placeholder_lambda_code
-  ]
-}
\ No newline at end of file
+  output_path = "${path.module}/cognito_trigger.zip"
+  source_dir  = var.package_dir
+}
@@ -1,9 +1,9 @@
-output "placeholder_function_name" {
-  description = "Name of the placeholder Lambda function"
-  value       = aws_lambda_function.placeholder.function_name
+output "cognito_trigger_function_name" {
+  description = "Name of the Cognito trigger Lambda function"
+  value       = aws_lambda_function.cognito_trigger.function_name
 }
 
-output "placeholder_function_arn" {
-  description = "ARN of the placeholder Lambda function"
-  value       = aws_lambda_function.placeholder.arn
-}
\ No newline at end of file
+output "cognito_trigger_function_arn" {
+  description = "ARN of the Cognito trigger Lambda function"
+  value       = aws_lambda_function.cognito_trigger.arn
+}
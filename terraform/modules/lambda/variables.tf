@@ -44,4 +44,10 @@ variable "raw_bucket_name" {
 variable "processed_bucket_name" {
   description = "Name of the processed media S3 bucket"
   type        = string
-}
\ No newline at end of file
+}
+
+variable "package_dir" {
+  description = "Directory holding the backend, its dependencies and lambda_function.py"
+  type        = string
+  default     = "../build/cognito-trigger"
+}
@@ -48,9 +48,9 @@ output "api_gateway_id" {
 }
 
 # Lambda outputs
-output "placeholder_lambda_function_name" {
-  description = "Name of the placeholder Lambda function"
-  value       = module.lambda.placeholder_function_name
+output "cognito_trigger_function_name" {
+  description = "Name of the Cognito trigger Lambda function"
+  value       = module.lambda.cognito_trigger_function_name
 }
 
 # IAM outputs